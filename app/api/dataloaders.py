@@ -0,0 +1,196 @@
+"""
+Request-scoped batch loaders for the GraphQL API.
+
+Strawberry's Flask view executes resolvers synchronously, so the async
+``strawberry.dataloader.DataLoader`` cannot be used here. ``BatchLoader``
+gives the same guarantee for the sync path: parent resolvers queue the keys
+their children will ask for, and the first child lookup fetches every queued
+key with a single ``IN (...)`` query. Nested queries therefore cost one round
+trip per relation instead of one per row.
+
+Usage:
+    loaders = GraphQLLoaders()
+    loaders.template.queue(s.template_id for s in students)
+    template = loaders.template.load(student.template_id)  # one query for all
+"""
+import logging
+from collections import defaultdict
+
+from sqlalchemy import func
+
+logger = logging.getLogger(__name__)
+
+# Keep IN (...) lists well below driver/bind-parameter limits (SQLite: 999).
+MAX_BATCH_SIZE = 500
+
+
+class BatchLoader:
+    """
+    Coalesce key lookups into batched queries and memoize them for one request.
+
+    ``batch_fn`` receives a list of keys and returns a dict of key -> value.
+    Keys missing from that dict resolve to ``default_factory()`` (or None).
+    ``sibling_keys`` optionally returns keys known elsewhere in the request
+    (e.g. every template already loaded) so they ride along in the same batch.
+    """
+
+    def __init__(self, batch_fn, default_factory=None, sibling_keys=None):
+        self._batch_fn = batch_fn
+        self._default_factory = default_factory
+        self._sibling_keys = sibling_keys
+        self._cache = {}
+        self._pending = set()
+        self.batches = 0
+
+    def _default(self):
+        return self._default_factory() if self._default_factory else None
+
+    def prime(self, key, value):
+        """Seed the cache with a value the caller already has in hand."""
+        if key is not None:
+            self._cache.setdefault(key, value)
+
+    def queue(self, keys):
+        """Register keys that will be requested later in this request."""
+        for key in keys:
+            if key is not None and key not in self._cache:
+                self._pending.add(key)
+
+    def cached_keys(self):
+        return [key for key, value in self._cache.items() if value is not None]
+
+    def load(self, key):
+        if key is None:
+            return self._default()
+        if key not in self._cache:
+            self._pending.add(key)
+            self._dispatch()
+        return self._cache.get(key, self._default())
+
+    def load_many(self, keys):
+        keys = [key for key in keys if key is not None]
+        self.queue(keys)
+        if self._pending:
+            self._dispatch()
+        return [self._cache.get(key, self._default()) for key in keys]
+
+    def _dispatch(self):
+        if self._sibling_keys is not None:
+            self.queue(self._sibling_keys())
+        keys = list(self._pending)
+        self._pending.clear()
+        for start in range(0, len(keys), MAX_BATCH_SIZE):
+            chunk = keys[start:start + MAX_BATCH_SIZE]
+            try:
+                results = self._batch_fn(chunk) or {}
+            except Exception as exc:
+                logger.error("GraphQL batch load failed for %d keys: %s", len(chunk), exc)
+                results = {}
+            self.batches += 1
+            for key in chunk:
+                self._cache[key] = results.get(key, self._default())
+
+
+# ---------------------------------------------------------------------------
+# Batch functions (one SQL statement per call)
+# ---------------------------------------------------------------------------
+
+def _students_by_id(ids):
+    from models import Student
+    return {s.id: s for s in Student.query.filter(Student.id.in_(ids)).all()}
+
+
+def _templates_by_id(ids):
+    from models import Template
+    return {t.id: t for t in Template.query.filter(Template.id.in_(ids)).all()}
+
+
+def _template_fields_by_template(template_ids):
+    from models import TemplateField
+    grouped = defaultdict(list)
+    rows = TemplateField.query.filter(
+        TemplateField.template_id.in_(template_ids)
+    ).order_by(TemplateField.template_id, TemplateField.display_order, TemplateField.id).all()
+    for field in rows:
+        grouped[field.template_id].append(field)
+    return grouped
+
+
+def _student_counts_by_template(template_ids):
+    from models import db, Student
+    rows = db.session.query(
+        Student.template_id, func.count(Student.id)
+    ).filter(Student.template_id.in_(template_ids)).group_by(Student.template_id).all()
+    return {template_id: count for template_id, count in rows}
+
+
+def _bulk_jobs_by_id(ids):
+    from models import BulkJob
+    return {j.id: j for j in BulkJob.query.filter(BulkJob.id.in_(ids)).all()}
+
+
+def _bulk_jobs_by_template(template_ids, limit):
+    """The newest ``limit`` bulk jobs of each template, limited per template in SQL."""
+    from models import db, BulkJob
+    grouped = defaultdict(list)
+    if limit <= 0:
+        return grouped
+    ranked = db.session.query(
+        BulkJob.id.label("id"),
+        func.row_number().over(
+            partition_by=BulkJob.template_id,
+            order_by=(BulkJob.created_at.desc(), BulkJob.id.desc()),
+        ).label("rank"),
+    ).filter(BulkJob.template_id.in_(template_ids)).subquery()
+    rows = BulkJob.query.join(ranked, ranked.c.id == BulkJob.id).filter(
+        ranked.c.rank <= limit
+    ).order_by(BulkJob.template_id, ranked.c.rank).all()
+    for job in rows:
+        grouped[job.template_id].append(job)
+    return grouped
+
+
+class GraphQLLoaders:
+    """The set of loaders shared by all resolvers of a single GraphQL request."""
+
+    def __init__(self):
+        self.student = BatchLoader(_students_by_id)
+        self.template = BatchLoader(_templates_by_id)
+        self.bulk_job = BatchLoader(_bulk_jobs_by_id)
+        self.template_fields = BatchLoader(
+            _template_fields_by_template, default_factory=list,
+            sibling_keys=self.template.cached_keys,
+        )
+        self.template_student_count = BatchLoader(
+            _student_counts_by_template, default_factory=int,
+            sibling_keys=self.template.cached_keys,
+        )
+        self._template_bulk_jobs = {}
+
+    def template_bulk_jobs(self, limit):
+        """Loader of each template's newest ``limit`` bulk jobs (one per distinct limit)."""
+        loader = self._template_bulk_jobs.get(limit)
+        if loader is None:
+            loader = self._template_bulk_jobs[limit] = BatchLoader(
+                lambda template_ids: _bulk_jobs_by_template(template_ids, limit),
+                default_factory=list,
+                sibling_keys=self.template.cached_keys,
+            )
+        return loader
+
+
+def get_loaders(context):
+    """Return the request's loaders, creating them on first use."""
+    if isinstance(context, dict):
+        loaders = context.get("loaders")
+        if loaders is None:
+            loaders = context["loaders"] = GraphQLLoaders()
+        return loaders
+    loaders = getattr(context, "loaders", None)
+    if loaders is None:
+        loaders = GraphQLLoaders()
+        try:
+            setattr(context, "loaders", loaders)
+        except Exception:
+            pass
+    return loaders
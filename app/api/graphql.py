@@ -10,11 +10,70 @@ Usage:
 """
 import json
 import logging
+import os
 from datetime import datetime
 from typing import List, Optional
 
+from app.api.dataloaders import get_loaders
+
 logger = logging.getLogger(__name__)
 
+# Guard rails so a single query cannot pin a worker.
+GRAPHQL_MAX_DEPTH = int(os.environ.get("GRAPHQL_MAX_DEPTH", "8"))
+GRAPHQL_MAX_COMPLEXITY = int(os.environ.get("GRAPHQL_MAX_COMPLEXITY", "5000"))
+GRAPHQL_MAX_ALIASES = int(os.environ.get("GRAPHQL_MAX_ALIASES", "15"))
+GRAPHQL_MAX_PAGE_SIZE = int(os.environ.get("GRAPHQL_MAX_PAGE_SIZE", "200"))
+
+
+def _clamp_limit(limit):
+    return max(0, min(int(limit or 0), GRAPHQL_MAX_PAGE_SIZE))
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _student_type(s):
+    return StudentType(
+        id=s.id, name=s.name, father_name=s.father_name,
+        class_name=s.class_name, dob=s.dob, phone=s.phone,
+        email=getattr(s, 'email', None),
+        photo_url=s.photo_url, image_url=s.image_url,
+        pdf_url=s.pdf_url,
+        created_at=_iso(s.created_at),
+        template_id=s.template_id,
+    )
+
+
+def _template_type(t):
+    return TemplateType(
+        id=t.id, school_name=t.school_name,
+        card_orientation=t.card_orientation or "landscape",
+        is_double_sided=t.is_double_sided or False,
+        language=t.language or "english",
+        created_at=_iso(t.created_at),
+    )
+
+
+def _template_field_type(f):
+    return TemplateFieldType(
+        id=f.id, template_id=f.template_id,
+        field_name=f.field_name, field_label=f.field_label,
+        field_type=f.field_type, is_required=bool(f.is_required),
+        display_order=f.display_order or 0,
+    )
+
+
+def _bulk_job_record_type(j):
+    return BulkJobRecordType(
+        id=j.id, template_id=j.template_id,
+        job_type=j.job_type, status=j.status,
+        total_items=j.total_items or 0,
+        processed_items=j.processed_items or 0,
+        failed_items=j.failed_items or 0,
+        created_at=_iso(j.created_at),
+    )
+
 # ---------------------------------------------------------------------------
 # Strawberry Schema Definition
 # ---------------------------------------------------------------------------
@@ -24,6 +83,49 @@ try:
     from strawberry.types import Info
     from strawberry.scalars import JSON
 
+    @strawberry.type
+    class TemplateFieldType:
+        id: int
+        template_id: int
+        field_name: str
+        field_label: str
+        field_type: str
+        is_required: bool = False
+        display_order: int = 0
+
+    @strawberry.type
+    class BulkJobRecordType:
+        id: int
+        template_id: Optional[int] = None
+        job_type: str = "bulk_card_generation"
+        status: str = "draft"
+        total_items: int = 0
+        processed_items: int = 0
+        failed_items: int = 0
+        created_at: Optional[str] = None
+
+    @strawberry.type
+    class TemplateType:
+        id: int
+        school_name: str
+        card_orientation: str = "landscape"
+        is_double_sided: bool = False
+        language: str = "english"
+        created_at: Optional[str] = None
+
+        @strawberry.field
+        def student_count(self, info: Info) -> int:
+            return get_loaders(info.context).template_student_count.load(self.id)
+
+        @strawberry.field
+        def fields(self, info: Info) -> List[TemplateFieldType]:
+            return [_template_field_type(f) for f in get_loaders(info.context).template_fields.load(self.id)]
+
+        @strawberry.field
+        def bulk_jobs(self, info: Info, limit: int = 20) -> List[BulkJobRecordType]:
+            jobs = get_loaders(info.context).template_bulk_jobs(_clamp_limit(limit)).load(self.id)
+            return [_bulk_job_record_type(j) for j in jobs]
+
     @strawberry.type
     class StudentType:
         id: int
@@ -37,16 +139,12 @@ try:
         image_url: Optional[str] = None
         pdf_url: Optional[str] = None
         created_at: Optional[str] = None
+        template_id: Optional[int] = None
 
-    @strawberry.type
-    class TemplateType:
-        id: int
-        school_name: str
-        card_orientation: str = "landscape"
-        is_double_sided: bool = False
-        language: str = "english"
-        created_at: Optional[str] = None
-        student_count: int = 0
+        @strawberry.field
+        def template(self, info: Info) -> Optional[TemplateType]:
+            t = get_loaders(info.context).template.load(self.template_id)
+            return _template_type(t) if t else None
 
     @strawberry.type
     class BulkJobType:
@@ -62,11 +160,16 @@ try:
     @strawberry.type
     class VerificationType:
         id: int
-        student_id: int
+        student_id: Optional[int]
         status: str
         scanned_at: Optional[str] = None
         ip_address: Optional[str] = None
 
+        @strawberry.field
+        def student(self, info: Info) -> Optional[StudentType]:
+            s = get_loaders(info.context).student.load(self.student_id)
+            return _student_type(s) if s else None
+
     @strawberry.type
     class DashboardStatsType:
         total_templates: int = 0
@@ -128,17 +231,12 @@ try:
                     query = query.filter_by(template_id=template_id)
                 if search:
                     query = query.filter(Student.name.ilike(f"%{search}%"))
-                students = query.order_by(Student.id.desc()).limit(limit).offset(offset).all()
-                return [
-                    StudentType(
-                        id=s.id, name=s.name, father_name=s.father_name,
-                        class_name=s.class_name, dob=s.dob, phone=s.phone,
-                        email=getattr(s, 'email', None),
-                        photo_url=s.photo_url, image_url=s.image_url,
-                        pdf_url=s.pdf_url,
-                        created_at=s.created_at.isoformat() if s.created_at else None,
-                    ) for s in students
-                ]
+                students = query.order_by(Student.id.desc()).limit(_clamp_limit(limit)).offset(max(0, offset)).all()
+                loaders = get_loaders(info.context)
+                for s in students:
+                    loaders.student.prime(s.id, s)
+                loaders.template.queue(s.template_id for s in students)
+                return [_student_type(s) for s in students]
             except Exception as exc:
                 logger.error("GraphQL students query failed: %s", exc)
                 return []
@@ -147,18 +245,8 @@ try:
         def student(self, info: Info, id: int) -> Optional[StudentType]:
             """Get a single student by ID."""
             try:
-                from models import Student
-                s = Student.query.get(id)
-                if not s:
-                    return None
-                return StudentType(
-                    id=s.id, name=s.name, father_name=s.father_name,
-                    class_name=s.class_name, dob=s.dob, phone=s.phone,
-                    email=getattr(s, 'email', None),
-                    photo_url=s.photo_url, image_url=s.image_url,
-                    pdf_url=s.pdf_url,
-                    created_at=s.created_at.isoformat() if s.created_at else None,
-                )
+                s = get_loaders(info.context).student.load(id)
+                return _student_type(s) if s else None
             except Exception as exc:
                 logger.error("GraphQL student query failed: %s", exc)
                 return None
@@ -172,27 +260,41 @@ try:
                 query = Template.query
                 if search:
                     query = query.filter(Template.school_name.ilike(f"%{search}%"))
-                templates = query.order_by(Template.id.desc()).limit(limit).all()
-                return [
-                    TemplateType(
-                        id=t.id, school_name=t.school_name,
-                        card_orientation=t.card_orientation or "landscape",
-                        is_double_sided=t.is_double_sided or False,
-                        language=t.language or "english",
-                        created_at=t.created_at.isoformat() if t.created_at else None,
-                        student_count=t.students.count() if hasattr(t, 'students') else 0,
-                    ) for t in templates
-                ]
+                templates = query.order_by(Template.id.desc()).limit(_clamp_limit(limit)).all()
+                loaders = get_loaders(info.context)
+                for t in templates:
+                    loaders.template.prime(t.id, t)
+                return [_template_type(t) for t in templates]
             except Exception as exc:
                 logger.error("GraphQL templates query failed: %s", exc)
                 return []
 
+        @strawberry.field
+        def template(self, info: Info, id: int) -> Optional[TemplateType]:
+            """Get a single template by ID."""
+            try:
+                t = get_loaders(info.context).template.load(id)
+                return _template_type(t) if t else None
+            except Exception as exc:
+                logger.error("GraphQL template query failed: %s", exc)
+                return None
+
+        @strawberry.field
+        def bulk_job_record(self, info: Info, id: int) -> Optional[BulkJobRecordType]:
+            """Get a persisted bulk job row by ID."""
+            try:
+                j = get_loaders(info.context).bulk_job.load(id)
+                return _bulk_job_record_type(j) if j else None
+            except Exception as exc:
+                logger.error("GraphQL bulk_job_record query failed: %s", exc)
+                return None
+
         @strawberry.field
         def bulk_jobs(self, info: Info, limit: int = 20) -> List[BulkJobType]:
             """Query recent bulk jobs."""
             try:
                 from app.services.bulk_job_service import _list_bulk_job_states
-                jobs = _list_bulk_job_states(limit=limit)
+                jobs = _list_bulk_job_states(limit=_clamp_limit(limit))
                 return [
                     BulkJobType(
                         task_id=j.get("task_id", ""),
@@ -229,12 +331,13 @@ try:
                 query = VerificationAudit.query
                 if student_id:
                     query = query.filter_by(student_id=student_id)
-                audits = query.order_by(VerificationAudit.id.desc()).limit(limit).all()
+                audits = query.order_by(VerificationAudit.id.desc()).limit(_clamp_limit(limit)).all()
+                get_loaders(info.context).student.queue(a.student_id for a in audits)
                 return [
                     VerificationType(
                         id=a.id, student_id=a.student_id,
                         status=a.status or "unknown",
-                        scanned_at=a.scanned_at.isoformat() if a.scanned_at else None,
+                        scanned_at=a.created_at.isoformat() if a.created_at else None,
                         ip_address=a.ip_address,
                     ) for a in audits
                 ]
@@ -266,6 +369,7 @@ try:
                 id=student.id, name=student.name,
                 father_name=student.father_name,
                 class_name=student.class_name,
+                template_id=student.template_id,
             )
 
         @strawberry.mutation
@@ -307,7 +411,72 @@ try:
     # Schema
     # ---------------------------------------------------------------------------
 
-    schema = strawberry.Schema(query=Query, mutation=Mutation)
+    from graphql import GraphQLError, ValidationRule
+    from graphql.language import FieldNode, FragmentSpreadNode, InlineFragmentNode, IntValueNode
+    from strawberry.extensions import AddValidationRules, MaxAliasesLimiter, QueryDepthLimiter
+
+    class QueryComplexityRule(ValidationRule):
+        """
+        Reject operations whose estimated cost exceeds GRAPHQL_MAX_COMPLEXITY.
+
+        Every field costs 1; a field with a ``limit`` argument multiplies the
+        cost of its sub-selection, so ``students(limit: 200) { template { fields } }``
+        is priced by the rows it can fan out to, not by its text length.
+        """
+
+        def enter_operation_definition(self, node, *_args):
+            cost = self._selection_cost(node.selection_set, 1, set())
+            if cost > GRAPHQL_MAX_COMPLEXITY:
+                self.report_error(GraphQLError(
+                    f"Query complexity {cost} exceeds the maximum of {GRAPHQL_MAX_COMPLEXITY}.",
+                    node,
+                ))
+
+        def _selection_cost(self, selection_set, multiplier, seen_fragments):
+            if selection_set is None:
+                return 0
+            cost = 0
+            for selection in selection_set.selections:
+                if isinstance(selection, FieldNode):
+                    if selection.name.value.startswith("__"):
+                        continue
+                    cost += multiplier
+                    cost += self._selection_cost(
+                        selection.selection_set,
+                        multiplier * self._list_size(selection),
+                        seen_fragments,
+                    )
+                elif isinstance(selection, InlineFragmentNode):
+                    cost += self._selection_cost(selection.selection_set, multiplier, seen_fragments)
+                elif isinstance(selection, FragmentSpreadNode):
+                    name = selection.name.value
+                    fragment = self.context.get_fragment(name)
+                    if fragment is None or name in seen_fragments:
+                        continue
+                    cost += self._selection_cost(
+                        fragment.selection_set, multiplier, seen_fragments | {name},
+                    )
+            return cost
+
+        @staticmethod
+        def _list_size(field):
+            for argument in field.arguments or ():
+                if argument.name.value != "limit":
+                    continue
+                if isinstance(argument.value, IntValueNode):
+                    return max(1, min(int(argument.value.value), GRAPHQL_MAX_PAGE_SIZE))
+                return GRAPHQL_MAX_PAGE_SIZE
+            return 1
+
+    schema = strawberry.Schema(
+        query=Query,
+        mutation=Mutation,
+        extensions=[
+            QueryDepthLimiter(max_depth=GRAPHQL_MAX_DEPTH),
+            MaxAliasesLimiter(max_alias_count=GRAPHQL_MAX_ALIASES),
+            AddValidationRules([QueryComplexityRule]),
+        ],
+    )
     GRAPHQL_AVAILABLE = True
 
 except ImportError:
@@ -320,31 +489,48 @@ except ImportError:
 # GraphQL View (for mounting in Flask)
 # ---------------------------------------------------------------------------
 
+def build_graphql_view():
+    """Return the /graphql view function, or None when strawberry is unavailable."""
+    if not GRAPHQL_AVAILABLE:
+        logger.warning("GraphQL not available — skipping")
+        return None
+
+    try:
+        from strawberry.flask.views import GraphQLView
+        from app.api.dataloaders import GraphQLLoaders
+    except ImportError:
+        logger.warning("strawberry-graphql[flask] not installed")
+        return None
+
+    class BatchingGraphQLView(GraphQLView):
+        """GraphQL view that gives each request a fresh set of batch loaders."""
+
+        def get_context(self, request, response):
+            context = super().get_context(request, response)
+            context["loaders"] = GraphQLLoaders()
+            return context
+
+    return BatchingGraphQLView.as_view(
+        "graphql",
+        schema=schema,
+        graphql_ide="graphiql",  # enable GraphQL Playground
+        allow_queries_via_get=True,
+    )
+
+
 def init_graphql_view(app):
     """
     Mount the GraphQL endpoint on the Flask app.
 
+    The app factory mounts it lazily instead (see legacy_app), so strawberry
+    is only imported by the first /graphql request.
+
     Usage:
         from app.api.graphql import init_graphql_view
         init_graphql_view(app)
     """
-    if not GRAPHQL_AVAILABLE:
-        logger.warning("GraphQL not available — skipping")
+    view = build_graphql_view()
+    if view is None:
         return
-
-    try:
-        from strawberry.flask.views import GraphQLView
-
-        app.add_url_rule(
-            "/graphql",
-            view_func=GraphQLView.as_view(
-                "graphql",
-                schema=schema,
-                graphiql=True,  # enable GraphQL Playground
-                allow_queries_via_get=True,
-            ),
-        )
-        logger.info("GraphQL API mounted at /graphql")
-
-    except ImportError:
-        logger.warning("strawberry-graphql[flask] not installed")
+    app.add_url_rule("/graphql", view_func=view, methods=["GET", "POST"])
+    logger.info("GraphQL API mounted at /graphql")
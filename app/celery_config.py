@@ -93,6 +93,10 @@ def make_celery(app=None):
                 "task": "app.celery_tasks.maintenance_tasks.collect_system_metrics",
                 "schedule": crontab(minute="*/15"),  # every 15 minutes
             },
+            "reconcile-analytics-rollups": {
+                "task": "app.celery_tasks.maintenance_tasks.reconcile_analytics_rollups",
+                "schedule": crontab(minute=5),  # hourly
+            },
             "process-dead-letter-queue": {
                 "task": "app.celery_tasks.maintenance_tasks.process_dead_letter_queue",
                 "schedule": crontab(minute="*/30"),  # every 30 minutes
@@ -156,4 +160,24 @@ def make_celery(app=None):
             pass
 
     celery.Task = ContextTask
+
+    # Celery workers write metric samples to their own subdirectory, which
+    # /metrics merges with gunicorn's. celeryd_init runs before the task
+    # modules import prometheus_client, so multiprocess mode takes effect.
+    from celery.signals import celeryd_init, worker_process_shutdown
+
+    def _use_celery_metrics_dir(**_kwargs):
+        base = os.environ.setdefault(
+            "IDCARD_METRICS_DIR", os.environ.get("PROMETHEUS_MULTIPROC_DIR", "/tmp/idcard-prometheus")
+        )
+        metrics_dir = os.path.join(base, "celery")
+        os.makedirs(metrics_dir, exist_ok=True)
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = metrics_dir
+
+    def _drop_worker_metrics(pid=None, **_kwargs):
+        from app.metrics import mark_process_dead
+        mark_process_dead(pid or os.getpid())
+
+    celeryd_init.connect(_use_celery_metrics_dir, weak=False, dispatch_uid="idcard_metrics_dir")
+    worker_process_shutdown.connect(_drop_worker_metrics, weak=False, dispatch_uid="idcard_metrics_shutdown")
     return celery
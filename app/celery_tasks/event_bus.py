@@ -10,19 +10,46 @@ Event flow:
                                               → Analytics updates
                                               → Notification triggers
                                               → Audit log entries
+
+Events are appended to a Redis stream and handled by a consumer thread in
+each process. The processes share one consumer group, so every event is
+handled once across the cluster and acknowledged after its handlers ran;
+entries left pending by a dead consumer are reclaimed after
+EVENT_CLAIM_IDLE_MS. Without Redis, events are queued for a local
+dispatcher thread. Either way handlers never run on the publishing thread.
+Handlers must be subscribed at import time so every process has them.
 """
+import os
 import json
+import queue
+import socket
 import logging
 import hashlib
+import threading
+from collections import deque
 from datetime import datetime, timezone
-from typing import Callable, Dict, List, Optional
+from typing import Callable, Deque, Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
+EVENT_STREAM_MAXLEN = int(os.environ.get("EVENT_STREAM_MAXLEN", "100000"))
+EVENT_CONSUMER_GROUP = os.environ.get("EVENT_CONSUMER_GROUP", "event-handlers")
+EVENT_BATCH_SIZE = max(1, int(os.environ.get("EVENT_BATCH_SIZE", "100")))
+EVENT_BLOCK_MS = int(os.environ.get("EVENT_BLOCK_MS", "1000"))
+EVENT_CLAIM_IDLE_MS = int(os.environ.get("EVENT_CLAIM_IDLE_MS", "60000"))
+# Deliveries after which a still-failing entry is acknowledged and dropped
+EVENT_MAX_DELIVERIES = int(os.environ.get("EVENT_MAX_DELIVERIES", "5"))
+
 # In-memory subscriber registry
 _subscribers: Dict[str, List[Callable]] = {}
-_event_log: List[dict] = []
 _EVENT_LOG_MAX = 10000
+_event_log: Deque[dict] = deque(maxlen=_EVENT_LOG_MAX)
+
+_audit_buffer = threading.local()
+
+_local_queue: "queue.Queue[dict]" = queue.Queue(maxsize=_EVENT_LOG_MAX)
+_consumer = None
+_consumer_lock = threading.Lock()
 
 
 def subscribe(event_type: str, handler: Callable):
@@ -46,6 +73,19 @@ def unsubscribe(event_type: str, handler: Callable):
         _subscribers[event_type] = [h for h in _subscribers[event_type] if h != handler]
 
 
+def _stream_key() -> str:
+    from app.services.redis_service import _redis_cache_key
+    return _redis_cache_key("events")
+
+
+def _redis():
+    try:
+        from app.services.redis_service import get_redis_client
+        return get_redis_client()
+    except Exception:
+        return None
+
+
 def publish_event(event_type: str, data: dict, source: str = "system"):
     """
     Publish an event to all subscribers.
@@ -55,49 +95,95 @@ def publish_event(event_type: str, data: dict, source: str = "system"):
         publish_event("bulk.completed", {"task_id": "abc", "count": 500})
         publish_event("template.updated", {"template_id": 5, "changes": ["font"]})
     """
+    now = datetime.now(timezone.utc).isoformat()
+    payload = json.dumps(data, default=str)
     event = {
-        "id": hashlib.sha256(
-            f"{event_type}:{datetime.now(timezone.utc).isoformat()}:{json.dumps(data, default=str)}".encode()
-        ).hexdigest()[:16],
+        "id": hashlib.sha256(f"{event_type}:{now}:{payload}".encode()).hexdigest()[:16],
         "type": event_type,
         "data": data,
         "source": source,
-        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "timestamp": now,
     }
 
     # Store in event log
     _event_log.append(event)
-    if len(_event_log) > _EVENT_LOG_MAX:
-        _event_log.pop(0)
 
-    # Notify synchronous subscribers
-    handlers = _subscribers.get(event_type, []) + _subscribers.get("*", [])
-    for handler in handlers:
+    consumer = _ensure_consumer()
+    client = _redis()
+    published = False
+    if client is not None:
         try:
-            handler(event)
-        except Exception as exc:
-            logger.error(
-                "event_bus: handler %s failed for %s: %s",
-                handler.__name__, event_type, exc,
+            client.xadd(
+                _stream_key(),
+                {"event": json.dumps(event, default=str)},
+                maxlen=EVENT_STREAM_MAXLEN,
+                approximate=True,
             )
-
-    # Publish to Redis for cross-process subscribers
-    try:
-        from app.services.redis_service import _redis_set, get_redis_client
-        client = get_redis_client()
-        if client:
-            client.publish(f"events:{event_type}", json.dumps(event, default=str))
-            client.publish("events:*", json.dumps(event, default=str))
-    except Exception:
-        pass
+            published = True
+        except Exception as exc:
+            logger.warning("event_bus: stream append failed for %s, handling locally: %s", event_type, exc)
+    if not published:
+        try:
+            _local_queue.put_nowait(event)
+        except queue.Full:
+            logger.warning("event_bus: local queue full, dropping %s", event_type)
+    if consumer is not None:
+        consumer.wake()
 
     logger.info("event_bus: published %s", event_type)
     return event
 
 
+def _stream_events(client, event_type: Optional[str], limit: int, since: Optional[str]) -> List[dict]:
+    """Newest-last events from the stream, paging back until ``limit`` match."""
+    min_id = "-"
+    if since:
+        try:
+            since_dt = datetime.fromisoformat(since)
+            if since_dt.tzinfo is None:
+                since_dt = since_dt.replace(tzinfo=timezone.utc)
+            min_id = str(int(since_dt.timestamp() * 1000))
+        except ValueError:
+            pass
+
+    matched: List[dict] = []
+    max_id = "+"
+    while len(matched) < limit:
+        entries = client.xrevrange(_stream_key(), max=max_id, min=min_id, count=max(limit, 100))
+        if not entries:
+            break
+        for entry_id, fields in entries:
+            raw = fields.get(b"event") or fields.get("event")
+            try:
+                event = json.loads(raw)
+            except (TypeError, ValueError):
+                continue
+            if event_type and event_type != "*" and event.get("type") != event_type:
+                continue
+            if since and event.get("timestamp", "") < since:
+                continue
+            matched.append(event)
+            if len(matched) >= limit:
+                break
+        last_id = entries[-1][0]
+        last_id = last_id.decode() if isinstance(last_id, bytes) else last_id
+        max_id = "(" + last_id
+        if len(entries) < max(limit, 100):
+            break
+    matched.reverse()
+    return matched
+
+
 def get_events(event_type: str = None, limit: int = 100, since: str = None):
-    """Query recent events from the in-memory log."""
-    events = _event_log
+    """Query recent events, from the shared stream when Redis is available."""
+    client = _redis()
+    if client is not None:
+        try:
+            return _stream_events(client, event_type, limit, since)
+        except Exception as exc:
+            logger.warning("event_bus: stream query failed, using local log: %s", exc)
+
+    events = list(_event_log)
     if event_type and event_type != "*":
         events = [e for e in events if e["type"] == event_type]
     if since:
@@ -106,11 +192,222 @@ def get_events(event_type: str = None, limit: int = 100, since: str = None):
 
 
 def get_event_types():
-    """Return all registered event types."""
-    types = set()
-    for event in _event_log:
-        types.add(event["type"])
-    return sorted(types)
+    """Return all event types seen in the recent event log."""
+    return sorted({event["type"] for event in get_events(limit=_EVENT_LOG_MAX)})
+
+
+# ---------------------------------------------------------------------------
+# Consumer
+# ---------------------------------------------------------------------------
+
+def _dispatch(events: List[dict]) -> List[bool]:
+    """
+    Run the subscribed handlers of a batch of events, then commit once.
+
+    Returns, per event, whether all its handlers and the commit succeeded;
+    the consumer acknowledges only those, so failed events are redelivered.
+
+    Audit rows are buffered while handlers run and added just before the
+    commit, so the session holds no pending write (and, on SQLite, no
+    write lock) while other handlers query or write. A failed event's audit
+    row is dropped, since its redelivery writes it again.
+    """
+    _audit_buffer.rows = []
+    audit_rows = []
+    results = []
+    for event in events:
+        succeeded = True
+        handlers = _subscribers.get(event.get("type"), []) + _subscribers.get("*", [])
+        for handler in handlers:
+            try:
+                handler(event)
+            except Exception as exc:
+                succeeded = False
+                logger.error(
+                    "event_bus: handler %s failed for %s: %s",
+                    handler.__name__, event.get("type"), exc,
+                )
+        if succeeded:
+            audit_rows.extend(_audit_buffer.rows)
+        _audit_buffer.rows = []
+        results.append(succeeded)
+    _audit_buffer.rows = None
+    try:
+        from models import db
+        if audit_rows:
+            db.session.add_all(audit_rows)
+        db.session.commit()
+    except Exception as exc:
+        logger.error("event_bus: committing handler writes failed: %s", exc)
+        try:
+            db.session.rollback()
+        except Exception:
+            pass
+        return [False] * len(events)
+    return results
+
+
+class _EventConsumer(threading.Thread):
+    """Reads the stream through the consumer group (or the local queue) and runs handlers."""
+
+    def __init__(self, app):
+        super().__init__(name="event-bus", daemon=True)
+        self.app = app
+        self.pid = os.getpid()
+        self.name_in_group = f"{socket.gethostname()}:{self.pid}"
+        self._group_ready = None
+        self._autoclaim = True
+        self._wake = threading.Event()
+
+    def wake(self):
+        self._wake.set()
+
+    def _ensure_group(self, client):
+        if self._group_ready is client:
+            return
+        try:
+            client.xgroup_create(_stream_key(), EVENT_CONSUMER_GROUP, id="0", mkstream=True)
+        except Exception as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+        self._group_ready = client
+
+    def _read(self, client):
+        """Return ``[(entry_id, event)]``: reclaimed stale entries first, then new ones."""
+        self._ensure_group(client)
+        stream = _stream_key()
+        entries = []
+        if self._autoclaim:
+            from redis.exceptions import ResponseError
+            try:
+                claimed = client.xautoclaim(
+                    stream, EVENT_CONSUMER_GROUP, self.name_in_group,
+                    min_idle_time=EVENT_CLAIM_IDLE_MS, start_id="0-0", count=EVENT_BATCH_SIZE,
+                )
+                entries = claimed[1] if claimed else []
+            except ResponseError as exc:
+                # XAUTOCLAIM needs Redis 6.2; stale entries then wait for a restart
+                logger.warning("event_bus: pending entries will not be reclaimed: %s", exc)
+                self._autoclaim = False
+        if not entries:
+            block = 0 if not _local_queue.empty() else EVENT_BLOCK_MS
+            response = client.xreadgroup(
+                EVENT_CONSUMER_GROUP, self.name_in_group, {stream: ">"},
+                count=EVENT_BATCH_SIZE, block=block or None,
+            )
+            entries = response[0][1] if response else []
+        decoded = []
+        for entry_id, fields in entries:
+            if not fields:
+                continue
+            raw = fields.get(b"event") or fields.get("event")
+            try:
+                decoded.append((entry_id, json.loads(raw)))
+            except (TypeError, ValueError):
+                decoded.append((entry_id, None))
+        return decoded
+
+    def _exhausted(self, client, entry_ids):
+        """Failed entries delivered EVENT_MAX_DELIVERIES times; these are dropped."""
+        exhausted = []
+        for entry_id in entry_ids:
+            pending = client.xpending_range(
+                _stream_key(), EVENT_CONSUMER_GROUP, min=entry_id, max=entry_id, count=1,
+            )
+            if pending and pending[0].get("times_delivered", 0) >= EVENT_MAX_DELIVERIES:
+                logger.error(
+                    "event_bus: dropping entry %s after %d failed deliveries",
+                    entry_id, pending[0]["times_delivered"],
+                )
+                exhausted.append(entry_id)
+        return exhausted
+
+    def _drain_local(self, timeout):
+        events = []
+        try:
+            events.append(_local_queue.get(timeout=timeout))
+        except queue.Empty:
+            return events
+        while len(events) < EVENT_BATCH_SIZE:
+            try:
+                events.append(_local_queue.get_nowait())
+            except queue.Empty:
+                break
+        return events
+
+    def run(self):
+        while True:
+            self._wake.clear()
+            try:
+                local = self._drain_local(timeout=0)
+                if local:
+                    with self.app.app_context():
+                        _dispatch(local)
+                client = _redis()
+                if client is None:
+                    if not local:
+                        self._wake.wait(EVENT_BLOCK_MS / 1000.0)
+                    continue
+                entries = self._read(client)
+                if not entries:
+                    continue
+                valid = [(entry_id, event) for entry_id, event in entries if event is not None]
+                with self.app.app_context():
+                    results = _dispatch([event for _, event in valid])
+                done = [entry_id for entry_id, event in entries if event is None]
+                failed = []
+                for (entry_id, _), succeeded in zip(valid, results):
+                    (done if succeeded else failed).append(entry_id)
+                if failed:
+                    # Left pending: XAUTOCLAIM redelivers them after EVENT_CLAIM_IDLE_MS
+                    done.extend(self._exhausted(client, failed))
+                if done:
+                    client.xack(_stream_key(), EVENT_CONSUMER_GROUP, *done)
+            except Exception:
+                logger.exception("event_bus: consumer loop failed")
+                self._wake.wait(EVENT_BLOCK_MS / 1000.0)
+
+
+def start_event_consumer(app=None):
+    """Start (or return) this process's event consumer thread."""
+    global _consumer
+    if app is None:
+        from flask import current_app
+        app = current_app._get_current_object()
+    with _consumer_lock:
+        if _consumer is None or not _consumer.is_alive() or _consumer.pid != os.getpid():
+            _consumer = _EventConsumer(app)
+            _consumer.start()
+        return _consumer
+
+
+def _ensure_consumer():
+    """Start the consumer on first publish from inside an app context."""
+    consumer = _consumer
+    if consumer is not None and consumer.pid == os.getpid() and consumer.is_alive():
+        return consumer
+    if os.environ.get("EVENT_BUS_CONSUMER", "true").strip().lower() in {"0", "false", "no", "off"}:
+        return None
+    from flask import has_app_context
+    if not has_app_context():
+        return None
+    return start_event_consumer()
+
+
+def flush_local_events():
+    """Handle events queued while Redis was unavailable on the calling thread (tests)."""
+    handled = 0
+    while True:
+        batch = []
+        while len(batch) < EVENT_BATCH_SIZE:
+            try:
+                batch.append(_local_queue.get_nowait())
+            except queue.Empty:
+                break
+        if not batch:
+            return handled
+        _dispatch(batch)
+        handled += len(batch)
 
 
 # ---------------------------------------------------------------------------
@@ -128,10 +425,15 @@ def _audit_log_handler(event):
             details=json.dumps(event, default=str)[:2000],
             timestamp=datetime.now(timezone.utc),
         )
-        db.session.add(log)
-        db.session.commit()
+        if getattr(_audit_buffer, "rows", None) is not None:
+            # Added and committed once per batch by _dispatch
+            _audit_buffer.rows.append(log)
+        else:
+            db.session.add(log)
+            db.session.commit()
     except Exception as exc:
         logger.error("audit_log_handler failed: %s", exc)
+        raise
 
 
 def _webhook_handler(event):
@@ -141,6 +443,7 @@ def _webhook_handler(event):
         dispatch_webhook_event(event["type"], event["data"])
     except Exception as exc:
         logger.error("webhook_handler failed: %s", exc)
+        raise
 
 
 # Register built-in handlers
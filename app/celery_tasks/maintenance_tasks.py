@@ -40,6 +40,19 @@ def collect_system_metrics():
         raise
 
 
+@celery.task(name="app.celery_tasks.maintenance_tasks.reconcile_analytics_rollups", queue="low")
+def reconcile_analytics_rollups():
+    """Rebuild analytics rollups from the source tables to correct drift."""
+    try:
+        from app.services.analytics_service import reconcile_rollups
+        result = reconcile_rollups()
+        publish_event("maintenance.analytics_reconciled", result, source="celery")
+        return result
+    except Exception as exc:
+        logger.error("Analytics rollup reconciliation failed: %s", exc)
+        raise
+
+
 @celery.task(name="app.celery_tasks.maintenance_tasks.process_dead_letter_queue", queue="low")
 def process_dead_letter_queue():
     """
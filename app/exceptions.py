@@ -76,3 +76,8 @@ class OCRError(AppError):
 class ArchiveError(AppError):
     """Raised when data archival or restoration fails."""
     status_code = 500
+
+
+class CollaborationConflictError(AppError):
+    """Raised when a collaboration room is busy; the client should retry."""
+    status_code = 409
@@ -17,7 +17,6 @@ import threading
 import time
 import uuid
 from datetime import datetime, timezone
-from functools import lru_cache
 from urllib.parse import urlparse
 
 import numpy as np
@@ -612,43 +611,11 @@ def detect_translation_source_language(raw_text, fallback="english"):
     return str(fallback or "english").strip().lower()
 
 
-@lru_cache(maxsize=4096)
 def _google_translate_text(raw_text, source_language, target_language):
     """Translate text using Google Translate API (cached)."""
-    text = str(raw_text or "").strip()
-    source = str(source_language or "").strip().lower()
-    target = str(target_language or "").strip().lower()
-    if not text or source == target:
-        return text
+    from app.services.translation_service import _google_translate_text as translate
 
-    source_code = LANGUAGE_TO_TRANSLATE_CODE.get(source)
-    target_code = LANGUAGE_TO_TRANSLATE_CODE.get(target)
-    if not source_code or not target_code:
-        return text
-
-    try:
-        response = requests.get(
-            "https://translate.googleapis.com/translate_a/single",
-            params={
-                "client": "gtx",
-                "sl": source_code,
-                "tl": target_code,
-                "dt": "t",
-                "q": text,
-            },
-            timeout=8,
-        )
-        response.raise_for_status()
-        translated = _extract_google_translate_text(response.json())
-        return translated or text
-    except Exception as exc:
-        logger.warning(
-            "Google translation failed for %s -> %s: %s",
-            source,
-            target,
-            exc,
-        )
-        return text
+    return translate(raw_text, source_language, target_language)
 
 
 def translate_value_for_template_side(template_obj, side, raw_value, *, field_key=None, field_type=None):
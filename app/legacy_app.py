@@ -126,6 +126,7 @@ from app.services.photo_service import (
     auto_crop_face_photo,
     _process_photo_pil,
     _prepare_uploaded_student_photo_bytes,
+    iter_prepared_uploaded_photos,
     _prepare_student_photo_image_bytes,
     _prepare_camera_student_photo_bytes
 )
@@ -280,6 +281,9 @@ csrf.init_app(app)
 
 scheduler = configure_notification_scheduler(check_and_notify_approaching_deadlines)
 
+# Session hooks that keep analytics_rollups in step with ORM writes
+from app.services import analytics_service as _analytics_rollups  # noqa: F401,E402
+
 # Production middleware (request ID, security headers, CORS, CSRF exemptions, auth context)
 try:
     from app.middleware import init_middleware
@@ -334,10 +338,15 @@ try:
 except Exception as exc:
     logger.warning("Tenant middleware initialization failed: %s", exc)
 
-# GraphQL API
+# GraphQL API — strawberry is imported by the first /graphql request, not at boot
 try:
-    from app.api.graphql import init_graphql_view
-    init_graphql_view(app)
+    from app.performance import lazy_view
+    app.add_url_rule(
+        "/graphql",
+        endpoint="graphql",
+        view_func=lazy_view("app.api.graphql:build_graphql_view"),
+        methods=["GET", "POST"],
+    )
 except Exception as exc:
     logger.warning("GraphQL initialization failed: %s", exc)
 
@@ -4768,43 +4777,41 @@ def bulk_generate():
         # 2. Process & Save Photos to Cloudinary
         photo_map = {}  # Maps name → Cloudinary URL
         if 'bulk_photos' in request.files:
-            photos = request.files.getlist('bulk_photos')
+            photos = [
+                p for p in request.files.getlist('bulk_photos')
+                if p and p.filename and secure_filename(p.filename)
+            ]
             _, photo_settings, _, _ = get_template_settings(template_id)  # Fixed: renamed p_settings → photo_settings
-            
-            for p in photos:
-                if p and p.filename:
-                    original_name = secure_filename(p.filename)
-                    if not original_name: 
-                        continue
-                    
-                    ts = datetime.now().strftime("%Y%m%d%H%M%S")
 
+            # Face cropping is the expensive part; run it across cores with pooled detectors.
+            for p, photo_bytes, error in iter_prepared_uploaded_photos(photos, photo_settings):
+                original_name = secure_filename(p.filename)
+                ts = datetime.now().strftime("%Y%m%d%H%M%S")
+
+                if isinstance(error, ValueError):
+                    logger.warning(f"Skipping bulk photo {original_name}: {error}")
+                    continue
+                if error is not None:
+                    logger.warning(f"Failed to process photo {original_name}: {error}")
+                    continue
+
+                if STORAGE_BACKEND == "local":
                     try:
-                        photo_bytes = _prepare_uploaded_student_photo_bytes(p, photo_settings)
-                    except ValueError as e:
-                        logger.warning(f"Skipping bulk photo {original_name}: {e}")
-                        continue
+                        stored_name = f"{ts}_{uuid.uuid4().hex}_{original_name}"
+                        local_path = os.path.join(UPLOAD_FOLDER, stored_name)
+                        _write_binary_file_atomic(local_path, photo_bytes)
+                        for alias in photo_match_aliases(original_name):
+                            photo_map.setdefault(alias, stored_name)
                     except Exception as e:
-                        logger.warning(f"Failed to process photo {original_name}: {e}")
-                        continue
-                    
-                    if STORAGE_BACKEND == "local":
-                        try:
-                            stored_name = f"{ts}_{uuid.uuid4().hex}_{original_name}"
-                            local_path = os.path.join(UPLOAD_FOLDER, stored_name)
-                            _write_binary_file_atomic(local_path, photo_bytes)
-                            for alias in photo_match_aliases(original_name):
-                                photo_map.setdefault(alias, stored_name)
-                        except Exception as e:
-                            logger.warning(f"Failed to save bulk photo {original_name} locally: {e}")
-                    else:
-                        # Upload to Cloudinary
-                        try:
-                            cloud_url = upload_image(photo_bytes, folder='bulk-photos')
-                            for alias in photo_match_aliases(original_name):
-                                photo_map.setdefault(alias, cloud_url)
-                        except Exception as e:
-                            logger.warning(f"Failed to upload photo {original_name} to Cloudinary: {e}")
+                        logger.warning(f"Failed to save bulk photo {original_name} locally: {e}")
+                else:
+                    # Upload to Cloudinary
+                    try:
+                        cloud_url = upload_image(photo_bytes, folder='bulk-photos')
+                        for alias in photo_match_aliases(original_name):
+                            photo_map.setdefault(alias, cloud_url)
+                    except Exception as e:
+                        logger.warning(f"Failed to upload photo {original_name} to Cloudinary: {e}")
 
         # 3. Start background generation. Prefer RQ when Railway Redis is
         # available, otherwise fall back to the local executor.
@@ -5026,15 +5033,48 @@ def cleanup_old_files(days=30):
 
 # run_cleanup moved to dashboard_routes.py
 # delete_all_students_by_template moved to dashboard_routes.py
-with app.app_context():
-    init_db()
-    migrate_database()
-    migrate_template_font_colors()
-    verify_fonts_available() # Add this line
-    migrate_photo_settings()
-    repair_student_photo_url_recursion()
-    from app.observability import verify_startup_dependencies
-    verify_startup_dependencies(app)
+_startup_tasks_done = False
+
+
+def run_startup_tasks(force=False):
+    """
+    Schema migrations, one-off data repairs and dependency checks.
+
+    These run once per deploy (`python manage.py migrate`, or gunicorn's
+    master via `on_starting`), not on every worker/Celery/CLI import.
+    """
+    global _startup_tasks_done
+    if _startup_tasks_done and not force:
+        return
+    _startup_tasks_done = True
+    with app.app_context():
+        init_db()
+        migrate_database()
+        migrate_template_font_colors()
+        verify_fonts_available()
+        migrate_photo_settings()
+        repair_student_photo_url_recursion()
+        from app.observability import verify_startup_dependencies
+        verify_startup_dependencies(app)
+
+
+def startup_tasks_on_import():
+    """
+    RUN_MIGRATIONS_ON_STARTUP: "true" / "false" / "auto" (default).
+
+    "auto" keeps zero-setup local development on SQLite; against Postgres the
+    deploy runs them once instead of every process paying for the inspection.
+    """
+    mode = (os.environ.get("RUN_MIGRATIONS_ON_STARTUP") or "auto").strip().lower()
+    if mode in {"1", "true", "yes", "on"}:
+        return True
+    if mode in {"0", "false", "no", "off"}:
+        return False
+    return DATABASE_URL.startswith("sqlite")
+
+
+if startup_tasks_on_import():
+    run_startup_tasks()
 
 
 if __name__ == "__main__":
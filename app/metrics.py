@@ -0,0 +1,172 @@
+"""
+Prometheus metrics for request handling, rendering, caches and uploads.
+
+Recording a sample is O(1): histograms bump one fixed bucket, counters add
+to one value. When ``PROMETHEUS_MULTIPROC_DIR`` is set before the first
+import of prometheus_client, each process writes to mmap files in that
+directory. gunicorn.conf.py points web workers at ``<IDCARD_METRICS_DIR>/gunicorn``
+and Celery workers use ``<IDCARD_METRICS_DIR>/celery`` (see celery_config), so
+``/metrics`` aggregates every live and exited web and Celery process on the
+host and a scrape no longer sees a single random worker.
+
+Usage:
+    from app.metrics import observe_render_stage, record_cache_lookup
+    observe_render_stage("photo", 0.042)
+    record_cache_lookup("final_card", hit=True)
+"""
+import glob
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR") or os.environ.get("prometheus_multiproc_dir")
+METRICS_BASE_DIR = os.environ.get("IDCARD_METRICS_DIR", "/tmp/idcard-prometheus")
+CELERY_METRICS_DIR = os.path.join(METRICS_BASE_DIR, "celery")
+
+# Request latency: sub-10ms static hits up to slow bulk/Corel exports.
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Render stages are mostly milliseconds; PDF rasterization can take seconds.
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+UPLOAD_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0)
+
+
+class _NoopMetric:
+    """Stand-in used when prometheus_client is not installed."""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    def observe(self, amount):
+        pass
+
+    def set(self, value):
+        pass
+
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST,
+        CollectorRegistry,
+        Counter,
+        Gauge,
+        Histogram,
+        REGISTRY,
+        generate_latest,
+    )
+
+    HTTP_REQUESTS = Counter(
+        "idcard_http_requests_total", "HTTP requests served.",
+        ["method", "endpoint", "status"],
+    )
+    HTTP_LATENCY = Histogram(
+        "idcard_http_request_duration_seconds", "HTTP request latency.",
+        ["method", "endpoint"], buckets=REQUEST_BUCKETS,
+    )
+    RENDER_STAGE_SECONDS = Histogram(
+        "idcard_render_stage_seconds", "Time spent in each card render / export stage.",
+        ["stage"], buckets=STAGE_BUCKETS,
+    )
+    CACHE_LOOKUPS = Counter(
+        "idcard_cache_lookups_total", "Cache lookups by cache name and result (hit/miss).",
+        ["cache", "result"],
+    )
+    QUEUE_DEPTH = Gauge(
+        "idcard_queue_depth", "Jobs waiting in each work queue.",
+        ["queue"], multiprocess_mode="mostrecent",
+    )
+    UPLOAD_SECONDS = Histogram(
+        "idcard_upload_duration_seconds", "Storage upload latency.",
+        ["backend", "resource_type", "outcome"], buckets=UPLOAD_BUCKETS,
+    )
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    logger.warning("prometheus_client not installed — /metrics disabled")
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+    HTTP_REQUESTS = HTTP_LATENCY = RENDER_STAGE_SECONDS = _NoopMetric()
+    CACHE_LOOKUPS = QUEUE_DEPTH = UPLOAD_SECONDS = _NoopMetric()
+    PROMETHEUS_AVAILABLE = False
+
+
+# ---------------------------------------------------------------------------
+# Recording helpers
+# ---------------------------------------------------------------------------
+
+def observe_request(method, endpoint, status_code, seconds):
+    HTTP_REQUESTS.labels(method, endpoint, str(status_code)).inc()
+    if seconds is not None:
+        HTTP_LATENCY.labels(method, endpoint).observe(seconds)
+
+
+def observe_render_stage(stage, seconds):
+    RENDER_STAGE_SECONDS.labels(stage).observe(seconds)
+
+
+def record_cache_lookup(cache, hit):
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def set_queue_depth(queue, depth):
+    QUEUE_DEPTH.labels(queue).set(depth)
+
+
+def observe_upload(backend, resource_type, seconds, ok=True):
+    UPLOAD_SECONDS.labels(backend, resource_type or "image", "ok" if ok else "error").observe(seconds)
+
+
+# ---------------------------------------------------------------------------
+# Exposition
+# ---------------------------------------------------------------------------
+
+def refresh_queue_depths():
+    """Sample queue lengths at scrape time rather than on every enqueue."""
+    try:
+        from app.services.redis_service import get_task_queue
+        queue = get_task_queue()
+        if queue is not None:
+            set_queue_depth("rq_bulk", queue.count)
+    except Exception as exc:
+        logger.debug("RQ queue depth unavailable: %s", exc)
+
+    try:
+        from models import PrintQueue
+        set_queue_depth("print", PrintQueue.query.filter_by(status="pending").count())
+    except Exception as exc:
+        logger.debug("Print queue depth unavailable: %s", exc)
+
+
+def render_latest():
+    """Return (body, content_type) for the Prometheus text exposition."""
+    if not PROMETHEUS_AVAILABLE:
+        return b"# prometheus_client not installed\n", CONTENT_TYPE_LATEST
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        registry.register(_DirectoriesCollector([MULTIPROC_DIR, CELERY_METRICS_DIR]))
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+class _DirectoriesCollector:
+    """Merge the sample files of several multiprocess directories into one view."""
+
+    def __init__(self, paths):
+        self.paths = list(dict.fromkeys(os.path.abspath(p) for p in paths if p))
+
+    def collect(self):
+        from prometheus_client import multiprocess
+        files = [f for path in self.paths for f in glob.glob(os.path.join(path, "*.db"))]
+        return multiprocess.MultiProcessCollector.merge(files, accumulate=True)
+
+
+def mark_process_dead(pid):
+    """Drop live-gauge files of an exited worker (gunicorn child_exit / Celery shutdown)."""
+    if not (PROMETHEUS_AVAILABLE and MULTIPROC_DIR):
+        return
+    try:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid)
+    except Exception as exc:
+        logger.debug("Could not mark metrics process %s dead: %s", pid, exc)
@@ -4,7 +4,6 @@ Production observability: health checks, metrics, timing, API versioning.
 import time
 import logging
 import functools
-from collections import defaultdict
 
 from flask import request, g, jsonify, Blueprint
 
@@ -42,47 +41,23 @@ def init_request_timing(app):
 # Prometheus-style metrics endpoint
 # ---------------------------------------------------------------------------
 
-_metrics = {
-    "requests_total": defaultdict(int),
-    "errors_total": defaultdict(int),
-    "request_duration_seconds": defaultdict(list),
-}
-
-
 def init_metrics(app):
     """Track request metrics and expose /metrics endpoint."""
+    from app.metrics import observe_request, refresh_queue_depths, render_latest
 
     @app.after_request
     def _track_metrics(response):
-        endpoint = request.endpoint or "unknown"
-        _metrics["requests_total"][endpoint] += 1
-        if response.status_code >= 400:
-            _metrics["errors_total"][f"{endpoint}:{response.status_code}"] += 1
         start = getattr(g, "request_start", None)
-        if start is not None:
-            elapsed = time.monotonic() - start
-            _metrics["request_duration_seconds"][endpoint].append(elapsed)
-            # Keep only last 1000 durations per endpoint
-            if len(_metrics["request_duration_seconds"][endpoint]) > 1000:
-                _metrics["request_duration_seconds"][endpoint] = \
-                    _metrics["request_duration_seconds"][endpoint][-1000:]
+        elapsed = time.monotonic() - start if start is not None else None
+        observe_request(request.method, request.endpoint or "unknown", response.status_code, elapsed)
         return response
 
     @app.route("/metrics")
     def _metrics_endpoint():
-        """Prometheus-compatible metrics endpoint."""
-        lines = []
-        for endpoint, count in _metrics["requests_total"].items():
-            lines.append(f'requests_total{{endpoint="{endpoint}"}} {count}')
-        for key, count in _metrics["errors_total"].items():
-            endpoint, status = key.rsplit(":", 1)
-            lines.append(f'errors_total{{endpoint="{endpoint}",status="{status}"}} {count}')
-        for endpoint, durations in _metrics["request_duration_seconds"].items():
-            if durations:
-                avg = sum(durations) / len(durations)
-                lines.append(f'request_duration_seconds_avg{{endpoint="{endpoint}"}} {avg:.4f}')
-                lines.append(f'request_duration_seconds_count{{endpoint="{endpoint}"}} {len(durations)}')
-        return "\n".join(lines), 200, {"Content-Type": "text/plain"}
+        """Prometheus-compatible metrics endpoint (aggregated across worker processes)."""
+        refresh_queue_depths()
+        body, content_type = render_latest()
+        return body, 200, {"Content-Type": content_type}
 
 
 # ---------------------------------------------------------------------------
@@ -293,3 +268,6 @@ def init_observability(app):
     init_health_checks(app)
     init_api_versioning(app)
     init_slow_query_logging(app)
+
+    from app.tracing import init_tracing
+    init_tracing(app)
@@ -223,6 +223,40 @@ def lazy_import(module_name: str):
     return _lazy_imports[module_name]
 
 
+def lazy_view(factory_path: str):
+    """
+    Flask view that builds the real view on its first request.
+
+    ``factory_path`` is "module:function"; the function returns a view
+    callable, or None when its optional dependency is missing (the route
+    then answers 503). Keeps heavy view modules (e.g. strawberry for
+    /graphql) out of worker boot.
+
+    Usage:
+        app.add_url_rule("/graphql", endpoint="graphql",
+                         view_func=lazy_view("app.api.graphql:build_graphql_view"),
+                         methods=["GET", "POST"])
+    """
+    state = {}
+    lock = threading.Lock()
+
+    def view(*args, **kwargs):
+        if "view" not in state:
+            with lock:
+                if "view" not in state:
+                    import importlib
+                    module_name, func_name = factory_path.split(":", 1)
+                    state["view"] = getattr(importlib.import_module(module_name), func_name)()
+        target = state["view"]
+        if target is None:
+            from flask import jsonify
+            return jsonify({"success": False, "error": "Endpoint unavailable"}), 503
+        return target(*args, **kwargs)
+
+    view.__name__ = factory_path.rsplit(":", 1)[-1]
+    return view
+
+
 # ---------------------------------------------------------------------------
 # 6. Query Result Cache (in-memory, TTL-based)
 # ---------------------------------------------------------------------------
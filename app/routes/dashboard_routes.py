@@ -13,7 +13,6 @@ from datetime import datetime, timezone
 from collections import defaultdict
 from io import BytesIO
 import glob
-import pandas as pd
 import requests
 from werkzeug.utils import secure_filename
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify, send_file, current_app
@@ -1058,6 +1057,7 @@ def download_school_excel(template_id):
 
             data.append(row)
 
+        import pandas as pd  # Lazy import — pandas adds ~0.3s to every worker boot
         df = pd.DataFrame(data)
 
         output = BytesIO()
@@ -515,6 +515,11 @@ def save_field_settings():
             actor_role=actor_role,
         )
         db.session.commit()
+        try:
+            from app.services.collaboration import schedule_room_preview
+            schedule_room_preview(template.id, settings_side, [key for key in data if key.endswith(("_settings", "_config"))])
+        except Exception as exc:
+            logger.debug("Editor preview broadcast skipped: %s", exc)
         return jsonify(_template_settings_payload(template, settings_side))
     except Exception as e:
         db.session.rollback()
@@ -8,7 +8,7 @@ import os
 import logging
 from datetime import datetime, timezone
 
-from flask import Blueprint, render_template, request, jsonify, send_file, session
+from flask import Blueprint, Response, render_template, request, jsonify, send_file, session, stream_with_context
 
 from app.legacy_app import admin_required, super_admin_required
 from app.extensions import limiter
@@ -33,7 +33,7 @@ from app.services.webhook_service import (
     create_webhook, trigger_event, get_delivery_stats, WEBHOOK_EVENTS
 )
 from app.services.report_service import (
-    generate_student_report, generate_activity_report, generate_bulk_job_report
+    student_report, activity_report, bulk_job_report, iter_report_csv, render_report, XLSX_MIMETYPE
 )
 from app.services.search_service import (
     search_students, search_templates, search_activity_logs
@@ -45,7 +45,7 @@ from app.services.monitoring_service import (
 from app.services.archive_service import (
     archive_old_students, archive_old_activities, list_archives, restore_archive
 )
-from app.services.ocr_service import extract_text_from_image, get_ocr_results
+from app.services.ocr_service import extract_text_from_image, enqueue_ocr_batch, get_ocr_results
 
 logger = logging.getLogger(__name__)
 
@@ -338,6 +338,7 @@ def api_test_webhook(wh_id):
         event_type='webhook.test',
         payload={'message': 'Test webhook', 'timestamp': datetime.now(timezone.utc).isoformat()},
     )
+    db.session.commit()
     return jsonify({'success': True, 'message': 'Test event triggered'})
 
 
@@ -349,16 +350,25 @@ def reports_page():
     return render_template('enterprise/reports.html')
 
 
+def _report_response(report, fmt):
+    """CSV streams chunk by chunk; XLSX is sent once the write-only workbook is saved."""
+    if fmt == 'csv':
+        return Response(
+            stream_with_context(iter_report_csv(report)),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename={report.name}.csv'},
+        )
+    buf = render_report(report, 'xlsx')
+    mimetype = XLSX_MIMETYPE if buf.name.endswith('.xlsx') else 'text/csv'
+    return send_file(buf, mimetype=mimetype, as_attachment=True, download_name=buf.name)
+
+
 @enterprise_bp.route('/admin/reports/students')
 @admin_required
 def report_students():
     fmt = request.args.get('format', 'xlsx')
     school = request.args.get('school')
-    buf = generate_student_report(format=fmt, school_name=school)
-    ext = 'xlsx' if fmt == 'xlsx' else 'csv'
-    mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' if ext == 'xlsx' else 'text/csv'
-    return send_file(buf, mimetype=mimetype, as_attachment=True,
-                     download_name=f'student_report.{ext}')
+    return _report_response(student_report(school_name=school), fmt)
 
 
 @enterprise_bp.route('/admin/reports/activity')
@@ -366,22 +376,14 @@ def report_students():
 def report_activity():
     fmt = request.args.get('format', 'xlsx')
     days = request.args.get('days', 30, type=int)
-    buf = generate_activity_report(format=fmt, days=days)
-    ext = 'xlsx' if fmt == 'xlsx' else 'csv'
-    mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' if ext == 'xlsx' else 'text/csv'
-    return send_file(buf, mimetype=mimetype, as_attachment=True,
-                     download_name=f'activity_report.{ext}')
+    return _report_response(activity_report(days=days), fmt)
 
 
 @enterprise_bp.route('/admin/reports/bulk-jobs')
 @admin_required
 def report_bulk_jobs():
     fmt = request.args.get('format', 'xlsx')
-    buf = generate_bulk_job_report(format=fmt)
-    ext = 'xlsx' if fmt == 'xlsx' else 'csv'
-    mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' if ext == 'xlsx' else 'text/csv'
-    return send_file(buf, mimetype=mimetype, as_attachment=True,
-                     download_name=f'bulk_job_report.{ext}')
+    return _report_response(bulk_job_report(), fmt)
 
 
 # ================== Advanced Search API ==================
@@ -524,6 +526,40 @@ def api_ocr_scan():
     return jsonify({'success': True, **result})
 
 
+@enterprise_bp.route('/admin/ocr/scan-batch', methods=['POST'])
+@admin_required
+def api_ocr_scan_batch():
+    """Queue many ID images for background OCR; poll /admin/ocr/jobs/<job_id>."""
+    files = [f for f in request.files.getlist('images') if f and f.filename]
+    if not files:
+        return jsonify({'success': False, 'message': 'No images uploaded'}), 400
+
+    student_ids = request.form.getlist('student_ids', type=int)
+    items = []
+    for i, f in enumerate(files):
+        image_bytes = f.read()
+        if image_bytes:
+            items.append({
+                'image_bytes': image_bytes,
+                'student_id': student_ids[i] if i < len(student_ids) else None,
+            })
+    if not items:
+        return jsonify({'success': False, 'message': 'Uploaded images are empty'}), 400
+
+    job_id = enqueue_ocr_batch(items)
+    return jsonify({'success': True, 'job_id': job_id, 'total': len(items)}), 202
+
+
+@enterprise_bp.route('/admin/ocr/jobs/<job_id>')
+@admin_required
+def api_ocr_job_status(job_id):
+    from app.services.bulk_job_service import _get_bulk_job_state
+    state = _get_bulk_job_state(job_id)
+    if not state or state.get('kind') != 'ocr':
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    return jsonify({'success': True, **state})
+
+
 # ================== Organization Management ==================
 
 @enterprise_bp.route('/admin/organizations')
@@ -5,6 +5,7 @@ All routes require API key authentication via the X-API-Key header.
 """
 
 
+import json
 import logging
 
 from flask import Blueprint, g, jsonify, request
@@ -520,6 +521,43 @@ def api_reprint_job(job_id):
     return jsonify({"success": False, "error": "Original job not found"}), 404
 
 
+@rest_api_bp.route("/print-queue/claim", methods=["POST"])
+@require_api_key("print:write")
+def api_claim_print_jobs():
+    """
+    Claim the next pending print jobs for a printer agent.
+
+    Body: ``printer_name``, ``limit`` (default 1) and ``wait`` — seconds to
+    long-poll for new jobs when none are pending (default 0).
+    """
+    data = request.get_json(silent=True) or {}
+    from app.services.print_queue_service import wait_for_jobs
+    try:
+        limit = int(data.get("limit", 1))
+        wait = float(data.get("wait", 0))
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "error": "limit and wait must be numbers"}), 400
+    jobs = wait_for_jobs(printer_name=data.get("printer_name"), limit=limit, timeout=wait)
+    return jsonify({
+        "success": True,
+        "jobs": [{"id": j.id, "template_id": j.template_id, "student_id": j.student_id,
+                  "job_type": j.job_type, "priority": j.priority, "status": j.status,
+                  "printer_name": j.printer_name, "card_side": j.card_side, "copies": j.copies,
+                  "created_at": j.created_at.isoformat() if j.created_at else None} for j in jobs],
+    })
+
+
+@rest_api_bp.route("/print-queue/<int:job_id>/complete", methods=["POST"])
+@require_api_key("print:write")
+def api_complete_print_job(job_id):
+    """Report a claimed print job as printed (``success``) or failed (``error_message``)."""
+    data = request.get_json(silent=True) or {}
+    from app.services.print_queue_service import complete_job
+    if complete_job(job_id, success=bool(data.get("success", True)), error_message=data.get("error_message")):
+        return jsonify({"success": True})
+    return jsonify({"success": False, "error": "Job not found"}), 404
+
+
 @rest_api_bp.route("/print-history", methods=["GET"])
 @require_api_key("print:read")
 def api_print_history():
@@ -548,7 +586,7 @@ def api_list_nfc_encodings():
     status_filter = request.args.get("status", type=str)
     page = request.args.get("page", 1, type=int)
     per_page = request.args.get("per_page", 50, type=int)
-    from app.services.nfc_service import list_encodings, get_encoding_stats
+    from app.services.nfc_service import list_encodings, get_encoding_stats, get_encoding_status
     jobs, total = list_encodings(status=status_filter, page=page, per_page=per_page)
     stats = get_encoding_stats()
     return jsonify({
@@ -576,6 +614,27 @@ def api_create_nfc_encoding():
     return jsonify({"success": False, "error": msg}), 400
 
 
+@rest_api_bp.route("/nfc-encodings/next", methods=["GET"])
+@require_api_key("nfc:read")
+def api_next_nfc_payloads():
+    """
+    Stream the next pending encoding payloads as NDJSON for an encoder station.
+
+    Query: ``limit`` (default 50), ``template_id``, ``chip_type`` and
+    ``after_id`` (last id already received).
+    """
+    from flask import Response, stream_with_context
+    from app.services.nfc_service import iter_pending_payloads
+    payloads = iter_pending_payloads(
+        limit=request.args.get("limit", 50, type=int),
+        template_id=request.args.get("template_id", type=int),
+        chip_type=request.args.get("chip_type", type=str),
+        after_id=request.args.get("after_id", type=int),
+    )
+    lines = (json.dumps(payload, default=str) + "\n" for payload in payloads)
+    return Response(stream_with_context(lines), mimetype="application/x-ndjson")
+
+
 @rest_api_bp.route("/nfc-encodings/<int:encoding_id>/encode", methods=["POST"])
 @require_api_key("nfc:write")
 def api_encode_nfc(encoding_id):
@@ -620,6 +679,7 @@ def api_batch_nfc_encode():
     from app.services.nfc_service import batch_create_encoding_jobs
     job_ids, errors = batch_create_encoding_jobs(
         template_id=data["template_id"],
+        student_ids=data.get("student_ids"),
         chip_type=data.get("chip_type", "MIFARE_1K"),
     )
     return jsonify({
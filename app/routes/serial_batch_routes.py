@@ -23,9 +23,11 @@ from app.decorators import school_admin_required, super_admin_required
 from app.services.serial_batch_service import (
     create_batch, get_batch, list_batches, get_batch_cards,
     upload_photos, update_card_details, delete_card,
+    render_batch, get_render_progress,
     _batch_dir, _thumbnail_path
 )
-from app.utils.helper_utils import get_template_settings, get_card_size
+from app.utils.helper_utils import get_template_settings
+from app.utils.layout_utils import get_card_size
 from utils import STATIC_DIR, GENERATED_FOLDER, FONTS_FOLDER
 
 logger = logging.getLogger(__name__)
@@ -367,6 +369,33 @@ def generate_card(batch_id, card_id):
         return jsonify({'error': f'Generation failed: {str(e)}'}), 500
 
 
+@serial_batch_bp.route('/<int:batch_id>/render', methods=['POST'])
+@school_admin_required
+def render_batch_route(batch_id):
+    """Queue rendering of all cards with details filled (format: JPEG, WEBP or PNG)."""
+    school_name = None if session.get('admin_role') == 'super_admin' else session.get('admin_school')
+    payload = request.get_json(silent=True) or request.form
+    try:
+        render_batch(batch_id, school_name=school_name, output_format=payload.get('format') or 'JPEG')
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Batch render error: {e}", exc_info=True)
+        return jsonify({'success': False, 'error': 'Render could not be started'}), 500
+    return jsonify({'success': True, 'progress': get_render_progress(batch_id, school_name=school_name)}), 202
+
+
+@serial_batch_bp.route('/<int:batch_id>/render/progress', methods=['GET'])
+@school_admin_required
+def render_progress_route(batch_id):
+    """Render progress for a batch."""
+    school_name = None if session.get('admin_role') == 'super_admin' else session.get('admin_school')
+    progress = get_render_progress(batch_id, school_name=school_name)
+    if progress is None:
+        return jsonify({'error': 'Batch not found'}), 404
+    return jsonify(progress)
+
+
 @serial_batch_bp.route('/<int:batch_id>/download_all', methods=['GET'])
 @school_admin_required
 def download_all_cards(batch_id):
@@ -403,7 +432,7 @@ def download_all_cards(batch_id):
                     include_barcode=True,
                 )
                 if rendered_img:
-                    rendered_dir = _batch_dir(batch_id, 'rendered')
+                    rendered_dir = os.path.join(_batch_dir(batch_id), 'rendered')
                     os.makedirs(rendered_dir, exist_ok=True)
                     output_path = os.path.join(rendered_dir, f'card_{card.id}.pdf')
                     rendered_img.convert('RGB').save(output_path, format='PDF')
@@ -412,7 +441,14 @@ def download_all_cards(batch_id):
                     db.session.commit()
 
             if card.rendered_path and os.path.exists(card.rendered_path):
-                card_doc = fitz.open(card.rendered_path)
+                if card.rendered_path.lower().endswith('.pdf'):
+                    card_doc = fitz.open(card.rendered_path)
+                else:
+                    # Batch renders are stored as JPEG/WebP/PNG images.
+                    pdf_io = io.BytesIO()
+                    with Image.open(card.rendered_path) as rendered_img:
+                        rendered_img.convert('RGB').save(pdf_io, format='PDF')
+                    card_doc = fitz.open("pdf", pdf_io.getvalue())
                 out_doc.insert_pdf(card_doc)
                 card_doc.close()
 
@@ -9,12 +9,17 @@ Provides intelligent template design assistance:
   5. Design Validation — check accessibility, print readiness, and best practices
 """
 import io
+import os
 import re
+import copy
 import json
+import hashlib
 import logging
 import colorsys
+import threading
+from collections import OrderedDict
 from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field
 
 logger = logging.getLogger(__name__)
 
@@ -54,6 +59,22 @@ class LayoutAnalysis:
     suggested_card_height: int = 0
 
 
+# Detection runs on a reduced copy: templates are often 300 DPI rasters of
+# several thousand pixels, while the heuristics only need coarse structure.
+LAYOUT_ANALYSIS_MAX_SIDE = int(os.environ.get("LAYOUT_ANALYSIS_MAX_SIDE", "1024"))
+# Palette, background and logo colour statistics read a strided sample of
+# that level (not a further reduction, which would blend text into grey).
+LAYOUT_COLOR_MAX_SIDE = 256
+# Finder candidates considered when pairing them up into a QR code
+_QR_MAX_FINDERS = 12
+LAYOUT_ANALYSIS_CACHE_SIZE = int(os.environ.get("LAYOUT_ANALYSIS_CACHE_SIZE", "64"))
+# Bump when the heuristics change so cached results are not reused.
+_LAYOUT_CACHE_VERSION = 3
+
+_analysis_cache = OrderedDict()
+_analysis_cache_lock = threading.Lock()
+
+
 def analyze_template_layout(image_bytes: bytes) -> LayoutAnalysis:
     """
     Analyze a template image to detect its layout structure.
@@ -61,16 +82,24 @@ def analyze_template_layout(image_bytes: bytes) -> LayoutAnalysis:
     Uses image processing heuristics to identify:
     - Photo area (typically a large rectangular region with face-like colors)
     - Text areas (regions with high contrast and small features)
-    - QR code area (small square with characteristic pattern)
+    - QR code area (three 1:1:3:1:1 finder patterns)
     - Logo area (top corner, typically small and colorful)
     - Background color
     - Dominant color palette
 
+    Results are cached by the SHA-256 of ``image_bytes`` (in-process and in
+    Redis when available), so re-analysing the same template is a lookup.
+
     Usage:
         with open("template.png", "rb") as f:
             analysis = analyze_template_layout(f.read())
         print(f"Found {len(analysis.regions)} regions")
     """
+    content_hash = hashlib.sha256(image_bytes).hexdigest()
+    cached = _cached_analysis(content_hash)
+    if cached is not None:
+        return cached
+
     try:
         from PIL import Image
         import numpy as np
@@ -78,9 +107,13 @@ def analyze_template_layout(image_bytes: bytes) -> LayoutAnalysis:
         logger.warning("PIL/numpy not available for layout analysis")
         return LayoutAnalysis(width=0, height=0)
 
-    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    arr = np.array(img)
-    h, w = arr.shape[:2]
+    img = Image.open(io.BytesIO(image_bytes))
+    w, h = img.size
+    # JPEG can decode directly at 1/2, 1/4 or 1/8 scale.
+    img.draft("RGB", (LAYOUT_ANALYSIS_MAX_SIDE, LAYOUT_ANALYSIS_MAX_SIDE))
+    arr = np.asarray(_analysis_level(img.convert("RGB"), LAYOUT_ANALYSIS_MAX_SIDE))
+    step = max(1, -(-max(arr.shape[:2]) // LAYOUT_COLOR_MAX_SIDE))
+    color_arr = arr[::step, ::step]
 
     analysis = LayoutAnalysis(
         width=w,
@@ -91,55 +124,191 @@ def analyze_template_layout(image_bytes: bytes) -> LayoutAnalysis:
     )
     # Detect background color (most common edge color)
     edge_pixels = np.concatenate([
-        arr[0, :, :], arr[-1, :, :],
-        arr[:, 0, :], arr[:, -1, :]
+        color_arr[0, :, :], color_arr[-1, :, :],
+        color_arr[:, 0, :], color_arr[:, -1, :]
     ])
     bg_color = _most_common_color(edge_pixels)
     analysis.background_color = _rgb_to_hex(bg_color)
 
     # Extract dominant color palette
-    analysis.color_palette = _extract_color_palette(arr, n_colors=5)
+    analysis.color_palette = _extract_color_palette(color_arr, n_colors=5)
     analysis.dominant_colors = analysis.color_palette.copy()
 
+    features = _layout_features(arr)
+    scale = _RegionScale(w / float(arr.shape[1]), h / float(arr.shape[0]))
+
     # Detect photo region (look for skin-tone colored area)
-    photo_region = _detect_photo_region(arr, w, h)
+    photo_region = _detect_photo_region(features, scale)
     if photo_region:
         analysis.photo_region = photo_region
         analysis.regions.append(photo_region)
 
     # Detect text regions (high contrast, small features)
-    text_regions = _detect_text_regions(arr, w, h)
+    text_regions = _detect_text_regions(features, scale)
     analysis.text_regions = text_regions
     analysis.regions.extend(text_regions)
 
-    # Detect QR code (small square in corner with characteristic pattern)
-    qr_region = _detect_qr_region(arr, w, h)
+    # Detect QR code (finder patterns, else a high-contrast corner square)
+    qr_region = _detect_qr_region(features, scale)
     if qr_region:
         analysis.qr_region = qr_region
         analysis.regions.append(qr_region)
 
     # Detect logo (small colorful region in corner)
-    logo_region = _detect_logo_region(arr, w, h)
+    logo_region = _detect_logo_region(color_arr, _RegionScale(w / float(color_arr.shape[1]), h / float(color_arr.shape[0])))
     if logo_region:
         analysis.logo_region = logo_region
         analysis.regions.append(logo_region)
 
     logger.info(
-        "layout_analysis: %dx%d, %d regions, %d colors",
-        w, h, len(analysis.regions), len(analysis.color_palette),
+        "layout_analysis: %dx%d (analysed at %dx%d), %d regions, %d colors",
+        w, h, arr.shape[1], arr.shape[0], len(analysis.regions), len(analysis.color_palette),
     )
-    return analysis
+    _store_analysis(content_hash, analysis)
+    return copy.deepcopy(analysis)
+
+
+def _analysis_cache_key(content_hash: str) -> str:
+    return f"layout_analysis:v{_LAYOUT_CACHE_VERSION}:{content_hash}"
+
+
+def _cached_analysis(content_hash: str) -> Optional[LayoutAnalysis]:
+    key = _analysis_cache_key(content_hash)
+    with _analysis_cache_lock:
+        analysis = _analysis_cache.get(key)
+        if analysis is not None:
+            _analysis_cache.move_to_end(key)
+            return copy.deepcopy(analysis)
+    try:
+        from app.services.redis_service import _redis_cache_key, _redis_get
+        payload = _redis_get(_redis_cache_key(key))
+        if not payload:
+            return None
+        analysis = _analysis_from_dict(json.loads(payload))
+    except Exception:
+        return None
+    _remember_analysis(key, analysis)
+    return copy.deepcopy(analysis)
+
+
+def _store_analysis(content_hash: str, analysis: LayoutAnalysis) -> None:
+    key = _analysis_cache_key(content_hash)
+    _remember_analysis(key, copy.deepcopy(analysis))
+    try:
+        from app.services.redis_service import _redis_cache_key, _redis_set
+        _redis_set(_redis_cache_key(key), json.dumps(asdict(analysis)).encode("utf-8"))
+    except Exception as exc:
+        logger.debug("layout analysis cache write skipped: %s", exc)
+
+
+def _remember_analysis(key: str, analysis: LayoutAnalysis) -> None:
+    if LAYOUT_ANALYSIS_CACHE_SIZE <= 0:
+        return
+    with _analysis_cache_lock:
+        _analysis_cache[key] = analysis
+        _analysis_cache.move_to_end(key)
+        while len(_analysis_cache) > LAYOUT_ANALYSIS_CACHE_SIZE:
+            _analysis_cache.popitem(last=False)
+
+
+def _analysis_from_dict(data: dict) -> LayoutAnalysis:
+    def region(value):
+        return LayoutRegion(**value) if value else None
+
+    data = dict(data)
+    for key in ("regions", "text_regions"):
+        data[key] = [region(r) for r in data.get(key) or []]
+    for key in ("photo_region", "qr_region", "logo_region"):
+        data[key] = region(data.get(key))
+    return LayoutAnalysis(**data)
+
+
+def _analysis_level(img, max_side: int):
+    """
+    Walk down a 2x pyramid until ``img`` fits ``max_side``. Box-filter halving
+    keeps thin text strokes visible as intermediate grey instead of aliasing
+    them away, and small templates are analysed at full resolution.
+    """
+    while max(img.size) > max_side:
+        img = img.reduce(2)
+    return img
+
+
+@dataclass
+class _RegionScale:
+    """Maps analysis-level pixel coordinates back to the source image."""
+    sx: float
+    sy: float
+
+    def region(self, x, y, width, height, **kwargs) -> LayoutRegion:
+        return LayoutRegion(
+            x=int(round(x * self.sx)),
+            y=int(round(y * self.sy)),
+            width=int(round(width * self.sx)),
+            height=int(round(height * self.sy)),
+            **kwargs,
+        )
+
+
+def _integral(mask):
+    """Summed-area table with a zero row/column, so any box sum is 4 lookups."""
+    import numpy as np
+    ii = np.zeros((mask.shape[0] + 1, mask.shape[1] + 1), dtype=np.int32)
+    np.cumsum(np.cumsum(mask, axis=0, dtype=np.int32), axis=1, out=ii[1:, 1:])
+    return ii
+
+
+def _box_sum(ii, y0: int, y1: int, x0: int, x1: int) -> float:
+    return float(ii[y1, x1] - ii[y0, x1] - ii[y1, x0] + ii[y0, x0])
+
+
+def _layout_features(arr) -> dict:
+    """
+    One pass over the analysis level producing the gray, edge, skin-tone and
+    dark masks plus their integral images, shared by every detector below.
+    """
+    import numpy as np
+
+    rgb = arr.astype(np.int16)
+    r, g, b = rgb[:, :, 0], rgb[:, :, 1], rgb[:, :, 2]
+    gray = (r + g + b) // 3
+
+    dx = np.zeros_like(gray)
+    dy = np.zeros_like(gray)
+    dx[:, :-1] = np.abs(gray[:, 1:] - gray[:, :-1])
+    dy[:-1, :] = np.abs(gray[1:, :] - gray[:-1, :])
+    edges = (dx + dy) > 30
+
+    skin = (
+        (r > 95) & (g > 40) & (b > 20) &
+        (r > g) & (r > b) &
+        (np.abs(r - g) > 15) &
+        (r - b > 15)
+    )
+    dark = gray < 128
+
+    return {
+        "height": gray.shape[0],
+        "width": gray.shape[1],
+        "gray": gray,
+        "edges": edges,
+        "skin": skin,
+        "dark": dark,
+        "edges_ii": _integral(edges),
+        "skin_ii": _integral(skin),
+    }
 
 
 def _most_common_color(pixels) -> tuple:
     """Find the most common color in a set of pixels."""
     try:
         import numpy as np
-        # Quantize to reduce unique colors
-        quantized = (pixels // 16) * 16
-        colors, counts = np.unique(quantized, axis=0, return_counts=True)
-        most_common = colors[np.argmax(counts)]
-        return tuple(int(c) for c in most_common)
+        # Quantize to reduce unique colors; pack to one int so np.unique runs on 1-D data.
+        quantized = (pixels.astype(np.int32) // 16) * 16
+        packed = (quantized[:, 0] << 16) | (quantized[:, 1] << 8) | quantized[:, 2]
+        colors, counts = np.unique(packed, return_counts=True)
+        most_common = int(colors[np.argmax(counts)])
+        return ((most_common >> 16) & 0xFF, (most_common >> 8) & 0xFF, most_common & 0xFF)
     except Exception:
         return (255, 255, 255)
 
@@ -150,25 +319,24 @@ def _rgb_to_hex(rgb: tuple) -> str:
 
 
 def _extract_color_palette(arr, n_colors: int = 5) -> List[str]:
-    """Extract dominant colors from an image using k-means-like approach."""
+    """Extract dominant colors from an image using colour quantization."""
     try:
         import numpy as np
-        # Sample pixels for speed
-        pixels = arr.reshape(-1, 3)
-        if len(pixels) > 10000:
-            indices = np.random.choice(len(pixels), 10000, replace=False)
-            pixels = pixels[indices]
-
-        # Simple color quantization
-        quantized = (pixels // 32) * 32
-        unique, counts = np.unique(quantized, axis=0, return_counts=True)
-        top_indices = np.argsort(counts)[-n_colors:]
-        return [_rgb_to_hex(tuple(int(c) for c in unique[i])) for i in top_indices]
+        # ``arr`` is already a sparse sample, so every pixel is counted.
+        quantized = arr.reshape(-1, 3).astype(np.int32) // 32
+        packed = (quantized[:, 0] << 6) | (quantized[:, 1] << 3) | quantized[:, 2]
+        counts = np.bincount(packed, minlength=512)
+        present = np.flatnonzero(counts)
+        top = present[np.argsort(counts[present], kind="stable")[-n_colors:]]
+        return [
+            _rgb_to_hex((int(c >> 6) * 32, int((c >> 3) & 7) * 32, int(c & 7) * 32))
+            for c in top
+        ]
     except Exception:
         return ["#FFFFFF", "#000000"]
 
 
-def _detect_photo_region(arr, w: int, h: int) -> Optional[LayoutRegion]:
+def _detect_photo_region(features: dict, scale: _RegionScale) -> Optional[LayoutRegion]:
     """
     Detect the photo area in a template.
     Heuristic: look for a rectangular region with skin-tone colors,
@@ -178,11 +346,14 @@ def _detect_photo_region(arr, w: int, h: int) -> Optional[LayoutRegion]:
         import numpy as np
 
         # Check left third of image for skin-tone pixels
-        left_region = arr[:, :w // 3, :]
-        skin_mask = _skin_tone_mask(left_region)
+        h, third = features["height"], features["width"] // 3
+        if third <= 0:
+            return None
+        skin_ratio = _box_sum(features["skin_ii"], 0, h, 0, third) / float(h * third)
 
-        if skin_mask.mean() > 0.05:  # at least 5% skin-tone pixels
+        if skin_ratio > 0.05:  # at least 5% skin-tone pixels
             # Find bounding box of skin-tone area
+            skin_mask = features["skin"][:, :third]
             rows = np.any(skin_mask, axis=1)
             cols = np.any(skin_mask, axis=0)
 
@@ -190,13 +361,10 @@ def _detect_photo_region(arr, w: int, h: int) -> Optional[LayoutRegion]:
                 rmin, rmax = np.where(rows)[0][[0, -1]]
                 cmin, cmax = np.where(cols)[0][[0, -1]]
 
-                return LayoutRegion(
-                    x=int(cmin),
-                    y=int(rmin),
-                    width=int(cmax - cmin),
-                    height=int(rmax - rmin),
+                return scale.region(
+                    cmin, rmin, cmax - cmin, rmax - rmin,
                     region_type="photo",
-                    confidence=float(skin_mask.mean()),
+                    confidence=float(skin_ratio),
                     suggested_field_name="student_photo",
                 )
     except Exception:
@@ -204,23 +372,7 @@ def _detect_photo_region(arr, w: int, h: int) -> Optional[LayoutRegion]:
     return None
 
 
-def _skin_tone_mask(arr) -> list:
-    """Create a boolean mask of skin-tone pixels."""
-    try:
-        import numpy as np
-        r, g, b = arr[:, :, 0], arr[:, :, 1], arr[:, :, 2]
-        mask = (
-            (r > 95) & (g > 40) & (b > 20) &
-            (r > g) & (r > b) &
-            (np.abs(r.astype(int) - g.astype(int)) > 15) &
-            (r - b > 15)
-        )
-        return mask
-    except Exception:
-        return []
-
-
-def _detect_text_regions(arr, w: int, h: int) -> List[LayoutRegion]:
+def _detect_text_regions(features: dict, scale: _RegionScale) -> List[LayoutRegion]:
     """
     Detect text regions using edge density heuristics.
     Text areas have high edge density with horizontal alignment.
@@ -229,34 +381,32 @@ def _detect_text_regions(arr, w: int, h: int) -> List[LayoutRegion]:
     try:
         import numpy as np
 
-        # Convert to grayscale
-        gray = np.mean(arr, axis=2).astype(np.uint8)
-
-        # Simple edge detection (Sobel-like)
-        edges = np.abs(np.diff(gray, axis=1, append=gray[:, -1:])) + \
-                np.abs(np.diff(gray, axis=0, append=gray[-1:, :]))
+        h, w = features["height"], features["width"]
+        strip_height = h // 20
+        if strip_height <= 0:
+            return regions
 
-        # Threshold
-        edge_mask = edges > 30
+        # Per-strip, per-column edge counts for all 20 strips at once, read
+        # straight off the integral image rows at the strip boundaries.
+        bounds = np.minimum(np.arange(21) * strip_height, h)
+        bounds[-1] = min(20 * strip_height, h)
+        ii = features["edges_ii"]
+        strip_cols = np.diff(np.diff(ii[bounds], axis=0), axis=1)
+        heights = np.diff(bounds).astype(np.float64)
 
-        # Divide into horizontal strips and find high-edge-density areas
-        strip_height = h // 20
         for i in range(20):
-            y_start = i * strip_height
-            y_end = min((i + 1) * strip_height, h)
-            strip = edge_mask[y_start:y_end, :]
-
-            density = strip.mean()
+            if heights[i] <= 0:
+                continue
+            density = strip_cols[i].sum() / (heights[i] * w)
             if density > 0.1:  # high edge density = likely text
                 # Find horizontal extent
-                col_density = strip.mean(axis=0)
-                active_cols = np.where(col_density > 0.05)[0]
+                active_cols = np.where(strip_cols[i] / heights[i] > 0.05)[0]
                 if len(active_cols) > 10:
-                    regions.append(LayoutRegion(
-                        x=int(active_cols[0]),
-                        y=int(y_start),
-                        width=int(active_cols[-1] - active_cols[0]),
-                        height=int(y_end - y_start),
+                    regions.append(scale.region(
+                        active_cols[0],
+                        bounds[i],
+                        active_cols[-1] - active_cols[0],
+                        heights[i],
                         region_type="text",
                         confidence=float(density),
                         suggested_field_name=f"text_field_{len(regions)}",
@@ -267,30 +417,157 @@ def _detect_text_regions(arr, w: int, h: int) -> List[LayoutRegion]:
     return regions
 
 
-def _detect_qr_region(arr, w: int, h: int) -> Optional[LayoutRegion]:
+def _finder_runs(dark):
+    """
+    Scan every row of ``dark`` for the QR finder signature: five runs,
+    dark/light/dark/light/dark, in the ratio 1:1:3:1:1. Returns arrays of
+    (row, centre column, pattern width) for each hit.
+    """
+    import numpy as np
+
+    h, w = dark.shape
+    change = np.ones((h, w + 1), dtype=bool)
+    change[:, 1:w] = dark[:, 1:] != dark[:, :-1]
+    rows, starts = np.nonzero(change)
+    empty = np.zeros(0, dtype=np.int64)
+    if len(rows) < 6:
+        return empty, empty, empty
+
+    # Window k covers runs k..k+4, i.e. boundaries k..k+5 of the same row.
+    lengths = np.diff(starts).astype(np.float64)
+    k = np.arange(len(rows) - 5)
+    same_row = rows[k] == rows[k + 5]
+    k = k[same_row & dark[rows[k], np.minimum(starts[k], w - 1)]]
+    runs = np.stack([lengths[k + i] for i in range(5)])
+    total = runs.sum(axis=0)
+    module = total / 7.0
+    tolerance = module / 2.0
+    ok = (
+        (total >= 7) &
+        (np.abs(runs[0] - module) < tolerance) &
+        (np.abs(runs[1] - module) < tolerance) &
+        (np.abs(runs[2] - 3 * module) < 3 * tolerance) &
+        (np.abs(runs[3] - module) < tolerance) &
+        (np.abs(runs[4] - module) < tolerance)
+    )
+    k, total = k[ok], total[ok]
+    return rows[k], (starts[k] + total // 2).astype(np.int64), total.astype(np.int64)
+
+
+def _finder_centres(dark) -> List[Tuple[float, float, float]]:
+    """
+    Locate QR finder patterns as points hit by both a horizontal and a
+    vertical 1:1:3:1:1 scan, clustered into (x, y, pattern width) centres.
+    """
+    import numpy as np
+
+    h, w = dark.shape
+    hy, hx, hsize = _finder_runs(dark)
+    vx, vy, _ = _finder_runs(dark.T)
+    if not len(hy) or not len(vx):
+        return []
+
+    # A horizontal hit is confirmed when a vertical hit lies within one
+    # module of it, checked with one box sum per hit on the vertical map.
+    vmap = np.zeros((h, w), dtype=np.uint8)
+    vmap[vy, vx] = 1
+    vii = _integral(vmap)
+    r = np.maximum(hsize // 7, 1)
+    y0, y1 = np.clip(hy - r, 0, h), np.clip(hy + r + 1, 0, h)
+    x0, x1 = np.clip(hx - r, 0, w), np.clip(hx + r + 1, 0, w)
+    confirmed = (vii[y1, x1] - vii[y0, x1] - vii[y1, x0] + vii[y0, x0]) > 0
+
+    centres = []
+    for x, y, size in zip(hx[confirmed], hy[confirmed], hsize[confirmed]):
+        for c in centres:
+            if abs(c[0] / c[3] - x) <= c[2] / c[3] / 2 and abs(c[1] / c[3] - y) <= c[2] / c[3] / 2:
+                c[0] += x
+                c[1] += y
+                c[2] += size
+                c[3] += 1
+                break
+        else:
+            centres.append([float(x), float(y), float(size), 1])
+    # Real finders are hit on several rows; single-row hits are text noise.
+    centres = sorted((c for c in centres if c[3] >= 2), key=lambda c: -c[3])[:_QR_MAX_FINDERS]
+    return [(c[0] / c[3], c[1] / c[3], c[2] / c[3]) for c in centres]
+
+
+def _qr_from_finders(centres) -> Optional[Tuple[float, float, float, float]]:
+    """
+    Pick three finder centres of similar size forming the right angle of a
+    QR code (two equal sides, hypotenuse ~sqrt(2) longer) and return the
+    code's bounding box as (x, y, width, height).
+    """
+    import itertools
+    import math
+
+    best = None
+    for trio in itertools.combinations(centres, 3):
+        sizes = [c[2] for c in trio]
+        if max(sizes) > 1.5 * min(sizes):
+            continue
+        for corner in range(3):
+            a = trio[corner]
+            b, c = (trio[i] for i in range(3) if i != corner)
+            ab = math.hypot(b[0] - a[0], b[1] - a[1])
+            ac = math.hypot(c[0] - a[0], c[1] - a[1])
+            bc = math.hypot(c[0] - b[0], c[1] - b[1])
+            side = (ab + ac) / 2
+            if side < 2 * max(sizes) or abs(ab - ac) > 0.15 * side:
+                continue
+            if abs(bc - side * math.sqrt(2)) > 0.15 * bc:
+                continue
+            if best is None or side > best[0]:
+                fourth = (b[0] + c[0] - a[0], b[1] + c[1] - a[1])
+                xs = [a[0], b[0], c[0], fourth[0]]
+                ys = [a[1], b[1], c[1], fourth[1]]
+                half = sum(sizes) / 6
+                best = (side, min(xs) - half, min(ys) - half,
+                        max(xs) - min(xs) + 2 * half, max(ys) - min(ys) + 2 * half)
+    return best[1:] if best else None
+
+
+def _detect_qr_region(features: dict, scale: _RegionScale) -> Optional[LayoutRegion]:
     """
     Detect QR code region.
-    Heuristic: small square in bottom-right corner with high-contrast checker pattern.
+
+    Looks for the three 1:1:3:1:1 finder patterns on the dark mask. When the
+    code's modules are too small to resolve at the analysis level, falls back
+    to a high-contrast square in the bottom-right quadrant.
     """
     try:
-        import numpy as np
+        h, w = features["height"], features["width"]
+        box = _qr_from_finders(_finder_centres(features["dark"]))
+        if box is not None:
+            x, y, bw, bh = box
+            x0, y0 = max(0, int(x)), max(0, int(y))
+            x1, y1 = min(w, int(round(x + bw))), min(h, int(round(y + bh)))
+            if x1 > x0 and y1 > y0:
+                return scale.region(
+                    x0, y0, x1 - x0, y1 - y0,
+                    region_type="qr",
+                    confidence=0.95,
+                    suggested_field_name="qr_code",
+                )
 
         # Check bottom-right quadrant
-        qr_area = arr[h // 2:, w // 2:, :]
-        gray = np.mean(qr_area, axis=2)
+        y0, x0 = h // 2, w // 2
+        eh, ew = h - y0, w - x0
+        if eh <= 0 or ew <= 0:
+            return None
+        contrast = float(features["gray"][y0:, x0:].std())
 
         # QR codes have very high contrast
-        contrast = gray.std()
         if contrast > 60:
             # Look for a roughly square region
-            eh, ew = gray.shape
             size = min(eh, ew) // 3
-            if size > 20:
-                return LayoutRegion(
-                    x=w // 2 + ew // 2 - size // 2,
-                    y=h // 2 + eh // 2 - size // 2,
-                    width=size,
-                    height=size,
+            if size * min(scale.sx, scale.sy) > 20:
+                return scale.region(
+                    x0 + ew // 2 - size // 2,
+                    y0 + eh // 2 - size // 2,
+                    size,
+                    size,
                     region_type="qr",
                     confidence=min(contrast / 100, 1.0),
                     suggested_field_name="qr_code",
@@ -300,21 +577,17 @@ def _detect_qr_region(arr, w: int, h: int) -> Optional[LayoutRegion]:
     return None
 
 
-def _detect_logo_region(arr, w: int, h: int) -> Optional[LayoutRegion]:
+def _detect_logo_region(arr, scale: _RegionScale) -> Optional[LayoutRegion]:
     """Detect logo region (small colorful area in top corner)."""
     try:
-        import numpy as np
-
+        h, w = arr.shape[:2]
         # Check top-left corner
         corner = arr[:h // 5, :w // 4, :]
         # Logo areas have high color variance
         variance = corner.std(axis=2).mean()
         if variance > 40:
-            return LayoutRegion(
-                x=0,
-                y=0,
-                width=w // 4,
-                height=h // 5,
+            return scale.region(
+                0, 0, w // 4, h // 5,
                 region_type="logo",
                 confidence=min(variance / 80, 1.0),
                 suggested_field_name="school_logo",
@@ -2,27 +2,315 @@
 Enterprise Analytics Service
 Aggregates statistics for dashboard widgets.
 Reads from existing models, does not modify any existing logic.
+
+Counts are served from ``analytics_rollups``: per-day, per-school counters;
+all-time totals are sums over the days, so concurrent writers of one school
+contend only on that day's rows. Session flush hooks apply the deltas of
+every ORM write to students, templates, verification audits and bulk jobs
+inside the same transaction. Writes that bypass the ORM (bulk
+``Query.update``, Core inserts) are corrected by ``reconcile_rollups``, run
+hourly from Celery beat or with ``manage.py reconcile-analytics``; readers
+never trigger it and show whatever the rollup table holds.
 """
 import logging
-from datetime import datetime, timezone, timedelta
-from sqlalchemy import func
+from datetime import date, datetime, timezone, timedelta
+from sqlalchemy import event, func, inspect as sa_inspect, select, text
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
 
 from models import (
     db, Student, Template, ActivityLog, BulkJob,
-    LoginHistory, VerificationAudit
+    LoginHistory, VerificationAudit, AnalyticsRollup
 )
 
 logger = logging.getLogger(__name__)
 
+STUDENTS_CREATED = 'students_created'
+CARDS_GENERATED = 'cards_generated'
+TEMPLATES_CREATED = 'templates_created'
+VERIFICATIONS = 'verifications:'  # + status
+BULK_JOBS = 'bulk_jobs:'  # + status
+BULK_ITEMS_TOTAL = 'bulk_items_total'
+BULK_ITEMS_PROCESSED = 'bulk_items_processed'
+
+# Day of the former all-time rows; reads skip it and reconciling removes them
+_LEGACY_ALL_TIME = date(1900, 1, 1)
+
+_INVALID_STATUSES = ['invalid', 'tampered', 'expired', 'revoked']
+
+# Attributes whose changes move rollup counters.
+_TRACKED = {
+    Student: ('created_at', 'school_name', 'image_url'),
+    Template: ('created_at', 'school_name'),
+    VerificationAudit: ('created_at', 'template_id', 'status'),
+    BulkJob: ('created_at', 'template_id', 'status', 'total_items', 'processed_items'),
+}
+
+_DELETED_KEY = 'analytics_rollup_deleted'
+
+_table_checked = {}
+
+
+# ================== Incremental Rollups ==================
+
+def _day(value):
+    if value is None:
+        return None
+    if isinstance(value, str):  # func.date() on SQLite
+        return date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value.date()
+    return value
+
+
+def _template_school(session, template_id, cache):
+    if template_id is None:
+        return ''
+    if template_id not in cache:
+        template = session.identity_map.get(identity_key(Template, template_id))
+        if template is not None:
+            cache[template_id] = template.school_name or ''
+        else:
+            cache[template_id] = session.connection().execute(
+                select(Template.school_name).where(Template.id == template_id)
+            ).scalar() or ''
+    return cache[template_id]
+
+
+def _contributions(session, obj, values, cache):
+    """(day, school, metric, amount) counted for an object with ``values``."""
+    day = _day(values['created_at'])
+    if isinstance(obj, Student):
+        school = values['school_name'] or ''
+        items = [(STUDENTS_CREATED, 1)]
+        if values['image_url'] is not None:
+            items.append((CARDS_GENERATED, 1))
+    elif isinstance(obj, Template):
+        school = values['school_name'] or ''
+        items = [(TEMPLATES_CREATED, 1)]
+    elif isinstance(obj, VerificationAudit):
+        school = _template_school(session, values['template_id'], cache)
+        items = [(VERIFICATIONS + (values['status'] or 'ok'), 1)]
+    else:
+        school = _template_school(session, values['template_id'], cache)
+        items = [
+            (BULK_JOBS + (values['status'] or 'draft'), 1),
+            (BULK_ITEMS_TOTAL, values['total_items'] or 0),
+            (BULK_ITEMS_PROCESSED, values['processed_items'] or 0),
+        ]
+    return [(day, school, metric, amount) for metric, amount in items]
+
+
+def _add(deltas, contributions, sign):
+    for day, school, metric, amount in contributions:
+        if not amount or day is None:
+            continue
+        key = (day, school, metric)
+        deltas[key] = deltas.get(key, 0) + sign * amount
+
+
+def _current_values(obj):
+    return {name: getattr(obj, name) for name in _TRACKED[type(obj)]}
+
+
+def _previous_values(obj):
+    state = sa_inspect(obj)
+    values = {}
+    changed = False
+    for name in _TRACKED[type(obj)]:
+        history = state.attrs[name].history
+        if history.has_changes():
+            values[name] = history.deleted[0] if history.deleted else None
+            changed = True
+        else:
+            values[name] = getattr(obj, name)
+    return values if changed else None
+
+
+def _rollups_available(connection):
+    engine = connection.engine
+    if engine not in _table_checked:
+        _table_checked[engine] = sa_inspect(connection).has_table(AnalyticsRollup.__tablename__)
+    return _table_checked[engine]
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_deleted(session, flush_context, instances):
+    deleted = [obj for obj in session.deleted if type(obj) in _TRACKED]
+    session.info[_DELETED_KEY] = [(obj, _current_values(obj)) for obj in deleted]
+
+
+@event.listens_for(Session, 'after_flush')
+def _apply_flush_deltas(session, flush_context):
+    deleted = session.info.pop(_DELETED_KEY, None) or []
+    new = [obj for obj in session.new if type(obj) in _TRACKED]
+    dirty = [obj for obj in session.dirty if type(obj) in _TRACKED and obj not in session.deleted]
+    if not (deleted or new or dirty):
+        return
+
+    deltas, cache = {}, {}
+    for obj, values in deleted:
+        _add(deltas, _contributions(session, obj, values, cache), -1)
+    for obj in new:
+        _add(deltas, _contributions(session, obj, _current_values(obj), cache), 1)
+    for obj in dirty:
+        previous = _previous_values(obj)
+        if previous is None:
+            continue
+        _add(deltas, _contributions(session, obj, previous, cache), -1)
+        _add(deltas, _contributions(session, obj, _current_values(obj), cache), 1)
+
+    deltas = {key: amount for key, amount in deltas.items() if amount}
+    if deltas:
+        _apply_deltas(session.connection(), deltas)
+
+
+def _apply_deltas(connection, deltas):
+    """Add ``{(day, school, metric): amount}`` to the rollup rows on ``connection``."""
+    if not _rollups_available(connection):
+        return
+    table = AnalyticsRollup.__table__
+    # Lock rollup rows in one global order so concurrent flushes touching the
+    # same hot all-time rows cannot deadlock each other.
+    rows = [
+        {'day': day, 'school_name': school, 'metric': metric, 'value': amount}
+        for (day, school, metric), amount in sorted(
+            deltas.items(), key=lambda item: (item[0][0], item[0][1] or '', item[0][2])
+        )
+    ]
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table).values(rows)
+        connection.execute(stmt.on_conflict_do_update(
+            index_elements=['day', 'school_name', 'metric'],
+            set_={'value': table.c.value + stmt.excluded.value},
+        ))
+        return
+    for row in rows:
+        updated = connection.execute(
+            table.update()
+            .where(table.c.day == row['day'], table.c.school_name == row['school_name'],
+                   table.c.metric == row['metric'])
+            .values(value=table.c.value + row['value'])
+        ).rowcount
+        if not updated:
+            connection.execute(table.insert().values(**row))
+
+
+def _register_active_history():
+    # Load old values on assignment so updates can subtract what they replace.
+    for model, names in _TRACKED.items():
+        for name in names:
+            event.listen(getattr(model, name), 'set', lambda *args: None, active_history=True)
+
+
+_register_active_history()
+
+
+# ================== Reconciliation ==================
+
+def _rollup_rows(connection):
+    """Recompute every rollup row from the source tables on ``connection``."""
+    deltas = {}
+
+    def add(day, school, metric, amount):
+        _add(deltas, [(_day(day), school or '', metric, int(amount or 0))], 1)
+
+    student_day = func.date(Student.created_at)
+    for day, school, students, cards in connection.execute(
+        select(student_day, Student.school_name, func.count(Student.id), func.count(Student.image_url))
+        .group_by(student_day, Student.school_name)
+    ):
+        add(day, school, STUDENTS_CREATED, students)
+        add(day, school, CARDS_GENERATED, cards)
+
+    template_day = func.date(Template.created_at)
+    for day, school, count in connection.execute(
+        select(template_day, Template.school_name, func.count(Template.id))
+        .group_by(template_day, Template.school_name)
+    ):
+        add(day, school, TEMPLATES_CREATED, count)
+
+    audit_day = func.date(VerificationAudit.created_at)
+    for day, school, status, count in connection.execute(
+        select(audit_day, Template.school_name, VerificationAudit.status, func.count(VerificationAudit.id))
+        .outerjoin(Template, Template.id == VerificationAudit.template_id)
+        .group_by(audit_day, Template.school_name, VerificationAudit.status)
+    ):
+        add(day, school, VERIFICATIONS + (status or 'ok'), count)
+
+    job_day = func.date(BulkJob.created_at)
+    for day, school, status, count, total, processed in connection.execute(
+        select(job_day, Template.school_name, BulkJob.status, func.count(BulkJob.id),
+               func.sum(BulkJob.total_items), func.sum(BulkJob.processed_items))
+        .outerjoin(Template, Template.id == BulkJob.template_id)
+        .group_by(job_day, Template.school_name, BulkJob.status)
+    ):
+        add(day, school, BULK_JOBS + (status or 'draft'), count)
+        add(day, school, BULK_ITEMS_TOTAL, total)
+        add(day, school, BULK_ITEMS_PROCESSED, processed)
+
+    return [
+        {'day': day, 'school_name': school, 'metric': metric, 'value': value}
+        for (day, school, metric), value in deltas.items() if value
+    ]
+
+
+def reconcile_rollups() -> dict:
+    """
+    Rebuild ``analytics_rollups`` from the source tables.
+
+    Corrects drift from writes that bypass the ORM. Meant for Celery beat and
+    the CLI, not requests: it runs on its own connection and transaction, and
+    holds off rollup writers from before the recount until the rewrite
+    commits, so no delta lands in between and gets lost. Returns the number
+    of rows written.
+    """
+    table = AnalyticsRollup.__table__
+    with db.engine.begin() as conn:
+        if conn.dialect.name == 'postgresql':
+            conn.execute(text('LOCK TABLE analytics_rollups IN EXCLUSIVE MODE'))
+        # Deleting first also takes SQLite's write lock before the recount.
+        conn.execute(table.delete())
+        rows = _rollup_rows(conn)
+        if rows:
+            conn.execute(table.insert(), rows)
+    logger.info("Analytics rollups reconciled: %d rows", len(rows))
+    return {'rows': len(rows)}
+
+
+# ================== Rollup Reads ==================
+
+def _metric_totals(metrics=None, prefix=None, since=None) -> dict:
+    """Sum rollup values per metric, all-time or from ``since`` on."""
+    query = db.session.query(AnalyticsRollup.metric, func.sum(AnalyticsRollup.value))
+    if since is None:
+        query = query.filter(AnalyticsRollup.day > _LEGACY_ALL_TIME)
+    else:
+        query = query.filter(AnalyticsRollup.day >= _day(since))
+    if metrics is not None:
+        query = query.filter(AnalyticsRollup.metric.in_(metrics))
+    if prefix is not None:
+        query = query.filter(AnalyticsRollup.metric.like(prefix + '%'))
+    totals = {metric: int(value or 0) for metric, value in query.group_by(AnalyticsRollup.metric)}
+    if prefix is not None:
+        return {metric[len(prefix):]: value for metric, value in totals.items()}
+    return totals
+
 
 def get_dashboard_stats() -> dict:
     """High-level counts for the main dashboard."""
+    totals = _metric_totals([TEMPLATES_CREATED, STUDENTS_CREATED, CARDS_GENERATED])
     return {
-        'total_templates': Template.query.count(),
-        'total_students': Student.query.count(),
-        'total_cards_generated': Student.query.filter(
-            Student.image_url.isnot(None)
-        ).count(),
+        'total_templates': totals.get(TEMPLATES_CREATED, 0),
+        'total_students': totals.get(STUDENTS_CREATED, 0),
+        'total_cards_generated': totals.get(CARDS_GENERATED, 0),
         'active_templates': Template.query.filter(
             Template.deadline.is_(None) | (Template.deadline > datetime.now(timezone.utc))
         ).count(),
@@ -49,54 +337,45 @@ def get_student_analytics(days: int = 30) -> dict:
     """Student registration and card generation analytics."""
     cutoff = datetime.now(timezone.utc) - timedelta(days=days)
 
-    new_students = Student.query.filter(Student.created_at >= cutoff).count()
-    total_students = Student.query.count()
-
-    # Cards generated in period
-    generated = Student.query.filter(
-        Student.created_at >= cutoff,
-        Student.image_url.isnot(None)
-    ).count()
-
-    # Templates created in period
-    templates_created = Template.query.filter(
-        Template.created_at >= cutoff
-    ).count()
+    period = _metric_totals([STUDENTS_CREATED, CARDS_GENERATED, TEMPLATES_CREATED], since=cutoff)
+    totals = _metric_totals([STUDENTS_CREATED])
 
     # Per-school breakdown
+    count = func.sum(AnalyticsRollup.value)
     school_breakdown = db.session.query(
-        Student.school_name,
-        func.count(Student.id)
-    ).group_by(Student.school_name).order_by(
-        func.count(Student.id).desc()
+        AnalyticsRollup.school_name,
+        count
+    ).filter(
+        AnalyticsRollup.day > _LEGACY_ALL_TIME,
+        AnalyticsRollup.metric == STUDENTS_CREATED
+    ).group_by(AnalyticsRollup.school_name).having(count > 0).order_by(
+        count.desc()
     ).limit(10).all()
 
     return {
-        'new_students': new_students,
-        'total_students': total_students,
-        'cards_generated': generated,
-        'templates_created': templates_created,
-        'schools': [{'name': s[0] or 'Unknown', 'count': s[1]} for s in school_breakdown],
+        'new_students': period.get(STUDENTS_CREATED, 0),
+        'total_students': totals.get(STUDENTS_CREATED, 0),
+        'cards_generated': period.get(CARDS_GENERATED, 0),
+        'templates_created': period.get(TEMPLATES_CREATED, 0),
+        'schools': [{'name': s[0] or 'Unknown', 'count': int(s[1])} for s in school_breakdown],
     }
 
 
 def get_bulk_job_analytics() -> dict:
     """Bulk job execution analytics."""
-    total_jobs = BulkJob.query.count()
-    completed = BulkJob.query.filter_by(status='completed').count()
-    failed = BulkJob.query.filter_by(status='failed').count()
-    processing = BulkJob.query.filter_by(status='processing').count()
+    statuses = _metric_totals(prefix=BULK_JOBS)
+    items = _metric_totals([BULK_ITEMS_TOTAL, BULK_ITEMS_PROCESSED])
 
-    total_items = db.session.query(func.sum(BulkJob.total_items)).scalar() or 0
-    processed_items = db.session.query(func.sum(BulkJob.processed_items)).scalar() or 0
+    total_jobs = sum(statuses.values())
+    completed = statuses.get('completed', 0)
 
     return {
         'total_jobs': total_jobs,
         'completed': completed,
-        'failed': failed,
-        'processing': processing,
-        'total_items': int(total_items),
-        'processed_items': int(processed_items),
+        'failed': statuses.get('failed', 0),
+        'processing': statuses.get('processing', 0),
+        'total_items': items.get(BULK_ITEMS_TOTAL, 0),
+        'processed_items': items.get(BULK_ITEMS_PROCESSED, 0),
         'success_rate': round(completed / total_jobs * 100, 1) if total_jobs else 0,
     }
 
@@ -104,29 +383,23 @@ def get_bulk_job_analytics() -> dict:
 def get_verification_stats(days: int = 7) -> dict:
     """QR code verification scan statistics."""
     cutoff = datetime.now(timezone.utc) - timedelta(days=days)
-    base_q = VerificationAudit.query.filter(VerificationAudit.created_at >= cutoff)
-
-    total = base_q.count()
-    valid = base_q.filter_by(status='ok').count()
-    invalid = base_q.filter(VerificationAudit.status.in_(['invalid', 'tampered', 'expired', 'revoked'])).count()
+    statuses = _metric_totals(prefix=VERIFICATIONS, since=cutoff)
 
     # Daily breakdown
+    count = func.sum(AnalyticsRollup.value)
     daily = db.session.query(
-        func.date(VerificationAudit.created_at),
-        func.count(VerificationAudit.id)
+        AnalyticsRollup.day,
+        count
     ).filter(
-        VerificationAudit.created_at >= cutoff
-    ).group_by(
-        func.date(VerificationAudit.created_at)
-    ).order_by(
-        func.date(VerificationAudit.created_at)
-    ).all()
+        AnalyticsRollup.day >= _day(cutoff),
+        AnalyticsRollup.metric.like(VERIFICATIONS + '%')
+    ).group_by(AnalyticsRollup.day).having(count > 0).order_by(AnalyticsRollup.day).all()
 
     return {
-        'total_scans': total,
-        'valid': valid,
-        'invalid': invalid,
-        'daily': [{'date': str(d[0]), 'count': d[1]} for d in daily],
+        'total_scans': sum(statuses.values()),
+        'valid': statuses.get('ok', 0),
+        'invalid': sum(statuses.get(status, 0) for status in _INVALID_STATUSES),
+        'daily': [{'date': str(d[0]), 'count': int(d[1])} for d in daily],
     }
 
 
@@ -3,22 +3,92 @@ API Key Authentication Service.
 
 Provides API key generation, validation, rate limiting, and access logging
 for the REST API. API keys are hashed before storage.
+
+Rate limits are token buckets kept in Redis and updated by one atomic Lua
+script, so a key's limit holds across all workers and nodes at O(1) cost
+per request. Without Redis each process keeps its own buckets. Access log
+rows are queued in memory and bulk-inserted by a background writer, which
+also applies the keys' usage counters.
+
+Validated keys are cached per process as detached snapshots for
+API_KEY_CACHE_TTL seconds. Revoking a key bumps a generation key in
+Redis that every worker checks at most every API_KEY_GENERATION_CHECK
+seconds, so a revoked key stops working everywhere within that delay.
+Any committed update or delete of an ApiKey row does the same.
 """
 import os
+import atexit
+import copy
 import hmac
 import hashlib
+import queue
 import secrets
 import logging
+import threading
 import time
+from collections import OrderedDict
 from datetime import datetime, timezone
 from functools import wraps
+from types import SimpleNamespace
 
-from flask import request, jsonify, g
+from flask import current_app, request, jsonify, g
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
 
 from models import db, ApiKey, ApiKeyLog, AdminUser
 
 logger = logging.getLogger(__name__)
 
+# Requests allowed per key per window (ApiKey.rate_limit overrides the count)
+_RATE_LIMIT_MAX = int(os.environ.get("API_RATE_LIMIT", "1000"))
+_RATE_LIMIT_WINDOW = float(os.environ.get("API_RATE_LIMIT_WINDOW", "3600"))
+
+API_KEY_CACHE_TTL = float(os.environ.get("API_KEY_CACHE_TTL", "30"))  # seconds
+API_KEY_CACHE_SIZE = int(os.environ.get("API_KEY_CACHE_SIZE", "1024"))
+API_KEY_GENERATION_CHECK = float(os.environ.get("API_KEY_GENERATION_CHECK", "1"))  # seconds
+
+API_LOG_BATCH_SIZE = max(1, int(os.environ.get("API_LOG_BATCH_SIZE", "200")))
+API_LOG_FLUSH_INTERVAL = float(os.environ.get("API_LOG_FLUSH_INTERVAL", "1.0"))
+API_LOG_QUEUE_SIZE = int(os.environ.get("API_LOG_QUEUE_SIZE", "10000"))
+
+# KEYS[1] bucket hash; ARGV capacity, tokens per second, cost.
+# Time comes from the Redis server so every node shares one clock.
+_TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil or ts == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity / rate) * 1000) + 1000)
+return allowed
+"""
+
+_bucket_script = None
+_bucket_script_client = None
+_local_buckets = {}
+_local_buckets_lock = threading.Lock()
+
+_key_cache = OrderedDict()  # key_hash -> (expires_at, snapshot)
+_key_cache_lock = threading.Lock()
+_key_generation = {"value": None, "checked_at": 0.0}
+
+_log_writer = None
+_log_writer_lock = threading.Lock()
+
 # All valid API scopes
 VALID_SCOPES = [
     'students:read', 'students:write',
@@ -69,60 +139,277 @@ def create_api_key(admin_id, name, scopes=None, rate_limit=None):
     return raw_key, api_key
 
 
+def _snapshot(api_key):
+    """Detached, session-free copy of an API key's column values."""
+    from sqlalchemy import inspect as sa_inspect
+    values = {
+        attr.key: copy.deepcopy(getattr(api_key, attr.key))
+        for attr in sa_inspect(type(api_key)).column_attrs
+    }
+    values.setdefault('admin_id', getattr(api_key, 'admin_id', None))
+    return SimpleNamespace(**values)
+
+
+def _api_key_generation():
+    try:
+        from app.services.redis_service import _redis_cache_key, _redis_get
+        raw = _redis_get(_redis_cache_key("api_key_cache_gen"))
+    except Exception:
+        return None
+    return raw.decode("utf-8") if isinstance(raw, bytes) else raw
+
+
+def _check_key_generation():
+    """Drop the local cache when another worker revoked a key."""
+    now = time.monotonic()
+    if now - _key_generation["checked_at"] < API_KEY_GENERATION_CHECK:
+        return
+    generation = _api_key_generation()
+    with _key_cache_lock:
+        _key_generation["checked_at"] = now
+        if generation != _key_generation["value"]:
+            _key_generation["value"] = generation
+            _key_cache.clear()
+
+
+def invalidate_api_key_cache():
+    """
+    Forget validated keys in this process and tell the other workers.
+
+    Without Redis, other workers keep their entries until API_KEY_CACHE_TTL.
+    """
+    with _key_cache_lock:
+        _key_cache.clear()
+    try:
+        from app.services.redis_service import _redis_cache_key, _redis_set
+        _redis_set(_redis_cache_key("api_key_cache_gen"), str(time.time_ns()).encode("utf-8"), ttl=7 * 86400)
+    except Exception as exc:
+        logger.debug("Could not publish API key cache generation: %s", exc)
+
+
+@event.listens_for(ApiKey, "after_update")
+@event.listens_for(ApiKey, "after_delete")
+def _mark_api_keys_changed(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+        session.info["api_keys_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_api_keys_after_commit(session):
+    if session.info.pop("api_keys_changed", False):
+        invalidate_api_key_cache()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_api_key_changes_after_rollback(session):
+    session.info.pop("api_keys_changed", None)
+
+
 def validate_api_key(raw_key):
-    """Validate an API key and return the ApiKey object or None."""
+    """
+    Validate an API key and return a snapshot of the ApiKey or None.
+
+    Usage counters (last_used_at, request_count) are updated by the access
+    log writer rather than here.
+    """
     if not raw_key:
         return None
 
     key_hash = hashlib.sha256(raw_key.encode()).hexdigest()
-    api_key = ApiKey.query.filter_by(key_hash=key_hash, is_active=True).first()
+    _check_key_generation()
+    now = time.monotonic()
+    with _key_cache_lock:
+        entry = _key_cache.get(key_hash)
+        if entry is not None and entry[0] > now:
+            _key_cache.move_to_end(key_hash)
+            return entry[1]
 
-    if api_key:
-        # Update last used
-        api_key.last_used_at = datetime.now(timezone.utc)
-        api_key.request_count = (api_key.request_count or 0) + 1
-        db.session.commit()
+    api_key = ApiKey.query.filter_by(key_hash=key_hash, is_active=True).first()
+    if api_key is None:
+        return None
 
-    return api_key
+    snapshot = _snapshot(api_key)
+    with _key_cache_lock:
+        _key_cache[key_hash] = (now + API_KEY_CACHE_TTL, snapshot)
+        _key_cache.move_to_end(key_hash)
+        while len(_key_cache) > API_KEY_CACHE_SIZE:
+            _key_cache.popitem(last=False)
+    return snapshot
+
+
+def _local_token_bucket(bucket_key, capacity, rate, cost=1):
+    """Per-process token bucket used when Redis is unavailable."""
+    now = time.monotonic()
+    with _local_buckets_lock:
+        tokens, last = _local_buckets.get(bucket_key, (capacity, now))
+        tokens = min(capacity, tokens + (now - last) * rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        _local_buckets[bucket_key] = (tokens, now)
+    return allowed
+
+
+def _redis_token_bucket(bucket_key, capacity, rate, cost=1):
+    """Run the bucket script in Redis; returns None when Redis is unavailable."""
+    global _bucket_script, _bucket_script_client
+    from redis.exceptions import RedisError
+    from app.services.redis_service import get_redis_client, _mark_redis_unavailable
+
+    client = get_redis_client()
+    if client is None:
+        return None
+    try:
+        if _bucket_script is None or _bucket_script_client is not client:
+            _bucket_script = client.register_script(_TOKEN_BUCKET_LUA)
+            _bucket_script_client = client
+        return bool(_bucket_script(keys=[bucket_key], args=[capacity, rate, cost]))
+    except RedisError as exc:
+        logger.warning("Redis rate limit check failed, using local buckets: %s", exc)
+        _mark_redis_unavailable(exc)
+        return None
 
 
 def check_rate_limit(api_key):
-    """Check if the API key has exceeded its rate limit."""
-    cache_key = f"ratelimit:{api_key.id}"
-    now = time.time()
+    """
+    Take one token from the API key's bucket; False when the limit is exceeded.
 
-    if cache_key not in _rate_limit_cache:
-        _rate_limit_cache[cache_key] = []
+    Buckets hold ``rate_limit`` tokens and refill continuously over
+    _RATE_LIMIT_WINDOW seconds.
+    """
+    from app.services.redis_service import _redis_cache_key
+
+    capacity = api_key.rate_limit or _RATE_LIMIT_MAX
+    rate = capacity / _RATE_LIMIT_WINDOW
+    bucket_key = _redis_cache_key("ratelimit", api_key.id)
+
+    allowed = _redis_token_bucket(bucket_key, capacity, rate)
+    if allowed is None:
+        allowed = _local_token_bucket(bucket_key, capacity, rate)
+    return allowed
+
+
+class _AccessLogWriter(threading.Thread):
+    """Bulk-inserts queued ApiKeyLog rows every API_LOG_FLUSH_INTERVAL seconds."""
+
+    def __init__(self, app):
+        super().__init__(name="api-access-log", daemon=True)
+        self.app = app
+        self.pid = os.getpid()
+        self.queue = queue.Queue(maxsize=API_LOG_QUEUE_SIZE)
+        self._dropped = 0
+        self._writing = threading.Lock()
+
+    def put(self, row):
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            self._dropped += 1
+            if self._dropped % 1000 == 1:
+                logger.warning("API access log queue full, dropped %s rows so far", self._dropped)
+
+    def _take_batch(self, timeout):
+        try:
+            batch = [self.queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while len(batch) < API_LOG_BATCH_SIZE:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self):
+        """Write everything queued so far; returns the number of rows written."""
+        written = 0
+        while True:
+            batch = self._take_batch(timeout=0)
+            if not batch:
+                with self._writing:
+                    # Wait for a batch the writer thread is inserting right now
+                    return written
+            self._write(batch)
+            written += len(batch)
+
+    def _write(self, rows):
+        keys = ApiKey.__table__
+        try:
+            with self._writing, self.app.app_context():
+                with db.engine.begin() as conn:
+                    # Keys deleted since the request was served would fail the FK for the whole batch
+                    existing = set(conn.execute(
+                        select(keys.c.id).where(keys.c.id.in_({row['api_key_id'] for row in rows}))
+                    ).scalars())
+                    rows = [row for row in rows if row['api_key_id'] in existing]
+                    if rows:
+                        self._insert(conn, rows)
+        except Exception as e:
+            logger.warning(f"Failed to log API access: {e}")
+
+    @staticmethod
+    def _insert(conn, rows):
+        usage = {}
+        for row in rows:
+            count, last_used = usage.get(row['api_key_id'], (0, None))
+            usage[row['api_key_id']] = (count + 1, max(last_used or row['created_at'], row['created_at']))
+        keys = ApiKey.__table__
+        conn.execute(ApiKeyLog.__table__.insert(), rows)
+        for key_id, (count, last_used) in usage.items():
+            conn.execute(
+                keys.update()
+                .where(keys.c.id == key_id)
+                .values(
+                    request_count=db.func.coalesce(keys.c.request_count, 0) + count,
+                    last_used_at=last_used,
+                )
+            )
 
-    # Clean old entries
-    window_start = now - _RATE_LIMIT_WINDOW
-    _rate_limit_cache[cache_key] = [
-        t for t in _rate_limit_cache[cache_key] if t > window_start
-    ]
+    def run(self):
+        while True:
+            batch = self._take_batch(timeout=API_LOG_FLUSH_INTERVAL)
+            if batch:
+                self._write(batch)
 
-    # Check limit
-    if len(_rate_limit_cache[cache_key]) >= (api_key.rate_limit or _RATE_LIMIT_MAX):
-        return False
 
-    _rate_limit_cache[cache_key].append(now)
-    return True
+def _access_log_writer(app=None):
+    """Start (or return) this process's access log writer."""
+    global _log_writer
+    with _log_writer_lock:
+        if _log_writer is None or not _log_writer.is_alive() or _log_writer.pid != os.getpid():
+            if app is None:
+                app = current_app._get_current_object()
+            _log_writer = _AccessLogWriter(app)
+            _log_writer.start()
+        return _log_writer
 
 
-def log_api_access(api_key, method, path, status_code, ip_address):
-    """Log an API access to ApiKeyLog."""
+def flush_api_access_logs():
+    """Write queued access log rows and usage counters now (shutdown hooks and tests)."""
+    writer = _log_writer
+    if writer is None or writer.pid != os.getpid():
+        return 0
+    return writer.flush()
+
+
+atexit.register(flush_api_access_logs)
+
+
+def log_api_access(api_key, method, path, status_code, ip_address, response_time_ms=None):
+    """Queue an API access for the background ApiKeyLog writer."""
     try:
-        log = ApiKeyLog(
-            api_key_id=api_key.id,
-            method=method,
-            path=path,
-            status_code=status_code,
-            ip_address=ip_address,
-        )
-        db.session.add(log)
-        db.session.commit()
+        _access_log_writer().put({
+            'api_key_id': api_key.id,
+            'method': method,
+            'path': (path or '')[:512],
+            'status_code': status_code,
+            'ip_address': ip_address,
+            'response_time_ms': response_time_ms,
+            'created_at': datetime.now(timezone.utc),
+        })
     except Exception as e:
         logger.warning(f"Failed to log API access: {e}")
-        db.session.rollback()
 
 
 def require_api_key(*required_scopes):
@@ -177,6 +464,7 @@ def require_api_key(*required_scopes):
             g.api_key = api_key
             g.api_admin = db.session.get(AdminUser, api_key.admin_id) if api_key.admin_id else None
 
+            started = time.perf_counter()
             response = f(*args, **kwargs)
 
             # Log the access
@@ -192,6 +480,7 @@ def require_api_key(*required_scopes):
                 path=request.path,
                 status_code=status_code,
                 ip_address=request.remote_addr,
+                response_time_ms=(time.perf_counter() - started) * 1000,
             )
 
             return response
@@ -2,19 +2,117 @@
 Data Archiving Service
 Handles archival and restoration of old records.
 Isolated module - creates DataArchive records.
+
+Archives are gzip-compressed NDJSON (one record per line). Rows are read in
+keyset-ordered chunks of ARCHIVE_CHUNK_SIZE, each in its own short
+transaction, and written straight through the compressor; deletes and
+restores run in committed batches of the same size, so memory stays flat
+and no table lock is held for the whole run. Legacy ``.json.gz`` archives
+(one JSON array) can still be restored.
 """
 import os
 import json
 import gzip
-import shutil
 import logging
 from datetime import datetime, timezone, timedelta
 
+from sqlalchemy import select
+
 from models import db, DataArchive, Student, Template, ActivityLog
 
 logger = logging.getLogger(__name__)
 
 ARCHIVE_DIR = 'instance/archives'
+ARCHIVE_CHUNK_SIZE = max(1, int(os.environ.get("ARCHIVE_CHUNK_SIZE", "1000")))
+
+# entity_type -> (model, archived columns, age column)
+_ENTITIES = {
+    'student': (Student, ('id', 'name', 'father_name', 'class_name', 'dob', 'school_name', 'phone',
+                          'address', 'email', 'photo_url', 'image_url', 'created_at'), 'created_at'),
+    'activity_log': (ActivityLog, ('id', 'actor', 'action', 'target', 'details', 'ip_address',
+                                   'timestamp'), 'timestamp'),
+}
+
+
+def _iter_chunks(model, columns, predicate, max_id=None):
+    """Yield lists of row mappings matching ``predicate`` in ascending id order."""
+    id_col = model.id
+    stmt = select(*[getattr(model, name) for name in columns]).where(predicate)
+    if max_id is not None:
+        stmt = stmt.where(id_col <= max_id)
+    last_id = None
+    while True:
+        chunk_stmt = stmt if last_id is None else stmt.where(id_col > last_id)
+        with db.engine.connect() as conn:
+            rows = conn.execute(chunk_stmt.order_by(id_col).limit(ARCHIVE_CHUNK_SIZE)).mappings().all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1]['id']
+
+
+def _serialize(row):
+    record = dict(row)
+    for key, value in record.items():
+        if isinstance(value, datetime):
+            record[key] = value.isoformat()
+    return json.dumps(record, default=str) + '\n'
+
+
+def _write_archive(entity_type, prefix, predicate):
+    """Stream matching rows into a new archive file; returns (path, count, min_id, max_id)."""
+    model, columns, _ = _ENTITIES[entity_type]
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    timestamp = datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')
+    filepath = os.path.join(ARCHIVE_DIR, f'{prefix}_archive_{timestamp}.ndjson.gz')
+    partial = filepath + '.part'
+
+    count, min_id, max_id = 0, None, None
+    try:
+        with gzip.open(partial, 'wt', encoding='utf-8') as f:
+            for rows in _iter_chunks(model, columns, predicate):
+                f.writelines(_serialize(row) for row in rows)
+                count += len(rows)
+                if min_id is None:
+                    min_id = rows[0]['id']
+                max_id = rows[-1]['id']
+    except Exception:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+
+    if not count:
+        os.remove(partial)
+        return None, 0, None, None
+    os.replace(partial, filepath)
+    return filepath, count, min_id, max_id
+
+
+def _record_archive(name, entity_type, filepath, count, min_id, max_id, cutoff, created_by):
+    archive = DataArchive(
+        archive_name=name,
+        entity_type=entity_type,
+        entity_ids_json={'id_range': [min_id, max_id], 'cutoff': cutoff.isoformat()},
+        file_path=filepath,
+        file_size_bytes=os.path.getsize(filepath),
+        record_count=count,
+        compressed=True,
+        created_by=created_by,
+    )
+    db.session.add(archive)
+    db.session.commit()
+    return archive
+
+
+def _delete_archived(model, predicate, max_id):
+    """Delete archived rows in committed, keyset-ordered batches."""
+    deleted = 0
+    table = model.__table__
+    for rows in _iter_chunks(model, ('id',), predicate, max_id=max_id):
+        ids = [row['id'] for row in rows]
+        with db.engine.begin() as conn:
+            deleted += conn.execute(table.delete().where(table.c.id.in_(ids))).rowcount
+    return deleted
 
 
 def archive_old_students(older_than_days: int = 365, created_by: str = 'system') -> dict:
@@ -23,58 +121,21 @@ def archive_old_students(older_than_days: int = 365, created_by: str = 'system')
     Returns summary of archived records.
     """
     cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
-    old_students = Student.query.filter(Student.created_at < cutoff).all()
+    filepath, count, min_id, max_id = _write_archive('student', 'students', Student.created_at < cutoff)
 
-    if not old_students:
+    if not count:
         return {'archived': 0, 'message': 'No records to archive'}
 
-    os.makedirs(ARCHIVE_DIR, exist_ok=True)
-    timestamp = datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')
-    filename = f'students_archive_{timestamp}.json.gz'
-    filepath = os.path.join(ARCHIVE_DIR, filename)
-
-    records = []
-    student_ids = []
-    for s in old_students:
-        records.append({
-            'id': s.id,
-            'name': s.name,
-            'father_name': s.father_name,
-            'class_name': s.class_name,
-            'dob': s.dob,
-            'school_name': s.school_name,
-            'phone': s.phone,
-            'address': s.address,
-            'email': s.email,
-            'photo_url': s.photo_url,
-            'image_url': s.image_url,
-            'created_at': s.created_at.isoformat() if s.created_at else None,
-        })
-        student_ids.append(s.id)
-
-    with gzip.open(filepath, 'wt', encoding='utf-8') as f:
-        json.dump(records, f, default=str)
-
-    file_size = os.path.getsize(filepath)
-
-    archive = DataArchive(
-        archive_name=f'Students older than {older_than_days} days',
-        entity_type='student',
-        entity_ids_json=student_ids,
-        file_path=filepath,
-        file_size_bytes=file_size,
-        record_count=len(records),
-        compressed=True,
-        created_by=created_by,
+    archive = _record_archive(
+        f'Students older than {older_than_days} days', 'student',
+        filepath, count, min_id, max_id, cutoff, created_by,
     )
-    db.session.add(archive)
-    db.session.commit()
 
-    logger.info(f"Archived {len(records)} students to {filepath}")
+    logger.info(f"Archived {count} students to {filepath}")
     return {
-        'archived': len(records),
+        'archived': count,
         'file': filepath,
-        'size_bytes': file_size,
+        'size_bytes': archive.file_size_bytes,
         'archive_id': archive.id,
     }
 
@@ -82,58 +143,25 @@ def archive_old_students(older_than_days: int = 365, created_by: str = 'system')
 def archive_old_activities(older_than_days: int = 90, created_by: str = 'system') -> dict:
     """Archive old activity log entries."""
     cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
-    old_logs = ActivityLog.query.filter(ActivityLog.timestamp < cutoff).all()
+    predicate = ActivityLog.timestamp < cutoff
+    filepath, count, min_id, max_id = _write_archive('activity_log', 'activities', predicate)
 
-    if not old_logs:
+    if not count:
         return {'archived': 0, 'message': 'No records to archive'}
 
-    os.makedirs(ARCHIVE_DIR, exist_ok=True)
-    timestamp = datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')
-    filename = f'activities_archive_{timestamp}.json.gz'
-    filepath = os.path.join(ARCHIVE_DIR, filename)
-
-    records = []
-    ids = []
-    for a in old_logs:
-        records.append({
-            'id': a.id,
-            'actor': a.actor,
-            'action': a.action,
-            'target': a.target,
-            'details': a.details,
-            'ip_address': a.ip_address,
-            'timestamp': a.timestamp.isoformat() if a.timestamp else None,
-        })
-        ids.append(a.id)
-
-    with gzip.open(filepath, 'wt', encoding='utf-8') as f:
-        json.dump(records, f, default=str)
-
-    file_size = os.path.getsize(filepath)
-
-    archive = DataArchive(
-        archive_name=f'Activity logs older than {older_than_days} days',
-        entity_type='activity_log',
-        entity_ids_json=ids,
-        file_path=filepath,
-        file_size_bytes=file_size,
-        record_count=len(records),
-        compressed=True,
-        created_by=created_by,
+    archive = _record_archive(
+        f'Activity logs older than {older_than_days} days', 'activity_log',
+        filepath, count, min_id, max_id, cutoff, created_by,
     )
-    db.session.add(archive)
-    db.session.commit()
 
-    # Delete archived records from source table
-    for a in old_logs:
-        db.session.delete(a)
-    db.session.commit()
+    # Delete archived records from source table (only rows the file holds)
+    deleted = _delete_archived(ActivityLog, predicate, max_id)
 
-    logger.info(f"Archived and deleted {len(records)} activity logs")
+    logger.info(f"Archived {count} and deleted {deleted} activity logs")
     return {
-        'archived': len(records),
+        'archived': count,
         'file': filepath,
-        'size_bytes': file_size,
+        'size_bytes': archive.file_size_bytes,
         'archive_id': archive.id,
     }
 
@@ -157,6 +185,52 @@ def list_archives(entity_type: str = None, limit: int = 50) -> list:
     } for a in archives]
 
 
+def _iter_archive_records(path, compressed):
+    """Yield records from an NDJSON archive, or from a legacy JSON-array one."""
+    opener = gzip.open if compressed else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+        if first == '[':
+            # Legacy format: a single JSON array
+            yield from json.loads(first + f.read())
+            return
+        line = first + f.readline()
+        while line:
+            if line.strip():
+                yield json.loads(line)
+            line = f.readline()
+
+
+def _parse_datetime(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _restore_chunk(model, columns, time_column, records):
+    """Bulk insert records whose ids are not present; returns the number inserted."""
+    table = model.__table__
+    ids = [rec['id'] for rec in records]
+    with db.engine.begin() as conn:
+        existing = set(conn.execute(select(table.c.id).where(table.c.id.in_(ids))).scalars())
+        rows = []
+        for rec in records:
+            if rec['id'] in existing:
+                continue
+            row = {name: rec.get(name) for name in columns}
+            row[time_column] = _parse_datetime(rec.get(time_column)) or datetime.now(timezone.utc)
+            rows.append(row)
+            existing.add(rec['id'])
+        if rows:
+            conn.execute(table.insert(), rows)
+    return len(rows)
+
+
 def restore_archive(archive_id: int) -> dict:
     """Restore records from an archive file."""
     archive = db.session.get(DataArchive, archive_id)
@@ -166,40 +240,27 @@ def restore_archive(archive_id: int) -> dict:
     if not os.path.exists(archive.file_path):
         return {'restored': 0, 'error': 'Archive file not found'}
 
+    entity = _ENTITIES.get(archive.entity_type)
+    restored = 0
+    total = 0
     try:
-        opener = gzip.open if archive.compressed else open
-        mode = 'rt' if archive.compressed else 'r'
-        with opener(archive.file_path, mode, encoding='utf-8') as f:
-            records = json.load(f)
-
-        restored = 0
-        if archive.entity_type == 'student':
-            for rec in records:
-                # Check if student already exists
-                existing = db.session.get(Student, rec['id'])
-                if not existing:
-                    s = Student(
-                        id=rec['id'],
-                        name=rec.get('name'),
-                        father_name=rec.get('father_name'),
-                        class_name=rec.get('class_name'),
-                        dob=rec.get('dob'),
-                        school_name=rec.get('school_name'),
-                        phone=rec.get('phone'),
-                        address=rec.get('address'),
-                        email=rec.get('email'),
-                        photo_url=rec.get('photo_url'),
-                        image_url=rec.get('image_url'),
-                    )
-                    db.session.add(s)
-                    restored += 1
+        chunk = []
+        for rec in _iter_archive_records(archive.file_path, archive.compressed):
+            total += 1
+            if entity is None:
+                continue
+            chunk.append(rec)
+            if len(chunk) >= ARCHIVE_CHUNK_SIZE:
+                restored += _restore_chunk(*entity, chunk)
+                chunk = []
+        if chunk:
+            restored += _restore_chunk(*entity, chunk)
 
-        db.session.commit()
         archive.restored_at = datetime.now(timezone.utc)
         db.session.commit()
 
-        return {'restored': restored, 'total_in_archive': len(records)}
+        return {'restored': restored, 'total_in_archive': total}
     except Exception as e:
         db.session.rollback()
         logger.error(f"Restore failed: {e}")
-        return {'restored': 0, 'error': str(e)}
+        return {'restored': restored, 'error': str(e)}
@@ -8,8 +8,17 @@ logger = logging.getLogger(__name__)
 
 jobs = {}
 
+# Job records of other background work sharing this store; kept out of the
+# card-generation listings.
+_NON_BULK_JOB_KINDS = {"ocr", "serial_batch"}
+
 def _set_bulk_job_state(task_id, **updates):
-    task = jobs.setdefault(task_id, {"task_id": task_id})
+    task = jobs.get(task_id)
+    if task is None:
+        # A worker process starts without the record the enqueuing process
+        # wrote; merge into the stored one instead of replacing it.
+        task = dict(_get_bulk_job_state(task_id) or {"task_id": task_id})
+        jobs[task_id] = task
     task.update(updates)
     try:
         _redis_set(
@@ -78,7 +87,7 @@ def _list_bulk_job_states(limit=100):
 
     rows = []
     for task_id, payload in aggregated.items():
-        if not isinstance(payload, dict):
+        if not isinstance(payload, dict) or payload.get("kind") in _NON_BULK_JOB_KINDS:
             continue
         row = dict(payload)
         row.setdefault("task_id", task_id)
@@ -20,6 +20,7 @@ from app.services.redis_service import (
 )
 from app.services.qr_service import generate_qr_code
 from app.services.barcode_service import generate_barcode_code128
+from app.metrics import record_cache_lookup
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +29,7 @@ def _get_cached_media_image(key_prefix, buffer_bytes, generate_fn):
     """Get or generate a cached media image with stampede protection."""
     cache_key = _redis_cache_key(key_prefix, buffer_bytes)
     cached = _redis_get(cache_key)
+    record_cache_lookup(key_prefix, cached is not None)
     if cached is not None:
         try:
             img = Image.open(io.BytesIO(cached))
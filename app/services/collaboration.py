@@ -15,29 +15,450 @@ Usage:
     socketio = init_socketio(app)
 """
 import json
+import os
 import time
 import logging
 import threading
+from contextlib import contextmanager
 from datetime import datetime, timezone
-from collections import defaultdict
+from collections import deque
 from typing import Dict, Optional, Set
 
 logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------------
-# In-memory state (use Redis for multi-worker deployments)
+# Room stores
 # ---------------------------------------------------------------------------
+#
+# Rooms, sessions and the operation log live in Redis when it is reachable,
+# so collaborators served by different gunicorn workers share one room.
+# Without Redis (or with COLLAB_STORE=memory) the process-local store is used.
+#
+# The operation log is a ring buffer of the last _OP_LOG_MAX operations with
+# a monotonic sequence number as the room version. Transforms consult a
+# per-target index (last operation and deletion state per field) instead of
+# rescanning recent operations.
+
+COLLAB_STORE = os.environ.get("COLLAB_STORE", "auto").strip().lower()
+_OP_LOG_MAX = int(os.environ.get("COLLAB_OP_LOG_SIZE", "1000"))
+_HISTORY_MAX = 100
+_ROOM_TTL = int(os.environ.get("COLLAB_ROOM_TTL", str(24 * 3600)))
+_ROOM_MUTEX_TIMEOUT = 5
+
+_USER_COLORS = [
+    "#FF6B6B", "#4ECDC4", "#45B7D1", "#96CEB4",
+    "#FFEAA7", "#DDA0DD", "#98D8C8", "#F7DC6F",
+    "#BB8FCE", "#85C1E9", "#F0B27A", "#82E0AA",
+]
+
+
+def _pick_color(users: dict) -> str:
+    used = {u.get("color") for u in users.values()}
+    for color in _USER_COLORS:
+        if color not in used:
+            return color
+    return _USER_COLORS[len(users) % len(_USER_COLORS)]
+
+
+def _new_user(user_info: dict, users: dict) -> dict:
+    return {
+        "user_id": user_info.get("user_id"),
+        "username": user_info.get("username", "Anonymous"),
+        "color": user_info.get("color") or _pick_color(users),
+        "cursor_x": 0,
+        "cursor_y": 0,
+        "active_field": None,
+        "joined_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def _empty_state(template_id: int) -> dict:
+    return {"template_id": template_id, "users": {}, "locks": {}, "user_count": 0}
+
+
+def _op_record(template_id: int, seq: int, sid: str, operation: dict) -> dict:
+    return {
+        "id": f"{template_id}:{seq}",
+        "seq": seq,
+        "sid": sid,
+        "operation": operation,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def _index_entry(entry: Optional[dict], operation: dict, seq: int) -> dict:
+    """Fold ``operation`` into the per-target index entry."""
+    entry = dict(entry or {})
+    op_type = operation.get("type")
+    entry["last_seq"] = seq
+    entry["last_type"] = op_type
+    if op_type == "delete_field" and not operation.get("_conflict"):
+        entry["deleted_seq"] = seq
+    elif op_type == "add_field":
+        entry.pop("deleted_seq", None)
+    return entry
+
+
+class _MemoryRoomStore:
+    """Process-local rooms; per-room locks, deque ring buffer per template."""
+
+    def __init__(self):
+        self._rooms: Dict[int, dict] = {}
+        self._logs: Dict[int, dict] = {}
+        self._sessions: Dict[str, dict] = {}
+        self._room_locks: Dict[int, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    @contextmanager
+    def _locked(self, template_id: int):
+        with self._guard:
+            lock = self._room_locks.setdefault(template_id, threading.Lock())
+        with lock:
+            yield
+
+    def _room(self, template_id: int) -> dict:
+        room = self._rooms.get(template_id)
+        if room is None:
+            room = self._rooms[template_id] = {
+                "users": {},
+                "locks": {},
+                "created_at": datetime.now(timezone.utc).isoformat(),
+            }
+        return room
+
+    def _log(self, template_id: int) -> dict:
+        log = self._logs.get(template_id)
+        if log is None:
+            log = self._logs[template_id] = {"ops": deque(maxlen=_OP_LOG_MAX), "seq": 0, "targets": {}}
+        return log
+
+    def room_state(self, template_id: int) -> dict:
+        with self._locked(template_id):
+            room = self._rooms.get(template_id)
+            if not room:
+                return _empty_state(template_id)
+            return {
+                "template_id": template_id,
+                "users": {sid: dict(user) for sid, user in room["users"].items()},
+                "locks": dict(room["locks"]),
+                "user_count": len(room["users"]),
+            }
 
-# Room state: template_id → { users, locks, operations }
-_rooms: Dict[int, dict] = {}
-_rooms_lock = threading.Lock()
+    def get_session(self, sid: str) -> Optional[dict]:
+        return self._sessions.get(sid)
+
+    def join(self, sid: str, template_id: int, user_info: dict) -> dict:
+        with self._locked(template_id):
+            room = self._room(template_id)
+            user = room["users"][sid] = _new_user(user_info, room["users"])
+            self._sessions[sid] = {"template_id": template_id, "user_info": user_info}
+            return dict(user), len(room["users"])
+
+    def leave(self, sid: str) -> Optional[dict]:
+        session = self._sessions.pop(sid, None)
+        if not session:
+            return None
+        template_id = session["template_id"]
+        with self._locked(template_id):
+            room = self._rooms.get(template_id)
+            user_data = None
+            if room:
+                user_data = room["users"].pop(sid, None)
+                for field in [f for f, locker in room["locks"].items() if locker == sid]:
+                    del room["locks"][field]
+                if not room["users"]:
+                    self._rooms.pop(template_id, None)
+        return {"template_id": template_id, "user_data": user_data}
+
+    def update_cursor(self, sid: str, x: int, y: int, active_field: str = None):
+        session = self._sessions.get(sid)
+        if not session:
+            return
+        template_id = session["template_id"]
+        with self._locked(template_id):
+            room = self._rooms.get(template_id)
+            if room and sid in room["users"]:
+                room["users"][sid].update(cursor_x=x, cursor_y=y, active_field=active_field)
+
+    def acquire_lock(self, template_id: int, field_id: str, sid: str) -> dict:
+        with self._locked(template_id):
+            room = self._room(template_id)
+            current_locker = room["locks"].get(field_id)
+            if current_locker and current_locker != sid:
+                locker_name = room["users"].get(current_locker, {}).get("username", "Unknown")
+                return {"success": False, "locked_by": locker_name, "locker_sid": current_locker}
+            room["locks"][field_id] = sid
+            return {"success": True, "locked_by": room["users"].get(sid, {}).get("username", "Unknown")}
+
+    def release_lock(self, template_id: int, field_id: str, sid: str) -> bool:
+        with self._locked(template_id):
+            room = self._rooms.get(template_id)
+            if room and room["locks"].get(field_id) == sid:
+                del room["locks"][field_id]
+                return True
+            return False
+
+    def release_all_locks(self, template_id: int, sid: str) -> int:
+        with self._locked(template_id):
+            room = self._rooms.get(template_id)
+            if not room:
+                return 0
+            to_release = [f for f, locker in room["locks"].items() if locker == sid]
+            for field in to_release:
+                del room["locks"][field]
+            return len(to_release)
 
-# User sessions: sid → { user_id, template_id, cursor_pos }
-_sessions: Dict[str, dict] = {}
+    def apply(self, template_id: int, operation: dict, sid: str) -> dict:
+        with self._locked(template_id):
+            room = self._rooms.get(template_id) or {"locks": {}}
+            target = operation.get("target")
+            locker = room["locks"].get(target) if target else None
+            if locker and locker != sid:
+                return {"success": False, "error": "Field is locked by another user"}
+
+            log = self._log(template_id)
+            transformed = _transform_operation(operation, log["targets"].get(target))
+            log["seq"] += 1
+            seq = log["seq"]
+            log["ops"].append(_op_record(template_id, seq, sid, transformed))
+            if target:
+                log["targets"][target] = _index_entry(log["targets"].get(target), transformed, seq)
+            return {"success": True, "operation": transformed, "version": seq}
+
+    def history(self, template_id: int, since_version: int = 0) -> list:
+        with self._locked(template_id):
+            log = self._logs.get(template_id)
+            if not log:
+                return []
+            ops = log["ops"]
+            # Sequence numbers are contiguous, so the offset is arithmetic.
+            first_seq = log["seq"] - len(ops) + 1
+            start = max(since_version - first_seq + 1, len(ops) - _HISTORY_MAX, 0)
+            return [ops[i] for i in range(start, len(ops))]
+
+    def version(self, template_id: int) -> int:
+        log = self._logs.get(template_id)
+        return log["seq"] if log else 0
+
+
+class _RedisRoomStore:
+    """
+    Rooms shared across workers through Redis.
 
-# Operational Transform operation log per template
-_op_log: Dict[int, list] = defaultdict(list)
-_OP_LOG_MAX = 1000
+    Keys per template: ``collab:room:<id>:users`` / ``:locks`` / ``:targets``
+    (hashes), ``:ops`` (list trimmed to the ring size) and ``:seq``.
+    Each socket has a ``collab:session:<sid>`` key expiring with the room TTL,
+    so sessions of workers that died without a disconnect do not pile up.
+    Multi-key updates of a room run under a short Redis lock per room.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    @staticmethod
+    def _key(template_id: int, name: str) -> str:
+        return f"collab:room:{template_id}:{name}"
+
+    @staticmethod
+    def _loads(raw):
+        if raw is None:
+            return None
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8")
+        return json.loads(raw)
+
+    @staticmethod
+    def _text(raw):
+        return raw.decode("utf-8") if isinstance(raw, bytes) else raw
+
+    @contextmanager
+    def _locked(self, template_id: int):
+        with self.client.lock(
+            self._key(template_id, "mutex"),
+            timeout=_ROOM_MUTEX_TIMEOUT,
+            blocking_timeout=_ROOM_MUTEX_TIMEOUT,
+        ):
+            yield
+
+    @staticmethod
+    def _session_key(sid: str) -> str:
+        return f"collab:session:{sid}"
+
+    def _touch(self, pipe, template_id: int, *names):
+        for name in names:
+            pipe.expire(self._key(template_id, name), _ROOM_TTL)
+
+    def _users(self, template_id: int) -> dict:
+        raw = self.client.hgetall(self._key(template_id, "users"))
+        return {self._text(sid): self._loads(user) for sid, user in raw.items()}
+
+    def room_state(self, template_id: int) -> dict:
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hgetall(self._key(template_id, "users"))
+        pipe.hgetall(self._key(template_id, "locks"))
+        users_raw, locks_raw = pipe.execute()
+        if not users_raw and not locks_raw:
+            return _empty_state(template_id)
+        users = {self._text(sid): self._loads(user) for sid, user in users_raw.items()}
+        locks = {self._text(field): self._text(sid) for field, sid in locks_raw.items()}
+        return {"template_id": template_id, "users": users, "locks": locks, "user_count": len(users)}
+
+    def get_session(self, sid: str) -> Optional[dict]:
+        return self._loads(self.client.get(self._session_key(sid)))
+
+    def join(self, sid: str, template_id: int, user_info: dict) -> dict:
+        with self._locked(template_id):
+            users = self._users(template_id)
+            user = _new_user(user_info, users)
+            pipe = self.client.pipeline()
+            pipe.hset(self._key(template_id, "users"), sid, json.dumps(user))
+            pipe.set(
+                self._session_key(sid),
+                json.dumps({"template_id": template_id, "user_info": user_info}),
+                ex=_ROOM_TTL,
+            )
+            self._touch(pipe, template_id, "users", "locks")
+            pipe.execute()
+            return user, len(users) + (sid not in users)
+
+    def leave(self, sid: str) -> Optional[dict]:
+        session = self.get_session(sid)
+        if not session:
+            return None
+        self.client.delete(self._session_key(sid))
+        template_id = session["template_id"]
+        users_key, locks_key = self._key(template_id, "users"), self._key(template_id, "locks")
+        with self._locked(template_id):
+            user_data = self._loads(self.client.hget(users_key, sid))
+            held = [f for f, locker in self.client.hgetall(locks_key).items() if self._text(locker) == sid]
+            pipe = self.client.pipeline()
+            pipe.hdel(users_key, sid)
+            if held:
+                pipe.hdel(locks_key, *held)
+            pipe.hlen(users_key)
+            remaining = pipe.execute()[-1]
+            if not remaining:
+                self.client.delete(users_key, locks_key)
+        return {"template_id": template_id, "user_data": user_data}
+
+    def update_cursor(self, sid: str, x: int, y: int, active_field: str = None):
+        session = self.get_session(sid)
+        if not session:
+            return
+        users_key = self._key(session["template_id"], "users")
+        user = self._loads(self.client.hget(users_key, sid))
+        if user is None:
+            return
+        user.update(cursor_x=x, cursor_y=y, active_field=active_field)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hset(users_key, sid, json.dumps(user))
+        pipe.expire(self._session_key(sid), _ROOM_TTL)
+        pipe.execute()
+
+    def acquire_lock(self, template_id: int, field_id: str, sid: str) -> dict:
+        locks_key = self._key(template_id, "locks")
+        current_locker = sid
+        if not self.client.hsetnx(locks_key, field_id, sid):
+            current_locker = self._text(self.client.hget(locks_key, field_id))
+        if current_locker and current_locker != sid:
+            locker = self._loads(self.client.hget(self._key(template_id, "users"), current_locker)) or {}
+            return {"success": False, "locked_by": locker.get("username", "Unknown"), "locker_sid": current_locker}
+        self.client.expire(locks_key, _ROOM_TTL)
+        user = self._loads(self.client.hget(self._key(template_id, "users"), sid)) or {}
+        return {"success": True, "locked_by": user.get("username", "Unknown")}
+
+    def release_lock(self, template_id: int, field_id: str, sid: str) -> bool:
+        locks_key = self._key(template_id, "locks")
+        with self._locked(template_id):
+            if self._text(self.client.hget(locks_key, field_id)) == sid:
+                self.client.hdel(locks_key, field_id)
+                return True
+            return False
+
+    def release_all_locks(self, template_id: int, sid: str) -> int:
+        locks_key = self._key(template_id, "locks")
+        with self._locked(template_id):
+            held = [f for f, locker in self.client.hgetall(locks_key).items() if self._text(locker) == sid]
+            if held:
+                self.client.hdel(locks_key, *held)
+            return len(held)
+
+    def apply(self, template_id: int, operation: dict, sid: str) -> dict:
+        target = operation.get("target")
+        targets_key = self._key(template_id, "targets")
+        with self._locked(template_id):
+            if target:
+                pipe = self.client.pipeline(transaction=False)
+                pipe.hget(self._key(template_id, "locks"), target)
+                pipe.hget(targets_key, target)
+                locker, entry = pipe.execute()
+                locker = self._text(locker)
+                if locker and locker != sid:
+                    return {"success": False, "error": "Field is locked by another user"}
+                entry = self._loads(entry)
+            else:
+                entry = None
+
+            transformed = _transform_operation(operation, entry)
+            seq = int(self.client.incr(self._key(template_id, "seq")))
+            pipe = self.client.pipeline()
+            pipe.rpush(self._key(template_id, "ops"), json.dumps(_op_record(template_id, seq, sid, transformed)))
+            pipe.ltrim(self._key(template_id, "ops"), -_OP_LOG_MAX, -1)
+            if target:
+                pipe.hset(targets_key, target, json.dumps(_index_entry(entry, transformed, seq)))
+            self._touch(pipe, template_id, "ops", "seq", "targets")
+            pipe.execute()
+            return {"success": True, "operation": transformed, "version": seq}
+
+    def history(self, template_id: int, since_version: int = 0) -> list:
+        ops_key = self._key(template_id, "ops")
+        pipe = self.client.pipeline()
+        pipe.get(self._key(template_id, "seq"))
+        pipe.llen(ops_key)
+        seq, length = pipe.execute()
+        if not length:
+            return []
+        first_seq = int(seq or 0) - length + 1
+        start = max(since_version - first_seq + 1, length - _HISTORY_MAX, 0)
+        ops = [self._loads(raw) for raw in self.client.lrange(ops_key, start, -1)]
+        return [op for op in ops if op.get("seq", 0) > since_version][-_HISTORY_MAX:]
+
+    def version(self, template_id: int) -> int:
+        return int(self.client.get(self._key(template_id, "seq")) or 0)
+
+
+_memory_store = _MemoryRoomStore()
+
+
+def _store():
+    if COLLAB_STORE == "memory":
+        return _memory_store
+    from app.services.redis_service import get_redis_client
+    client = get_redis_client()
+    return _RedisRoomStore(client) if client is not None else _memory_store
+
+
+def _call(method: str, *args):
+    """
+    Run a store method, falling back to process memory only if Redis is down.
+
+    A busy room mutex raises CollaborationConflictError for the client to
+    retry; other Redis errors propagate, since serving the room from this
+    worker's memory while Redis is up would split it between workers.
+    """
+    store = _store()
+    if store is _memory_store:
+        return getattr(store, method)(*args)
+    from redis.exceptions import ConnectionError as RedisConnectionError, LockError, TimeoutError as RedisTimeoutError
+    try:
+        return getattr(store, method)(*args)
+    except LockError as exc:
+        from app.exceptions import CollaborationConflictError
+        raise CollaborationConflictError("Room is busy, please retry") from exc
+    except (RedisConnectionError, RedisTimeoutError) as exc:
+        from app.services.redis_service import _mark_redis_unavailable
+        _mark_redis_unavailable(exc)
+        return getattr(_memory_store, method)(*args)
 
 
 # ---------------------------------------------------------------------------
@@ -46,33 +467,12 @@ _OP_LOG_MAX = 1000
 
 def get_room_state(template_id: int) -> dict:
     """Get the current state of a collaboration room."""
-    with _rooms_lock:
-        room = _rooms.get(template_id)
-        if not room:
-            return {
-                "template_id": template_id,
-                "users": {},
-                "locks": {},
-                "user_count": 0,
-            }
-        return {
-            "template_id": template_id,
-            "users": dict(room["users"]),
-            "locks": dict(room["locks"]),
-            "user_count": len(room["users"]),
-        }
-
-
-def _get_or_create_room(template_id: int) -> dict:
-    """Get or initialize a room."""
-    with _rooms_lock:
-        if template_id not in _rooms:
-            _rooms[template_id] = {
-                "users": {},
-                "locks": {},
-                "created_at": datetime.now(timezone.utc).isoformat(),
-            }
-        return _rooms[template_id]
+    return _call("room_state", template_id)
+
+
+def get_session(sid: str) -> Optional[dict]:
+    """Return ``{"template_id", "user_info"}`` for a connected socket, if any."""
+    return _call("get_session", sid)
 
 
 # ---------------------------------------------------------------------------
@@ -81,77 +481,28 @@ def _get_or_create_room(template_id: int) -> dict:
 
 def join_room(sid: str, template_id: int, user_info: dict):
     """Register a user as present in a template's editing room."""
-    room = _get_or_create_room(template_id)
-    room["users"][sid] = {
-        "user_id": user_info.get("user_id"),
-        "username": user_info.get("username", "Anonymous"),
-        "color": user_info.get("color", _assign_user_color(template_id)),
-        "cursor_x": 0,
-        "cursor_y": 0,
-        "active_field": None,
-        "joined_at": datetime.now(timezone.utc).isoformat(),
-    }
-    _sessions[sid] = {"template_id": template_id, "user_info": user_info}
+    user, user_count = _call("join", sid, template_id, user_info)
     logger.info("collab: user %s joined template %d (%d users online)",
-                user_info.get("username"), template_id, len(room["users"]))
-    return room["users"][sid]
+                user_info.get("username"), template_id, user_count)
+    return user
 
 
 def leave_room(sid: str):
     """Remove a user from their current room."""
-    session = _sessions.pop(sid, None)
-    if not session:
-        return None
-
-    template_id = session["template_id"]
-    with _rooms_lock:
-        room = _rooms.get(template_id)
-        if room:
-            user_data = room["users"].pop(sid, None)
-            # Release any locks held by this user
-            locks_to_release = [
-                field for field, locker in room["locks"].items()
-                if locker == sid
-            ]
-            for field in locks_to_release:
-                del room["locks"][field]
-
-            # Clean up empty rooms
-            if not room["users"]:
-                _rooms.pop(template_id, None)
-
-    logger.info("collab: user left template %d", template_id)
-    return {"template_id": template_id, "user_data": user_data}
+    result = _call("leave", sid)
+    if result:
+        logger.info("collab: user left template %d", result["template_id"])
+    return result
 
 
 def update_cursor(sid: str, x: int, y: int, active_field: str = None):
     """Update a user's cursor position."""
-    session = _sessions.get(sid)
-    if not session:
-        return
-
-    template_id = session["template_id"]
-    with _rooms_lock:
-        room = _rooms.get(template_id)
-        if room and sid in room["users"]:
-            room["users"][sid]["cursor_x"] = x
-            room["users"][sid]["cursor_y"] = y
-            room["users"][sid]["active_field"] = active_field
+    _call("update_cursor", sid, x, y, active_field)
 
 
 def _assign_user_color(template_id: int) -> str:
     """Assign a unique color to a user in a room."""
-    colors = [
-        "#FF6B6B", "#4ECDC4", "#45B7D1", "#96CEB4",
-        "#FFEAA7", "#DDA0DD", "#98D8C8", "#F7DC6F",
-        "#BB8FCE", "#85C1E9", "#F0B27A", "#82E0AA",
-    ]
-    room = _get_or_create_room(template_id)
-    used = {u.get("color") for u in room["users"].values()}
-    for color in colors:
-        if color not in used:
-            return color
-    return colors[len(room["users"]) % len(colors)]
+    return _pick_color(get_room_state(template_id)["users"])
 
 
 # ---------------------------------------------------------------------------
@@ -163,40 +514,20 @@ def acquire_lock(template_id: int, field_id: str, sid: str) -> dict:
     Try to lock a field for editing by a specific user.
     Returns {"success": bool, "locked_by": str|None}.
     """
-    with _rooms_lock:
-        room = _get_or_create_room(template_id)
-        current_locker = room["locks"].get(field_id)
-
-        if current_locker and current_locker != sid:
-            locker_name = room["users"].get(current_locker, {}).get("username", "Unknown")
-            return {"success": False, "locked_by": locker_name, "locker_sid": current_locker}
-
-        room["locks"][field_id] = sid
-        locker_name = room["users"].get(sid, {}).get("username", "Unknown")
-        logger.debug("collab: %s locked field %s in template %d", locker_name, field_id, template_id)
-        return {"success": True, "locked_by": locker_name}
+    result = _call("acquire_lock", template_id, field_id, sid)
+    if result["success"]:
+        logger.debug("collab: %s locked field %s in template %d", result["locked_by"], field_id, template_id)
+    return result
 
 
 def release_lock(template_id: int, field_id: str, sid: str) -> bool:
     """Release a lock on a field."""
-    with _rooms_lock:
-        room = _get_or_create_room(template_id)
-        if room["locks"].get(field_id) == sid:
-            del room["locks"][field_id]
-            return True
-        return False
+    return _call("release_lock", template_id, field_id, sid)
 
 
 def release_all_locks(template_id: int, sid: str):
     """Release all locks held by a user (called on disconnect)."""
-    with _rooms_lock:
-        room = _rooms.get(template_id)
-        if room:
-            to_release = [f for f, locker in room["locks"].items() if locker == sid]
-            for field in to_release:
-                del room["locks"][field]
-            return len(to_release)
-    return 0
+    return _call("release_all_locks", template_id, sid)
 
 
 # ---------------------------------------------------------------------------
@@ -213,74 +544,66 @@ def apply_operation(template_id: int, operation: dict, sid: str) -> dict:
          "data": {...},
          "base_version": <int>}
 
-    Returns the transformed operation that should be applied.
+    Returns the transformed operation that should be applied, with
+    ``version`` set to the room's operation sequence number.
     """
-    with _rooms_lock:
-        room = _get_or_create_room(template_id)
-
-        # Check lock
-        target = operation.get("target")
-        if target and room["locks"].get(target) and room["locks"][target] != sid:
-            return {"success": False, "error": "Field is locked by another user"}
-
-        # Transform against concurrent operations
-        transformed = _transform_operation(template_id, operation)
-
-        # Log the operation
-        op_record = {
-            "id": f"{template_id}:{_op_log_counter(template_id)}",
-            "sid": sid,
-            "operation": transformed,
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-        }
-        _op_log[template_id].append(op_record)
-        if len(_op_log[template_id]) > _OP_LOG_MAX:
-            _op_log[template_id] = _op_log[template_id][-_OP_LOG_MAX:]
-
-        return {"success": True, "operation": transformed, "version": len(_op_log[template_id])}
+    return _call("apply", template_id, operation, sid)
 
 
-def _op_log_counter(template_id: int) -> int:
-    """Get the next operation sequence number."""
-    return len(_op_log[template_id]) + 1
-
-
-def _transform_operation(template_id: int, operation: dict) -> dict:
+def _transform_operation(operation: dict, target_entry: Optional[dict]) -> dict:
     """
-    Transform an operation against all concurrent operations.
+    Transform an operation against the index entry of its target.
     This is a simplified OT — for production, use a full OT library.
     """
-    concurrent = _op_log[template_id][-50:]  # last 50 ops
-
     transformed = dict(operation)
+    if not target_entry:
+        return transformed
 
-    for record in concurrent:
-        other = record["operation"]
-        if other.get("target") == operation.get("target"):
-            # Same target — need to transform
-            if other.get("type") == "move_field" and operation.get("type") == "move_field":
-                # Last-write-wins for moves (simplified)
-                pass
-            elif other.get("type") == "delete_field" and operation.get("type") != "delete_field":
-                # Field was deleted — reject
-                transformed["_conflict"] = True
-                transformed["_conflict_reason"] = "Field was deleted by another user"
+    # Moves on the same target are last-write-wins (simplified).
+    if target_entry.get("deleted_seq") and operation.get("type") not in ("delete_field", "add_field"):
+        # Field was deleted — reject
+        transformed["_conflict"] = True
+        transformed["_conflict_reason"] = "Field was deleted by another user"
 
     return transformed
 
 
 def get_operation_history(template_id: int, since_version: int = 0) -> list:
     """Get operations since a specific version (for reconnection sync)."""
-    ops = _op_log.get(template_id, [])
-    if since_version > 0:
-        ops = ops[since_version:]
-    return ops[-100:]  # return last 100 ops max
+    return _call("history", template_id, since_version)
+
+
+def get_operation_version(template_id: int) -> int:
+    """Sequence number of the latest operation applied in a room."""
+    return _call("version", template_id)
 
 
 # ---------------------------------------------------------------------------
 # Live Preview Sync
 # ---------------------------------------------------------------------------
 
+_socketio = None
+
+
+def _emit_preview(payload: dict):
+    if _socketio is not None:
+        _socketio.emit("preview_update", payload, room=f"template_{payload['template_id']}")
+
+
+def schedule_room_preview(template_id: int, side: str = "front", changes=None):
+    """
+    Queue a coalesced preview render for everyone in a template's room.
+
+    ``changes`` are operation types or settings sections (see
+    ``preview_service.layers_for_changes``). No-op without SocketIO or
+    when nobody is editing the template.
+    """
+    if _socketio is None or not get_room_state(template_id)["user_count"]:
+        return None
+    from app.services.preview_service import request_preview
+    return request_preview(template_id, side=side, changed=changes, on_ready=_emit_preview)
+
+
 def broadcast_preview_update(template_id: int, preview_data: dict, exclude_sid: str = None):
     """
     Broadcast a preview update to all users in a room.
@@ -288,8 +611,8 @@ def broadcast_preview_update(template_id: int, preview_data: dict, exclude_sid:
     """
     # This is called from the SocketIO event handlers
     # The actual emit happens in the socket handlers
-    room = _get_or_create_room(template_id)
-    recipients = [sid for sid in room["users"] if sid != exclude_sid]
+    users = get_room_state(template_id)["users"]
+    recipients = [sid for sid in users if sid != exclude_sid]
     return recipients
 
 
@@ -313,8 +636,16 @@ def init_socketio(app):
         logger.warning("flask-socketio not installed — real-time collaboration disabled")
         return None
 
+    # With several workers, emits must travel through Redis to reach clients
+    # connected to other processes.
+    message_queue = os.environ.get("SOCKETIO_MESSAGE_QUEUE")
+    if not message_queue and _store() is not _memory_store:
+        from app.services.redis_service import _active_redis_url
+        message_queue = _active_redis_url
+
     socketio = SocketIO(
         app,
+        message_queue=message_queue or None,
         cors_allowed_origins="*",
         async_mode="threading",
         logger=False,
@@ -327,6 +658,19 @@ def init_socketio(app):
     # Socket Event Handlers
     # ---------------------------------------------------------------------------
 
+    @socketio.on_error_default
+    def handle_error(exc):
+        """Tell the client to retry when a room mutex is contended."""
+        from flask import request
+        from app.exceptions import CollaborationConflictError
+        if not isinstance(exc, CollaborationConflictError):
+            raise exc
+        emit("conflict", {
+            "event": (getattr(request, "event", None) or {}).get("message"),
+            "message": exc.message,
+            "retryable": True,
+        })
+
     @socketio.on("connect")
     def handle_connect():
         """Handle new WebSocket connection."""
@@ -432,6 +776,7 @@ def init_socketio(app):
                 "operation_id": operation.get("id"),
                 "version": result["version"],
             })
+            schedule_room_preview(int(template_id), operation.get("side") or "front", [operation.get("type")])
         else:
             emit("operation_rejected", {
                 "error": result.get("error", "Unknown error"),
@@ -499,7 +844,7 @@ def init_socketio(app):
             emit("sync_response", {
                 "operations": ops,
                 "room": room,
-                "current_version": len(_op_log.get(int(template_id), [])),
+                "current_version": get_operation_version(int(template_id)),
             })
 
     @socketio.on("chat_message")
@@ -511,7 +856,7 @@ def init_socketio(app):
         message = data.get("message", "").strip()
 
         if template_id and message:
-            session = _sessions.get(request.sid, {})
+            session = get_session(request.sid) or {}
             user_info = session.get("user_info", {})
             emit("chat_message", {
                 "sid": request.sid,
@@ -520,5 +865,14 @@ def init_socketio(app):
                 "timestamp": datetime.now(timezone.utc).isoformat(),
             }, room=f"template_{template_id}")
 
+    @socketio.on("request_preview")
+    def handle_request_preview(data):
+        """Client asks for a (coalesced) preview of a template side."""
+        template_id = data.get("template_id")
+        if template_id:
+            schedule_room_preview(int(template_id), data.get("side") or "front", data.get("changes"))
+
+    global _socketio
+    _socketio = socketio
     logger.info("SocketIO initialized with real-time collaboration handlers")
     return socketio
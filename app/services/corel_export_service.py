@@ -32,6 +32,7 @@ from utils import (
     get_layout_flow_start_y, get_localized_standard_labels, normalize_photo_shape,
 )
 from utils import load_template_smart
+from app.tracing import traced
 
 logger = logging.getLogger(__name__)
 GOOGLE_TRANSLATE_API_KEY=(os.environ.get("GOOGLE_TRANSLATE_API_KEY") or "").strip()
@@ -44,16 +45,29 @@ try:
 except Exception:
     _ARABIC_RESHAPER = None
 
-try:
-    from pypdf import PdfReader, PdfWriter, Transformation
-    from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, NameObject
-except Exception:
-    PdfReader = PdfWriter = Transformation = ArrayObject = DecodedStreamObject = DictionaryObject = NameObject = None
+# pypdf (with its cryptography backend) and pikepdf add ~0.3s to every process
+# import, but only PDF post-processing needs them; _load_pdf_libs() binds them
+# on first use.
+PdfReader = PdfWriter = Transformation = ArrayObject = DecodedStreamObject = DictionaryObject = NameObject = None
+pikepdf = None
+_PDF_LIBS_LOADED = False
 
-try:
-    import pikepdf
-except Exception:
-    pikepdf = None
+
+def _load_pdf_libs():
+    global PdfReader, PdfWriter, Transformation, ArrayObject, DecodedStreamObject, DictionaryObject, NameObject
+    global pikepdf, _PDF_LIBS_LOADED
+    if _PDF_LIBS_LOADED:
+        return
+    try:
+        from pypdf import PdfReader, PdfWriter, Transformation
+        from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, NameObject
+    except Exception:
+        pass
+    try:
+        import pikepdf
+    except Exception:
+        pass
+    _PDF_LIBS_LOADED = True
 
 # Monkeypatch PDFPage check_format and Canvas _setShadingUsed
 # Guard against duplicate patching in case of reloads/multiple imports
@@ -177,6 +191,7 @@ def _strip_page_level_pdf_keys(page_obj) -> None:
 
 
 def _strip_optional_content_pypdf_page(page, *, strip_transparency: bool = True) -> None:
+    _load_pdf_libs()
     try:
         _strip_page_level_pdf_keys(page)
         resources = (page.get("/Resources") or {}).get_object()
@@ -228,6 +243,7 @@ def _strip_optional_content_pypdf_page(page, *, strip_transparency: bool = True)
 
 
 def _save_pikepdf_corel(pdf, out_stream) -> None:
+    _load_pdf_libs()
     pdf.save(
         out_stream,
         force_version="1.4",
@@ -248,6 +264,7 @@ def _normalize_pdf_for_corel(pdf_bytes: bytes) -> bytes:
     This pass removes page-level optional-content references and risky metadata, then
     writes a simple uncompressed PDF. It intentionally does not try to preserve layers.
     """
+    _load_pdf_libs()
     if not pdf_bytes or PdfReader is None or PdfWriter is None:
         return pdf_bytes
     try:
@@ -283,6 +300,7 @@ def _rebuild_optional_content_catalog(writer) -> None:
     For CorelDRAW compatibility we now do the opposite: strip optional-content and
     page-level metadata from the pypdf writer before it serializes.
     """
+    _load_pdf_libs()
     if writer is None or ArrayObject is None or DictionaryObject is None or NameObject is None:
         return
 
@@ -310,6 +328,7 @@ def _flatten_optional_content_pdf_bytes(pdf_bytes: bytes) -> bytes:
     This is intentionally aggressive for CorelDRAW. Layers and marked content are not
     preserved because they are a common import failure source.
     """
+    _load_pdf_libs()
     if not pdf_bytes or pikepdf is None:
         return pdf_bytes
 
@@ -369,6 +388,7 @@ def _aggressive_corel_flatten(pdf_bytes: bytes, mode: str = "editable") -> bytes
     This pass is intentionally destructive for PDF metadata, transparency state, layers,
     and marked content. It keeps text, images, and basic vector content whenever possible.
     """
+    _load_pdf_libs()
     if not pdf_bytes:
         return pdf_bytes
 
@@ -432,6 +452,7 @@ def _aggressive_corel_flatten(pdf_bytes: bytes, mode: str = "editable") -> bytes
 
 
 
+@traced("corel.make_friendly")
 def _make_corel_friendly(pdf_bytes: bytes, mode: str = "editable") -> bytes:
     """Final nuclear cleaning specifically for CorelDRAW compatibility."""
     current = bytes(pdf_bytes or b"")
@@ -507,6 +528,7 @@ def _template_pdf_has_corel_hostile_features(pdf_bytes: bytes) -> bool:
 
 
 
+@traced("corel.rasterize_template")
 def _rasterize_template_pdf_for_editable_overlay(pdf_bytes: bytes, *, dpi: int = 300) -> bytes:
     """
     Convert a template PDF page into a simple image-backed PDF page.
@@ -1119,6 +1141,7 @@ def _draw_editable_media_overlays(
 
 
 
+@traced("corel.compiled_sheet")
 def _build_compiled_sheet_via_app_renderer(
     *,
     template,
@@ -1254,6 +1277,7 @@ def _compose_vector_template_export_pypdf(
     *,
     mode: str = "editable",
 ) -> bytes:
+    _load_pdf_libs()
     if PdfReader is None or PdfWriter is None:
         return _compose_vector_template_export(
             template_pdf_bytes,
@@ -1302,6 +1326,7 @@ def _compose_vector_template_export_pypdf(
 
 
 
+@traced("corel.compose_sheet")
 def _compose_card_pages_to_sheet_pypdf(
     card_pages_pdf_bytes: bytes,
     placements: list[dict],
@@ -1310,6 +1335,7 @@ def _compose_card_pages_to_sheet_pypdf(
     *,
     mode: str = "editable",
 ) -> bytes:
+    _load_pdf_libs()
     if not placements:
         return card_pages_pdf_bytes
 
@@ -1481,7 +1507,9 @@ def _compose_card_pages_to_sheet_pypdf(
 
 
 
+@traced("corel.interleave")
 def _interleave_pdf_bytes(front_pdf_bytes: bytes, back_pdf_bytes: bytes, *, mode: str = "editable") -> bytes:
+    _load_pdf_libs()
     if PdfReader is None or PdfWriter is None:
         front_doc = fitz.open(stream=front_pdf_bytes, filetype="pdf")
         back_doc = fitz.open(stream=back_pdf_bytes, filetype="pdf")
@@ -1584,43 +1612,10 @@ def _extract_google_translate_text(payload):
     ).strip()
 
 
-@lru_cache(maxsize=4096)
-
-
 def _google_translate_text(raw_text: str, source_language: str, target_language: str) -> str:
-    text = str(raw_text or "").strip()
-    source = _normalize_language(source_language)
-    target = _normalize_language(target_language)
-    if not text or source == target:
-        return text
-    source_code = LANGUAGE_TO_TRANSLATE_CODE.get(source)
-    target_code = LANGUAGE_TO_TRANSLATE_CODE.get(target)
-    if not source_code or not target_code:
-        return text
-    try:
-        if GOOGLE_TRANSLATE_API_KEY:
-            response = requests.post(
-                "https://translation.googleapis.com/language/translate/v2",
-                params={"key": GOOGLE_TRANSLATE_API_KEY},
-                json={"q": text, "source": source_code, "target": target_code, "format": "text"},
-                timeout=8,
-            )
-            response.raise_for_status()
-            payload = response.json()
-            translated = payload.get("data", {}).get("translations", [{}])[0].get("translatedText", "")
-            return str(translated or "").strip() or text
-
-        response = requests.get(
-            "https://translate.googleapis.com/translate_a/single",
-            params={"client": "gtx", "sl": source_code, "tl": target_code, "dt": "t", "q": text},
-            timeout=8,
-        )
-        response.raise_for_status()
-        translated = _extract_google_translate_text(response.json())
-        return translated or text
-    except Exception as exc:
-        logger.warning("Vector export translation failed for %s -> %s: %s", source, target, exc)
-        return text
+    from app.services.translation_service import _google_translate_text as translate
+
+    return translate(raw_text, _normalize_language(source_language), _normalize_language(target_language))
 
 
 
@@ -1998,7 +1993,7 @@ def _clean_bidi_controls(text: str) -> str:
 
 
 
-def process_text_for_vector(text: str, language: str) -> str:
+def process_text_for_vector(text: str, language: str, *, for_native_bidi: bool = False) -> str:
     """
     Prepare text for ReportLab drawing.
 
@@ -2006,6 +2001,9 @@ def process_text_for_vector(text: str, language: str) -> str:
     - ReportLab does not do complex shaping (joining) or BiDi reordering by itself.
     - Arabic/Urdu need reshaping (glyph joining) + BiDi to display correctly.
     - Hindi (Devanagari) is LTR and does not need BiDi, so return unchanged.
+
+    With ``for_native_bidi`` the text is reshaped but left in logical order for
+    renderers that apply BiDi themselves (HarfBuzz / PyMuPDF overlays).
     """
     text = _clean_bidi_controls(text)
     if not text:
@@ -2022,6 +2020,8 @@ def process_text_for_vector(text: str, language: str) -> str:
                 reshaped = _ARABIC_RESHAPER.reshape(text)
             else:
                 reshaped = arabic_reshaper.reshape(text)
+            if for_native_bidi:
+                return _clean_bidi_controls(reshaped)
             # base_dir='R' ensures stable RTL display for ReportLab (which draws LTR only).
             return _clean_bidi_controls(_safe_bidi_get_display(reshaped, base_dir="R"))
         except Exception as exc:
@@ -2977,6 +2977,7 @@ def _compose_vector_template_export(
 
 
 
+@traced("corel.editable_export")
 def _generate_direct_editable_pdf_template_export(
     *,
     template,
@@ -4112,6 +4113,7 @@ def _queue_hb_run(
 
 
 
+@traced("corel.text_overlay")
 def _apply_hb_text_overlay(pdf_bytes: bytes, runs: list[dict], page_height_pt: float) -> bytes:
     """
     Overlay shaped text runs using PyMuPDF HTML engine (HarfBuzz-backed).
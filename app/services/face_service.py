@@ -6,6 +6,8 @@ Extracted from legacy_app.py.
 """
 
 import logging
+import math
+import os
 import threading
 
 import numpy as np
@@ -31,7 +33,20 @@ def _get_mediapipe_face():
         _mp_face = None
     return _mp_face
 
-_detector_lock = threading.Lock()
+# MediaPipe graphs are not safe to share between threads, and building one
+# costs far more than a detection. Detectors are checked out of a per-process
+# pool for the duration of one call, so each concurrent worker keeps reusing
+# its own instance instead of constructing and closing one per photo. At most
+# FACE_DETECT_WORKERS detectors exist per process; further callers wait for one
+# to be returned rather than growing the pool to peak concurrency.
+FACE_DETECT_MAX_SIDE = int(os.environ.get("FACE_DETECT_MAX_SIDE", "640"))
+FACE_DETECT_WORKERS = int(os.environ.get("FACE_DETECT_WORKERS", "0") or 0) or (os.cpu_count() or 2)
+
+_pool_lock = threading.Lock()
+_detector_slots = threading.BoundedSemaphore(FACE_DETECT_WORKERS)
+_idle_detectors = []
+_pool_pid = None
+_detector_unavailable = False
 
 
 def _get_face_detector():
@@ -46,6 +61,52 @@ def _get_face_detector():
         return None
 
 
+def _reset_pool_after_fork():
+    """Drop detectors inherited from a parent process (gunicorn/Celery prefork)."""
+    global _pool_pid, _detector_unavailable, _detector_slots
+    pid = os.getpid()
+    if _pool_pid != pid:
+        _idle_detectors.clear()
+        _detector_unavailable = False
+        _detector_slots = threading.BoundedSemaphore(FACE_DETECT_WORKERS)
+        _pool_pid = pid
+
+
+def _acquire_detector():
+    """Check out a detector, waiting while FACE_DETECT_WORKERS are in use."""
+    global _detector_unavailable
+    with _pool_lock:
+        _reset_pool_after_fork()
+        slots = _detector_slots
+    slots.acquire()
+    with _pool_lock:
+        if _idle_detectors:
+            return _idle_detectors.pop()
+        unavailable = _detector_unavailable
+    detector = None if unavailable else _get_face_detector()
+    if detector is None:
+        with _pool_lock:
+            _detector_unavailable = True
+        slots.release()
+    return detector
+
+
+def _release_detector(detector):
+    with _pool_lock:
+        _idle_detectors.append(detector)
+        slots = _detector_slots
+    slots.release()
+
+
+def _detection_array(rgb_img):
+    """Downscale to about FACE_DETECT_MAX_SIDE for detection; boxes are relative, so they map back."""
+    longest = max(rgb_img.size)
+    if FACE_DETECT_MAX_SIDE > 0 and longest > FACE_DETECT_MAX_SIDE:
+        # Integer box reduction is several times cheaper than a resampling resize.
+        rgb_img = rgb_img.reduce(math.ceil(longest / float(FACE_DETECT_MAX_SIDE)))
+    return np.array(rgb_img)
+
+
 def _fallback_center_crop(pil_img, save_path, target_w, target_h):
     """Save a center-cropped photo, respecting EXIF rotation."""
     final = _process_photo_pil(pil_img, target_width=target_w, target_height=target_h)
@@ -95,45 +156,66 @@ def _center_crop_box(img_w, img_h, target_ratio):
     return (0, top, img_w, top + crop_h)
 
 
+def _detect_face_box(pil_img):
+    """
+    Run face detection and return ``(analyzed, box)``.
+
+    ``box`` is the best detection as a relative ``(xmin, ymin, width, height)``
+    tuple, or None when no face was found. ``analyzed`` is False when no
+    detector was available, so callers don't memoize a miss that never ran.
+    """
+    rgb_img = pil_img if pil_img.mode == "RGB" else pil_img.convert("RGB")
+    if rgb_img.width <= 0 or rgb_img.height <= 0:
+        return False, None
+
+    detector = _acquire_detector()
+    if detector is None:
+        return False, None
+    try:
+        results = detector.process(_detection_array(rgb_img))
+    finally:
+        _release_detector(detector)
+
+    if not results or not results.detections:
+        return True, None
+    detection = max(results.detections, key=lambda d: d.score[0])
+    box = detection.location_data.relative_bounding_box
+    return True, (float(box.xmin), float(box.ymin), float(box.width), float(box.height))
+
+
+def _face_crop_box(face_box, w_orig, h_orig, target_width, target_height):
+    """Crop box around a relative face box, framed for the target aspect ratio."""
+    xmin, ymin, box_w, box_h = face_box
+    face_h = max(1, int(box_h * h_orig))
+    face_cx = int((xmin + (box_w / 2.0)) * w_orig)
+    face_cy = int((ymin + (box_h / 2.0)) * h_orig)
+
+    target_ratio = float(target_width) / float(max(1, target_height))
+    face_to_image_ratio = 0.45
+    face_center_y_ratio = 0.51
+    crop_h = max(1, int(round(face_h / face_to_image_ratio)))
+    crop_w = max(1, int(round(crop_h * target_ratio)))
+
+    x1 = face_cx - (crop_w // 2)
+    y1 = face_cy - int(round(crop_h * face_center_y_ratio))
+    return (x1, y1, x1 + crop_w, y1 + crop_h)
+
+
 def _detect_face_crop_box(pil_img, target_width, target_height):
     """Detect a face in the image and return a crop box around it."""
     try:
-        rgb_img = pil_img.convert("RGB")
-        img_np = np.array(rgb_img)
-        h_orig, w_orig = img_np.shape[:2]
-        if h_orig <= 0 or w_orig <= 0:
+        _, face_box = _detect_face_box(pil_img)
+        if face_box is None:
             return None
-
-        with _detector_lock:
-            detector = _get_face_detector()
-            if detector is None:
-                return None
-            try:
-                results = detector.process(img_np.copy())
-            finally:
-                try:
-                    detector.close()
-                except Exception:
-                    pass
-
-        if not results or not results.detections:
-            return None
-
-        detection = max(results.detections, key=lambda d: d.score[0])
-        box = detection.location_data.relative_bounding_box
-        face_h = max(1, int(box.height * h_orig))
-        face_cx = int((box.xmin + (box.width / 2.0)) * w_orig)
-        face_cy = int((box.ymin + (box.height / 2.0)) * h_orig)
-
-        target_ratio = float(target_width) / float(max(1, target_height))
-        face_to_image_ratio = 0.45
-        face_center_y_ratio = 0.51
-        crop_h = max(1, int(round(face_h / face_to_image_ratio)))
-        crop_w = max(1, int(round(crop_h * target_ratio)))
-
-        x1 = face_cx - (crop_w // 2)
-        y1 = face_cy - int(round(crop_h * face_center_y_ratio))
-        return (x1, y1, x1 + crop_w, y1 + crop_h)
+        return _face_crop_box(face_box, pil_img.width, pil_img.height, target_width, target_height)
     except Exception as exc:
         logger.warning("Face detection crop fallback triggered: %s", exc)
         return None
+
+
+def _batch_workers(item_count, max_workers=None):
+    if item_count <= 1:
+        return 1
+    if max_workers is None:
+        max_workers = FACE_DETECT_WORKERS
+    return max(1, min(item_count, int(max_workers)))
@@ -3,16 +3,33 @@ NFC/Chip Card Encoding Service.
 
 Handles NFC tag reading/writing, chip encoding workflows, and encoding verification.
 Supports MIFARE Classic, MIFARE DESFire, and NTAG chip types.
+
+Batch job creation reads students in chunks of NFC_BATCH_CHUNK_SIZE (only
+the payload columns), builds and size-checks every payload of a chunk
+against the chip capacity, and inserts the chunk's jobs in one commit.
+Encoder stations pull ready payloads with ``iter_pending_payloads``.
 """
+import os
 import logging
 import json
 import hashlib
 from datetime import datetime, timezone
 
+from sqlalchemy import select
+
 from models import db, NfcEncoding, Student, Template
 
 logger = logging.getLogger(__name__)
 
+NFC_BATCH_CHUNK_SIZE = max(1, int(os.environ.get("NFC_BATCH_CHUNK_SIZE", "500")))
+NFC_PREFETCH_MAX = int(os.environ.get("NFC_PREFETCH_MAX", "500"))
+
+# Student columns read by prepare_encoding_data
+_PAYLOAD_COLUMNS = (
+    Student.id, Student.name, Student.father_name, Student.class_name,
+    Student.dob, Student.phone, Student.school_name, Student.email,
+)
+
 # Chip type configurations
 CHIP_CONFIGS = {
     'MIFARE_1K': {
@@ -126,29 +143,116 @@ def create_encoding_job(student_id, template_id, chip_type='MIFARE_1K', encoding
     return encoding.id, 'OK'
 
 
+def _student_chunks(template_id, student_ids=None):
+    """Yield lists of payload rows, by id keyset or by chunks of ``student_ids``."""
+    if student_ids is not None:
+        for start in range(0, len(student_ids), NFC_BATCH_CHUNK_SIZE):
+            chunk_ids = student_ids[start:start + NFC_BATCH_CHUNK_SIZE]
+            rows = db.session.execute(select(*_PAYLOAD_COLUMNS).where(Student.id.in_(chunk_ids))).all()
+            by_id = {row.id: row for row in rows}
+            yield chunk_ids, [by_id.get(student_id) for student_id in chunk_ids]
+        return
+
+    stmt = select(*_PAYLOAD_COLUMNS).where(Student.template_id == template_id).order_by(Student.id)
+    last_id = None
+    while True:
+        chunk_stmt = stmt if last_id is None else stmt.where(Student.id > last_id)
+        rows = db.session.execute(chunk_stmt.limit(NFC_BATCH_CHUNK_SIZE)).all()
+        if not rows:
+            return
+        yield [row.id for row in rows], rows
+        last_id = rows[-1].id
+
+
+def _payload_sizes(payloads):
+    """Encoded size of every payload, measured as validate_encoding_data does."""
+    encode = json.JSONEncoder().encode
+    return [len(encode(payload).encode('utf-8')) for payload in payloads]
+
+
 def batch_create_encoding_jobs(template_id, student_ids=None, chip_type='MIFARE_1K', extra_fields=None):
-    """Create NFC encoding jobs for multiple students."""
+    """
+    Create NFC encoding jobs for multiple students.
+
+    Students are processed in chunks: one query per chunk, payloads built
+    and size-checked together, and one bulk insert per chunk. Returns
+    ``(job_ids, errors)`` like calling create_encoding_job per student.
+    """
     template = db.session.get(Template, template_id)
     if not template:
         return [], 'Template not found'
 
-    if student_ids is None:
-        # Get all students for this template
-        students = Student.query.filter_by(template_id=template_id).all()
-        student_ids = [s.id for s in students]
+    config = CHIP_CONFIGS.get(chip_type)
+    if not config:
+        return [], f'Unknown chip type: {chip_type}'
+    capacity = config['capacity_bytes']
 
     job_ids = []
     errors = []
-    for student_id in student_ids:
-        job_id, message = create_encoding_job(student_id, template_id, chip_type, extra_fields=extra_fields)
-        if job_id:
-            job_ids.append(job_id)
-        else:
-            errors.append(f'Student {student_id}: {message}')
-
+    for chunk_ids, rows in _student_chunks(template_id, list(student_ids) if student_ids is not None else None):
+        payloads = []
+        for student_id, row in zip(chunk_ids, rows):
+            if row is None:
+                errors.append(f'Student {student_id}: Student not found')
+            else:
+                payloads.append(prepare_encoding_data(row, template, extra_fields))
+
+        now = datetime.now(timezone.utc)
+        jobs = []
+        for payload, size in zip(payloads, _payload_sizes(payloads)):
+            if size > capacity:
+                errors.append(
+                    f"Student {payload['student_id']}: Data size ({size}B) exceeds chip capacity ({capacity}B)"
+                )
+                continue
+            jobs.append({
+                'student_id': payload['student_id'],
+                'template_id': template_id,
+                'chip_type': chip_type,
+                'encoding_data': payload,
+                'status': 'pending',
+                'created_at': now,
+            })
+
+        if jobs:
+            table = NfcEncoding.__table__
+            inserted = db.session.execute(
+                table.insert().returning(table.c.id), jobs
+            ).scalars().all()
+            db.session.commit()
+            job_ids.extend(inserted)
+
+    logger.info(f"Created {len(job_ids)} NFC encoding jobs for template {template_id} ({len(errors)} errors)")
     return job_ids, errors
 
 
+def iter_pending_payloads(limit=50, template_id=None, chip_type=None, after_id=None):
+    """
+    Yield the next ``limit`` pending encoding jobs in id order, payload included.
+
+    Encoder stations pass the last id they received as ``after_id`` to page on.
+    """
+    table = NfcEncoding.__table__
+    stmt = select(
+        table.c.id, table.c.student_id, table.c.template_id, table.c.chip_type, table.c.encoding_data,
+    ).where(table.c.status == 'pending')
+    if template_id:
+        stmt = stmt.where(table.c.template_id == template_id)
+    if chip_type:
+        stmt = stmt.where(table.c.chip_type == chip_type)
+    if after_id:
+        stmt = stmt.where(table.c.id > after_id)
+    limit = max(1, min(int(limit or 1), NFC_PREFETCH_MAX))
+    stmt = stmt.order_by(table.c.id).limit(limit)
+
+    result = db.session.execute(stmt.execution_options(yield_per=NFC_BATCH_CHUNK_SIZE))
+    try:
+        for row in result:
+            yield dict(row._mapping)
+    finally:
+        result.close()
+
+
 def encode_chip(encoding_id, uid=None):
     """
     Execute NFC chip encoding.
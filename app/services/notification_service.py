@@ -1,13 +1,17 @@
 from notifications import (
     check_and_notify_approaching_deadlines,
+    dispatch_notifications,
     notify_card_ready,
+    notify_cards_ready,
     notify_deadline_approaching,
     notify_generation_error,
 )
 
 __all__ = [
     "check_and_notify_approaching_deadlines",
+    "dispatch_notifications",
     "notify_card_ready",
+    "notify_cards_ready",
     "notify_deadline_approaching",
     "notify_generation_error",
 ]
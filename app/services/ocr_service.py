@@ -5,7 +5,11 @@ Isolated module - uses OcrResult model, stores results only.
 """
 import io
 import logging
+import os
+import threading
 import time as _time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from typing import Optional
 
@@ -13,14 +17,144 @@ from models import db, OcrResult, Student
 
 logger = logging.getLogger(__name__)
 
+# Longest side fed to the engine. ID cards scanned at 600 DPI or phone photos
+# are far above what Tesseract needs, and engine time scales with pixels.
+OCR_MAX_SIDE = int(os.environ.get("OCR_MAX_SIDE", "1800"))
+OCR_DESKEW = os.environ.get("OCR_DESKEW", "true").lower() in ("1", "true", "yes")
+OCR_BATCH_WORKERS = int(os.environ.get("OCR_BATCH_WORKERS", "0") or 0)
+# Skew beyond this is more likely a photo or background than tilted text.
+_MAX_DESKEW_DEGREES = 15.0
 
-def extract_text_from_image(image_bytes: bytes, student_id: int = None,
-                              source_url: str = None) -> dict:
+_engine_lock = threading.Lock()
+_easyocr_reader = None
+_easyocr_lock = threading.Lock()
+_tesseract_ok = None
+
+_job_executor = None
+_job_executor_lock = threading.Lock()
+
+
+def _tesseract_available():
+    """Import pytesseract and probe the binary once per process."""
+    global _tesseract_ok
+    if _tesseract_ok is None:
+        with _engine_lock:
+            if _tesseract_ok is None:
+                try:
+                    import pytesseract
+                    pytesseract.get_tesseract_version()
+                    _tesseract_ok = True
+                except Exception as e:
+                    logger.info("Tesseract unavailable, using easyocr fallback: %s", e)
+                    _tesseract_ok = False
+    return _tesseract_ok
+
+
+def _get_easyocr_reader():
+    """Process-wide easyocr Reader; loading the model costs seconds, so build it once."""
+    global _easyocr_reader
+    if _easyocr_reader is None:
+        with _engine_lock:
+            if _easyocr_reader is None:
+                import easyocr
+                _easyocr_reader = easyocr.Reader(['en'], gpu=False)
+    return _easyocr_reader
+
+
+def _deskew(gray):
+    """Rotate a grayscale image so text lines are horizontal (needs OpenCV)."""
+    try:
+        import cv2
+        import numpy as np
+        from PIL import Image
+    except ImportError:
+        return gray
+    try:
+        arr = np.asarray(gray)
+        _, mask = cv2.threshold(arr, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        coords = cv2.findNonZero(mask)
+        if coords is None or len(coords) < 50:
+            return gray
+        angle = cv2.minAreaRect(coords)[-1]
+        # OpenCV < 4.5 reports [-90, 0), newer versions (0, 90].
+        if angle > 45:
+            angle -= 90
+        elif angle < -45:
+            angle += 90
+        if abs(angle) < 0.5 or abs(angle) > _MAX_DESKEW_DEGREES:
+            return gray
+        return gray.rotate(angle, resample=Image.Resampling.BICUBIC, expand=True, fillcolor=255)
+    except Exception as e:
+        logger.debug("Deskew skipped: %s", e)
+        return gray
+
+
+def _preprocess_for_ocr(image_bytes: bytes):
+    """Decode to an upright, grayscale, size-capped (and deskewed) PIL image."""
+    from PIL import Image, ImageOps
+
+    img = Image.open(io.BytesIO(image_bytes))
+    if OCR_MAX_SIDE > 0:
+        # JPEG can decode straight to grayscale at a reduced scale.
+        img.draft("L", (OCR_MAX_SIDE, OCR_MAX_SIDE))
+    img = ImageOps.exif_transpose(img)
+    gray = img.convert("L")
+    if OCR_MAX_SIDE > 0 and max(gray.size) > OCR_MAX_SIDE:
+        gray.thumbnail((OCR_MAX_SIDE, OCR_MAX_SIDE), Image.Resampling.LANCZOS)
+    if OCR_DESKEW:
+        gray = _deskew(gray)
+    return gray
+
+
+def _tesseract_text_and_confidence(gray):
     """
-    Extract text from an image using available OCR engine.
-    Tries pytesseract first, then falls back to basic analysis.
-    Returns extracted text and structured fields.
+    One ``image_to_data`` pass: rebuild the text from the word boxes instead of
+    running ``image_to_string`` as a second recognition pass.
     """
+    import pytesseract
+
+    data = pytesseract.image_to_data(gray, output_type=pytesseract.Output.DICT)
+    lines = {}
+    confidences = []
+    for i, word in enumerate(data.get('text', [])):
+        word = (word or '').strip()
+        if not word:
+            continue
+        key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        lines.setdefault(key, []).append(word)
+        try:
+            conf = float(data['conf'][i])
+        except (TypeError, ValueError):
+            continue
+        if conf > 0:
+            confidences.append(conf)
+
+    text_lines = []
+    previous_par = None
+    for key in sorted(lines):
+        if previous_par is not None and key[:2] != previous_par:
+            text_lines.append('')
+        text_lines.append(' '.join(lines[key]))
+        previous_par = key[:2]
+    avg_conf = sum(confidences) / len(confidences) if confidences else 0
+    return '\n'.join(text_lines).strip(), round(avg_conf, 1)
+
+
+def _easyocr_text_and_confidence(gray):
+    import numpy as np
+
+    reader = _get_easyocr_reader()
+    # One Reader is shared by every thread; torch inference on it isn't re-entrant.
+    with _easyocr_lock:
+        ocr_results = reader.readtext(np.asarray(gray))
+    texts = [r[1] for r in ocr_results]
+    confs = [r[2] for r in ocr_results]
+    avg_conf = round(sum(confs) / len(confs) * 100, 1) if confs else 0
+    return '\n'.join(texts).strip(), avg_conf
+
+
+def _run_ocr(image_bytes: bytes) -> dict:
+    """OCR one image without touching the database."""
     start = _time.time()
     result = {
         'text': '',
@@ -31,36 +165,24 @@ def extract_text_from_image(image_bytes: bytes, student_id: int = None,
     }
 
     try:
-        from PIL import Image
-        img = Image.open(io.BytesIO(image_bytes))
+        gray = _preprocess_for_ocr(image_bytes)
+        engines = []
+        if _tesseract_available():
+            engines.append(('tesseract', _tesseract_text_and_confidence))
+        engines.append(('easyocr', _easyocr_text_and_confidence))
 
-        # Try pytesseract
-        try:
-            import pytesseract
-            text = pytesseract.image_to_string(img)
-            data = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT)
-            confidences = [int(c) for c in data.get('conf', []) if str(c).isdigit() and int(c) > 0]
-            avg_conf = sum(confidences) / len(confidences) if confidences else 0
-
-            result['text'] = text.strip()
-            result['confidence'] = round(avg_conf, 1)
-            result['model'] = 'tesseract'
-        except (ImportError, Exception):
-            # Fallback: try easyocr
+        for model, engine in engines:
             try:
-                import easyocr
-                reader = easyocr.Reader(['en'], gpu=False)
-                ocr_results = reader.readtext(image_bytes)
-                texts = [r[1] for r in ocr_results]
-                confs = [r[2] for r in ocr_results]
-                result['text'] = '\n'.join(texts).strip()
-                result['confidence'] = round(sum(confs) / len(confs) * 100, 1) if confs else 0
-                result['model'] = 'easyocr'
-            except (ImportError, Exception):
-                logger.warning("No OCR engine available")
-                result['text'] = ''
-                result['confidence'] = 0
-                result['model'] = 'unavailable'
+                result['text'], result['confidence'] = engine(gray)
+                result['model'] = model
+                break
+            except (ImportError, Exception) as e:
+                logger.debug("OCR engine %s failed: %s", model, e)
+        else:
+            logger.warning("No OCR engine available")
+            result['text'] = ''
+            result['confidence'] = 0
+            result['model'] = 'unavailable'
 
         # Parse common ID fields from extracted text
         result['fields'] = _parse_id_fields(result['text'])
@@ -70,18 +192,33 @@ def extract_text_from_image(image_bytes: bytes, student_id: int = None,
         result['confidence'] = 0
 
     result['processing_time_ms'] = round((_time.time() - start) * 1000, 2)
+    return result
+
+
+def _ocr_record(result: dict, student_id: int = None, source_url: str = None) -> OcrResult:
+    return OcrResult(
+        student_id=student_id,
+        source_image_url=source_url,
+        extracted_text=result['text'][:10000],
+        extracted_fields=result['fields'],
+        confidence_score=result['confidence'],
+        processing_time_ms=result['processing_time_ms'],
+        model_used=result['model'],
+    )
+
+
+def extract_text_from_image(image_bytes: bytes, student_id: int = None,
+                              source_url: str = None) -> dict:
+    """
+    Extract text from an image using available OCR engine.
+    Tries pytesseract first, then falls back to easyocr.
+    Returns extracted text and structured fields.
+    """
+    result = _run_ocr(image_bytes)
 
     # Store result
     try:
-        ocr_record = OcrResult(
-            student_id=student_id,
-            source_image_url=source_url,
-            extracted_text=result['text'][:10000],
-            extracted_fields=result['fields'],
-            confidence_score=result['confidence'],
-            processing_time_ms=result['processing_time_ms'],
-            model_used=result['model'],
-        )
+        ocr_record = _ocr_record(result, student_id, source_url)
         db.session.add(ocr_record)
         db.session.commit()
         result['ocr_id'] = ocr_record.id
@@ -92,6 +229,136 @@ def extract_text_from_image(image_bytes: bytes, student_id: int = None,
     return result
 
 
+def extract_text_batch(items: list, max_workers: Optional[int] = None) -> list:
+    """
+    OCR many images in parallel and store every result in one commit.
+
+    ``items`` are dicts with ``image_bytes`` and optional ``student_id`` /
+    ``source_url``. Returns one result dict per item, in order.
+    """
+    items = list(items)
+    if not items:
+        return []
+    workers = max_workers or OCR_BATCH_WORKERS or (os.cpu_count() or 2)
+    workers = max(1, min(len(items), workers))
+    if workers == 1:
+        results = [_run_ocr(item['image_bytes']) for item in items]
+    else:
+        # Tesseract runs as a subprocess, so threads scale across cores.
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr") as pool:
+            results = list(pool.map(lambda item: _run_ocr(item['image_bytes']), items))
+
+    records = [
+        _ocr_record(result, item.get('student_id'), item.get('source_url'))
+        for item, result in zip(items, results)
+    ]
+    try:
+        db.session.add_all(records)
+        db.session.commit()
+        for result, record in zip(results, records):
+            result['ocr_id'] = record.id
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to save OCR batch: {e}")
+    return results
+
+
+def run_ocr_batch_job(job_id: str, items: list):
+    """Queue entry point: OCR ``items`` and publish progress under ``job_id``."""
+    from flask import has_app_context
+    from app.services.bulk_job_service import _set_bulk_job_state
+
+    if not has_app_context():
+        from app.legacy_app import app
+        with app.app_context():
+            return run_ocr_batch_job(job_id, items)
+
+    _set_bulk_job_state(
+        job_id,
+        kind='ocr',
+        total=len(items),
+        state='PROCESSING',
+        status=f'Scanning {len(items)} images...',
+        updated_at=datetime.now(timezone.utc).isoformat(),
+    )
+    try:
+        results = extract_text_batch(items)
+    except Exception as e:
+        logger.error("OCR batch %s failed: %s", job_id, e, exc_info=True)
+        _set_bulk_job_state(
+            job_id,
+            kind='ocr',
+            state='FAILURE',
+            status=f'Failed: {str(e)[:200]}',
+            updated_at=datetime.now(timezone.utc).isoformat(),
+        )
+        return None
+
+    _set_bulk_job_state(
+        job_id,
+        kind='ocr',
+        state='SUCCESS',
+        status='Completed',
+        current=len(results),
+        ocr_ids=[r.get('ocr_id') for r in results],
+        updated_at=datetime.now(timezone.utc).isoformat(),
+    )
+    return [r.get('ocr_id') for r in results]
+
+
+def _get_job_executor():
+    global _job_executor
+    with _job_executor_lock:
+        if _job_executor is None:
+            # Jobs run one at a time; each job already fans out across cores.
+            _job_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ocr-job")
+    return _job_executor
+
+
+def enqueue_ocr_batch(items: list) -> str:
+    """
+    Queue a batch of images for background OCR and return the job id.
+
+    Uses the RQ queue when a worker is listening, otherwise a local
+    background thread. Progress is readable via ``_get_bulk_job_state``.
+    """
+    from app.services.bulk_job_service import _set_bulk_job_state
+    from app.services.redis_service import enqueue_on_worker
+
+    items = [
+        {
+            'image_bytes': item['image_bytes'],
+            'student_id': item.get('student_id'),
+            'source_url': item.get('source_url'),
+        }
+        for item in items
+    ]
+    job_id = f"ocr-{uuid.uuid4().hex}"
+    now = datetime.now(timezone.utc).isoformat()
+    _set_bulk_job_state(
+        job_id,
+        kind='ocr',
+        state='PENDING',
+        status='Queued',
+        current=0,
+        total=len(items),
+        created_at=now,
+        updated_at=now,
+    )
+
+    if enqueue_on_worker(run_ocr_batch_job, args=(job_id, items), job_id=job_id):
+        return job_id
+    from flask import current_app
+    app = current_app._get_current_object()
+
+    def run_local():
+        with app.app_context():
+            run_ocr_batch_job(job_id, items)
+
+    _get_job_executor().submit(run_local)
+    return job_id
+
+
 def _parse_id_fields(text: str) -> dict:
     """Heuristic parsing of common ID card fields from OCR text."""
     import re
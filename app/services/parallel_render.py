@@ -22,6 +22,7 @@ import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from PIL import Image
 from app.services.render_service import render_student_card_side
+from app.tracing import propagate, span
 from app.legacy_app import get_template_path, get_template_settings, get_card_size, load_font_dynamic
 logger = logging.getLogger(__name__)
 
@@ -159,7 +160,7 @@ def render_cards_parallel(template_obj, students, side='front', render_scale=1.0
 
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         future_to_idx = {
-            executor.submit(_render_single_card, args): idx
+            executor.submit(propagate(_render_single_card), args): idx
             for idx, args in enumerate(render_args)
         }
 
@@ -221,7 +222,8 @@ def render_cards_parallel_to_bytes(template_obj, students, side='front',
         if result['success'] and result['image']:
             try:
                 buf = io.BytesIO()
-                result['image'].save(buf, format=output_format, quality=quality)
+                with span("render.encode", format=output_format):
+                    result['image'].save(buf, format=output_format, quality=quality)
                 buf.seek(0)
                 byte_results.append({
                     'success': True,
@@ -255,9 +257,31 @@ def get_optimal_workers(card_count):
     # Use at least 2 workers for bulk operations
     optimal = min(card_count, cpu_count, 8)
     return max(optimal, 2)
+
+
+def _student_like(student_data):
+    """Build the student-like object the card renderer expects."""
+    from types import SimpleNamespace
+
+    return SimpleNamespace(
+        name=student_data.get('name', ''),
+        father_name=student_data.get('father_name', ''),
+        class_name=student_data.get('class_name', ''),
+        dob=student_data.get('dob', ''),
+        address=student_data.get('address', ''),
+        phone=student_data.get('phone', ''),
+        photo_url=student_data.get('photo_url'),
+        photo_filename=student_data.get('photo_filename'),
+        custom_data=student_data.get('custom_data', {}),
+        school_name=student_data.get('school_name', ''),
+        _template_fields=student_data.get('_template_fields', []),
+        _prepared_photo_cache=student_data.get('_prepared_photo_cache', {}),
+    )
+
+
 def bulk_render_students(app, template_obj, student_data_list, side='front',
                          render_scale=1.0, max_workers=None,
-                         progress_callback=None):
+                         progress_callback=None, include_back=True):
     """
     High-level bulk rendering: prepares student objects, renders in parallel,
     and returns results ready for database saving.
@@ -273,43 +297,42 @@ def bulk_render_students(app, template_obj, student_data_list, side='front',
         render_scale: float
         max_workers: int (default: auto)
         progress_callback: callable(completed, total)
+        include_back: render the back of double-sided templates (default True)
 
     Returns:
         list of dicts: {success, front_image, back_image, error, render_time_ms, student_data}
     """
-    from types import SimpleNamespace
-
     if max_workers is None:
         max_workers = get_optimal_workers(len(student_data_list))
 
     card_width, card_height = get_card_size(template_obj.id)
-    is_double_sided = getattr(template_obj, "is_double_sided", False)
+    is_double_sided = include_back and getattr(template_obj, "is_double_sided", False)
+
+    # Translate every unique value of the batch up front, in batched requests,
+    # so the workers below only hit the translation cache.
+    try:
+        from app.services.translation_service import prefetch_card_translations
+        with app.app_context():
+            prefetch_card_translations(
+                template_obj,
+                [_student_like(data) for data in student_data_list],
+                sides=('front', 'back') if is_double_sided else ('front',),
+            )
+    except Exception as e:
+        logger.warning(f"Translation prefetch failed, translating per card: {e}")
+
     def _render_one(student_data):
         """Render a single student card (runs in thread pool)."""
         start = time.time()
         try:
             with app.app_context():
-                # Build student-like object
-                side_render_student = SimpleNamespace(
-                    name=student_data.get('name', ''),
-                    father_name=student_data.get('father_name', ''),
-                    class_name=student_data.get('class_name', ''),
-                    dob=student_data.get('dob', ''),
-                    address=student_data.get('address', ''),
-                    phone=student_data.get('phone', ''),
-                    photo_url=student_data.get('photo_url'),
-                    photo_filename=student_data.get('photo_filename'),
-                    custom_data=student_data.get('custom_data', {}),
-                    school_name=student_data.get('school_name', ''),
-                    _template_fields=student_data.get('_template_fields', []),
-                    _prepared_photo_cache=student_data.get('_prepared_photo_cache', {}),
-                )
+                side_render_student = _student_like(student_data)
 
                 front_image = render_student_card_side(
                     template_obj=template_obj,
                     student_like=side_render_student,
                     side='front',
-                    student_id=None,
+                    student_id=student_data.get('id'),
                     school_name=student_data.get('school_name', ''),
                     render_scale=render_scale,
                 )
@@ -320,7 +343,7 @@ def bulk_render_students(app, template_obj, student_data_list, side='front',
                         template_obj=template_obj,
                         student_like=side_render_student,
                         side='back',
-                        student_id=None,
+                        student_id=student_data.get('id'),
                         school_name=student_data.get('school_name', ''),
                         render_scale=render_scale,
                     )
@@ -355,7 +378,7 @@ def bulk_render_students(app, template_obj, student_data_list, side='front',
 
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         futures = {
-            executor.submit(_render_one, data): idx
+            executor.submit(propagate(_render_one), data): idx
             for idx, data in enumerate(student_data_list)
         }
 
@@ -0,0 +1,156 @@
+"""
+Content-addressed memo of per-photo vision results.
+
+Face boxes, EXIF orientation, upright dimensions and quality scores are keyed
+by the SHA-256 of the photo bytes, so re-uploads, bulk retries and repeated
+quality checks of the same file become lookups. Rows live in
+``photo_analyses``; a bounded in-process LRU sits in front of the table.
+
+Reads and writes go through their own engine connection rather than
+``db.session``, so a memo write never commits a caller's pending changes.
+Outside an app context only the LRU is used.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+PHOTO_ANALYSIS_LRU_SIZE = int(os.environ.get("PHOTO_ANALYSIS_LRU_SIZE", "4096"))
+
+_FIELDS = (
+    "width",
+    "height",
+    "exif_orientation",
+    "face_analyzed",
+    "face_box",
+    "quality_score",
+    "quality_status",
+)
+
+_lru = OrderedDict()
+_lru_lock = threading.Lock()
+
+
+def photo_content_hash(raw_bytes):
+    """Hex SHA-256 of the raw photo bytes, or None for empty input."""
+    if not raw_bytes:
+        return None
+    return hashlib.sha256(bytes(raw_bytes)).hexdigest()
+
+
+def image_geometry(pil_img):
+    """Return ``(width, height, exif_orientation)`` with dimensions in the upright frame."""
+    try:
+        orientation = int(pil_img.getexif().get(0x0112, 1) or 1)
+    except Exception:
+        orientation = 1
+    width, height = pil_img.size
+    if orientation in (5, 6, 7, 8):
+        width, height = height, width
+    return width, height, orientation
+
+
+def _lru_get(content_hash):
+    with _lru_lock:
+        record = _lru.get(content_hash)
+        if record is not None:
+            _lru.move_to_end(content_hash)
+            return dict(record)
+    return None
+
+
+def _lru_put(content_hash, record):
+    if PHOTO_ANALYSIS_LRU_SIZE <= 0:
+        return
+    with _lru_lock:
+        _lru[content_hash] = dict(record)
+        _lru.move_to_end(content_hash)
+        while len(_lru) > PHOTO_ANALYSIS_LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def _table_and_engine():
+    from flask import has_app_context
+    if not has_app_context():
+        return None, None
+    from models import db, PhotoAnalysis
+    return PhotoAnalysis.__table__, db.engine
+
+
+def get_photo_analysis(content_hash):
+    """Return the memoized analysis dict for ``content_hash`` or None."""
+    if not content_hash:
+        return None
+    record = _lru_get(content_hash)
+    if record is not None:
+        return record
+    try:
+        table, engine = _table_and_engine()
+        if table is None:
+            return None
+        with engine.connect() as conn:
+            row = conn.execute(
+                table.select().where(table.c.content_hash == content_hash)
+            ).mappings().first()
+    except Exception as exc:
+        logger.debug("Photo analysis lookup failed: %s", exc)
+        return None
+    if row is None:
+        return None
+    record = {field: row[field] for field in _FIELDS}
+    if record.get("face_box") is not None:
+        record["face_box"] = tuple(record["face_box"])
+    _lru_put(content_hash, record)
+    return dict(record)
+
+
+def save_photo_analysis(content_hash, **fields):
+    """
+    Merge ``fields`` into the memo for ``content_hash``.
+
+    None values are ignored except ``face_box``, which is stored as-is once
+    ``face_analyzed`` is set (None then means "no face found").
+    """
+    if not content_hash:
+        return
+    updates = {k: v for k, v in fields.items() if k in _FIELDS and v is not None}
+    if fields.get("face_analyzed"):
+        face_box = fields.get("face_box")
+        updates["face_box"] = list(face_box) if face_box is not None else None
+    if not updates:
+        return
+
+    merged = get_photo_analysis(content_hash) or {field: None for field in _FIELDS}
+    merged.update(updates)
+    if merged.get("face_box") is not None:
+        merged["face_box"] = tuple(merged["face_box"])
+    _lru_put(content_hash, merged)
+
+    try:
+        table, engine = _table_and_engine()
+        if table is None:
+            return
+        from sqlalchemy.exc import IntegrityError
+        where = table.c.content_hash == content_hash
+        with engine.begin() as conn:
+            if conn.execute(table.update().where(where).values(**updates)).rowcount:
+                return
+        try:
+            with engine.begin() as conn:
+                conn.execute(table.insert().values(content_hash=content_hash, **updates))
+        except IntegrityError:
+            # Another worker inserted the same photo first.
+            with engine.begin() as conn:
+                conn.execute(table.update().where(where).values(**updates))
+    except Exception as exc:
+        logger.debug("Photo analysis save failed: %s", exc)
+
+
+def clear_photo_analysis_cache():
+    """Drop the in-process LRU (the table is left intact)."""
+    with _lru_lock:
+        _lru.clear()
@@ -10,6 +10,13 @@ from models import db, Student
 from utils import PLACEHOLDER_PATH, UPLOAD_FOLDER, STATIC_DIR, round_photo
 
 from app.services.redis_service import _redis_cache_key, _redis_get, _redis_set
+from app.services.photo_analysis_service import (
+    get_photo_analysis,
+    image_geometry,
+    photo_content_hash,
+    save_photo_analysis,
+)
+from app.tracing import span, traced
 
 logger = logging.getLogger(__name__)
 
@@ -120,7 +127,11 @@ def load_student_photo_rgba_prepared(
             cached_img.load()
             return cached_img.convert("RGBA")
 
+    source_hash = None
+
     def _load_detached_image(image_bytes):
+        nonlocal source_hash
+        source_hash = photo_content_hash(image_bytes)
         photo_img = image_open(io.BytesIO(image_bytes))
         photo_img.load()
         return photo_img.copy()
@@ -133,8 +144,9 @@ def load_student_photo_rgba_prepared(
             import time
             for attempt in range(max_retries):
                 try:
-                    response = requests.get(photo_url, timeout=timeout)
-                    response.raise_for_status()
+                    with span("photo.fetch", source="url"):
+                        response = requests.get(photo_url, timeout=timeout)
+                        response.raise_for_status()
                     photo_img = _load_detached_image(response.content)
                     break
                 except (requests.exceptions.RequestException, Exception) as req_exc:
@@ -154,7 +166,7 @@ def load_student_photo_rgba_prepared(
 
         if photo_img is None and local_path and os.path.exists(local_path):
             logger.info(f"Loading student photo from local path: {local_path}")
-            with open(local_path, "rb") as fh:
+            with span("photo.fetch", source="local"), open(local_path, "rb") as fh:
                 photo_img = _load_detached_image(fh.read())
 
         if photo_img is None and allow_placeholder and os.path.exists(PLACEHOLDER_PATH):
@@ -170,6 +182,7 @@ def load_student_photo_rgba_prepared(
             photo_img,
             target_width=width,
             target_height=height,
+            content_hash=source_hash,
         )
         if prepared_img is None:
             return None
@@ -232,11 +245,14 @@ def auto_crop_face_photo(photo_path, target_width=260, target_height=313):
     """
     try:
         image_open = getattr(Image, "open_original", Image.open)
-        pil_img = image_open(photo_path)
+        with open(photo_path, "rb") as fh:
+            raw_bytes = fh.read()
+        pil_img = image_open(io.BytesIO(raw_bytes))
         final_img = _process_photo_pil(
             pil_img,
             target_width=target_width,
             target_height=target_height,
+            content_hash=photo_content_hash(raw_bytes),
         )
         if final_img.mode == "RGBA":
             rgb = Image.new("RGB", final_img.size, (255, 255, 255))
@@ -257,19 +273,27 @@ def auto_crop_face_photo(photo_path, target_width=260, target_height=313):
             return False
 
 
-def _process_photo_pil(pil_img, target_width=260, target_height=313, cache_key_extra=None):
+@traced("photo.crop")
+def _process_photo_pil(pil_img, target_width=260, target_height=313, cache_key_extra=None, content_hash=None):
     """
     Normalize a student photo to the requested card frame and return RGBA.
     Now includes Redis caching for performance.
+
+    ``content_hash`` (see ``photo_analysis_service.photo_content_hash``) of the
+    source bytes, when the caller has them, keys both the Redis entry and the
+    persistent face-box memo, so the same file is never detected twice.
     """
     try:
         # 🔑 Build cache key
-        try:
-            img_bytes = pil_img.tobytes()
-        except Exception:
-            buf_tmp = io.BytesIO()
-            pil_img.save(buf_tmp, format="PNG")
-            img_bytes = buf_tmp.getvalue()
+        if content_hash:
+            img_bytes = content_hash
+        else:
+            try:
+                img_bytes = pil_img.tobytes()
+            except Exception:
+                buf_tmp = io.BytesIO()
+                pil_img.save(buf_tmp, format="PNG")
+                img_bytes = buf_tmp.getvalue()
 
         cache_key = _redis_cache_key(
             "processed_photo",
@@ -288,13 +312,16 @@ def _process_photo_pil(pil_img, target_width=260, target_height=313, cache_key_e
                 pass
 
         from app.services.face_service import (
-            _detect_face_crop_box,
+            _detect_face_box,
+            _face_crop_box,
             _center_crop_box,
             _crop_with_padding,
         )
 
         pil_img.load()
         pil_img = pil_img.copy()
+        analysis = get_photo_analysis(content_hash) if content_hash else None
+        geometry = image_geometry(pil_img) if content_hash else None
 
         try:
             pil_img = ImageOps.exif_transpose(pil_img)
@@ -308,7 +335,28 @@ def _process_photo_pil(pil_img, target_width=260, target_height=313, cache_key_e
         fill_rgb = (255, 255, 255)
         target_ratio = float(target_width) / float(target_height)
 
-        crop_box = _detect_face_crop_box(base_img, target_width, target_height)
+        if analysis and analysis.get("face_analyzed"):
+            face_box = analysis.get("face_box")
+        else:
+            try:
+                analyzed, face_box = _detect_face_box(base_img)
+            except Exception as exc:
+                logger.warning("Face detection crop fallback triggered: %s", exc)
+                analyzed, face_box = False, None
+            if content_hash and (analyzed or not analysis):
+                width, height, orientation = geometry
+                save_photo_analysis(
+                    content_hash,
+                    width=width,
+                    height=height,
+                    exif_orientation=orientation,
+                    face_analyzed=analyzed or None,
+                    face_box=face_box,
+                )
+
+        crop_box = None
+        if face_box is not None:
+            crop_box = _face_crop_box(face_box, base_img.width, base_img.height, target_width, target_height)
         if crop_box is None:
             crop_box = _center_crop_box(base_img.width, base_img.height, target_ratio)
 
@@ -359,6 +407,53 @@ def _prepare_uploaded_student_photo_bytes(file_storage, photo_settings=None):
     )
 
 
+def iter_prepared_uploaded_photos(file_storages, photo_settings=None, max_workers=None):
+    """
+    Normalize many uploaded photos in parallel for bulk imports.
+
+    Yields ``(file_storage, jpeg_bytes, error)`` in input order; exactly one of
+    ``jpeg_bytes``/``error`` is set. Workers share the pooled face detectors and
+    at most ``2 * workers`` results are held in memory at a time. Pool threads
+    run inside the caller's app context so vision results reach the shared
+    photo_analyses memo, not just this process's LRU.
+    """
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+    from flask import current_app, has_app_context
+    from app.services.face_service import _batch_workers
+
+    files = list(file_storages)
+
+    def prepare(file_storage):
+        try:
+            return file_storage, _prepare_uploaded_student_photo_bytes(file_storage, photo_settings), None
+        except Exception as exc:
+            return file_storage, None, exc
+
+    workers = _batch_workers(len(files), max_workers)
+    if workers <= 1:
+        for file_storage in files:
+            yield prepare(file_storage)
+        return
+
+    app = current_app._get_current_object() if has_app_context() else None
+
+    def prepare_in_app(file_storage):
+        if app is None:
+            return prepare(file_storage)
+        with app.app_context():
+            return prepare(file_storage)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="photo-prep") as executor:
+        pending = deque()
+        for file_storage in files:
+            pending.append(executor.submit(prepare_in_app, file_storage))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
 def _prepare_student_photo_image_bytes(raw_bytes, photo_settings=None, source_label="photo"):
     """Validate and normalize raw student photo bytes to JPEG bytes."""
     photo_settings = photo_settings or {}
@@ -366,17 +461,19 @@ def _prepare_student_photo_image_bytes(raw_bytes, photo_settings=None, source_la
     if not raw_bytes:
         raise ValueError("Uploaded photo is empty. Please choose the image again.")
     try:
-        source_img = Image.open(io.BytesIO(raw_bytes))
-        source_img.load()
+        raw_img = Image.open(io.BytesIO(raw_bytes))
+        raw_img.load()
     except Exception as exc:
         raise ValueError(f"Uploaded photo is not a valid image: {exc}") from exc
 
-    source_img = ImageOps.exif_transpose(source_img).convert("RGB")
+    source_img = ImageOps.exif_transpose(raw_img).convert("RGB")
     try:
+        # Pass the untransposed image so the memo records its EXIF orientation.
         processed_img = _process_photo_pil(
-            source_img,
+            raw_img,
             target_width=photo_settings.get("photo_width", 260),
             target_height=photo_settings.get("photo_height", 313),
+            content_hash=photo_content_hash(raw_bytes),
         )
         if processed_img is None:
             processed_img = source_img
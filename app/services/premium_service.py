@@ -116,8 +116,21 @@ def parse_signed_verify_token(secret_key, token, max_age_seconds):
 
 
 def simple_photo_quality_score(img_bytes):
+    from app.services.photo_analysis_service import (
+        get_photo_analysis,
+        image_geometry,
+        photo_content_hash,
+        save_photo_analysis,
+    )
+
+    content_hash = photo_content_hash(img_bytes)
+    cached = get_photo_analysis(content_hash)
+    if cached and cached.get("quality_score") is not None and cached.get("quality_status"):
+        return int(cached["quality_score"]), cached["quality_status"]
     try:
-        img = Image.open(io.BytesIO(img_bytes)).convert("RGB")
+        img = Image.open(io.BytesIO(img_bytes))
+        width, height, orientation = image_geometry(img)
+        img = img.convert("RGB")
         w, h = img.size
         stat = ImageStat.Stat(img)
         brightness = sum(stat.mean) / 3.0
@@ -130,6 +143,14 @@ def simple_photo_quality_score(img_bytes):
             score += 10
         score = max(0, min(100, int(score)))
         status = "pass" if score >= 70 else "fail"
+        save_photo_analysis(
+            content_hash,
+            width=width,
+            height=height,
+            exif_orientation=orientation,
+            quality_score=float(score),
+            quality_status=status,
+        )
         return score, status
     except Exception:
         return 0, "fail"
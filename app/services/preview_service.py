@@ -0,0 +1,281 @@
+"""
+Coalesced, layered card previews for the template editor.
+
+Edits arrive much faster than cards render (a drag emits dozens of moves a
+second). ``request_preview`` keeps only the newest request per template
+side and renders it once after a short debounce, so a burst of edits costs
+a single render. Previews are single-pass: each coalesced burst delivers
+one card-size image. The field renderer lays text out in card pixels and
+has no reduced ``render_scale``, so a smaller draft would cost as much as
+the full card.
+
+Previews are composed from cached layers. The template background, the
+shaped photo and the QR/barcode sprites are kept per template side and
+rebuilt only when their settings change or an edit names them. Text and
+layout objects are redrawn on every render.
+"""
+
+import base64
+import io
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from types import SimpleNamespace
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_DEBOUNCE_MS = int(os.environ.get("PREVIEW_DEBOUNCE_MS", "120"))
+PREVIEW_LAYER_CACHE_SIZE = int(os.environ.get("PREVIEW_LAYER_CACHE_SIZE", "32"))
+
+LAYERS = ("background", "text", "photo", "codes")
+
+# Editor operation type / settings section -> cached layers it invalidates.
+# Text is redrawn on every render, so "text" only documents the intent.
+_LAYERS_BY_CHANGE = {
+    "move_field": {"text"},
+    "resize_field": {"text"},
+    "update_style": {"text"},
+    "add_field": {"text"},
+    "delete_field": {"text"},
+    "font_settings": {"text"},
+    "layout_config": {"text"},
+    "photo_settings": {"photo"},
+    "qr_settings": {"codes"},
+    "template_image": {"background"},
+}
+
+_SAMPLE_STUDENT = {
+    "name": "Student Name",
+    "father_name": "Father Name",
+    "class_name": "10-A",
+    "dob": "01-01-2010",
+    "address": "Street 1, City",
+    "phone": "03001234567",
+}
+
+_layer_cache = OrderedDict()
+_layer_cache_lock = threading.Lock()
+
+_slots = {}
+_slots_lock = threading.Lock()
+
+
+def layers_for_changes(changes):
+    """Map operation types / settings sections to the layers they affect."""
+    layers = set()
+    for change in changes or ():
+        layers |= _LAYERS_BY_CHANGE.get(change, {change} if change in LAYERS else set())
+    return layers
+
+
+def invalidate_preview_layers(template_id, side=None, layers=None):
+    """Drop cached layers of a template (all sides / all layers by default)."""
+    with _layer_cache_lock:
+        for key in [k for k in _layer_cache if k[0] == template_id and side in (None, k[1])]:
+            if layers is None:
+                _layer_cache.pop(key, None)
+            else:
+                for layer in layers:
+                    _layer_cache[key].pop(layer, None)
+
+
+def _cached_layer(key, layer, signature, build, force=False):
+    with _layer_cache_lock:
+        entry = _layer_cache.get(key)
+        if entry is not None:
+            _layer_cache.move_to_end(key)
+            cached = entry.get(layer)
+            if cached is not None and cached[0] == signature and not force:
+                return cached[1]
+
+    value = build()
+    with _layer_cache_lock:
+        entry = _layer_cache.setdefault(key, {})
+        entry[layer] = (signature, value)
+        _layer_cache.move_to_end(key)
+        while len(_layer_cache) > PREVIEW_LAYER_CACHE_SIZE:
+            _layer_cache.popitem(last=False)
+    return value
+
+
+def _sample_student(template_obj):
+    return SimpleNamespace(
+        id=None,
+        photo_url=None,
+        photo_filename=None,
+        image_url=None,
+        custom_data={},
+        school_name=getattr(template_obj, "school_name", "") or "",
+        **_SAMPLE_STUDENT,
+    )
+
+
+def render_preview(template_obj, side="front", student_like=None, changed=None):
+    """
+    Render a card preview at card size from cached layers.
+
+    Produces the same image as ``render_student_card_side`` at scale 1.0;
+    ``changed`` names layers (or edit types) to rebuild regardless of cache.
+    """
+    from app.services.render_service import (
+        _build_qr_hash,
+        _build_student_image_ref,
+        _load_template_image_for_render,
+        _qr_and_barcode_sprites,
+        _render_student_fields,
+        _student_photo_sprite,
+        apply_layout_custom_objects_pil,
+        get_card_size,
+        get_template_language_direction_from_obj,
+        get_template_path,
+        get_template_settings,
+    )
+
+    if not template_obj:
+        return None
+    template_id = template_obj.id
+    template_path = get_template_path(template_id, side=side)
+    if not template_path:
+        return None
+
+    font_settings, photo_settings, qr_settings, _ = get_template_settings(template_id, side=side)
+    card_width, card_height = get_card_size(template_id)
+    lang, direction = get_template_language_direction_from_obj(template_obj, side=side)
+    student = student_like if student_like is not None else _sample_student(template_obj)
+    student_key = _build_student_image_ref(student) if student_like is not None else "sample"
+    forced = layers_for_changes(changed)
+    key = (template_id, side)
+
+    background = _cached_layer(
+        key, "background", (template_path, card_width, card_height),
+        lambda: _load_template_image_for_render(template_path, card_width, card_height),
+        force="background" in forced,
+    )
+    photo = _cached_layer(
+        key, "photo", (student_key, json.dumps(photo_settings, sort_keys=True, default=str)),
+        lambda: _student_photo_sprite(student, photo_settings),
+        force="photo" in forced,
+    )
+    codes = _cached_layer(
+        key, "codes", (_build_qr_hash(student), json.dumps(qr_settings, sort_keys=True, default=str)),
+        lambda: _qr_and_barcode_sprites(
+            qr_settings, student, getattr(student, "id", None), getattr(student, "school_name", None)
+        ),
+        force="codes" in forced,
+    )
+
+    image = background.copy()
+    _render_student_fields(image, template_obj, student, font_settings, photo_settings, side, lang, direction)
+    if photo is not None:
+        photo_img, position = photo
+        image.paste(photo_img, position, photo_img)
+    for kind, sprite, position in codes:
+        try:
+            image.paste(sprite, position)
+        except Exception as exc:
+            logger.error("Failed to paste %s: %s", kind, exc)
+    if image.size != (card_width, card_height):
+        image = image.resize((card_width, card_height), Image.LANCZOS)
+    apply_layout_custom_objects_pil(image, template_obj, font_settings, side=side, language=lang, render_scale=1.0)
+    return image
+
+
+def encode_preview(image):
+    """Encode a preview as a PNG data URL."""
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+# ---------------------------------------------------------------------------
+# Debounce / coalescing
+# ---------------------------------------------------------------------------
+
+class _PreviewSlot:
+    """Latest pending preview request of one template side."""
+
+    def __init__(self):
+        self.generation = 0
+        self.changed = set()
+        self.timer = None
+        self.on_ready = None
+        self.student = None
+        self.app = None
+
+
+def _start_timer(delay_ms, fn, *args):
+    timer = threading.Timer(max(0, delay_ms) / 1000.0, fn, args=args)
+    timer.daemon = True
+    timer.start()
+    return timer
+
+
+def request_preview(template_id, side="front", changed=None, on_ready=None, student_like=None):
+    """
+    Schedule a coalesced preview of a template side and return its generation.
+
+    ``on_ready(payload)`` is called from a background thread once per
+    coalesced burst. Requests arriving while one is pending replace it.
+    """
+    from flask import current_app
+
+    key = (int(template_id), side or "front")
+    with _slots_lock:
+        slot = _slots.setdefault(key, _PreviewSlot())
+        slot.generation += 1
+        slot.changed |= set(changed or ())
+        slot.on_ready = on_ready
+        slot.student = student_like
+        slot.app = current_app._get_current_object()
+        if slot.timer is None:
+            slot.timer = _start_timer(PREVIEW_DEBOUNCE_MS, _flush, key)
+        return slot.generation
+
+
+def _deliver(slot, key, generation, image):
+    if slot.on_ready is None:
+        return
+    payload = {
+        "template_id": key[0],
+        "side": key[1],
+        "generation": generation,
+        "width": image.width,
+        "height": image.height,
+        "image": encode_preview(image),
+    }
+    try:
+        slot.on_ready(payload)
+    except Exception as exc:
+        logger.warning("Preview delivery failed for template %s: %s", key[0], exc)
+
+
+def _flush(key):
+    with _slots_lock:
+        slot = _slots.get(key)
+        if slot is None:
+            return
+        slot.timer = None
+        generation, changed, app = slot.generation, slot.changed, slot.app
+        slot.changed = set()
+
+    image = None
+    try:
+        from models import db, Template
+        with app.app_context():
+            template = db.session.get(Template, key[0])
+            image = render_preview(template, side=key[1], student_like=slot.student, changed=changed)
+    except Exception as exc:
+        logger.warning("Preview render failed for template %s (%s): %s", key[0], key[1], exc)
+    finally:
+        with _slots_lock:
+            # Edits that arrived during the render have started a new timer.
+            if _slots.get(key) is slot and slot.timer is None:
+                _slots.pop(key, None)
+    if image is None:
+        return
+
+    _deliver(slot, key, generation, image)
@@ -3,22 +3,83 @@ Print Queue Management Service.
 
 Manages print job queue with priority scheduling, printer status monitoring,
 print history tracking, and reprint management.
+
+Printer agents take work with ``claim_jobs``, which marks jobs processing
+in the same transaction that selects them: ``FOR UPDATE SKIP LOCKED`` on
+PostgreSQL, a compare-and-set update elsewhere. Two agents can never get
+the same job. ``wait_for_jobs`` long-polls: it sleeps until a new job is
+signalled (locally, or through a Redis generation key from other
+processes) instead of re-querying the table.
+
+A waiting agent holds a request thread for up to PRINT_QUEUE_LONG_POLL_MAX
+seconds, so at most PRINT_QUEUE_MAX_LONG_POLLERS waits run per process; the
+default of 2 leaves half of gunicorn's 4 gthread threads for other requests.
+Agents beyond the cap get an immediate empty answer and poll again. Raise the
+cap together with gunicorn's ``threads`` when many agents share a worker.
 """
+import os
 import logging
 import time
 import threading
 from datetime import datetime, timezone
 from collections import deque
 
+from sqlalchemy import select
+
 from models import db, PrintQueue, PrintHistory, Student, Template
 
 logger = logging.getLogger(__name__)
 
+PRINT_QUEUE_MAX_CLAIM = int(os.environ.get("PRINT_QUEUE_MAX_CLAIM", "50"))
+PRINT_QUEUE_LONG_POLL_MAX = float(os.environ.get("PRINT_QUEUE_LONG_POLL_MAX", "25"))  # seconds
+PRINT_QUEUE_POLL_INTERVAL = float(os.environ.get("PRINT_QUEUE_POLL_INTERVAL", "1"))  # seconds
+PRINT_QUEUE_MAX_LONG_POLLERS = int(os.environ.get("PRINT_QUEUE_MAX_LONG_POLLERS", "2"))
+
 # In-memory queue for fast access (backed by DB)
 _queue_cache = {}
 _queue_lock = threading.Lock()
 _printer_status = {}
 
+# Wakes long-polling agents of this process when jobs are added
+_jobs_added = threading.Condition()
+_local_generation = 0
+# Caps the request threads parked in wait_for_jobs
+_long_pollers = threading.BoundedSemaphore(max(1, PRINT_QUEUE_MAX_LONG_POLLERS))
+
+
+def _signal_new_jobs():
+    """Wake agents waiting in this process and bump the shared generation."""
+    global _local_generation
+    with _jobs_added:
+        _local_generation += 1
+        _jobs_added.notify_all()
+    try:
+        from app.services.redis_service import _redis_cache_key, get_redis_client
+        client = get_redis_client()
+        if client is not None:
+            client.incr(_redis_cache_key("print_queue_gen"))
+    except Exception as exc:
+        logger.debug("Could not publish print queue generation: %s", exc)
+
+
+def _queue_generation():
+    """
+    Token that changes whenever jobs may have been added.
+
+    Without Redis, jobs added by other processes are only noticed once per
+    PRINT_QUEUE_POLL_INTERVAL.
+    """
+    shared = None
+    try:
+        from app.services.redis_service import _redis_cache_key, _redis_get, get_redis_client
+        if get_redis_client() is not None:
+            shared = _redis_get(_redis_cache_key("print_queue_gen"))
+    except Exception:
+        shared = None
+    if shared is None:
+        shared = int(time.monotonic() / max(PRINT_QUEUE_POLL_INTERVAL, 0.1))
+    return _local_generation, shared
+
 
 def add_print_job(template_id, student_id=None, admin_id=None, job_type='single',
                   priority=5, card_side='front', copies=1, printer_name=None):
@@ -39,6 +100,7 @@ def add_print_job(template_id, student_id=None, admin_id=None, job_type='single'
 
     with _queue_lock:
         _queue_cache[job.id] = job
+    _signal_new_jobs()
 
     logger.info(f"Print job {job.id} added: template={template_id}, student={student_id}, priority={priority}")
     return job.id
@@ -46,39 +108,142 @@ def add_print_job(template_id, student_id=None, admin_id=None, job_type='single'
 
 def add_batch_print_jobs(template_id, student_ids, admin_id=None, priority=5, card_side='front'):
     """Add multiple print jobs for a batch of students."""
-    job_ids = []
-    for student_id in student_ids:
-        job_id = add_print_job(
+    jobs = [
+        PrintQueue(
             template_id=template_id,
             student_id=student_id,
             admin_id=admin_id,
             job_type='batch',
             priority=priority,
             card_side=card_side,
+            copies=1,
+            status='pending',
         )
-        job_ids.append(job_id)
-    return job_ids
+        for student_id in student_ids
+    ]
+    if not jobs:
+        return []
+    db.session.add_all(jobs)
+    db.session.commit()
 
+    with _queue_lock:
+        for job in jobs:
+            _queue_cache[job.id] = job
+    _signal_new_jobs()
 
-def get_next_job(printer_name=None):
-    """Get the next job to process (highest priority first, then FIFO)."""
-    query = PrintQueue.query.filter_by(status='pending')
+    logger.info(f"{len(jobs)} batch print jobs added: template={template_id}, priority={priority}")
+    return [job.id for job in jobs]
+
+
+def _pending_jobs(printer_name=None):
+    stmt = select(PrintQueue.id).where(PrintQueue.status == 'pending')
     if printer_name:
-        query = query.filter_by(printer_name=printer_name)
+        stmt = stmt.where(PrintQueue.printer_name == printer_name)
     # Order by priority (ascending = highest first), then by created_at (FIFO)
-    job = query.order_by(PrintQueue.priority.asc(), PrintQueue.created_at.asc()).first()
-    return job
+    return stmt.order_by(PrintQueue.priority.asc(), PrintQueue.created_at.asc())
 
 
-def start_job(job_id, printer_name=None):
-    """Mark a job as processing."""
-    job = db.session.get(PrintQueue, job_id)
-    if job and job.status == 'pending':
-        job.status = 'processing'
-        job.started_at = datetime.now(timezone.utc)
-        job.printer_name = printer_name or job.printer_name
+def get_next_job(printer_name=None):
+    """Peek at the next job to process (highest priority first, then FIFO); see claim_jobs."""
+    job_id = db.session.execute(_pending_jobs(printer_name).limit(1)).scalar()
+    return db.session.get(PrintQueue, job_id) if job_id is not None else None
+
+
+def claim_jobs(printer_name=None, limit=1):
+    """
+    Atomically move up to ``limit`` pending jobs to processing and return them.
+
+    With ``printer_name`` only jobs queued for that printer are claimed;
+    claimed jobs are assigned to the claiming printer.
+    """
+    limit = max(1, min(int(limit or 1), PRINT_QUEUE_MAX_CLAIM))
+    table = PrintQueue.__table__
+    now = datetime.now(timezone.utc)
+    values = {'status': 'processing', 'started_at': now, 'updated_at': now}
+    if printer_name:
+        values['printer_name'] = printer_name
+
+    try:
+        if db.session.get_bind().dialect.name == 'postgresql':
+            ids = db.session.execute(
+                _pending_jobs(printer_name).limit(limit).with_for_update(skip_locked=True)
+            ).scalars().all()
+            if ids:
+                db.session.execute(table.update().where(table.c.id.in_(ids)).values(**values))
+        else:
+            # Compare-and-set: a job only counts as ours if it was still pending
+            ids = []
+            for job_id in db.session.execute(_pending_jobs(printer_name).limit(limit)).scalars().all():
+                result = db.session.execute(
+                    table.update()
+                    .where(table.c.id == job_id, table.c.status == 'pending')
+                    .values(**values)
+                )
+                if result.rowcount == 1:
+                    ids.append(job_id)
         db.session.commit()
-        logger.info(f"Print job {job_id} started on printer {job.printer_name}")
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if not ids:
+        return []
+    jobs = PrintQueue.query.filter(PrintQueue.id.in_(ids)).all()
+    jobs.sort(key=lambda job: ids.index(job.id))
+    logger.info(f"Printer {printer_name or '-'} claimed print jobs {ids}")
+    return jobs
+
+
+def wait_for_jobs(printer_name=None, limit=1, timeout=0):
+    """
+    Claim jobs, waiting up to ``timeout`` seconds for new ones to arrive.
+
+    Returns the claimed jobs, or an empty list when the wait timed out or
+    PRINT_QUEUE_MAX_LONG_POLLERS agents of this process are already waiting.
+    """
+    deadline = time.monotonic() + max(0.0, min(float(timeout or 0), PRINT_QUEUE_LONG_POLL_MAX))
+    seen = _queue_generation()
+    jobs = claim_jobs(printer_name, limit)
+    if jobs or deadline <= time.monotonic():
+        return jobs
+    if not _long_pollers.acquire(blocking=False):
+        return []
+    try:
+        return _wait_and_claim(printer_name, limit, deadline, seen)
+    finally:
+        _long_pollers.release()
+
+
+def _wait_and_claim(printer_name, limit, deadline, seen):
+    while True:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            with _jobs_added:
+                if _local_generation == seen[0]:
+                    _jobs_added.wait(min(PRINT_QUEUE_POLL_INTERVAL, remaining))
+            if _queue_generation() != seen:
+                break
+        seen = _queue_generation()
+        jobs = claim_jobs(printer_name, limit)
+        if jobs:
+            return jobs
+
+
+def start_job(job_id, printer_name=None):
+    """Mark a job as processing (only if it is still pending)."""
+    table = PrintQueue.__table__
+    now = datetime.now(timezone.utc)
+    values = {'status': 'processing', 'started_at': now, 'updated_at': now}
+    if printer_name:
+        values['printer_name'] = printer_name
+    result = db.session.execute(
+        table.update().where(table.c.id == job_id, table.c.status == 'pending').values(**values)
+    )
+    db.session.commit()
+    if result.rowcount == 1:
+        logger.info(f"Print job {job_id} started on printer {printer_name or '-'}")
         return True
     return False
 
@@ -142,6 +142,33 @@ def get_task_queue():
     return task_queue
 
 
+def enqueue_on_worker(func, args=(), job_id=None, job_timeout="1h", retries=0):
+    """
+    Enqueue ``func`` on the RQ queue when at least one worker is listening.
+
+    Returns the RQ job, or None when Redis or workers are unavailable so the
+    caller can fall back to running in-process.
+    """
+    queue = get_task_queue()
+    if queue is None:
+        return None
+    try:
+        from rq import Retry, Worker
+        if not Worker.all(queue=queue):
+            logger.warning("Redis is running, but no RQ worker is active on '%s'.", queue.name)
+            return None
+        return queue.enqueue(
+            func,
+            args=args,
+            job_id=job_id,
+            job_timeout=job_timeout,
+            retry=Retry(max=retries) if retries else None,
+        )
+    except Exception as exc:
+        logger.warning("RQ enqueue failed; running in-process instead: %s", exc)
+        return None
+
+
 def _redis_cache_key(*parts):
     normalized = []
     for part in parts:
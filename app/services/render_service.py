@@ -47,6 +47,8 @@ from app.performance import (
     get_cached_font, get_cached_qr, set_cached_qr,
     get_cached_barcode, set_cached_barcode, timed,
 )
+from app.metrics import record_cache_lookup
+from app.tracing import span, traced
 
 logger = logging.getLogger(__name__)
 
@@ -67,7 +69,9 @@ def _cache_get_template(path_or_url, target_w, target_h):
     """Get a cached template image, returns (image_bytes, hit) tuple."""
     cache_key = (path_or_url, target_w, target_h)
     with _template_cache_lock:
-        return _template_cache.get(cache_key)
+        cached = _template_cache.get(cache_key)
+    record_cache_lookup("template_image", cached is not None)
+    return cached
 
 
 def _cache_put_template(path_or_url, target_w, target_h, image_bytes):
@@ -124,6 +128,7 @@ def _get_cached_photo(student_like, photo_settings, photo_w, photo_h):
 
     # 🔍 Try cache
     cached = _redis_get(cache_key)
+    record_cache_lookup("photo", bool(cached))
     if cached:
         try:
             img = Image.open(io.BytesIO(cached))
@@ -192,6 +197,7 @@ def _get_cached_final_card(
 
     # 🔍 Try cache
     cached = _redis_get(cache_key)
+    record_cache_lookup("final_card", bool(cached))
     if cached:
         try:
             img = Image.open(io.BytesIO(cached))
@@ -243,18 +249,15 @@ def _get_cached_final_card(
         _redis_delete(lock_key)
 
 
-def _render_qr_and_barcode(template_img, qr_settings, student_like, student_id, school_name, scale=1.0, include_qr=True, include_barcode=True):
-    qr_id = _build_qr_hash(student_like)
+def _qr_and_barcode_sprites(qr_settings, student_like, student_id, school_name, scale=1.0, include_qr=True, include_barcode=True):
+    """Return ``[(kind, image, (x, y))]`` for the enabled QR code and barcode."""
+    sprites = []
     if include_qr and qr_settings.get('enable_qr', False):
         qr_payload = _build_payload(qr_settings, student_like, student_id, school_name, 'qr')
         qr_size = max(1, int(round(float(qr_settings.get('qr_size', 120) or 120) * scale)))
         qr_x = int(round(float(qr_settings.get('qr_x', 50) or 50) * scale))
         qr_y = int(round(float(qr_settings.get('qr_y', 50) or 50) * scale))
-        qr_img = _get_cached_qr_image(qr_payload, qr_settings, qr_size)
-        try:
-            template_img.paste(qr_img, (qr_x, qr_y))
-        except Exception as exc:
-            logger.error('Failed to paste QR code: %s', exc)
+        sprites.append(('QR code', _get_cached_qr_image(qr_payload, qr_settings, qr_size), (qr_x, qr_y)))
 
     if include_barcode and qr_settings.get('enable_barcode', False):
         barcode_payload = _build_payload(qr_settings, student_like, student_id, school_name, 'barcode')
@@ -262,11 +265,19 @@ def _render_qr_and_barcode(template_img, qr_settings, student_like, student_id,
         barcode_h = max(30, int(round(float(qr_settings.get('barcode_height', 70) or 70) * scale)))
         barcode_x = int(round(float(qr_settings.get('barcode_x', 50) or 50) * scale))
         barcode_y = int(round(float(qr_settings.get('barcode_y', 200) or 200) * scale))
-        barcode_img = _get_cached_barcode_image(barcode_payload, qr_settings, barcode_w, barcode_h)
+        sprites.append(('barcode', _get_cached_barcode_image(barcode_payload, qr_settings, barcode_w, barcode_h), (barcode_x, barcode_y)))
+    return sprites
+
+
+def _render_qr_and_barcode(template_img, qr_settings, student_like, student_id, school_name, scale=1.0, include_qr=True, include_barcode=True):
+    for kind, image, position in _qr_and_barcode_sprites(
+        qr_settings, student_like, student_id, school_name,
+        scale=scale, include_qr=include_qr, include_barcode=include_barcode,
+    ):
         try:
-            template_img.paste(barcode_img, (barcode_x, barcode_y))
+            template_img.paste(image, position)
         except Exception as exc:
-            logger.error('Failed to paste barcode: %s', exc)
+            logger.error('Failed to paste %s: %s', kind, exc)
 
 
 def _photo_settings_dimensions(photo_settings, scale=1.0):
@@ -305,13 +316,14 @@ def _load_card_photo_image(student_like, photo_settings, photo_w, photo_h):
         return None
 
 
-def _render_student_photo(template_img, student_like, photo_settings, scale=1.0):
+def _student_photo_sprite(student_like, photo_settings, scale=1.0):
+    """Return the shaped photo (RGBA) and its paste position, or None."""
     if not photo_settings.get('enable_photo', True):
-        return
+        return None
     photo_w, photo_h, photo_x, photo_y, radii = _photo_settings_dimensions(photo_settings, scale)
     photo_img = _get_cached_photo(student_like, photo_settings, photo_w, photo_h)    
     if not photo_img:
-        return
+        return None
     try:
         border_color = photo_settings.get('photo_frame_color')
         border_thickness = max(1.0, 2.0 * scale) if border_color else 0
@@ -323,7 +335,19 @@ def _render_student_photo(template_img, student_like, photo_settings, scale=1.0)
             shape=photo_settings.get("photo_shape", "rectangle"),
             shape_inset=photo_settings.get("photo_shape_inset", 0),
         )
-        template_img.paste(photo_img, (photo_x, photo_y), photo_img)
+    except Exception as exc:
+        logger.error('Error rendering student photo: %s', exc)
+        return None
+    return photo_img, (photo_x, photo_y)
+
+
+def _render_student_photo(template_img, student_like, photo_settings, scale=1.0):
+    sprite = _student_photo_sprite(student_like, photo_settings, scale=scale)
+    if sprite is None:
+        return
+    photo_img, position = sprite
+    try:
+        template_img.paste(photo_img, position, photo_img)
     except Exception as exc:
         logger.error('Error rendering student photo: %s', exc)
 
@@ -675,6 +699,7 @@ def _ellipsize_to_width_pil(text: str, max_width_px: float, measure_fn) -> str:
     return best
 
 
+@traced('render.text_fit')
 def fit_wrapped_text_pil(
     text,
     font_loader,
@@ -1038,6 +1063,7 @@ def render_student_card_side_background(
 
 
 @timed('render_card', threshold_ms=500)
+@traced('render.card', root=True)
 def render_student_card_side(
     template_obj,
     student_like,
@@ -1054,23 +1080,28 @@ def render_student_card_side(
         return None
 
     template_id = template_obj.id
-    template_path = get_template_path(template_id, side=side)
-    if not template_path:
-        return None
-
-    font_settings, photo_settings, qr_settings, _ = get_template_settings(template_id, side=side)
-    card_width, card_height = get_card_size(template_id)
-    template_img = _load_template_image_for_render(template_path, card_width, card_height, render_scale=render_scale)
+    with span("render.settings_load"):
+        template_path = get_template_path(template_id, side=side)
+        if not template_path:
+            return None
+
+        font_settings, photo_settings, qr_settings, _ = get_template_settings(template_id, side=side)
+        card_width, card_height = get_card_size(template_id)
+    with span("render.template_decode"):
+        template_img = _load_template_image_for_render(template_path, card_width, card_height, render_scale=render_scale)
     lang, direction = get_template_language_direction_from_obj(template_obj, side=side)
 
     if include_text:
-        _render_student_fields(template_img, template_obj, student_like, font_settings, photo_settings, side, lang, direction)
+        with span("render.field_layout"):
+            _render_student_fields(template_img, template_obj, student_like, font_settings, photo_settings, side, lang, direction)
 
     if include_photo:
-        _render_student_photo(template_img, student_like, photo_settings, scale=max(1.0, float(render_scale or 1.0)))
+        with span("render.photo"):
+            _render_student_photo(template_img, student_like, photo_settings, scale=max(1.0, float(render_scale or 1.0)))
 
     if include_qr or include_barcode:
-        _render_qr_and_barcode(template_img, qr_settings, student_like, student_id, school_name, scale=max(1.0, float(render_scale or 1.0)), include_qr=include_qr, include_barcode=include_barcode)
+        with span("render.qr_barcode"):
+            _render_qr_and_barcode(template_img, qr_settings, student_like, student_id, school_name, scale=max(1.0, float(render_scale or 1.0)), include_qr=include_qr, include_barcode=include_barcode)
 
     if template_img.size != (
         max(1, int(round(card_width * max(1.0, float(render_scale or 1.0))))),
@@ -1084,7 +1115,8 @@ def render_student_card_side(
             Image.LANCZOS,
         )
 
-    apply_layout_custom_objects_pil(template_img, template_obj, font_settings, side=side, language=lang, render_scale=max(1.0, float(render_scale or 1.0)))
+    with span("render.custom_objects"):
+        apply_layout_custom_objects_pil(template_img, template_obj, font_settings, side=side, language=lang, render_scale=max(1.0, float(render_scale or 1.0)))
     return template_img
 
 
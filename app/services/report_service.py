@@ -2,36 +2,68 @@
 Report Generation Service
 Generates PDF and Excel reports for various data types.
 Isolated module - reads from existing models only.
+
+Reports are streamed: rows come from a server-side cursor over only the
+columns a report needs, CSV is produced chunk by chunk, and XLSX is written
+with openpyxl's write-only workbook. Column widths are estimated from the
+first REPORT_WIDTH_SAMPLE rows instead of a second pass over every cell.
 """
+import csv
 import io
 import logging
+import os
+from collections import namedtuple
 from datetime import datetime, timezone, timedelta
+from itertools import chain, islice
+
+from sqlalchemy import select
 
 from models import db, Student, Template, ActivityLog, BulkJob
 
 logger = logging.getLogger(__name__)
 
+REPORT_CHUNK_SIZE = max(1, int(os.environ.get("REPORT_CHUNK_SIZE", "1000")))
+REPORT_WIDTH_SAMPLE = max(1, int(os.environ.get("REPORT_WIDTH_SAMPLE", "200")))
 
-def generate_student_report(format: str = 'xlsx', school_name: str = None,
-                            template_id: int = None) -> io.BytesIO:
-    """
-    Generate a student report in XLSX or CSV format.
-    Returns a BytesIO buffer.
-    """
-    query = Student.query
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+Report = namedtuple('Report', 'name sheet_title headers rows')
+
+
+def _stream(stmt, formatter):
+    """Yield formatted rows of ``stmt`` from a server-side cursor."""
+    result = db.session.execute(stmt.execution_options(yield_per=REPORT_CHUNK_SIZE))
+    try:
+        for row in result:
+            yield formatter(row)
+    finally:
+        result.close()
+
+
+def _fmt_time(value, fmt='%Y-%m-%d %H:%M'):
+    return value.strftime(fmt) if value else ''
+
+
+# ================== Report Definitions ==================
+
+def student_report(school_name: str = None, template_id: int = None) -> Report:
+    """Student report rows, newest first."""
+    stmt = select(
+        Student.id, Student.name, Student.father_name, Student.class_name, Student.dob,
+        Student.school_name, Student.phone, Student.address, Student.email,
+        Student.photo_url, Student.photo_filename, Student.image_url, Student.created_at,
+    )
     if school_name:
-        query = query.filter_by(school_name=school_name)
+        stmt = stmt.where(Student.school_name == school_name)
     if template_id:
-        query = query.filter_by(template_id=template_id)
-
-    students = query.order_by(Student.created_at.desc()).all()
+        stmt = stmt.where(Student.template_id == template_id)
+    stmt = stmt.order_by(Student.created_at.desc())
 
     headers = ['ID', 'Name', 'Father Name', 'Class', 'DOB', 'School', 'Phone',
                'Address', 'Email', 'Has Photo', 'Card Generated', 'Created At']
 
-    rows = []
-    for s in students:
-        rows.append([
+    def formatter(s):
+        return [
             s.id,
             s.name or '',
             s.father_name or '',
@@ -43,162 +75,151 @@ def generate_student_report(format: str = 'xlsx', school_name: str = None,
             s.email or '',
             'Yes' if (s.photo_url or s.photo_filename) else 'No',
             'Yes' if s.image_url else 'No',
-            s.created_at.strftime('%Y-%m-%d %H:%M') if s.created_at else '',
-        ])
-
-    if format == 'csv':
-        import csv
-        buf = io.StringIO()
-        writer = csv.writer(buf)
-        writer.writerow(headers)
-        writer.writerows(rows)
-        result = io.BytesIO(buf.getvalue().encode('utf-8'))
-        result.name = 'student_report.csv'
-        return result
-
-    # Default XLSX
-    try:
-        import openpyxl
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = 'Students'
-
-        # Header styling
-        from openpyxl.styles import Font, PatternFill, Alignment
-        header_font = Font(bold=True, color='FFFFFF')
-        header_fill = PatternFill(start_color='2563EB', end_color='2563EB', fill_type='solid')
-
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal='center')
-
-        for row_idx, row in enumerate(rows, 2):
-            for col_idx, value in enumerate(row, 1):
-                ws.cell(row=row_idx, column=col_idx, value=value)
-
-        # Auto-width
-        for col in ws.columns:
-            max_len = 0
-            col_letter = col[0].column_letter
-            for cell in col:
-                if cell.value:
-                    max_len = max(max_len, len(str(cell.value)))
-            ws.column_dimensions[col_letter].width = min(max_len + 4, 50)
-
-        buf = io.BytesIO()
-        wb.save(buf)
-        buf.seek(0)
-        buf.name = 'student_report.xlsx'
-        return buf
+            _fmt_time(s.created_at),
+        ]
 
-    except ImportError:
-        # Fallback to CSV if openpyxl not available
-        logger.warning("openpyxl not installed, falling back to CSV")
-        return generate_student_report(format='csv', school_name=school_name, template_id=template_id)
+    return Report('student_report', 'Students', headers, _stream(stmt, formatter))
 
 
-def generate_activity_report(format: str = 'xlsx', days: int = 30) -> io.BytesIO:
-    """Generate an activity log report."""
+def activity_report(days: int = 30) -> Report:
+    """Activity log rows of the last ``days`` days, newest first."""
     cutoff = datetime.now(timezone.utc) - timedelta(days=days)
-    activities = ActivityLog.query.filter(
-        ActivityLog.timestamp >= cutoff
-    ).order_by(ActivityLog.timestamp.desc()).all()
+    stmt = select(
+        ActivityLog.timestamp, ActivityLog.actor, ActivityLog.action,
+        ActivityLog.target, ActivityLog.details, ActivityLog.ip_address,
+    ).where(ActivityLog.timestamp >= cutoff).order_by(ActivityLog.timestamp.desc())
 
     headers = ['Timestamp', 'Actor', 'Action', 'Target', 'Details', 'IP Address']
-    rows = []
-    for a in activities:
-        rows.append([
-            a.timestamp.strftime('%Y-%m-%d %H:%M:%S') if a.timestamp else '',
+
+    def formatter(a):
+        return [
+            _fmt_time(a.timestamp, '%Y-%m-%d %H:%M:%S'),
             a.actor or '',
             a.action or '',
             a.target or '',
             a.details or '',
             a.ip_address or '',
-        ])
-
-    if format == 'csv':
-        import csv
-        buf = io.StringIO()
-        writer = csv.writer(buf)
-        writer.writerow(headers)
-        writer.writerows(rows)
-        result = io.BytesIO(buf.getvalue().encode('utf-8'))
-        result.name = 'activity_report.csv'
-        return result
+        ]
 
-    try:
-        import openpyxl
-        from openpyxl.styles import Font, PatternFill, Alignment
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = 'Activity Log'
-
-        header_font = Font(bold=True, color='FFFFFF')
-        header_fill = PatternFill(start_color='2563EB', end_color='2563EB', fill_type='solid')
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-
-        for row_idx, row in enumerate(rows, 2):
-            for col_idx, value in enumerate(row, 1):
-                ws.cell(row=row_idx, column=col_idx, value=value)
-
-        buf = io.BytesIO()
-        wb.save(buf)
-        buf.seek(0)
-        buf.name = 'activity_report.xlsx'
-        return buf
-    except ImportError:
-        return generate_activity_report(format='csv', days=days)
+    return Report('activity_report', 'Activity Log', headers, _stream(stmt, formatter))
 
 
-def generate_bulk_job_report(format: str = 'xlsx') -> io.BytesIO:
-    """Generate a bulk job execution report."""
-    jobs = BulkJob.query.order_by(BulkJob.created_at.desc()).limit(100).all()
+def bulk_job_report() -> Report:
+    """The 100 most recent bulk jobs."""
+    stmt = select(
+        BulkJob.id, BulkJob.template_id, BulkJob.job_type, BulkJob.status,
+        BulkJob.total_items, BulkJob.processed_items, BulkJob.failed_items,
+        BulkJob.created_by, BulkJob.created_at,
+    ).order_by(BulkJob.created_at.desc()).limit(100)
 
     headers = ['ID', 'Template ID', 'Type', 'Status', 'Total Items', 'Processed',
                'Failed', 'Created By', 'Created At']
-    rows = []
-    for j in jobs:
-        rows.append([
+
+    def formatter(j):
+        return [
             j.id, j.template_id or '', j.job_type or '', j.status or '',
             j.total_items, j.processed_items, j.failed_items,
             j.created_by or '',
-            j.created_at.strftime('%Y-%m-%d %H:%M') if j.created_at else '',
-        ])
-
-    if format == 'csv':
-        import csv
-        buf = io.StringIO()
-        writer = csv.writer(buf)
-        writer.writerow(headers)
-        writer.writerows(rows)
-        result = io.BytesIO(buf.getvalue().encode('utf-8'))
-        result.name = 'bulk_job_report.csv'
-        return result
-
-    try:
-        import openpyxl
-        from openpyxl.styles import Font, PatternFill
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = 'Bulk Jobs'
-        header_font = Font(bold=True, color='FFFFFF')
-        header_fill = PatternFill(start_color='2563EB', end_color='2563EB', fill_type='solid')
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-        for row_idx, row in enumerate(rows, 2):
-            for col_idx, value in enumerate(row, 1):
-                ws.cell(row=row_idx, column=col_idx, value=value)
-        buf = io.BytesIO()
-        wb.save(buf)
+            _fmt_time(j.created_at),
+        ]
+
+    return Report('bulk_job_report', 'Bulk Jobs', headers, _stream(stmt, formatter))
+
+
+# ================== Writers ==================
+
+def iter_report_csv(report: Report):
+    """Yield the report as UTF-8 CSV, REPORT_CHUNK_SIZE rows per chunk."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(report.headers)
+    rows = iter(report.rows)
+    while True:
+        chunk = list(islice(rows, REPORT_CHUNK_SIZE))
+        writer.writerows(chunk)
+        data = buf.getvalue()
+        if data:
+            yield data.encode('utf-8')
         buf.seek(0)
-        buf.name = 'bulk_job_report.xlsx'
-        return buf
-    except ImportError:
-        return generate_bulk_job_report(format='csv')
+        buf.truncate()
+        if len(chunk) < REPORT_CHUNK_SIZE:
+            return
+
+
+def _estimate_widths(headers, sample):
+    widths = [len(str(h)) for h in headers]
+    for row in sample:
+        for idx, value in enumerate(row):
+            if value is not None and value != '':
+                widths[idx] = max(widths[idx], len(str(value)))
+    return [min(width + 4, 50) for width in widths]
+
+
+def write_report_xlsx(report: Report) -> io.BytesIO:
+    """Write the report with a write-only workbook; raises ImportError without openpyxl."""
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill, Alignment
+    from openpyxl.utils import get_column_letter
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title=report.sheet_title)
+
+    rows = iter(report.rows)
+    sample = list(islice(rows, REPORT_WIDTH_SAMPLE))
+    for col, width in enumerate(_estimate_widths(report.headers, sample), 1):
+        ws.column_dimensions[get_column_letter(col)].width = width
+
+    header_font = Font(bold=True, color='FFFFFF')
+    header_fill = PatternFill(start_color='2563EB', end_color='2563EB', fill_type='solid')
+    header_row = []
+    for header in report.headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = Alignment(horizontal='center')
+        header_row.append(cell)
+    ws.append(header_row)
+
+    for row in chain(sample, rows):
+        ws.append(row)
+
+    buf = io.BytesIO()
+    wb.save(buf)
+    buf.seek(0)
+    buf.name = f'{report.name}.xlsx'
+    return buf
+
+
+def render_report(report: Report, format: str = 'xlsx') -> io.BytesIO:
+    """Render a report into a BytesIO buffer (XLSX, or CSV)."""
+    if format != 'csv':
+        try:
+            return write_report_xlsx(report)
+        except ImportError:
+            # Fallback to CSV if openpyxl not available
+            logger.warning("openpyxl not installed, falling back to CSV")
+    result = io.BytesIO(b''.join(iter_report_csv(report)))
+    result.name = f'{report.name}.csv'
+    return result
+
+
+# ================== Buffered API ==================
+
+def generate_student_report(format: str = 'xlsx', school_name: str = None,
+                            template_id: int = None) -> io.BytesIO:
+    """
+    Generate a student report in XLSX or CSV format.
+    Returns a BytesIO buffer.
+    """
+    return render_report(student_report(school_name=school_name, template_id=template_id), format)
+
+
+def generate_activity_report(format: str = 'xlsx', days: int = 30) -> io.BytesIO:
+    """Generate an activity log report."""
+    return render_report(activity_report(days=days), format)
+
+
+def generate_bulk_job_report(format: str = 'xlsx') -> io.BytesIO:
+    """Generate a bulk job execution report."""
+    return render_report(bulk_job_report(), format)
@@ -19,7 +19,6 @@ from flask import request, session, current_app
 from models import (
     db, AdminUser, LoginHistory, UserSession, TwoFactorBackupCode
 )
-from user_agents import parse as parse_ua
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +29,8 @@ def _parse_user_agent(user_agent_string: str) -> dict:
     if not user_agent_string:
         return {'device_type': 'unknown', 'browser': 'unknown', 'os': 'unknown'}
     try:
+        # Lazy import — user_agents compiles its regex tables on import (~0.3s).
+        from user_agents import parse as parse_ua
         ua = parse_ua(user_agent_string)
         device_type = 'mobile' if ua.is_mobile else ('tablet' if ua.is_tablet else 'desktop')
         return {
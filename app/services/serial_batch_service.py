@@ -15,19 +15,21 @@ import csv
 import json
 import uuid
 import logging
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from threading import Thread
 
 from PIL import Image, ImageDraw
 from flask import current_app
-from sqlalchemy import and_
+from sqlalchemy import and_, func
 
 from models import db, SerialBatch, SerialCard, Template, Student
 from utils import UPLOAD_FOLDER, STATIC_DIR
 from app.utils.helper_utils import get_template_settings
 from app.utils.layout_utils import get_card_size
 from app.utils.image_utils import get_default_photo_config
-from app.services.render_service import render_student_card_side
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +40,16 @@ os.makedirs(SERIAL_BATCH_DIR, exist_ok=True)
 THUMBNAIL_WIDTH = 150
 THUMBNAIL_HEIGHT = 190
 
+# Output format -> file extension for batch renders.
+SERIAL_RENDER_FORMATS = {'JPEG': '.jpg', 'WEBP': '.webp', 'PNG': '.png'}
+SERIAL_RENDER_QUALITY = int(os.environ.get('SERIAL_RENDER_QUALITY', '92'))
+# Cards rendered and committed together; also the resume granularity.
+SERIAL_RENDER_CHUNK = max(1, int(os.environ.get('SERIAL_RENDER_CHUNK', '25')))
+SERIAL_RENDER_RETRIES = int(os.environ.get('SERIAL_RENDER_RETRIES', '2'))
+
+_thumbnail_executor = None
+_thumbnail_executor_lock = threading.Lock()
+
 
 def _batch_dir(batch_id):
     return os.path.join(SERIAL_BATCH_DIR, str(batch_id))
@@ -58,8 +70,8 @@ def _ensure_dirs(batch_id):
     os.makedirs(os.path.join(d, 'rendered'), exist_ok=True)
 
 
-def _get_next_serial(batch):
-    """Get the next serial number for a batch."""
+def _iter_free_serials(batch):
+    """Yield unused serial numbers for a batch, lowest first."""
     existing = db.session.query(SerialCard.serial_no).filter_by(batch_id=batch.id).all()
     existing_numbers = set()
     for (serial_no,) in existing:
@@ -70,9 +82,16 @@ def _get_next_serial(batch):
             except ValueError:
                 pass
     next_num = 1
-    while next_num in existing_numbers:
+    while True:
+        while next_num in existing_numbers:
+            next_num += 1
+        yield f"{batch.prefix}{next_num:03d}"
         next_num += 1
-    return f"{batch.prefix}{next_num:03d}"
+
+
+def _get_next_serial(batch):
+    """Get the next serial number for a batch."""
+    return next(_iter_free_serials(batch))
 
 
 def create_batch(school_name, template_id, prefix='SCH-', created_by=None):
@@ -118,7 +137,10 @@ def get_batch_cards(batch_id, page=None, per_page=None):
 def upload_photos(batch_id, files, school_name=None):
     """
     Upload photos for a batch. Each file gets a new serial number.
-    
+
+    Thumbnails are generated afterwards by ``schedule_thumbnails``; the
+    request only stores the files and commits the cards.
+
     Returns list of created SerialCard objects.
     """
     batch = get_batch(batch_id, school_name=school_name)
@@ -129,6 +151,7 @@ def upload_photos(batch_id, files, school_name=None):
 
     _ensure_dirs(batch.id)
     created_cards = []
+    serials = _iter_free_serials(batch)
 
     for file in files:
         if not file or not file.filename:
@@ -146,13 +169,10 @@ def upload_photos(batch_id, files, school_name=None):
         # Save file
         file.save(filepath)
 
-        # Assign serial number
-        serial_no = _get_next_serial(batch)
-
         # Create card record
         card = SerialCard(
             batch_id=batch.id,
-            serial_no=serial_no,
+            serial_no=next(serials),
             photo_path=filepath,
             status='photo_only',
         )
@@ -162,87 +182,175 @@ def upload_photos(batch_id, files, school_name=None):
     if created_cards:
         batch.status = 'ready'
         db.session.commit()
+        try:
+            schedule_thumbnails(batch.id, [card.id for card in created_cards])
+        except Exception as e:
+            logger.warning(f"Could not schedule thumbnails for batch {batch.id}: {e}")
+
+    return created_cards
+
+
+def _get_thumbnail_executor():
+    global _thumbnail_executor
+    with _thumbnail_executor_lock:
+        if _thumbnail_executor is None:
+            # One upload at a time; each job fans out across cores itself.
+            _thumbnail_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="serial-thumbs")
+    return _thumbnail_executor
+
+
+def schedule_thumbnails(batch_id, card_ids):
+    """Generate thumbnails for ``card_ids`` on the RQ worker or a local background thread."""
+    from app.services.redis_service import enqueue_on_worker
+
+    card_ids = list(card_ids)
+    if not card_ids:
+        return
+    if enqueue_on_worker(generate_batch_thumbnails, args=(batch_id, card_ids), job_timeout='30m'):
+        return
+    app = current_app._get_current_object()
+    _get_thumbnail_executor().submit(generate_batch_thumbnails, batch_id, card_ids, app)
+
+
+def generate_batch_thumbnails(batch_id, card_ids, app=None):
+    """Build photo-on-template thumbnails for the given cards of a batch."""
+    if app is None:
+        from flask import has_app_context
+        if has_app_context():
+            app = current_app._get_current_object()
+        else:
+            from app.legacy_app import app
+    with app.app_context():
+        batch = db.session.get(SerialBatch, batch_id)
+        if not batch:
+            return
+        cards = SerialCard.query.filter(
+            SerialCard.batch_id == batch_id, SerialCard.id.in_(list(card_ids))
+        ).all()
+        if not cards:
+            return
+
+        layout = _thumbnail_layout(batch)
+        jobs = [(card.id, card.photo_path, _thumbnail_path(batch_id, card.id)) for card in cards]
 
-        # Generate thumbnails in background
-        for card in created_cards:
+        def build(job):
+            card_id, photo_path, thumb_path = job
             try:
-                _generate_thumbnail(batch, card)
+                if not photo_path or not os.path.exists(photo_path):
+                    return card_id, None
+                _compose_thumbnail(layout, photo_path).save(thumb_path, 'JPEG', quality=85)
+                return card_id, thumb_path
             except Exception as e:
-                logger.warning(f"Thumbnail generation failed for card {card.id}: {e}")
+                logger.warning(f"Thumbnail generation failed for card {card_id}: {e}")
+                return card_id, None
 
-    return created_cards
+        from app.services.parallel_render import get_optimal_workers
+        with ThreadPoolExecutor(max_workers=get_optimal_workers(len(jobs))) as pool:
+            done = dict(pool.map(build, jobs))
+
+        for card in cards:
+            if done.get(card.id):
+                card.photo_thumbnail = done[card.id]
+        db.session.commit()
 
 
 def _generate_thumbnail(batch, card):
-    """Generate a photo-on-template thumbnail for a card."""
+    """Generate a photo-on-template thumbnail for a single card."""
     if not card.photo_path or not os.path.exists(card.photo_path):
         return
+    thumb_path = _thumbnail_path(batch.id, card.id)
+    _compose_thumbnail(_thumbnail_layout(batch), card.photo_path).save(thumb_path, 'JPEG', quality=85)
+    card.photo_thumbnail = thumb_path
+    db.session.commit()
+
 
+def _thumbnail_layout(batch):
+    """
+    Template base and photo box for a batch, scaled once to thumbnail size.
+
+    Returns a dict with ``base`` (RGB image or None when the template image
+    is unavailable), ``scale`` and the scaled photo box and shape.
+    """
     template = db.session.get(Template, batch.template_id)
     if not template:
-        return
-
-    try:
-        font_settings, photo_settings, qr_settings, orientation = get_template_settings(
-            template.id, side='front'
-        )
-    except Exception:
         photo_settings = get_default_photo_config()
+    else:
+        try:
+            font_settings, photo_settings, qr_settings, orientation = get_template_settings(
+                template.id, side='front'
+            )
+        except Exception:
+            photo_settings = get_default_photo_config()
+
+    layout = {
+        'base': None,
+        'scale': 1.0,
+        'photo_box': (photo_settings.get('photo_width', 200), photo_settings.get('photo_height', 250)),
+        'photo_xy': (photo_settings.get('photo_x', 50), photo_settings.get('photo_y', 50)),
+        'shape': photo_settings.get('photo_shape', 'circle'),
+    }
 
-    # Load template image
-    from app.legacy_app import get_template_path, _load_template_image_for_render
-    template_path = get_template_path(template.id, side='front')
+    template_path = None
+    if template:
+        from app.legacy_app import get_template_path, _load_template_image_for_render
+        template_path = get_template_path(template.id, side='front')
     if not template_path or not os.path.exists(template_path):
-        # Fallback: just resize the photo
-        thumb = _resize_photo_thumbnail(card.photo_path, template, photo_settings)
+        return layout
+
+    card_width, card_height = get_card_size(template.id)
+    template_img = _load_template_image_for_render(template_path, card_width, card_height, render_scale=1.0)
+    scale = min(1.0, THUMBNAIL_WIDTH / template_img.width, THUMBNAIL_HEIGHT / template_img.height)
+    base_size = (max(1, round(template_img.width * scale)), max(1, round(template_img.height * scale)))
+    layout['base'] = template_img.resize(base_size, Image.LANCZOS)
+    layout['scale'] = scale
+    return layout
+
+
+def _open_photo_for_thumbnail(photo_path, box):
+    """Open a photo decoded (JPEG draft mode) close to ``box`` and fitted inside it."""
+    img = Image.open(photo_path)
+    img.draft('RGB', box)
+    img = img.convert('RGBA')
+    img.thumbnail(box, Image.LANCZOS)
+    return img
+
+
+def _compose_thumbnail(layout, photo_path):
+    """Place a photo on the pre-scaled template base (or a white card) and return RGB."""
+    if layout['base'] is None:
+        return _resize_photo_thumbnail(photo_path, None, {
+            'photo_width': layout['photo_box'][0],
+            'photo_height': layout['photo_box'][1],
+        })
+
+    scale = layout['scale']
+    box = tuple(max(1, round(v * scale)) for v in layout['photo_box'])
+    x, y = (round(v * scale) for v in layout['photo_xy'])
+    thumb = layout['base'].copy()
+    photo_img = _open_photo_for_thumbnail(photo_path, box)
+
+    if layout['shape'] == 'circle':
+        mask = Image.new('L', photo_img.size, 0)
+        draw = ImageDraw.Draw(mask)
+        draw.ellipse((0, 0, photo_img.width, photo_img.height), fill=255)
+        thumb.paste(photo_img, (x, y), mask)
     else:
-        card_width, card_height = get_card_size(template.id)
-        template_img = _load_template_image_for_render(template_path, card_width, card_height, render_scale=1.0)
-
-        # Load and place photo
-        photo_img = Image.open(card.photo_path).convert('RGBA')
-        photo_w, photo_h = photo_settings.get('photo_width', 200), photo_settings.get('photo_height', 250)
-        photo_x = photo_settings.get('photo_x', 50)
-        photo_y = photo_settings.get('photo_y', 50)
-
-        # Resize photo to fit
-        photo_img.thumbnail((photo_w, photo_h), Image.LANCZOS)
-
-        # Create circular mask if needed
-        shape = photo_settings.get('photo_shape', 'circle')
-        if shape == 'circle':
-            mask = Image.new('L', photo_img.size, 0)
-            draw = ImageDraw.Draw(mask)
-            draw.ellipse((0, 0, photo_img.width, photo_img.height), fill=255)
-            template_img.paste(photo_img, (photo_x, photo_y), mask)
-        else:
-            template_img.paste(photo_img, (photo_x, photo_y), photo_img if photo_img.mode == 'RGBA' else None)
-
-        # Scale to thumbnail
-        thumb = template_img.copy()
-        thumb.thumbnail((THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT), Image.LANCZOS)
-
-    # Save thumbnail
-    thumb_path = _thumbnail_path(batch.id, card.id)
-    thumb = thumb.convert('RGB')
-    thumb.save(thumb_path, 'JPEG', quality=85)
-    card.photo_thumbnail = thumb_path
-    db.session.commit()
+        thumb.paste(photo_img, (x, y), photo_img)
+    return thumb
 
 
 def _resize_photo_thumbnail(photo_path, template, photo_settings):
     """Fallback: just resize the photo when template is unavailable."""
-    img = Image.open(photo_path).convert('RGBA')
     photo_w = photo_settings.get('photo_width', 200)
     photo_h = photo_settings.get('photo_height', 250)
-    img.thumbnail((photo_w, photo_h), Image.LANCZOS)
+    img = _open_photo_for_thumbnail(photo_path, (photo_w, photo_h))
 
     # Create white background
     bg = Image.new('RGB', (THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT), (255, 255, 255))
     # Center the photo
     x = (THUMBNAIL_WIDTH - img.width) // 2
     y = (THUMBNAIL_HEIGHT - img.height) // 2
-    bg.paste(img, (x, y), img if img.mode == 'RGBA' else None)
+    bg.paste(img, (x, y), img)
     return bg
 
 
@@ -369,11 +477,23 @@ def delete_batch(batch_id, school_name=None):
     db.session.commit()
 
 
-def render_batch(batch_id, school_name=None):
+def render_batch(batch_id, school_name=None, output_format='JPEG'):
     """
-    Render all cards in a batch that have details filled.
-    Uses the existing render pipeline.
+    Queue rendering of every card in a batch that has details filled.
+
+    The job runs on the RQ worker when one is listening, otherwise on a
+    background thread of this process. Progress is published as bulk job
+    state and read back by ``get_render_progress``.
     """
+    from app.services.bulk_job_service import _set_bulk_job_state
+    from app.services.redis_service import enqueue_on_worker
+
+    output_format = str(output_format or 'JPEG').upper()
+    if output_format == 'JPG':
+        output_format = 'JPEG'
+    if output_format not in SERIAL_RENDER_FORMATS:
+        raise ValueError(f"Unsupported render format '{output_format}'")
+
     batch = get_batch(batch_id, school_name=school_name)
     if not batch:
         raise ValueError("Batch not found")
@@ -381,120 +501,229 @@ def render_batch(batch_id, school_name=None):
     batch.status = 'rendering'
     db.session.commit()
 
-    # Run render in background thread
+    job_id = _render_job_id(batch.id)
+    _set_bulk_job_state(
+        job_id,
+        kind='serial_batch',
+        state='PENDING',
+        batch_id=batch.id,
+        format=output_format,
+        updated_at=datetime.now(timezone.utc).isoformat(),
+    )
+
+    if enqueue_on_worker(
+        run_serial_batch_render,
+        args=(batch.id, output_format),
+        job_id=job_id,
+        job_timeout='4h',
+        retries=SERIAL_RENDER_RETRIES,
+    ):
+        return True
+
     app = current_app._get_current_object()
-    thread = Thread(target=_render_batch_worker, args=(app, batch.id))
+    thread = Thread(target=run_serial_batch_render, args=(batch.id, output_format, app))
     thread.daemon = True
     thread.start()
     return True
 
 
-def _render_batch_worker(app, batch_id):
-    """Background worker for batch rendering."""
-    with app.app_context():
-        batch = db.session.get(SerialBatch, batch_id)
-        if not batch:
-            return
-
-        cards = SerialCard.query.filter(
-            SerialCard.batch_id == batch_id,
-            SerialCard.status == 'details_filled'
-        ).order_by(SerialCard.serial_no).all()
-
-        success_count = 0
-        error_count = 0
-        total = len(cards)
-
-        for i, card in enumerate(cards):
-            try:
-                _render_single_card(app, batch, card)
-                success_count += 1
-            except Exception as e:
-                logger.error(f"Render failed for card {card.id} ({card.serial_no}): {e}")
-                card.status = 'error'
-                card.error_message = str(e)
-                error_count += 1
+def _render_job_id(batch_id):
+    return f"serial-batch-{batch_id}"
 
-            # Update progress every 5 cards
-            if (i + 1) % 5 == 0 or (i + 1) == total:
-                logger.info(f"Batch {batch_id} render progress: {i+1}/{total}")
 
-        # Mark remaining as rendered
-        for card in cards:
-            if card.status == 'details_filled':
-                card.status = 'rendered'
-
-        batch.status = 'done'
-        db.session.commit()
-        logger.info(f"Batch {batch_id} render complete: {success_count} success, {error_count} errors")
-
-
-def _render_single_card(app, batch, card):
-    """Render a single card using the existing render pipeline."""
-    template = db.session.get(Template, batch.template_id)
-    if not card.photo_path or not os.path.exists(card.photo_path):
-        raise FileNotFoundError(f"Photo not found for card {card.serial_no}")
-
-    # Build a student-like object for the render function
-    student_like = {
+def _card_render_data(card, batch, fields, photo_cache):
+    return {
+        'id': card.id,
         'name': card.name or '',
         'father_name': card.father_name or '',
         'class_name': card.class_name or '',
         'dob': card.dob or '',
         'address': card.address or '',
         'phone': card.phone or '',
-        'photo_path': card.photo_path,
-        'photo_filename': os.path.basename(card.photo_path),
         'photo_url': None,
-        'image_url': None,
+        'photo_filename': card.photo_path,
         'custom_data': card.custom_data or {},
-        'template_id': template.id,
         'school_name': batch.school_name,
-        'id': card.id,
+        '_template_fields': fields,
+        '_prepared_photo_cache': photo_cache,
     }
 
-    # Render front
-    result = render_student_card_side(
-        template_obj=template,
-        student_like=student_like,
-        side='front',
-        student_id=card.id,
-        school_name=batch.school_name,
-        render_scale=1.0,
-        include_photo=True,
-        include_qr=True,
-        include_barcode=True,
-        include_text=True,
-    )
 
-    if result:
-        # Save rendered image
-        rendered_dir = os.path.join(_batch_dir(batch.id), 'rendered')
-        rendered_path = os.path.join(rendered_dir, f'{card.serial_no}.png')
-        result.save(rendered_path, 'PNG')
-        card.rendered_path = rendered_path
-        card.status = 'rendered'
-        db.session.commit()
+def _save_rendered_image(image, path, output_format):
+    if output_format == 'PNG':
+        image.save(path, 'PNG', optimize=False)
+        return
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    if output_format == 'WEBP':
+        image.save(path, 'WEBP', quality=SERIAL_RENDER_QUALITY, method=4)
     else:
-        raise RuntimeError("Render returned None")
+        image.save(path, 'JPEG', quality=SERIAL_RENDER_QUALITY, optimize=True)
+
+
+def run_serial_batch_render(batch_id, output_format='JPEG', app=None):
+    """
+    Render a batch's pending cards through the parallel render engine.
+
+    Cards are rendered and committed in chunks of ``SERIAL_RENDER_CHUNK``, so
+    a job that is killed midway resumes from the first unrendered card when
+    it is queued again. Runs on the RQ worker or on a local thread.
+    """
+    if app is None:
+        from flask import has_app_context
+        if has_app_context():
+            app = current_app._get_current_object()
+        else:
+            from app.legacy_app import app
+    with app.app_context():
+        _run_serial_batch_render(app, batch_id, output_format)
+
+
+def _run_serial_batch_render(app, batch_id, output_format):
+    from models import TemplateField
+    from app.services.bulk_job_service import _set_bulk_job_state
+    from app.services.parallel_render import bulk_render_students, get_optimal_workers
+
+    job_id = _render_job_id(batch_id)
+    ext = SERIAL_RENDER_FORMATS[output_format]
+    batch = db.session.get(SerialBatch, batch_id)
+    if not batch:
+        _set_bulk_job_state(
+            job_id, kind='serial_batch', batch_id=batch_id, format=output_format,
+            state='FAILURE', result='Batch not found',
+        )
+        return
+
+    template = db.session.get(Template, batch.template_id)
+    if not template:
+        batch.status = 'ready'
+        db.session.commit()
+        _set_bulk_job_state(
+            job_id, kind='serial_batch', batch_id=batch_id, format=output_format,
+            state='FAILURE', result='Template not found',
+        )
+        return
+
+    fields = TemplateField.query.filter_by(template_id=template.id).order_by(
+        TemplateField.display_order.asc()
+    ).all()
+    photo_cache = {}
+    rendered_dir = os.path.join(_batch_dir(batch.id), 'rendered')
+    os.makedirs(rendered_dir, exist_ok=True)
+
+    card_ids = [
+        card_id for (card_id,) in db.session.query(SerialCard.id).filter(
+            SerialCard.batch_id == batch.id,
+            SerialCard.status == 'details_filled',
+        ).order_by(SerialCard.serial_no)
+    ]
+    total = len(card_ids)
+    success_count = 0
+    error_count = 0
+    started = time.perf_counter()
+    workers = get_optimal_workers(min(total, SERIAL_RENDER_CHUNK) or 1)
+
+    def publish(state, **extra):
+        elapsed = time.perf_counter() - started
+        done = success_count + error_count
+        _set_bulk_job_state(
+            job_id,
+            kind='serial_batch',
+            batch_id=batch_id,
+            format=output_format,
+            state=state,
+            total=total,
+            current=done,
+            rendered=success_count,
+            errors=error_count,
+            cards_per_second=round(done / elapsed, 2) if elapsed > 0 else None,
+            updated_at=datetime.now(timezone.utc).isoformat(),
+            **extra,
+        )
+
+    publish('PROGRESS')
+    try:
+        for offset in range(0, total, SERIAL_RENDER_CHUNK):
+            chunk_ids = card_ids[offset:offset + SERIAL_RENDER_CHUNK]
+            cards = SerialCard.query.filter(SerialCard.id.in_(chunk_ids)).all()
+            cards_by_id = {card.id: card for card in cards}
+            render_list = []
+            for card in cards:
+                if not card.photo_path or not os.path.exists(card.photo_path):
+                    card.status = 'error'
+                    card.error_message = f"Photo not found for card {card.serial_no}"
+                    error_count += 1
+                    continue
+                render_list.append(_card_render_data(card, batch, fields, photo_cache))
+
+            results = bulk_render_students(
+                app, template, render_list, max_workers=workers, include_back=False,
+            ) if render_list else []
+            now = datetime.now(timezone.utc)
+            for result in results:
+                card = cards_by_id[result['student_data']['id']]
+                try:
+                    if not result['success']:
+                        raise RuntimeError(result.get('error') or "Render returned None")
+                    rendered_path = os.path.join(rendered_dir, f'{card.serial_no}{ext}')
+                    _save_rendered_image(result['front_image'], rendered_path, output_format)
+                    card.rendered_path = rendered_path
+                    card.status = 'rendered'
+                    card.error_message = None
+                    success_count += 1
+                except Exception as e:
+                    logger.error(f"Render failed for card {card.id} ({card.serial_no}): {e}")
+                    card.status = 'error'
+                    card.error_message = str(e)
+                    error_count += 1
+                card.updated_at = now
+            db.session.commit()
+            photo_cache.clear()
+            publish('PROGRESS')
+            logger.info(f"Batch {batch_id} render progress: {success_count + error_count}/{total}")
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Batch {batch_id} render aborted: {e}", exc_info=True)
+        publish('FAILURE', result=str(e))
+        raise
+
+    batch.status = 'done'
+    db.session.commit()
+    publish('SUCCESS')
+    logger.info(f"Batch {batch_id} render complete: {success_count} success, {error_count} errors")
 
 
 def get_render_progress(batch_id, school_name=None):
     """Get render progress for a batch."""
+    from app.services.bulk_job_service import _get_bulk_job_state
+
     batch = get_batch(batch_id, school_name=school_name)
     if not batch:
         return None
 
-    total = SerialCard.query.filter_by(batch_id=batch.id).filter(
-        SerialCard.status.in_(['details_filled', 'rendered'])
-    ).count()
-    rendered = SerialCard.query.filter_by(batch_id=batch.id, status='rendered').count()
-    errors = SerialCard.query.filter_by(batch_id=batch.id, status='error').count()
+    counts = dict(
+        db.session.query(SerialCard.status, func.count(SerialCard.id))
+        .filter(SerialCard.batch_id == batch.id)
+        .group_by(SerialCard.status)
+        .all()
+    )
+    rendered = counts.get('rendered', 0)
+    errors = counts.get('error', 0)
+    total = counts.get('details_filled', 0) + rendered
 
-    return {
+    progress = {
         'status': batch.status,
         'total': total,
         'rendered': rendered,
         'errors': errors,
         'progress': round(rendered / total * 100, 1) if total > 0 else 0,
     }
+    job = _get_bulk_job_state(_render_job_id(batch.id)) or {}
+    if job:
+        progress.update({
+            'job_state': job.get('state'),
+            'format': job.get('format'),
+            'cards_per_second': job.get('cards_per_second'),
+            'updated_at': job.get('updated_at'),
+        })
+    return progress
@@ -13,11 +13,16 @@ All new models and services — no existing code modified.
 """
 import os
 import re
+import copy
 import json
+import time
 import logging
 import hashlib
 import secrets
+import threading
+from collections import OrderedDict
 from datetime import datetime, timezone, timedelta
+from types import SimpleNamespace
 from typing import Dict, List, Optional
 from functools import wraps
 
@@ -27,18 +32,134 @@ logger = logging.getLogger(__name__)
 # Tenant Context
 # ---------------------------------------------------------------------------
 
-_current_tenant = None
+TENANT_CACHE_TTL = float(os.environ.get("TENANT_CACHE_TTL", "60"))  # seconds
+TENANT_CACHE_SIZE = int(os.environ.get("TENANT_CACHE_SIZE", "1024"))
+TENANT_GENERATION_CHECK = float(os.environ.get("TENANT_GENERATION_CHECK", "2"))  # seconds
+
+# Requests under these prefixes never need a tenant.
+_SKIP_PREFIXES = ("/static/", "/health", "/favicon.ico")
+
+_cache = OrderedDict()  # key -> (expires_at, snapshot or None)
+_cache_lock = threading.Lock()
+_generation = {"value": None, "checked_at": 0.0}
 
 
 def get_current_tenant():
-    """Get the current tenant from request context."""
-    return _current_tenant
+    """Get the current tenant (a read-only snapshot) from the request context."""
+    from flask import g, has_app_context
+    if not has_app_context():
+        return None
+    return g.get("tenant")
 
 
 def set_current_tenant(tenant):
-    """Set the current tenant (called by middleware)."""
-    global _current_tenant
-    _current_tenant = tenant
+    """Set the current tenant on the request context (called by middleware)."""
+    from flask import g, has_app_context
+    if has_app_context():
+        g.tenant = tenant
+
+
+# ---------------------------------------------------------------------------
+# Tenant Resolution Cache
+# ---------------------------------------------------------------------------
+
+def _snapshot(tenant):
+    """Detached, session-free copy of a tenant's column values."""
+    if tenant is None:
+        return None
+    from sqlalchemy import inspect as sa_inspect
+    return SimpleNamespace(**{
+        attr.key: copy.deepcopy(getattr(tenant, attr.key))
+        for attr in sa_inspect(type(tenant)).column_attrs
+    })
+
+
+def _tenant_generation() -> Optional[str]:
+    try:
+        from app.services.redis_service import _redis_cache_key, _redis_get
+        raw = _redis_get(_redis_cache_key("tenant_cache_gen"))
+    except Exception:
+        return None
+    return raw.decode("utf-8") if isinstance(raw, bytes) else raw
+
+
+def _check_generation():
+    """Drop the local cache when another worker invalidated tenants."""
+    now = time.monotonic()
+    if now - _generation["checked_at"] < TENANT_GENERATION_CHECK:
+        return
+    generation = _tenant_generation()
+    with _cache_lock:
+        _generation["checked_at"] = now
+        if generation != _generation["value"]:
+            _generation["value"] = generation
+            _cache.clear()
+
+
+def invalidate_tenant_cache() -> None:
+    """
+    Forget cached host/header -> tenant resolutions.
+
+    Other workers notice through a generation key in Redis; without Redis
+    their entries expire after TENANT_CACHE_TTL seconds.
+    """
+    with _cache_lock:
+        _cache.clear()
+    try:
+        from app.services.redis_service import _redis_cache_key, _redis_set
+        _redis_set(_redis_cache_key("tenant_cache_gen"), str(time.time_ns()).encode("utf-8"), ttl=7 * 86400)
+    except Exception as exc:
+        logger.debug("Could not publish tenant cache generation: %s", exc)
+
+
+def _cached(key, load):
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None and entry[0] > now:
+            _cache.move_to_end(key)
+            return entry[1]
+    value = _snapshot(load())
+    with _cache_lock:
+        _cache[key] = (now + TENANT_CACHE_TTL, value)
+        _cache.move_to_end(key)
+        while len(_cache) > TENANT_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return value
+
+
+def _resolve(Tenant, tenant_id_header, host):
+    """Header, subdomain, custom domain, then default tenant; cached per key."""
+    # 1. Check custom header (for API calls)
+    if tenant_id_header:
+        try:
+            tenant_id = int(tenant_id_header)
+        except ValueError:
+            tenant_id = None
+        if tenant_id is not None:
+            tenant = _cached(
+                ("id", tenant_id),
+                lambda: Tenant.query.filter_by(id=tenant_id, is_active=True).first(),
+            )
+            if tenant:
+                return tenant
+
+    # 2. Check subdomain (school1.idcard.com), 3. custom domain (cards.schoolname.com)
+    def by_host():
+        base_domain = os.environ.get("BASE_DOMAIN", "idcard.com")
+        if host != base_domain and host.endswith(f".{base_domain}"):
+            subdomain = host[: -len(base_domain) - 1]
+            tenant = Tenant.query.filter_by(subdomain=subdomain, is_active=True).first()
+            if tenant:
+                return tenant
+        return Tenant.query.filter_by(custom_domain=host, is_active=True).first()
+
+    tenant = _cached(("host", host), by_host)
+    if tenant:
+        return tenant
+
+    # 4. Default tenant (for single-tenant mode)
+    return _cached(("default",), lambda: Tenant.query.filter_by(is_default=True).first())
 
 
 # ---------------------------------------------------------------------------
@@ -50,6 +171,10 @@ def init_tenant_middleware(app):
     Initialize tenant resolution middleware.
     Resolves tenant from subdomain, custom domain, or header.
 
+    Resolutions are cached per header/host for TENANT_CACHE_TTL seconds and
+    dropped when a tenant is committed. Static and health requests are
+    skipped.
+
     Usage:
         from app.services.tenant import init_tenant_middleware
         init_tenant_middleware(app)
@@ -60,39 +185,42 @@ def init_tenant_middleware(app):
         logger.warning("Tenant model not available — multi-tenancy disabled")
         return
 
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+
+    skip_prefixes = _SKIP_PREFIXES
+    if app.static_url_path:
+        skip_prefixes += (app.static_url_path.rstrip("/") + "/",)
+
+    def _mark_tenants_changed(mapper, connection, target):
+        session = Session.object_session(target)
+        if session is not None:
+            session.info["tenants_changed"] = True
+
+    for identifier in ("after_insert", "after_update", "after_delete"):
+        event.listen(Tenant, identifier, _mark_tenants_changed)
+
+    @event.listens_for(Session, "after_commit")
+    def _invalidate_tenants_after_commit(session):
+        if session.info.pop("tenants_changed", False):
+            invalidate_tenant_cache()
+
     @app.before_request
     def resolve_tenant():
         """Resolve the current tenant before each request."""
         from flask import request, g
 
-        tenant = None
-
-        # 1. Check custom header (for API calls)
-        tenant_id = request.headers.get("X-Tenant-ID")
-        if tenant_id:
-            try:
-                tenant = Tenant.query.filter_by(id=int(tenant_id), is_active=True).first()
-            except (ValueError, Exception):
-                pass
-
-        # 2. Check subdomain (school1.idcard.com)
-        if not tenant:
-            host = request.host.split(":")[0]
-            base_domain = os.environ.get("BASE_DOMAIN", "idcard.com")
-            if host != base_domain and host.endswith(f".{base_domain}"):
-                subdomain = host[: -len(base_domain) - 1]
-                tenant = Tenant.query.filter_by(subdomain=subdomain, is_active=True).first()
-
-        # 3. Check custom domain (cards.schoolname.com)
-        if not tenant:
-            host = request.host.split(":")[0]
-            tenant = Tenant.query.filter_by(custom_domain=host, is_active=True).first()
+        if request.endpoint == "static" or request.path.startswith(skip_prefixes):
+            g.tenant = None
+            return
 
-        # 4. Default tenant (for single-tenant mode)
-        if not tenant:
-            tenant = Tenant.query.filter_by(is_default=True).first()
+        _check_generation()
+        try:
+            tenant = _resolve(Tenant, request.headers.get("X-Tenant-ID"), request.host.split(":")[0].lower())
+        except Exception as exc:
+            logger.warning("Tenant resolution failed: %s", exc)
+            tenant = None
 
-        g.tenant = tenant
         set_current_tenant(tenant)
 
 
@@ -3,17 +3,45 @@ Translation and language service.
 
 Handles Google Translate integration, language detection, and text direction.
 Extracted from legacy_app.py.
+
+Translations are memoized in an in-process LRU backed by the shared
+``translation_memory`` table, keyed by language pair and normalized text,
+so every worker reuses what any worker translated. Bulk renders call
+``prefetch_card_translations`` to translate all unique values of a batch
+in a few batched requests before rendering.
 """
 
+import hashlib
 import logging
+import os
 import re
-from functools import lru_cache
+import threading
+import time
+from collections import OrderedDict, defaultdict, namedtuple
+from datetime import datetime, timezone
 
 import requests
 from flask import current_app
+from sqlalchemy import select
 
 logger = logging.getLogger(__name__)
 
+TRANSLATION_LRU_SIZE = int(os.environ.get("TRANSLATION_LRU_SIZE", "8192"))
+TRANSLATION_BATCH_SIZE = max(1, int(os.environ.get("TRANSLATION_BATCH_SIZE", "100")))  # v2 allows 128 per request
+TRANSLATION_CONCURRENCY = int(os.environ.get("TRANSLATION_CONCURRENCY", "4"))
+TRANSLATION_TIMEOUT = float(os.environ.get("TRANSLATION_TIMEOUT", "8"))
+# Failed texts are served untranslated for this long before being retried
+TRANSLATION_FAILURE_TTL = float(os.environ.get("TRANSLATION_FAILURE_TTL", "300"))
+
+_lru = OrderedDict()
+_lru_lock = threading.Lock()
+
+_Failure = namedtuple("_Failure", "expires_at")
+_FAILED = object()
+
+_translator = None
+_translator_lock = threading.Lock()
+
 SUPPORTED_TEMPLATE_LANGUAGES = {"english", "urdu", "hindi", "arabic"}
 LANGUAGE_TO_TRANSLATE_CODE = {
     "english": "en",
@@ -96,63 +124,315 @@ def detect_translation_source_language(raw_text, fallback="english"):
     return str(fallback or "english").strip().lower()
 
 
-@lru_cache(maxsize=4096)
-def _google_translate_text(raw_text, source_language, target_language):
-    """Translate text using Google Translate API (cached)."""
-    text = str(raw_text or "").strip()
-    source = str(source_language or "").strip().lower()
-    target = str(target_language or "").strip().lower()
-    if not text or source == target:
-        return text
+# ---------------------------------------------------------------------------
+# Translation memory
+# ---------------------------------------------------------------------------
+
+def _normalize_text(raw_text):
+    """Collapse runs of spaces and blank lines; line breaks are kept."""
+    lines = (" ".join(line.split()) for line in str(raw_text or "").splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def _text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _lru_get(key):
+    """Cached translation, _FAILED for a recent failure, or None."""
+    with _lru_lock:
+        value = _lru.get(key)
+        if value is None:
+            return None
+        if isinstance(value, _Failure):
+            if value.expires_at <= time.monotonic():
+                del _lru[key]
+                return None
+            return _FAILED
+        _lru.move_to_end(key)
+        return value
 
-    source_code = LANGUAGE_TO_TRANSLATE_CODE.get(source)
-    target_code = LANGUAGE_TO_TRANSLATE_CODE.get(target)
-    if not source_code or not target_code:
-        return text
 
+def _lru_put(key, value):
+    if TRANSLATION_LRU_SIZE <= 0:
+        return
+    with _lru_lock:
+        _lru[key] = value
+        _lru.move_to_end(key)
+        while len(_lru) > TRANSLATION_LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def _lru_put_failure(key):
+    """Remember a failed translation for TRANSLATION_FAILURE_TTL seconds."""
+    if TRANSLATION_FAILURE_TTL > 0:
+        _lru_put(key, _Failure(time.monotonic() + TRANSLATION_FAILURE_TTL))
+
+
+def clear_translation_cache():
+    """Drop the in-process LRU (the translation_memory table is left intact)."""
+    with _lru_lock:
+        _lru.clear()
+
+
+def _memory_table_and_engine():
+    from flask import has_app_context
+    if not has_app_context():
+        return None, None
+    from models import db, TranslationMemory
+    return TranslationMemory.__table__, db.engine
+
+
+def _memory_lookup(source, target, hashes):
+    """Return {text_hash: translated_text} stored in translation_memory."""
+    found = {}
     try:
-        google_api_key = current_app.config.get("GOOGLE_TRANSLATE_API_KEY")
-        if google_api_key:
-            response = requests.post(
-                "https://translation.googleapis.com/language/translate/v2",
-                params={"key": google_api_key},
+        table, engine = _memory_table_and_engine()
+        if table is None:
+            return found
+        hashes = list(hashes)
+        with engine.connect() as conn:
+            for start in range(0, len(hashes), 500):
+                rows = conn.execute(
+                    select(table.c.text_hash, table.c.translated_text).where(
+                        table.c.source_language == source,
+                        table.c.target_language == target,
+                        table.c.text_hash.in_(hashes[start:start + 500]),
+                    )
+                )
+                found.update(rows.all())
+    except Exception as exc:
+        logger.debug("Translation memory lookup failed: %s", exc)
+    return found
+
+
+def _memory_store(source, target, translations):
+    """Persist {text: translated} pairs; rows another worker added first are kept."""
+    if not translations:
+        return
+    try:
+        table, engine = _memory_table_and_engine()
+        if table is None:
+            return
+        now = datetime.now(timezone.utc)
+        rows = [
+            {
+                "source_language": source,
+                "target_language": target,
+                "text_hash": _text_hash(text),
+                "source_text": text,
+                "translated_text": translated,
+                "created_at": now,
+            }
+            for text, translated in translations.items()
+        ]
+        with engine.begin() as conn:
+            dialect = conn.dialect.name
+            if dialect in ("postgresql", "sqlite"):
+                if dialect == "postgresql":
+                    from sqlalchemy.dialects.postgresql import insert
+                else:
+                    from sqlalchemy.dialects.sqlite import insert
+                conn.execute(insert(table).on_conflict_do_nothing(
+                    index_elements=["source_language", "target_language", "text_hash"]
+                ), rows)
+                return
+        from sqlalchemy.exc import IntegrityError
+        for row in rows:
+            try:
+                with engine.begin() as conn:
+                    conn.execute(table.insert().values(**row))
+            except IntegrityError:
+                pass
+    except Exception as exc:
+        logger.debug("Translation memory store failed: %s", exc)
+
+
+# ---------------------------------------------------------------------------
+# Translators
+# ---------------------------------------------------------------------------
+
+class GoogleTranslator:
+    """
+    Google Translate client.
+
+    With GOOGLE_TRANSLATE_API_KEY, each batch is sent as one v2 request; the
+    keyless endpoint takes one text per request, so those are issued
+    TRANSLATION_CONCURRENCY at a time over a pooled session.
+    """
+
+    _V2_URL = "https://translation.googleapis.com/language/translate/v2"
+    _GTX_URL = "https://translate.googleapis.com/translate_a/single"
+
+    def __init__(self):
+        self._session = requests.Session()
+
+    def _api_key(self):
+        from flask import has_app_context
+        if has_app_context():
+            key = current_app.config.get("GOOGLE_TRANSLATE_API_KEY")
+            if key:
+                return key
+        return (os.environ.get("GOOGLE_TRANSLATE_API_KEY") or "").strip() or None
+
+    def translate_batch(self, texts, source_code, target_code):
+        """Translate ``texts``; failed entries come back as None."""
+        api_key = self._api_key()
+        if api_key:
+            return self._translate_v2(api_key, texts, source_code, target_code)
+        if len(texts) == 1:
+            return [self._translate_gtx(texts[0], source_code, target_code)]
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=max(1, TRANSLATION_CONCURRENCY)) as executor:
+            return list(executor.map(lambda text: self._translate_gtx(text, source_code, target_code), texts))
+
+    def _translate_v2(self, api_key, texts, source_code, target_code):
+        try:
+            response = self._session.post(
+                self._V2_URL,
+                params={"key": api_key},
                 json={
-                    "q": text,
+                    "q": texts,
                     "source": source_code,
                     "target": target_code,
                     "format": "text",
                 },
-                timeout=8,
+                timeout=TRANSLATION_TIMEOUT,
             )
             response.raise_for_status()
-            payload = response.json()
-            translated = (
-                payload.get("data", {})
-                .get("translations", [{}])[0]
-                .get("translatedText", "")
+            translations = response.json().get("data", {}).get("translations", [])
+            return [
+                (str(item.get("translatedText") or "").strip() or None) if isinstance(item, dict) else None
+                for item in translations
+            ] + [None] * (len(texts) - len(translations))
+        except Exception as exc:
+            logger.warning("Google translation failed for %s -> %s: %s", source_code, target_code, exc)
+            return [None] * len(texts)
+
+    def _translate_gtx(self, text, source_code, target_code):
+        try:
+            response = self._session.get(
+                self._GTX_URL,
+                params={
+                    "client": "gtx",
+                    "sl": source_code,
+                    "tl": target_code,
+                    "dt": "t",
+                    "q": text,
+                },
+                timeout=TRANSLATION_TIMEOUT,
             )
-            return str(translated or "").strip() or text
-
-        response = requests.get(
-            "https://translate.googleapis.com/translate_a/single",
-            params={
-                "client": "gtx",
-                "sl": source_code,
-                "tl": target_code,
-                "dt": "t",
-                "q": text,
-            },
-            timeout=8,
-        )
-        response.raise_for_status()
-        translated = _extract_google_translate_text(response.json())
-        return translated or text
-    except Exception as exc:
-        logger.warning(
-            "Google translation failed for %s -> %s: %s",
-            source, target, exc,
-        )
-        return text
+            response.raise_for_status()
+            return _extract_google_translate_text(response.json()) or None
+        except Exception as exc:
+            logger.warning("Google translation failed for %s -> %s: %s", source_code, target_code, exc)
+            return None
+
+
+class LocalTranslator:
+    """
+    Offline stand-in (TRANSLATION_BACKEND=local) for tests and benchmarks.
+
+    Returns ``"[<target>] <text>"`` and counts the batches it was asked for.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.texts = 0
+
+    def translate_batch(self, texts, source_code, target_code):
+        self.calls += 1
+        self.texts += len(texts)
+        return [f"[{target_code}] {text}" for text in texts]
+
+
+def get_translator():
+    """Return the process-wide translator (Google unless TRANSLATION_BACKEND=local)."""
+    global _translator
+    with _translator_lock:
+        if _translator is None:
+            backend = os.environ.get("TRANSLATION_BACKEND", "google").strip().lower()
+            _translator = LocalTranslator() if backend == "local" else GoogleTranslator()
+        return _translator
+
+
+def set_translator(translator):
+    """Replace the translator (e.g. with a LocalTranslator in tests)."""
+    global _translator
+    with _translator_lock:
+        _translator = translator
+
+
+def translate_texts(texts, source_language, target_language):
+    """
+    Translate many texts at once.
+
+    Returns ``{text: translation}`` for every input text. Values are served
+    from the in-process LRU, then the shared translation_memory table, and
+    only the remaining unique texts go to the translator in batches of
+    TRANSLATION_BATCH_SIZE.
+    Untranslatable input (unknown language, failed call) maps to itself;
+    failures are not retried for TRANSLATION_FAILURE_TTL seconds.
+    """
+    source = str(source_language or "").strip().lower()
+    target = str(target_language or "").strip().lower()
+    results = {}
+    normalized = {}
+    for raw_text in texts:
+        results[raw_text] = str(raw_text or "").strip()
+        text = _normalize_text(raw_text)
+        if text and source != target:
+            normalized.setdefault(text, []).append(raw_text)
+
+    source_code = LANGUAGE_TO_TRANSLATE_CODE.get(source)
+    target_code = LANGUAGE_TO_TRANSLATE_CODE.get(target)
+    if not normalized or not source_code or not target_code:
+        return results
+
+    translated = {}
+    missing = []
+    for text in normalized:
+        cached = _lru_get((source, target, text))
+        if cached is _FAILED:
+            continue
+        if cached is not None:
+            translated[text] = cached
+        else:
+            missing.append(text)
+
+    if missing:
+        by_hash = {_text_hash(text): text for text in missing}
+        for text_hash, value in _memory_lookup(source, target, by_hash).items():
+            text = by_hash[text_hash]
+            translated[text] = value
+            _lru_put((source, target, text), value)
+        missing = [text for text in missing if text not in translated]
+
+    if missing:
+        fresh = {}
+        translator = get_translator()
+        outputs = []
+        for start in range(0, len(missing), TRANSLATION_BATCH_SIZE):
+            outputs.extend(translator.translate_batch(missing[start:start + TRANSLATION_BATCH_SIZE], source_code, target_code))
+        for text, value in zip(missing, outputs):
+            if value:
+                fresh[text] = value
+                _lru_put((source, target, text), value)
+            else:
+                _lru_put_failure((source, target, text))
+        translated.update(fresh)
+        _memory_store(source, target, fresh)
+
+    for text, raw_texts in normalized.items():
+        for raw_text in raw_texts:
+            if text in translated:
+                results[raw_text] = translated[text]
+    return results
+
+
+def _google_translate_text(raw_text, source_language, target_language):
+    """Translate text using Google Translate API (cached)."""
+    return translate_texts([raw_text], source_language, target_language)[raw_text]
 
 
 def get_template_language_direction_from_obj(template_obj, side="front"):
@@ -181,11 +461,11 @@ def get_template_language_direction_from_obj(template_obj, side="front"):
     return lang, direction
 
 
-def translate_value_for_template_side(template_obj, side, raw_value, *, field_key=None, field_type=None):
-    """Translate a field value for a template side if needed."""
+def _translation_request(template_obj, side, raw_value, field_key=None, field_type=None):
+    """Return (text, source, target) when a value needs translating, else None."""
     text = str(raw_value or "")
     if not template_obj:
-        return text
+        return None
 
     target_language, _ = get_template_language_direction_from_obj(template_obj, side=side)
     source_hint = (
@@ -194,10 +474,48 @@ def translate_value_for_template_side(template_obj, side, raw_value, *, field_ke
     source_language = detect_translation_source_language(text, fallback=source_hint)
 
     if source_language == target_language:
-        return text
+        return None
     if source_language not in SUPPORTED_TEMPLATE_LANGUAGES or target_language not in SUPPORTED_TEMPLATE_LANGUAGES:
-        return text
+        return None
     if _should_skip_translation(text, field_key=field_key, field_type=field_type):
-        return text
+        return None
+    return text, source_language, target_language
+
+
+def translate_value_for_template_side(template_obj, side, raw_value, *, field_key=None, field_type=None):
+    """Translate a field value for a template side if needed."""
+    request = _translation_request(template_obj, side, raw_value, field_key, field_type)
+    if request is None:
+        return str(raw_value or "")
+    return _google_translate_text(*request)
+
 
-    return _google_translate_text(text, source_language, target_language)
+def prefetch_card_translations(template_obj, students_like, sides=("front",)):
+    """
+    Translate every field value and label the card renderer will request.
+
+    Unique texts are grouped per language pair and sent through
+    ``translate_texts``; renders afterwards are served from the cache.
+    Returns the number of unique texts that needed translating.
+    """
+    if not template_obj:
+        return 0
+    from app.services.render_service import _build_card_field_list
+
+    pending = defaultdict(set)
+    for side in sides:
+        lang, _ = get_template_language_direction_from_obj(template_obj, side=side)
+        for student in students_like:
+            for item in _build_card_field_list(student, template_obj, template_obj.id, lang):
+                values = [(item["val"], item.get("key"), item.get("field_type"))]
+                if item.get("translate_label"):
+                    values.append((item["label"], f"{item.get('key')}_LABEL", "label"))
+                for value, field_key, field_type in values:
+                    request = _translation_request(template_obj, side, value, field_key, field_type)
+                    if request is not None:
+                        text, source, target = request
+                        pending[(source, target)].add(text)
+
+    for (source, target), texts in pending.items():
+        translate_texts(list(texts), source, target)
+    return sum(len(texts) for texts in pending.values())
@@ -3,26 +3,40 @@ Webhook service: registration, dispatch, delivery with HMAC signatures.
 
 Provides webhook lifecycle management and asynchronous event delivery
 to registered endpoints with retry logic and delivery logging.
+
+Events are written to the ``webhook_outbox`` table and drained by one
+worker thread per process, which batches events per endpoint, posts
+over pooled keep-alive connections and reschedules failures with
+backoff instead of sleeping. Undelivered rows survive restarts and are
+picked up the next time a worker runs.
 """
 
 import hashlib
 import hmac
 import json
 import logging
+import os
+import threading
 import time
+import uuid
+from collections import defaultdict
 from concurrent.futures import ThreadPoolExecutor
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, List, Optional
 
 import requests
 from flask import current_app
+from sqlalchemy import and_, event, or_, select
+from sqlalchemy.orm import Session
 
 from models import (
     ApiKey,
     db,
     WebhookDelivery,
     WebhookEndpoint,
+    WebhookOutbox,
 )
+from app.services.redis_service import _redis_cache_key, _redis_get, _redis_set
 
 logger = logging.getLogger(__name__)
 
@@ -40,9 +54,6 @@ WEBHOOK_EVENTS = [
     "template.updated",
 ]
 
-# Thread pool for async webhook delivery
-_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="webhook")
-
 # Retry configuration
 _MAX_RETRIES = 3
 _RETRY_BACKOFF_BASE = 2  # seconds: 2, 4, 8
@@ -50,6 +61,25 @@ _RETRY_BACKOFF_BASE = 2  # seconds: 2, 4, 8
 # Request timeout for webhook POST
 _REQUEST_TIMEOUT = 10  # seconds
 
+# Outbox worker configuration
+_BATCH_SIZE = max(1, int(os.environ.get("WEBHOOK_BATCH_SIZE", "50")))
+_CLAIM_LIMIT = int(os.environ.get("WEBHOOK_CLAIM_LIMIT", "500"))
+_DELIVERY_WORKERS = max(1, int(os.environ.get("WEBHOOK_DELIVERY_WORKERS", "4")))
+_POLL_SECONDS = float(os.environ.get("WEBHOOK_OUTBOX_POLL_SECONDS", "30"))
+_CLAIM_TIMEOUT = 300  # seconds before a claimed row is considered abandoned
+_INDEX_TTL = float(os.environ.get("WEBHOOK_INDEX_TTL", "60"))
+_USER_AGENT = "IDCardGenerator-Webhook/1.0"
+
+_index = None
+_index_lock = threading.Lock()
+
+_http = None
+_http_pid = None
+_http_lock = threading.Lock()
+
+_worker = None
+_worker_lock = threading.Lock()
+
 
 def register_webhook(
     url: str,
@@ -171,6 +201,89 @@ def get_delivery_log(
     )
 
 
+# ---------------------------------------------------------------------------
+# Subscription index
+# ---------------------------------------------------------------------------
+
+def _index_generation() -> Optional[str]:
+    try:
+        raw = _redis_get(_redis_cache_key("webhook_index_gen"))
+    except Exception:
+        return None
+    return raw.decode("utf-8") if isinstance(raw, bytes) else raw
+
+
+def invalidate_subscription_index() -> None:
+    """
+    Drop the event -> endpoint index.
+
+    Other workers notice through a generation key in Redis; without Redis
+    their copies expire after WEBHOOK_INDEX_TTL seconds.
+    """
+    global _index
+    with _index_lock:
+        _index = None
+    try:
+        _redis_set(_redis_cache_key("webhook_index_gen"), str(time.time_ns()).encode("utf-8"), ttl=7 * 86400)
+    except Exception as exc:
+        logger.debug("Could not publish webhook index generation: %s", exc)
+
+
+def _subscriptions(event_type: str, organization_id: int = None) -> List[int]:
+    """IDs of active endpoints subscribed to ``event_type``."""
+    global _index
+    generation = _index_generation()
+    with _index_lock:
+        index = _index
+    if (
+        index is None
+        or index["generation"] != generation
+        or time.monotonic() - index["built_at"] > _INDEX_TTL
+    ):
+        by_event = defaultdict(list)
+        rows = db.session.query(
+            WebhookEndpoint.id, WebhookEndpoint.organization_id, WebhookEndpoint.events
+        ).filter(WebhookEndpoint.is_active.is_(True)).all()
+        for webhook_id, org_id, events in rows:
+            for subscribed in events or []:
+                by_event[subscribed].append((webhook_id, org_id))
+        index = {"built_at": time.monotonic(), "generation": generation, "by_event": dict(by_event)}
+        with _index_lock:
+            _index = index
+    return [
+        webhook_id
+        for webhook_id, org_id in index["by_event"].get(event_type, ())
+        if organization_id is None or org_id == organization_id
+    ]
+
+
+@event.listens_for(WebhookEndpoint, "after_insert")
+@event.listens_for(WebhookEndpoint, "after_update")
+@event.listens_for(WebhookEndpoint, "after_delete")
+def _mark_webhooks_changed(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+        session.info["webhooks_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop("webhooks_changed", False):
+        invalidate_subscription_index()
+    app = session.info.pop("webhook_outbox_app", None)
+    if app is not None:
+        start_outbox_worker(app).wake()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_outbox_after_rollback(session):
+    session.info.pop("webhook_outbox_app", None)
+
+
+# ---------------------------------------------------------------------------
+# Dispatch
+# ---------------------------------------------------------------------------
+
 def trigger_event(
     event_type: str,
     payload: Dict[str, Any],
@@ -179,29 +292,41 @@ def trigger_event(
     """
     Dispatch a webhook event to all matching registered endpoints.
 
-    Finds all active webhooks subscribed to the given event and
-    dispatches them asynchronously via ThreadPoolExecutor.
+    Matching endpoints come from the in-memory subscription index. One
+    outbox row per endpoint is written through the caller's session, so the
+    rows commit (or roll back) with the caller's transaction; the delivery
+    worker is woken after the commit. Callers must commit the session.
 
     Args:
         event_type: The event type string (e.g. 'student.created').
         payload: The event payload data.
         organization_id: If provided, only dispatch to this org's webhooks.
     """
-    query = WebhookEndpoint.query.filter_by(is_active=True)
-    if organization_id is not None:
-        query = query.filter_by(organization_id=organization_id)
-    webhooks = query.all()
-
-    matching = [wh for wh in webhooks if event_type in (wh.events or [])]
-    if not matching:
+    webhook_ids = _subscriptions(event_type, organization_id)
+    if not webhook_ids:
         return
 
+    now = datetime.now(timezone.utc)
+    data = json.loads(json.dumps(payload, default=str))
+    rows = [
+        {
+            "webhook_id": webhook_id,
+            "event_type": event_type,
+            "payload_json": data,
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now,
+        }
+        for webhook_id in webhook_ids
+    ]
+    db.session.execute(WebhookOutbox.__table__.insert(), rows)
+
     logger.info(
-        "Triggering event '%s' to %d webhook(s)", event_type, len(matching)
+        "Triggering event '%s' to %d webhook(s)", event_type, len(webhook_ids)
     )
-
-    for webhook in matching:
-        _executor.submit(_deliver_with_retry, webhook.id, event_type, payload)
+    if os.environ.get("WEBHOOK_OUTBOX_WORKER", "true").strip().lower() not in {"0", "false", "no", "off"}:
+        db.session.info["webhook_outbox_app"] = current_app._get_current_object()
 
 
 def dispatch_webhook_event(event_type: str, data: dict) -> None:
@@ -221,40 +346,236 @@ def dispatch_webhook_event(event_type: str, data: dict) -> None:
         logger.exception("dispatch_webhook_event failed for %s", event_type)
 
 
-def _deliver_with_retry(
-    webhook_id: int,
-    event_type: str,
-    payload: Dict[str, Any],
-) -> None:
-    """
-    Deliver a webhook with exponential backoff retry.
+# ---------------------------------------------------------------------------
+# Outbox worker
+# ---------------------------------------------------------------------------
+
+class _OutboxWorker(threading.Thread):
+    """Drains the outbox; sleeps until the next row is due or it is woken."""
+
+    def __init__(self, app):
+        super().__init__(name="webhook-outbox", daemon=True)
+        self.app = app
+        self.pid = os.getpid()
+        self._wake = threading.Event()
+
+    def wake(self):
+        self._wake.set()
+
+    def run(self):
+        while True:
+            self._wake.clear()
+            try:
+                with self.app.app_context():
+                    delay = drain_outbox()
+            except Exception:
+                logger.exception("Webhook outbox drain failed")
+                delay = _POLL_SECONDS
+            self._wake.wait(delay)
+
+
+def start_outbox_worker(app=None) -> _OutboxWorker:
+    """Start (or return) this process's outbox worker thread."""
+    global _worker
+    if app is None:
+        app = current_app._get_current_object()
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive() or _worker.pid != os.getpid():
+            _worker = _OutboxWorker(app)
+            _worker.start()
+        return _worker
+
+
+def _http_session() -> requests.Session:
+    """Process-wide keep-alive session shared by delivery threads."""
+    global _http, _http_pid
+    with _http_lock:
+        if _http is None or _http_pid != os.getpid():
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=_DELIVERY_WORKERS * 2)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["User-Agent"] = _USER_AGENT
+            _http, _http_pid = session, os.getpid()
+        return _http
+
+
+def _claim_due(token: str, limit: int) -> list:
+    """Mark up to ``limit`` due rows as delivering under ``token`` and return them."""
+    table = WebhookOutbox.__table__
+    now = datetime.now(timezone.utc)
+    due = or_(
+        and_(table.c.status == "pending", table.c.next_attempt_at <= now),
+        and_(table.c.status == "delivering", table.c.claimed_at < now - timedelta(seconds=_CLAIM_TIMEOUT)),
+    )
+    with db.engine.begin() as conn:
+        ids = conn.execute(
+            select(table.c.id).where(due).order_by(table.c.next_attempt_at, table.c.id).limit(limit)
+        ).scalars().all()
+        if not ids:
+            return []
+        conn.execute(
+            table.update()
+            .where(table.c.id.in_(ids), due)
+            .values(status="delivering", claim_token=token, claimed_at=now)
+        )
+        return conn.execute(
+            select(table).where(table.c.claim_token == token, table.c.status == "delivering").order_by(table.c.id)
+        ).mappings().all()
+
+
+def _seconds_until_next_due() -> float:
+    table = WebhookOutbox.__table__
+    with db.engine.connect() as conn:
+        next_at = conn.execute(
+            select(table.c.next_attempt_at).where(table.c.status == "pending").order_by(table.c.next_attempt_at).limit(1)
+        ).scalar()
+    if next_at is None:
+        return _POLL_SECONDS
+    if next_at.tzinfo is None:
+        next_at = next_at.replace(tzinfo=timezone.utc)
+    return min(_POLL_SECONDS, max(0.0, (next_at - datetime.now(timezone.utc)).total_seconds()))
+
+
+def _envelope(rows) -> tuple:
+    """Build ``(event_type, timestamp, body)``; several rows become one batch envelope."""
+    timestamp = datetime.now(timezone.utc).isoformat()
+    if len(rows) == 1:
+        row = rows[0]
+        return row["event_type"], timestamp, json.dumps(
+            {"event": row["event_type"], "timestamp": timestamp, "data": row["payload_json"]},
+            default=str,
+        )
+    events = [
+        {
+            "id": row["id"],
+            "event": row["event_type"],
+            "timestamp": row["created_at"].isoformat() if row["created_at"] else timestamp,
+            "data": row["payload_json"],
+        }
+        for row in rows
+    ]
+    return "batch", timestamp, json.dumps({"event": "batch", "timestamp": timestamp, "events": events}, default=str)
+
+
+def _post(url: str, secret: str, event_type: str, timestamp: str, body: str, batch_size: int = 1) -> dict:
+    """POST a signed body; returns the outcome without touching the database."""
+    headers = {
+        "Content-Type": "application/json",
+        "X-Webhook-Signature": f"sha256={_compute_signature(secret or '', body)}",
+        "X-Webhook-Event": event_type,
+        "X-Webhook-Timestamp": timestamp,
+    }
+    if batch_size > 1:
+        headers["X-Webhook-Batch-Size"] = str(batch_size)
+    try:
+        response = _http_session().post(url, data=body, headers=headers, timeout=_REQUEST_TIMEOUT)
+        return {
+            "status_code": response.status_code,
+            "response_body": response.text[:2000],  # Cap response storage
+            "delivered": 200 <= response.status_code < 300,
+            "error": None,
+        }
+    except requests.RequestException as exc:
+        return {"status_code": None, "response_body": None, "delivered": False, "error": str(exc)[:1000]}
 
-    Attempts delivery up to _MAX_RETRIES times with exponential backoff
-    (2s, 4s, 8s). Each attempt is logged as a WebhookDelivery record.
 
-    Args:
-        webhook_id: ID of the webhook endpoint.
-        event_type: The event type string.
-        payload: The event payload data.
+def drain_outbox(limit: int = None) -> float:
     """
-    for attempt in range(_MAX_RETRIES + 1):
-        delivery = deliver_webhook(webhook_id, event_type, payload, attempt)
-        if delivery and delivery.delivered:
-            return
-        if attempt < _MAX_RETRIES:
-            wait = _RETRY_BACKOFF_BASE ** (attempt + 1)
-            logger.warning(
-                "Webhook %d delivery failed (attempt %d/%d), retrying in %ds",
-                webhook_id,
-                attempt + 1,
-                _MAX_RETRIES + 1,
-                wait,
-            )
-            time.sleep(wait)
+    Deliver due outbox rows and return the seconds until the next is due.
 
-    logger.error(
-        "Webhook %d delivery failed after %d attempts", webhook_id, _MAX_RETRIES + 1
-    )
+    Rows are grouped per endpoint into batches of WEBHOOK_BATCH_SIZE and
+    POSTed in parallel over pooled connections. Failures are rescheduled
+    with exponential backoff; after _MAX_RETRIES retries a row is failed.
+    """
+    limit = limit or _CLAIM_LIMIT
+    claimed = _claim_due(uuid.uuid4().hex, limit)
+    if not claimed:
+        return _seconds_until_next_due()
+
+    by_webhook = defaultdict(list)
+    for row in claimed:
+        by_webhook[row["webhook_id"]].append(row)
+    endpoints = {
+        webhook.id: webhook
+        for webhook in WebhookEndpoint.query.filter(WebhookEndpoint.id.in_(list(by_webhook))).all()
+    }
+
+    chunks = []
+    skipped = []
+    for webhook_id, rows in by_webhook.items():
+        webhook = endpoints.get(webhook_id)
+        if webhook is None or not webhook.is_active:
+            skipped.extend(rows)
+            continue
+        for i in range(0, len(rows), _BATCH_SIZE):
+            chunks.append((webhook.id, webhook.url, webhook.secret, rows[i:i + _BATCH_SIZE]))
+
+    def send(chunk):
+        webhook_id, url, secret, rows = chunk
+        event_type, timestamp, body = _envelope(rows)
+        return chunk, event_type, body, _post(url, secret, event_type, timestamp, body, len(rows))
+
+    outcomes = []
+    if chunks:
+        with ThreadPoolExecutor(max_workers=min(_DELIVERY_WORKERS, len(chunks)), thread_name_prefix="webhook") as pool:
+            outcomes = list(pool.map(send, chunks))
+
+    _record_outcomes(outcomes, endpoints, skipped)
+    return 0.0 if len(claimed) >= limit else _seconds_until_next_due()
+
+
+def _record_outcomes(outcomes, endpoints, skipped) -> None:
+    table = WebhookOutbox.__table__
+    now = datetime.now(timezone.utc)
+    for (webhook_id, _url, _secret, rows), event_type, body, result in outcomes:
+        webhook = endpoints[webhook_id]
+        db.session.add(WebhookDelivery(
+            webhook_id=webhook_id,
+            event_type=event_type,
+            payload_json=json.loads(body),
+            status_code=result["status_code"],
+            response_body=result["response_body"],
+            retry_count=max(row["attempts"] for row in rows),
+            delivered=result["delivered"],
+            error_message=result["error"],
+        ))
+        if result["status_code"] is not None:
+            webhook.last_triggered_at = now
+            webhook.last_status_code = result["status_code"]
+        ids = [row["id"] for row in rows]
+        if result["delivered"]:
+            webhook.failure_count = 0
+            db.session.execute(
+                table.update().where(table.c.id.in_(ids))
+                .values(status="delivered", attempts=table.c.attempts + 1, delivered_at=now, claim_token=None, last_error=None)
+            )
+            logger.info(
+                "Webhook %d delivered: event=%s status=%d events=%d",
+                webhook_id, event_type, result["status_code"], len(rows),
+            )
+            continue
+
+        webhook.failure_count = (webhook.failure_count or 0) + 1
+        error = result["error"] or f"HTTP {result['status_code']}"
+        logger.warning("Webhook %d delivery failed: event=%s events=%d error=%s", webhook_id, event_type, len(rows), error)
+        for row in rows:
+            attempts = row["attempts"] + 1
+            values = {"attempts": attempts, "claim_token": None, "last_error": error}
+            if attempts > _MAX_RETRIES:
+                values["status"] = "failed"
+                logger.error("Webhook %d delivery failed after %d attempts (outbox %d)", webhook_id, attempts, row["id"])
+            else:
+                values["status"] = "pending"
+                values["next_attempt_at"] = now + timedelta(seconds=_RETRY_BACKOFF_BASE ** attempts)
+            db.session.execute(table.update().where(table.c.id == row["id"]).values(**values))
+
+    if skipped:
+        db.session.execute(
+            table.update().where(table.c.id.in_([row["id"] for row in skipped]))
+            .values(status="failed", claim_token=None, last_error="Webhook endpoint inactive or deleted")
+        )
+    db.session.commit()
 
 
 def deliver_webhook(
@@ -264,11 +585,10 @@ def deliver_webhook(
     retry_count: int = 0,
 ) -> Optional[WebhookDelivery]:
     """
-    Send an HTTP POST to the webhook URL with HMAC-SHA256 signature.
+    Send a single event to a webhook right away, bypassing the outbox.
 
-    Constructs a JSON payload with event type, timestamp, and data,
-    signs it with the webhook's secret using HMAC-SHA256, and sends
-    it as a POST request. Creates a WebhookDelivery record for the attempt.
+    Signs the JSON envelope with the webhook's secret using HMAC-SHA256,
+    POSTs it over the pooled session and records a WebhookDelivery.
 
     Args:
         webhook_id: ID of the webhook endpoint.
@@ -279,90 +599,31 @@ def deliver_webhook(
     Returns:
         The created WebhookDelivery instance, or None if webhook not found.
     """
-    # Use a new app context since this runs in a thread
-    from app import create_app
-
-    app = create_app()
-    with app.app_context():
-        webhook = db.session.get(WebhookEndpoint, webhook_id)
-        if webhook is None:
-            logger.error("Webhook %d not found", webhook_id)
-            return None
-
-        # Build the delivery envelope
-        timestamp = datetime.now(timezone.utc).isoformat()
-        body = json.dumps(
-            {
-                "event": event_type,
-                "timestamp": timestamp,
-                "data": payload,
-            },
-            default=str,
-        )
-
-        # Compute HMAC-SHA256 signature
-        signature = _compute_signature(webhook.secret or "", body)
-
-        headers = {
-            "Content-Type": "application/json",
-            "X-Webhook-Signature": f"sha256={signature}",
-            "X-Webhook-Event": event_type,
-            "X-Webhook-Timestamp": timestamp,
-            "User-Agent": "IDCardGenerator-Webhook/1.0",
-        }
-
-        delivery = WebhookDelivery(
-            webhook_id=webhook_id,
-            event_type=event_type,
-            payload_json=json.loads(body),
-            retry_count=retry_count,
-        )
-
-        try:
-            response = requests.post(
-                webhook.url,
-                data=body,
-                headers=headers,
-                timeout=_REQUEST_TIMEOUT,
-            )
-            delivery.status_code = response.status_code
-            delivery.response_body = response.text[:2000]  # Cap response storage
-            delivery.delivered = 200 <= response.status_code < 300
-            delivery.error_message = None
-
-            # Update webhook status fields
-            webhook.last_triggered_at = datetime.now(timezone.utc)
-            webhook.last_status_code = response.status_code
-            if not delivery.delivered:
-                webhook.failure_count = (webhook.failure_count or 0) + 1
-            else:
-                webhook.failure_count = 0
-
-            logger.info(
-                "Webhook %d delivered: event=%s status=%d attempt=%d",
-                webhook_id,
-                event_type,
-                response.status_code,
-                retry_count,
-            )
-
-        except requests.RequestException as exc:
-            delivery.status_code = None
-            delivery.response_body = None
-            delivery.delivered = False
-            delivery.error_message = str(exc)[:1000]
-            webhook.failure_count = (webhook.failure_count or 0) + 1
-            logger.warning(
-                "Webhook %d delivery error: event=%s attempt=%d error=%s",
-                webhook_id,
-                event_type,
-                retry_count,
-                exc,
-            )
-
-        db.session.add(delivery)
-        db.session.commit()
-        return delivery
+    webhook = db.session.get(WebhookEndpoint, webhook_id)
+    if webhook is None:
+        logger.error("Webhook %d not found", webhook_id)
+        return None
+
+    row = {"id": None, "event_type": event_type, "payload_json": payload, "created_at": None}
+    event_type, timestamp, body = _envelope([row])
+    result = _post(webhook.url, webhook.secret, event_type, timestamp, body)
+    delivery = WebhookDelivery(
+        webhook_id=webhook_id,
+        event_type=event_type,
+        payload_json=json.loads(body),
+        status_code=result["status_code"],
+        response_body=result["response_body"],
+        retry_count=retry_count,
+        delivered=result["delivered"],
+        error_message=result["error"],
+    )
+    if result["status_code"] is not None:
+        webhook.last_triggered_at = datetime.now(timezone.utc)
+        webhook.last_status_code = result["status_code"]
+    webhook.failure_count = 0 if result["delivered"] else (webhook.failure_count or 0) + 1
+    db.session.add(delivery)
+    db.session.commit()
+    return delivery
 
 
 def _compute_signature(secret: str, body: str) -> str:
@@ -0,0 +1,288 @@
+"""
+Lightweight render tracing: per-stage spans with Chrome trace / OpenTelemetry export.
+
+Every span feeds the ``idcard_render_stage_seconds`` histogram (O(1), always
+on). Full span timelines are only kept for *sampled* traces:
+
+  - a request is sampled with probability ``TRACE_SAMPLE_RATE`` (default 1%),
+    or always when an admin sends ``X-Trace: 1`` / ``?trace=1``;
+  - a card render started outside any request (bulk workers, Celery) opens
+    its own root trace under the same sampling rate.
+
+Finished traces are kept in a small in-memory ring buffer, optionally written
+to ``TRACE_EXPORT_DIR`` as Chrome trace JSON (open in chrome://tracing,
+Perfetto or speedscope), and mirrored to OpenTelemetry when
+``TRACE_EXPORTER=otel`` and the opentelemetry API is installed.
+
+Usage:
+    from app.tracing import span, traced
+
+    with span("render.photo"):
+        ...
+
+    @traced("corel.compose_sheet")
+    def compose(...):
+        ...
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+from app.metrics import observe_render_stage
+
+logger = logging.getLogger(__name__)
+
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "0.01"))
+TRACE_EXPORT_DIR = (os.environ.get("TRACE_EXPORT_DIR") or "").strip()
+TRACE_BUFFER_SIZE = int(os.environ.get("TRACE_BUFFER_SIZE", "50"))
+TRACE_MAX_SPANS = int(os.environ.get("TRACE_MAX_SPANS", "20000"))
+
+_otel_tracer = None
+if (os.environ.get("TRACE_EXPORTER") or "").strip().lower() == "otel":
+    try:
+        from opentelemetry import trace as _otel_trace
+        _otel_tracer = _otel_trace.get_tracer("idcard.render")
+    except ImportError:
+        logger.warning("TRACE_EXPORTER=otel but opentelemetry is not installed — using Chrome trace export only")
+
+_current_trace = contextvars.ContextVar("idcard_current_trace", default=None)
+_recent_traces = deque(maxlen=max(1, TRACE_BUFFER_SIZE))
+_recent_lock = threading.Lock()
+_PID = os.getpid()
+
+
+class Trace:
+    """A sampled timeline of spans, possibly recorded from several threads."""
+
+    def __init__(self, name, attrs=None):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs = dict(attrs or {})
+        self.started_at = time.time()
+        self.duration_ms = None
+        self.events = []
+        self.dropped = 0
+
+    def add(self, name, start_ns, dur_ns, attrs):
+        if len(self.events) >= TRACE_MAX_SPANS:
+            self.dropped += 1
+            return
+        # list.append is atomic, so worker threads can record concurrently.
+        self.events.append((name, start_ns, dur_ns, threading.get_ident(), attrs))
+
+    def summary(self):
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "attrs": self.attrs,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "span_count": len(self.events),
+            "dropped_spans": self.dropped,
+        }
+
+    def to_chrome_trace(self):
+        """Return the trace in Chrome Trace Event format ("X" complete events)."""
+        events = [{
+            "name": name,
+            "cat": name.split(".", 1)[0],
+            "ph": "X",
+            "ts": start_ns / 1000.0,
+            "dur": dur_ns / 1000.0,
+            "pid": _PID,
+            "tid": tid,
+            "args": attrs or {},
+        } for name, start_ns, dur_ns, tid, attrs in self.events]
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": self.summary(),
+        }
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def should_sample():
+    return TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE
+
+
+def begin_trace(name, sampled=None, **attrs):
+    """
+    Open a root trace and make it current. Returns a handle for ``end_trace``.
+
+    Returns None when the trace is not sampled or one is already active.
+    """
+    if _current_trace.get() is not None:
+        return None
+    if sampled is None:
+        sampled = should_sample()
+    if not sampled:
+        return None
+    trace = Trace(name, attrs)
+    token = _current_trace.set(trace)
+    return trace, token, time.perf_counter_ns()
+
+
+def end_trace(handle, record_root=True):
+    if handle is None:
+        return None
+    trace, token, start_ns = handle
+    end_ns = time.perf_counter_ns()
+    if record_root:
+        trace.add(trace.name, start_ns, end_ns - start_ns, trace.attrs)
+    trace.duration_ms = (end_ns - start_ns) / 1e6
+    try:
+        _current_trace.reset(token)
+    except ValueError:
+        # Finished from a different context (e.g. teardown); just detach.
+        _current_trace.set(None)
+    _export(trace)
+    return trace
+
+
+@contextmanager
+def start_trace(name, sampled=None, **attrs):
+    """Root a trace around a block; nests as a plain span if a trace is already active."""
+    if _current_trace.get() is not None:
+        with span(name, **attrs):
+            yield _current_trace.get()
+        return
+    handle = begin_trace(name, sampled=sampled, **attrs)
+    try:
+        # The root span itself goes through span() so it is timed like any stage.
+        with span(name, **attrs):
+            yield handle[0] if handle else None
+    finally:
+        end_trace(handle, record_root=False)
+
+
+@contextmanager
+def span(name, **attrs):
+    """Time a block: always into the stage histogram, and into the current trace if sampled."""
+    trace = _current_trace.get()
+    otel_cm = _otel_tracer.start_as_current_span(name, attributes=attrs or None) if (_otel_tracer and trace) else nullcontext()
+    start_ns = time.perf_counter_ns()
+    try:
+        with otel_cm:
+            yield
+    finally:
+        dur_ns = time.perf_counter_ns() - start_ns
+        observe_render_stage(name, dur_ns / 1e9)
+        if trace is not None:
+            trace.add(name, start_ns, dur_ns, attrs)
+
+
+def traced(name, root=False):
+    """
+    Decorator form of ``span``. With ``root=True`` the call opens its own
+    (sampled) trace when none is active, e.g. a card render in a bulk worker.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if root and _current_trace.get() is None:
+                with start_trace(name):
+                    return fn(*args, **kwargs)
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def propagate(fn):
+    """Bind ``fn`` to the caller's trace context so pool threads record into the same trace."""
+    ctx = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return ctx.copy().run(fn, *args, **kwargs)
+    return wrapper
+
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+def _export(trace):
+    with _recent_lock:
+        _recent_traces.append(trace)
+    if not TRACE_EXPORT_DIR:
+        return
+    try:
+        os.makedirs(TRACE_EXPORT_DIR, exist_ok=True)
+        safe_name = re.sub(r"[^0-9A-Za-z_.-]+", "_", trace.name).strip("_")[:80]
+        filename = f"{int(trace.started_at)}_{safe_name}_{trace.trace_id}.json"
+        with open(os.path.join(TRACE_EXPORT_DIR, filename), "w", encoding="utf-8") as fh:
+            json.dump(trace.to_chrome_trace(), fh, default=str)
+    except Exception as exc:
+        logger.warning("Trace export failed for %s: %s", trace.trace_id, exc)
+
+
+def list_recent_traces():
+    with _recent_lock:
+        return [t.summary() for t in reversed(_recent_traces)]
+
+
+def get_recent_trace(trace_id):
+    with _recent_lock:
+        for trace in _recent_traces:
+            if trace.trace_id == trace_id:
+                return trace
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Flask integration
+# ---------------------------------------------------------------------------
+
+def init_tracing(app):
+    """Sample request traces and expose recent ones to admins as Chrome trace JSON."""
+    from flask import g, jsonify, request, session
+
+    @app.before_request
+    def _begin_request_trace():
+        if request.endpoint == "static":
+            return
+        forced = session.get("admin") is True and (
+            request.headers.get("X-Trace") == "1" or request.args.get("trace") == "1"
+        )
+        g.trace_handle = begin_trace(
+            f"{request.method} {request.url_rule.rule if request.url_rule else request.path}",
+            sampled=True if forced else None,
+            request_id=getattr(g, "request_id", ""),
+        )
+
+    @app.after_request
+    def _end_request_trace(response):
+        trace = end_trace(g.pop("trace_handle", None))
+        if trace is not None:
+            response.headers["X-Trace-Id"] = trace.trace_id
+        return response
+
+    @app.route("/admin/traces")
+    def _list_traces():
+        if not session.get("admin"):
+            return jsonify({"success": False, "error": "Unauthorized"}), 403
+        return jsonify({"success": True, "traces": list_recent_traces()})
+
+    @app.route("/admin/traces/<trace_id>")
+    def _download_trace(trace_id):
+        if not session.get("admin"):
+            return jsonify({"success": False, "error": "Unauthorized"}), 403
+        trace = get_recent_trace(trace_id)
+        if trace is None:
+            return jsonify({"success": False, "error": "Trace not found"}), 404
+        response = jsonify(trace.to_chrome_trace())
+        response.headers["Content-Disposition"] = f"attachment; filename=trace_{trace_id}.json"
+        return response
@@ -32,6 +32,7 @@ logger = logging.getLogger(__name__)
 _FONT_CMAP_CACHE = {}
 _FONT_PIL_CACHE = {}
 _FONT_MISSING_GLYPH_WARNED = set()
+_REQUESTED_FONT_UNSAFE_WARNED = set()
 # Cache for get_available_fonts() — avoids filesystem scan on every admin page load
 _AVAILABLE_FONT_CACHE = None
 _AVAILABLE_FONT_CACHE_TIME = 0
@@ -0,0 +1,12 @@
+"""
+Offline benchmark suite for card rendering, exports and bulk ingestion.
+
+Everything runs against synthetic fixtures (templates, photos, spreadsheets)
+in a throwaway SQLite database, so no live DB, Redis or Cloudinary is needed.
+
+Run:
+    python -m benchmarks.run                      # full suite, compare to baseline
+    python -m benchmarks.run --quick              # smaller workloads (CI smoke)
+    python -m benchmarks.run --only single_render,verify_lookup
+    python -m benchmarks.run --update-baseline    # accept current numbers
+"""
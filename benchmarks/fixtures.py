@@ -0,0 +1,240 @@
+"""
+Synthetic fixtures for the benchmark suite.
+
+Assets are generated deterministically (fixed seeds) into a work directory:
+template backgrounds as PNG and vector PDF, portrait-like photos, and a bulk
+spreadsheet. Templates and students are seeded for three scripts: Latin
+(LTR), Urdu (RTL) and Hindi (Devanagari), using the fonts bundled under
+static/fonts so shaping paths match production.
+"""
+import os
+import random
+
+from PIL import Image, ImageDraw, ImageFilter
+
+CARD_W, CARD_H = 1015, 661
+
+LANGUAGES = {
+    "english": {
+        "direction": "ltr",
+        "font_regular": "arial.ttf",
+        "font_bold": "arialbd.ttf",
+        "first": ["Ayaan", "Zara", "Omar", "Hana", "Ibrahim", "Sara", "Yusuf", "Maryam"],
+        "last": ["Khan", "Ahmed", "Siddiqui", "Qureshi", "Malik", "Hussain"],
+        "classes": ["5A", "6B", "7C", "8A", "9B", "10C"],
+        "address": "House {n}, Street {m}, Block C, Gulshan-e-Iqbal, Karachi",
+    },
+    "urdu": {
+        "direction": "rtl",
+        "font_regular": "NotoNastaliqUrdu-Regular.ttf",
+        "font_bold": "NotoNastaliqUrdu-Medium.ttf",
+        "first": ["محمد", "عائشہ", "عمر", "فاطمہ", "ابراہیم", "زینب", "یوسف", "مریم"],
+        "last": ["خان", "احمد", "صدیقی", "قریشی", "ملک", "حسین"],
+        "classes": ["پنجم", "ششم", "ہفتم", "ہشتم"],
+        "address": "مکان نمبر {n}، گلی {m}، بلاک سی، گلشن اقبال، کراچی",
+    },
+    "hindi": {
+        "direction": "ltr",
+        "font_regular": "TiroDevanagariHindi-Regular.ttf",
+        "font_bold": "TiroDevanagariHindi-Regular.ttf",
+        "first": ["आरव", "अनन्या", "विवान", "दीया", "अर्जुन", "सान्वी", "कबीर", "इशिता"],
+        "last": ["शर्मा", "वर्मा", "गुप्ता", "सिंह", "पटेल", "जोशी"],
+        "classes": ["पाँचवीं", "छठी", "सातवीं", "आठवीं"],
+        "address": "मकान {n}, गली {m}, सेक्टर 12, द्वारका, नई दिल्ली",
+    },
+}
+
+
+def _rng(seed):
+    return random.Random(seed)
+
+
+# ---------------------------------------------------------------------------
+# Assets
+# ---------------------------------------------------------------------------
+
+def make_template_png(path, seed=0, size=(CARD_W, CARD_H)):
+    """A card background with a header band, watermark circles and a photo frame."""
+    rng = _rng(seed)
+    w, h = size
+    img = Image.new("RGB", size, (245, 247, 250))
+    draw = ImageDraw.Draw(img)
+    for y in range(h):
+        shade = 235 + int(15 * y / h)
+        draw.line([(0, y), (w, y)], fill=(shade, shade, 255))
+    draw.rectangle([0, 0, w, int(h * 0.22)], fill=(rng.randint(0, 60), 70, 140))
+    for _ in range(12):
+        cx, cy, r = rng.randint(0, w), rng.randint(0, h), rng.randint(20, 90)
+        draw.ellipse([cx - r, cy - r, cx + r, cy + r], outline=(210, 215, 235), width=3)
+    draw.rectangle([w - 300, 170, w - 60, 480], outline=(30, 30, 30), width=4)
+    img.save(path, format="PNG", optimize=False)
+    return path
+
+
+def make_template_pdf(path, png_path):
+    """A single-page vector PDF template wrapping the PNG background plus vector art."""
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+
+    w_pt, h_pt = CARD_W * 72.0 / 300.0, CARD_H * 72.0 / 300.0
+    c = canvas.Canvas(path, pagesize=(w_pt, h_pt))
+    c.drawImage(ImageReader(png_path), 0, 0, width=w_pt, height=h_pt)
+    c.setStrokeColorRGB(0.1, 0.2, 0.5)
+    c.setLineWidth(1.5)
+    c.roundRect(4, 4, w_pt - 8, h_pt - 8, 6)
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(12, h_pt - 22, "BENCHMARK SCHOOL")
+    c.showPage()
+    c.save()
+    return path
+
+
+def make_photo(path, seed=0, size=(600, 800)):
+    """A portrait-like JPEG: background, shoulders and an oval face with features."""
+    rng = _rng(seed)
+    w, h = size
+    bg = tuple(rng.randint(150, 230) for _ in range(3))
+    img = Image.new("RGB", size, bg)
+    draw = ImageDraw.Draw(img)
+    skin = (rng.randint(170, 230), rng.randint(130, 180), rng.randint(100, 150))
+    draw.ellipse([w * 0.1, h * 0.62, w * 0.9, h * 1.25], fill=tuple(rng.randint(20, 120) for _ in range(3)))
+    draw.ellipse([w * 0.3, h * 0.18, w * 0.7, h * 0.62], fill=skin)
+    for ex in (0.41, 0.59):
+        draw.ellipse([w * (ex - 0.03), h * 0.35, w * (ex + 0.03), h * 0.39], fill=(40, 30, 30))
+    draw.arc([w * 0.42, h * 0.45, w * 0.58, h * 0.53], 20, 160, fill=(120, 40, 40), width=4)
+    img = img.filter(ImageFilter.GaussianBlur(1.2))
+    img.save(path, format="JPEG", quality=90)
+    return path
+
+
+def student_rows(count, language="english", seed=0):
+    """Deterministic student dicts for ``language``."""
+    spec = LANGUAGES[language]
+    rng = _rng(f"{language}:{seed}")
+    rows = []
+    for i in range(count):
+        first, last = rng.choice(spec["first"]), rng.choice(spec["last"])
+        father = f"{rng.choice(spec['first'])} {last}"
+        rows.append({
+            "roll_no": str(1000 + i),
+            "name": f"{first} {last}",
+            "father_name": father,
+            "class_name": rng.choice(spec["classes"]),
+            "dob": f"20{rng.randint(8, 16):02d}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "address": spec["address"].format(n=rng.randint(1, 400), m=rng.randint(1, 40)),
+            "phone": f"+92300{rng.randint(1000000, 9999999)}",
+        })
+    return rows
+
+
+def make_spreadsheet(path, rows, photo_names=None):
+    """Write rows to .xlsx (or .csv by extension), optionally with a photo column."""
+    import pandas as pd
+
+    records = []
+    for i, row in enumerate(rows):
+        record = dict(row)
+        if photo_names:
+            record["photo_filename"] = photo_names[i % len(photo_names)]
+        records.append(record)
+    df = pd.DataFrame.from_records(records)
+    if path.endswith(".csv"):
+        df.to_csv(path, index=False)
+    else:
+        df.to_excel(path, index=False, engine="openpyxl")
+    return path
+
+
+class FixtureSet:
+    """Paths of generated assets inside ``workdir``."""
+
+    def __init__(self, workdir, photo_count=8):
+        self.workdir = os.path.abspath(workdir)
+        self.assets = os.path.join(self.workdir, "assets")
+        os.makedirs(self.assets, exist_ok=True)
+        self.template_png = make_template_png(os.path.join(self.assets, "template_front.png"), seed=1)
+        self.template_back_png = make_template_png(os.path.join(self.assets, "template_back.png"), seed=2)
+        self.template_pdf = make_template_pdf(os.path.join(self.assets, "template_front.pdf"), self.template_png)
+        self.photos = [
+            make_photo(os.path.join(self.assets, f"photo_{i:02d}.jpg"), seed=i)
+            for i in range(photo_count)
+        ]
+
+
+# ---------------------------------------------------------------------------
+# Database seeding
+# ---------------------------------------------------------------------------
+
+def seed_template(db, fixtures, language="english", *, vector=False, double_sided=False):
+    """Create a Template (plus one custom field) for ``language``; returns it."""
+    from models import Template, TemplateField
+
+    spec = LANGUAGES[language]
+    font_settings = {
+        "font_regular": spec["font_regular"],
+        "font_bold": spec["font_bold"],
+        "label_font_size": 34,
+        "value_font_size": 30,
+        "start_y": 190,
+        "line_height": 52,
+        "address_max_lines": 2,
+    }
+    photo_settings = {
+        "enable_photo": True,
+        "photo_x": CARD_W - 290,
+        "photo_y": 180,
+        "photo_width": 220,
+        "photo_height": 290,
+    }
+    qr_settings = {"enable_qr": True, "qr_x": 40, "qr_y": CARD_H - 180, "qr_size": 150}
+    # Absolute paths survive os.path.join(STATIC_DIR, filename) unchanged.
+    template = Template(
+        filename=fixtures.template_pdf if vector else fixtures.template_png,
+        back_filename=fixtures.template_back_png if double_sided else None,
+        school_name=f"Benchmark School ({language})",
+        font_settings=font_settings,
+        photo_settings=photo_settings,
+        qr_settings=qr_settings,
+        back_font_settings=dict(font_settings),
+        back_photo_settings={"enable_photo": False},
+        back_qr_settings=dict(qr_settings),
+        card_orientation="landscape",
+        is_double_sided=double_sided,
+        language=language,
+        text_direction=spec["direction"],
+        back_language=language,
+        back_text_direction=spec["direction"],
+        card_width=CARD_W,
+        card_height=CARD_H,
+    )
+    db.session.add(template)
+    db.session.flush()
+    db.session.add(TemplateField(
+        template_id=template.id, field_name="roll_no", field_label="Roll No",
+        field_type="text", display_order=1,
+    ))
+    db.session.commit()
+    return template
+
+
+def seed_students(db, template, fixtures, count, language="english"):
+    """Insert ``count`` students for ``template`` with local photos; returns their ids."""
+    from models import Student
+    from utils import generate_data_hash
+
+    students = []
+    for i, row in enumerate(student_rows(count, language, seed=template.id)):
+        photo = fixtures.photos[i % len(fixtures.photos)]
+        form = {k: row[k] for k in ("name", "father_name", "class_name", "dob", "address", "phone")}
+        form["template_id"] = template.id
+        students.append(Student(
+            template_id=template.id,
+            school_name=template.school_name,
+            photo_filename=photo,
+            custom_data={"roll_no": row["roll_no"]},
+            data_hash=generate_data_hash(form, f"{photo}:{i}"),
+            **{k: row[k] for k in ("name", "father_name", "class_name", "dob", "address", "phone")},
+        ))
+    db.session.add_all(students)
+    db.session.commit()
+    return [s.id for s in students]
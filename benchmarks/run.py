@@ -0,0 +1,255 @@
+"""
+Benchmark runner: executes scenarios offline and compares them with a baseline.
+
+Each scenario runs in a fresh interpreter with its own SQLite database and
+fixture directory, so peak RSS and warm caches are attributable to that
+scenario alone. Results are written as JSON; with a baseline present, the
+run exits non-zero when a scenario's p95 latency, throughput or peak RSS
+regresses beyond the tolerance.
+
+Run:
+    python -m benchmarks.run [--quick] [--only a,b] [--output results.json]
+                             [--baseline benchmarks/baseline.json] [--tolerance 0.25]
+                             [--update-baseline]
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, "benchmarks", "baseline.json")
+DEFAULT_TOLERANCE = float(os.environ.get("BENCH_TOLERANCE", "0.25"))
+# Peak RSS is noisier across machines than latency; allow more headroom.
+RSS_TOLERANCE = float(os.environ.get("BENCH_RSS_TOLERANCE", "0.5"))
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def summarize(samples, items):
+    ordered = sorted(samples)
+    total = sum(samples)
+    ms = lambda v: None if v is None else round(v * 1000.0, 2)
+    return {
+        "iterations": len(samples),
+        "items": items,
+        "total_s": round(total, 4),
+        "throughput_per_s": round(items / total, 3) if total > 0 else None,
+        "latency_ms": {
+            "mean": ms(total / len(samples)) if samples else None,
+            "p50": ms(_percentile(ordered, 50)),
+            "p90": ms(_percentile(ordered, 90)),
+            "p95": ms(_percentile(ordered, 95)),
+            "p99": ms(_percentile(ordered, 99)),
+            "max": ms(ordered[-1]) if ordered else None,
+        },
+    }
+
+
+# ---------------------------------------------------------------------------
+# Worker (one scenario per process)
+# ---------------------------------------------------------------------------
+
+def _offline_env(workdir):
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "STORAGE_BACKEND": "local",
+        "SECRET_KEY": env.get("SECRET_KEY") or "benchmark-secret",
+        "FLASK_ENV": "development",
+        "TRACE_SAMPLE_RATE": "0",
+        "GOOGLE_TRANSLATE_API_KEY": "",
+        "PYTHONPATH": os.pathsep.join(p for p in (REPO_ROOT, env.get("PYTHONPATH")) if p),
+    })
+    for key in ("REDIS_URL", "REDIS_HOST", "CELERY_BROKER_URL", "SENTRY_DSN", "PROMETHEUS_MULTIPROC_DIR"):
+        env.pop(key, None)
+    return env
+
+
+def run_worker(name, workdir, quick):
+    """Entry point of the child process: build fixtures, run one scenario, print JSON."""
+    import logging
+    logging.disable(logging.WARNING)
+
+    from benchmarks.fixtures import FixtureSet
+    from benchmarks.scenarios import SCENARIOS, BenchContext
+
+    fixtures = FixtureSet(workdir)
+    from app import create_app
+    from models import db
+    app = create_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+
+    rss_before = _peak_rss_mb()
+    started = time.perf_counter()
+    result = SCENARIOS[name](BenchContext(app, db, fixtures, quick=quick))
+    payload = summarize(result.samples, result.items)
+    payload.update({
+        "unit": result.unit,
+        "wall_s": round(time.perf_counter() - started, 3),
+        "peak_rss_mb": _peak_rss_mb(),
+        "rss_at_start_mb": rss_before,
+        "notes": result.notes,
+    })
+    sys.stdout.write("\n@@BENCH@@" + json.dumps(payload) + "\n")
+
+
+def run_scenario(name, quick, keep=False):
+    workdir = tempfile.mkdtemp(prefix=f"idcard-bench-{name}-")
+    cmd = [sys.executable, "-m", "benchmarks.run", "--worker", name, "--workdir", workdir]
+    if quick:
+        cmd.append("--quick")
+    try:
+        proc = subprocess.run(cmd, cwd=workdir, env=_offline_env(workdir), capture_output=True, text=True)
+    finally:
+        if not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+    marker = proc.stdout.rfind("@@BENCH@@")
+    if proc.returncode != 0 or marker < 0:
+        tail = (proc.stderr or proc.stdout or "").strip().splitlines()[-15:]
+        return {"error": "\n".join(tail) or f"exit code {proc.returncode}"}
+    return json.loads(proc.stdout[marker + len("@@BENCH@@"):].strip())
+
+
+# ---------------------------------------------------------------------------
+# Baseline comparison
+# ---------------------------------------------------------------------------
+
+def compare(results, baseline, tolerance):
+    """Return a list of human-readable regressions against ``baseline``."""
+    regressions = []
+    for name, current in results.items():
+        base = (baseline.get("scenarios") or {}).get(name)
+        if not base or "error" in current or "error" in base:
+            continue
+        p95, base_p95 = current["latency_ms"]["p95"], base["latency_ms"]["p95"]
+        if p95 and base_p95 and p95 > base_p95 * (1 + tolerance):
+            regressions.append(f"{name}: p95 {p95:.1f}ms vs baseline {base_p95:.1f}ms")
+        tput, base_tput = current.get("throughput_per_s"), base.get("throughput_per_s")
+        if tput and base_tput and tput < base_tput / (1 + tolerance):
+            regressions.append(f"{name}: throughput {tput:.2f}/s vs baseline {base_tput:.2f}/s")
+        rss, base_rss = current.get("peak_rss_mb"), base.get("peak_rss_mb")
+        if rss and base_rss and rss > base_rss * (1 + RSS_TOLERANCE):
+            regressions.append(f"{name}: peak RSS {rss:.0f}MB vs baseline {base_rss:.0f}MB")
+    return regressions
+
+
+def _machine():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def main(argv=None):
+    from benchmarks.scenarios import SCENARIOS
+
+    parser = argparse.ArgumentParser(description="Offline ID card benchmark suite")
+    parser.add_argument("--only", help="comma-separated scenario names")
+    parser.add_argument("--quick", action="store_true", help="smaller workloads")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--keep-workdir", action="store_true")
+    parser.add_argument("--list", action="store_true")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(args.worker, args.workdir, args.quick)
+        return 0
+    if args.list:
+        for name, fn in SCENARIOS.items():
+            print(f"{name:<24} {(fn.__doc__ or '').strip()}")
+        return 0
+
+    names = [n.strip() for n in args.only.split(",")] if args.only else list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    results = {}
+    for name in names:
+        print(f"{name:<24}", end=" ", flush=True)
+        res = results[name] = run_scenario(name, args.quick, keep=args.keep_workdir)
+        if "error" in res:
+            print("ERROR\n    " + res["error"].replace("\n", "\n    "))
+            continue
+        lat = res["latency_ms"]
+        print(
+            f"p50 {lat['p50']:>9.1f}ms  p95 {lat['p95']:>9.1f}ms  "
+            f"{res['throughput_per_s']:>8.2f} {res['unit']}/s  peak RSS {res['peak_rss_mb']}MB"
+        )
+
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "quick": args.quick,
+        "machine": _machine(),
+        "scenarios": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    failed = [n for n, r in results.items() if "error" in r]
+    profile = "quick" if args.quick else "full"
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+
+    if args.update_baseline:
+        if failed:
+            print(f"Not updating baseline: {', '.join(failed)} failed")
+            return 1
+        entry = baseline.setdefault("profiles", {}).setdefault(profile, {})
+        entry.setdefault("scenarios", {}).update(results)
+        entry.update({k: report[k] for k in ("generated_at", "machine")})
+        with open(args.baseline, "w", encoding="utf-8") as fh:
+            json.dump(baseline, fh, indent=2)
+            fh.write("\n")
+        print(f"Baseline ({profile}) updated: {args.baseline}")
+        return 0
+
+    baseline = (baseline.get("profiles") or {}).get(profile)
+    if not baseline:
+        print(f"No {profile} baseline found; run with --update-baseline to record one.")
+        return 1 if failed else 0
+    if baseline.get("machine", {}).get("cpu_count") != os.cpu_count():
+        print("Note: baseline was recorded on a machine with a different CPU count.")
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print(f"No regressions beyond {args.tolerance:.0%} of baseline.")
+    return 1 if (regressions or failed) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
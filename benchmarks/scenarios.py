@@ -0,0 +1,256 @@
+"""
+Benchmark scenarios.
+
+Each scenario takes a ``BenchContext`` and returns a ``Result``: one latency
+sample per measured operation plus the number of items (cards, rows,
+lookups) those operations produced. Warm-up work happens before timing so
+template decode and font loading are not billed to the first sample.
+"""
+import os
+import time
+import uuid
+
+from benchmarks.fixtures import seed_students, seed_template, student_rows, make_spreadsheet
+
+
+class Result:
+    def __init__(self, samples, items, unit="items", notes=None):
+        self.samples = samples
+        self.items = items
+        self.unit = unit
+        self.notes = notes or {}
+
+
+class BenchContext:
+    def __init__(self, app, db, fixtures, quick=False):
+        self.app = app
+        self.db = db
+        self.fixtures = fixtures
+        self.quick = quick
+
+    def size(self, full, quick):
+        return quick if self.quick else full
+
+    def admin_client(self):
+        client = self.app.test_client()
+        with client.session_transaction() as sess:
+            sess["admin"] = True
+            sess["admin_role"] = "super_admin"
+        return client
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    value = fn(*args, **kwargs)
+    return time.perf_counter() - start, value
+
+
+def _student_like(row, template, fixtures, i, fields):
+    from types import SimpleNamespace
+    return SimpleNamespace(
+        id=None,
+        photo_url=None,
+        photo_filename=fixtures.photos[i % len(fixtures.photos)],
+        image_url=None,
+        custom_data={"roll_no": row["roll_no"]},
+        school_name=template.school_name,
+        _template_fields=fields,
+        _prepared_photo_cache={},
+        **{k: row[k] for k in ("name", "father_name", "class_name", "dob", "address", "phone")},
+    )
+
+
+# ---------------------------------------------------------------------------
+# Rendering
+# ---------------------------------------------------------------------------
+
+def single_render(ctx):
+    """One front side per call, across LTR, RTL and Devanagari templates."""
+    from models import TemplateField
+    from app.services.render_service import render_student_card_side
+
+    per_language = ctx.size(12, 3)
+    samples = []
+    with ctx.app.app_context():
+        for language in ("english", "urdu", "hindi"):
+            template = seed_template(ctx.db, ctx.fixtures, language)
+            fields = TemplateField.query.filter_by(template_id=template.id).all()
+            rows = student_rows(per_language + 1, language)
+            render_student_card_side(template, _student_like(rows[0], template, ctx.fixtures, 0, fields), side="front")
+            for i, row in enumerate(rows[1:], start=1):
+                student = _student_like(row, template, ctx.fixtures, i, fields)
+                elapsed, image = _timed(render_student_card_side, template, student, side="front")
+                if image is None:
+                    raise RuntimeError(f"render returned no image for {language}")
+                samples.append(elapsed)
+    return Result(samples, len(samples), unit="cards")
+
+
+def parallel_bulk_render(ctx):
+    """``bulk_render_students`` on the worker count production picks."""
+    from models import TemplateField
+    from app.services.parallel_render import bulk_render_students, get_optimal_workers
+
+    batch = ctx.size(48, 12)
+    repeats = ctx.size(3, 1)
+    samples = []
+    with ctx.app.app_context():
+        template = seed_template(ctx.db, ctx.fixtures, "english")
+        fields = TemplateField.query.filter_by(template_id=template.id).all()
+        photo_cache = {}
+
+        def make_batch():
+            out = []
+            for i, row in enumerate(student_rows(batch, "english", seed=len(samples))):
+                data = {k: row[k] for k in ("name", "father_name", "class_name", "dob", "address", "phone")}
+                data.update({
+                    "photo_url": None,
+                    "photo_filename": ctx.fixtures.photos[i % len(ctx.fixtures.photos)],
+                    "custom_data": {"roll_no": row["roll_no"]},
+                    "school_name": template.school_name,
+                    "_template_fields": fields,
+                    "_prepared_photo_cache": photo_cache,
+                })
+                out.append(data)
+            return out
+
+        workers = get_optimal_workers(batch)
+        bulk_render_students(ctx.app, template, make_batch()[:4], max_workers=workers)
+        for _ in range(repeats):
+            elapsed, results = _timed(bulk_render_students, ctx.app, template, make_batch(), max_workers=workers)
+            failed = [r for r in results if not r.get("success")]
+            if failed:
+                raise RuntimeError(f"{len(failed)} cards failed: {failed[0].get('error')}")
+            samples.append(elapsed)
+    return Result(samples, batch * repeats, unit="cards", notes={"workers": workers, "batch": batch})
+
+
+# ---------------------------------------------------------------------------
+# PDF exports
+# ---------------------------------------------------------------------------
+
+def _export_pdf(ctx, *, vector, mode, language):
+    cards = ctx.size(10, 4)
+    repeats = ctx.size(3, 1)
+    samples = []
+    with ctx.app.app_context():
+        template = seed_template(ctx.db, ctx.fixtures, language, vector=vector)
+        seed_students(ctx.db, template, ctx.fixtures, cards, language)
+        template_id = template.id
+    client = ctx.admin_client()
+    url = f"/corel/download_compiled_vector_pdf/{template_id}?mode={mode}"
+    warm = client.get(url)
+    if warm.status_code != 200 or not warm.data.startswith(b"%PDF"):
+        raise RuntimeError(f"{mode} export failed: HTTP {warm.status_code} {warm.data[:200]!r}")
+    size = len(warm.data)
+    for _ in range(repeats):
+        elapsed, response = _timed(client.get, url)
+        if response.status_code != 200:
+            raise RuntimeError(f"{mode} export failed: HTTP {response.status_code}")
+        samples.append(elapsed)
+    return Result(samples, cards * repeats, unit="cards", notes={"pdf_bytes": size, "cards_per_sheet": cards})
+
+
+def sheet_pdf_print(ctx):
+    """Print-mode sheet PDF from a raster template."""
+    return _export_pdf(ctx, vector=False, mode="print", language="english")
+
+
+def corel_editable_export(ctx):
+    """Corel editable export over a vector PDF template with RTL text."""
+    return _export_pdf(ctx, vector=True, mode="editable", language="urdu")
+
+
+# ---------------------------------------------------------------------------
+# Ingestion and lookups
+# ---------------------------------------------------------------------------
+
+def bulk_ingestion(ctx):
+    """Spreadsheet -> rendered cards -> committed students, via the bulk worker."""
+    from app.legacy_app import background_bulk_generate
+    from app.services.bulk_job_service import _get_bulk_job_state
+    from utils import GENERATED_FOLDER
+    from models import Student
+
+    rows_per_job = ctx.size(40, 10)
+    repeats = ctx.size(2, 1)
+    samples = []
+    photo_map = {os.path.basename(p).lower(): p for p in ctx.fixtures.photos}
+    photo_names = sorted(photo_map)
+    with ctx.app.app_context():
+        template = seed_template(ctx.db, ctx.fixtures, "english")
+        template_id = template.id
+
+    def cleanup():
+        with ctx.app.app_context():
+            for student in Student.query.filter_by(template_id=template_id).all():
+                for name in (student.generated_filename, student.back_generated_filename):
+                    path = os.path.join(GENERATED_FOLDER, name) if name else None
+                    if path and os.path.exists(path):
+                        os.remove(path)
+                ctx.db.session.delete(student)
+            ctx.db.session.commit()
+
+    try:
+        for run in range(repeats):
+            sheet = make_spreadsheet(
+                os.path.join(ctx.fixtures.assets, f"bulk_{run}.xlsx"),
+                student_rows(rows_per_job, "english", seed=run),
+                photo_names=photo_names,
+            )
+            task_id = f"bench-{uuid.uuid4().hex}"
+            elapsed, _ = _timed(background_bulk_generate, task_id, template_id, sheet, photo_map)
+            state = _get_bulk_job_state(task_id) or {}
+            with ctx.app.app_context():
+                created = Student.query.filter_by(template_id=template_id).count()
+            if state.get("state") != "SUCCESS" or created != rows_per_job:
+                raise RuntimeError(
+                    f"bulk job ended in state {state.get('state')} with {created}/{rows_per_job} rows: {state.get('result')}"
+                )
+            samples.append(elapsed)
+            cleanup()
+    finally:
+        cleanup()
+    return Result(samples, rows_per_job * repeats, unit="rows")
+
+
+def verify_lookup(ctx):
+    """Public /verify lookups: signed tokens and legacy ID fallbacks."""
+    from app.extensions import limiter
+    from app.services.premium_service import build_signed_verify_token
+
+    lookups = ctx.size(200, 40)
+    with ctx.app.app_context():
+        template = seed_template(ctx.db, ctx.fixtures, "english")
+        ids = seed_students(ctx.db, template, ctx.fixtures, ctx.size(500, 100))
+        template_id = template.id
+    secret = os.environ.get("SECRET_KEY", "dev-key")
+    paths = []
+    for i in range(lookups):
+        sid = ids[(i * 7) % len(ids)]
+        if i % 2:
+            paths.append(f"/verify/{sid}")
+        else:
+            token = build_signed_verify_token(secret, sid, template_id, f"bench-{i}")
+            paths.append(f"/verify/v2/{token}")
+
+    limiter.enabled = False
+    client = ctx.app.test_client()
+    client.get(paths[0])
+    samples = []
+    for path in paths:
+        elapsed, response = _timed(client.get, path)
+        if response.status_code >= 400:
+            raise RuntimeError(f"verify lookup failed: HTTP {response.status_code} for {path}")
+        samples.append(elapsed)
+    return Result(samples, len(samples), unit="lookups")
+
+
+SCENARIOS = {
+    "single_render": single_render,
+    "parallel_bulk_render": parallel_bulk_render,
+    "sheet_pdf_print": sheet_pdf_print,
+    "corel_editable_export": corel_editable_export,
+    "bulk_ingestion": bulk_ingestion,
+    "verify_lookup": verify_lookup,
+}
@@ -4,6 +4,7 @@ Handles all image uploads to Cloudinary
 """
 
 import os
+import time
 import logging
 import cloudinary
 import cloudinary.uploader
@@ -37,6 +38,23 @@ if not CLOUDINARY_CONFIGURED:
         logger.info("Cloudinary credentials not found; app will use local filesystem storage unless configured otherwise.")
 
 
+def _upload_span(resource_type):
+    try:
+        from app.tracing import span
+        return span("storage.upload", backend="cloudinary", resource_type=resource_type)
+    except Exception:
+        from contextlib import nullcontext
+        return nullcontext()
+
+
+def _observe_upload(resource_type, seconds, ok):
+    try:
+        from app.metrics import observe_upload
+        observe_upload("cloudinary", resource_type, seconds, ok=ok)
+    except Exception:
+        pass
+
+
 def upload_image(file_bytes, folder='generated', resource_type='image', format=None):
     """
     Upload image bytes to Cloudinary.
@@ -98,11 +116,18 @@ def upload_image(file_bytes, folder='generated', resource_type='image', format=N
             else:
                 file_obj.name = "upload.bin"
         
-        result = cloudinary.uploader.upload(
-            file_obj,
-            public_id=public_id,
-            **upload_options
-        )
+        upload_started = time.perf_counter()
+        try:
+            with _upload_span(resource_type):
+                result = cloudinary.uploader.upload(
+                    file_obj,
+                    public_id=public_id,
+                    **upload_options
+                )
+        except Exception:
+            _observe_upload(resource_type, time.perf_counter() - upload_started, ok=False)
+            raise
+        _observe_upload(resource_type, time.perf_counter() - upload_started, ok=True)
         
         upload_url = result.get("secure_url") or result.get("url")
         if upload_url and upload_url.startswith("http://"):
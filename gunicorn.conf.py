@@ -3,8 +3,32 @@ Production gunicorn configuration.
 Usage: gunicorn -c gunicorn.conf.py "app:create_app()"
 """
 import os
+import glob
 import multiprocessing
 
+# Prometheus multiprocess mode: every worker writes metric samples to mmap files
+# here and /metrics aggregates them. Must be set before prometheus_client is
+# imported (preload_app imports the app right after this file is read).
+# gunicorn gets its own subdirectory of IDCARD_METRICS_DIR (Celery uses the
+# "celery" one), so clearing the previous run's samples never touches files
+# of other processes. HUP reloads and USR2 re-execs inherit the marker and
+# keep the live workers' files.
+if "IDCARD_METRICS_MASTER_PID" not in os.environ:
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = os.path.join(
+        os.environ.setdefault(
+            "IDCARD_METRICS_DIR", os.environ.get("PROMETHEUS_MULTIPROC_DIR", "/tmp/idcard-prometheus")
+        ),
+        "gunicorn",
+    )
+    os.environ["IDCARD_METRICS_MASTER_PID"] = str(os.getpid())
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+    for _stale in glob.glob(os.path.join(os.environ["PROMETHEUS_MULTIPROC_DIR"], "*.db")):
+        try:
+            os.remove(_stale)
+        except OSError:
+            pass
+PROMETHEUS_MULTIPROC_DIR = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+
 # Server socket
 bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
 backlog = 2048
@@ -40,8 +64,11 @@ secure_scheme_headers = {"X-Forwarded-Proto": "https"}
 
 
 def on_starting(server):
-    """Called just before the master process is initialized."""
-    pass
+    """Run schema migrations once in the master; workers skip them on import."""
+    if (os.environ.get("RUN_MIGRATIONS_ON_STARTUP") or "auto").strip().lower() in {"0", "false", "no", "off"}:
+        return
+    from app.legacy_app import run_startup_tasks
+    run_startup_tasks()
 
 
 def post_fork(server, worker):
@@ -57,3 +84,12 @@ def pre_exec(server):
 def worker_exit(server, worker):
     """Called when a worker exits."""
     server.log.info("Worker exited (pid: %s)", worker.pid)
+
+
+def child_exit(server, worker):
+    """Called in the master after a worker exits; drop its live gauge samples."""
+    try:
+        from app.metrics import mark_process_dead
+        mark_process_dead(worker.pid)
+    except Exception as exc:
+        server.log.warning("Could not clean metrics for pid %s: %s", worker.pid, exc)
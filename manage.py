@@ -3,11 +3,13 @@ Management CLI commands for the ID Card Generator.
 
 Usage:
     python manage.py migrate          — Run pending migrations
+    python manage.py profile-imports  — Show what the app factory spends boot time importing
     python manage.py migrate-create   — Create new migration
     python manage.py create-admin     — Create admin user
     python manage.py verify-fonts     — Verify font availability
     python manage.py health           — Run health check
     python manage.py stats            — Show database statistics
+    python manage.py reconcile-analytics — Rebuild analytics rollups from the source tables
 """
 import os
 import sys
@@ -25,11 +27,46 @@ def cli():
 
 @cli.command()
 def migrate():
-    """Run database migrations."""
-    from app.legacy_app import app, migrate_database
-    with app.app_context():
-        migrate_database()
-        click.echo("✓ Migrations complete")
+    """Run database migrations and startup data repairs (once per deploy)."""
+    from app.legacy_app import run_startup_tasks
+    run_startup_tasks()
+    click.echo("✓ Migrations complete")
+
+
+@cli.command()
+@click.option("--top", default=25, show_default=True, help="Rows to show")
+@click.option("--self-time", is_flag=True, help="Sort by self time instead of cumulative")
+def profile_imports(top, self_time):
+    """Profile `create_app()` imports with `python -X importtime`."""
+    import subprocess
+    import time
+
+    env = dict(os.environ, RUN_MIGRATIONS_ON_STARTUP="false")
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "from app import create_app; create_app()"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            rows.append((int(parts[0]), int(parts[1]), parts[2].rstrip()))
+        except ValueError:
+            continue
+    if proc.returncode != 0 or not rows:
+        click.echo(proc.stderr[-2000:], err=True)
+        sys.exit(1)
+
+    click.echo(f"create_app() boot: {wall:.2f}s wall, {len(rows)} modules imported")
+    click.echo(f"{'self ms':>9} {'cumul ms':>9}  module")
+    key = (lambda r: r[0]) if self_time else (lambda r: r[1])
+    for self_us, cumulative_us, name in sorted(rows, key=key, reverse=True)[:top]:
+        click.echo(f"{self_us / 1000:>9.1f} {cumulative_us / 1000:>9.1f}  {name}")
 
 
 @cli.command()
@@ -97,6 +134,17 @@ def stats():
             click.echo(f"  Uploads:     {file_count} files ({total_size / 1024 / 1024:.1f} MB)")
 
 
+@cli.command()
+def reconcile_analytics():
+    """Rebuild analytics rollups from the source tables."""
+    from app.legacy_app import app
+    from app.services.analytics_service import reconcile_rollups
+
+    with app.app_context():
+        result = reconcile_rollups()
+        click.echo(f"✓ Analytics rollups rebuilt: {result['rows']} rows")
+
+
 @cli.command()
 def create_admin():
     """Create a new admin user interactively."""
@@ -0,0 +1,29 @@
+"""Add composite index for the print agents' claim query
+
+Revision ID: 60a1b2c3d4e5
+Revises: 50a1b2c3d4e5
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '60a1b2c3d4e5'
+down_revision = '50a1b2c3d4e5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() does not add indexes to the existing print_queue table.
+    # Using IF NOT EXISTS so databases that already have it are left alone.
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_print_queue_claim "
+        "ON print_queue (status, printer_name, priority, created_at)"
+    )
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_print_queue_claim")
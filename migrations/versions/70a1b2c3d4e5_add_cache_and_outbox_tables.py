@@ -0,0 +1,87 @@
+"""Add photo analysis, webhook outbox, analytics rollup and translation memory tables
+
+Revision ID: 70a1b2c3d4e5
+Revises: 60a1b2c3d4e5
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '70a1b2c3d4e5'
+down_revision = '60a1b2c3d4e5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() may already have created these tables; leave them alone.
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    # PhotoAnalysis
+    if 'photo_analyses' not in existing:
+        op.create_table('photo_analyses',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('content_hash', sa.String(64), unique=True, nullable=False, index=True),
+            sa.Column('width', sa.Integer()),
+            sa.Column('height', sa.Integer()),
+            sa.Column('exif_orientation', sa.Integer()),
+            sa.Column('face_analyzed', sa.Boolean(), nullable=False, server_default=sa.false()),
+            sa.Column('face_box', sa.JSON()),
+            sa.Column('quality_score', sa.Float()),
+            sa.Column('quality_status', sa.String(20)),
+            sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+            sa.Column('updated_at', sa.DateTime()),
+        )
+
+    # WebhookOutbox
+    if 'webhook_outbox' not in existing:
+        op.create_table('webhook_outbox',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('webhook_id', sa.Integer(), sa.ForeignKey('webhook_endpoints.id', ondelete='CASCADE'), nullable=False, index=True),
+            sa.Column('event_type', sa.String(100), nullable=False),
+            sa.Column('payload_json', sa.JSON()),
+            sa.Column('status', sa.String(20), nullable=False, server_default='pending'),
+            sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('next_attempt_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+            sa.Column('claim_token', sa.String(32), nullable=True),
+            sa.Column('claimed_at', sa.DateTime(), nullable=True),
+            sa.Column('last_error', sa.Text()),
+            sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+            sa.Column('delivered_at', sa.DateTime(), nullable=True),
+            sa.Index('ix_webhook_outbox_due', 'status', 'next_attempt_at'),
+        )
+
+    # AnalyticsRollup
+    if 'analytics_rollups' not in existing:
+        op.create_table('analytics_rollups',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('day', sa.Date(), nullable=False),
+            sa.Column('school_name', sa.String(255), nullable=False, server_default=''),
+            sa.Column('metric', sa.String(64), nullable=False),
+            sa.Column('value', sa.BigInteger(), nullable=False, server_default='0'),
+            sa.UniqueConstraint('day', 'school_name', 'metric', name='uq_analytics_rollup'),
+            sa.Index('ix_analytics_rollup_metric_day', 'metric', 'day'),
+        )
+
+    # TranslationMemory
+    if 'translation_memory' not in existing:
+        op.create_table('translation_memory',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('source_language', sa.String(16), nullable=False),
+            sa.Column('target_language', sa.String(16), nullable=False),
+            sa.Column('text_hash', sa.String(64), nullable=False),
+            sa.Column('source_text', sa.Text(), nullable=False),
+            sa.Column('translated_text', sa.Text(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+            sa.UniqueConstraint('source_language', 'target_language', 'text_hash', name='uq_translation_memory'),
+        )
+
+
+def downgrade():
+    op.drop_table('translation_memory')
+    op.drop_table('analytics_rollups')
+    op.drop_table('webhook_outbox')
+    op.drop_table('photo_analyses')
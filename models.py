@@ -2,7 +2,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, JSON, Float
 from sqlalchemy.orm import relationship, backref
-from sqlalchemy.ext.mutable import MutableDict
+from sqlalchemy.ext.mutable import MutableDict, MutableList
 from sqlalchemy.sql import func
 from sqlalchemy import text, inspect
 from datetime import datetime, timezone
@@ -545,7 +545,7 @@ class WebhookEndpoint(db.Model):
     name = db.Column(db.String(100), nullable=False)
     url = db.Column(db.String(512), nullable=False)
     secret = db.Column(db.String(255))
-    events = db.Column(MutableDict.as_mutable(JSON), default=list)
+    events = db.Column(MutableList.as_mutable(JSON), default=list)
     is_active = db.Column(db.Boolean, default=True)
     last_triggered_at = db.Column(db.DateTime, nullable=True)
     last_status_code = db.Column(db.Integer, nullable=True)
@@ -571,6 +571,27 @@ class WebhookDelivery(db.Model):
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), index=True)
 
 
+class WebhookOutbox(db.Model):
+    """Pending webhook events, drained by the delivery worker."""
+    __tablename__ = 'webhook_outbox'
+    __table_args__ = (
+        db.Index('ix_webhook_outbox_due', 'status', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    webhook_id = db.Column(db.Integer, ForeignKey('webhook_endpoints.id', ondelete='CASCADE'), nullable=False, index=True)
+    event_type = db.Column(db.String(100), nullable=False)
+    payload_json = db.Column(JSON, default=dict)
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending, delivering, delivered, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    claim_token = db.Column(db.String(32), nullable=True)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    delivered_at = db.Column(db.DateTime, nullable=True)
+
+
 class AccessPolicy(db.Model):
     __tablename__ = 'access_policies'
 
@@ -645,10 +666,63 @@ class OcrResult(db.Model):
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), index=True)
 
     student = relationship('Student', backref=backref('ocr_results', lazy='dynamic'))
+
+
+class PhotoAnalysis(db.Model):
+    """Vision results memoized by the SHA-256 of the photo bytes."""
+    __tablename__ = 'photo_analyses'
+
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), unique=True, nullable=False, index=True)
+    width = db.Column(db.Integer)  # EXIF-upright dimensions
+    height = db.Column(db.Integer)
+    exif_orientation = db.Column(db.Integer)
+    face_analyzed = db.Column(db.Boolean, default=False, nullable=False)
+    face_box = db.Column(JSON)  # relative [xmin, ymin, width, height] in the upright frame, null = no face
+    quality_score = db.Column(db.Float)
+    quality_status = db.Column(db.String(20))
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+
+class TranslationMemory(db.Model):
+    """Shared translation cache keyed by language pair and normalized source text."""
+    __tablename__ = 'translation_memory'
+    __table_args__ = (
+        db.UniqueConstraint('source_language', 'target_language', 'text_hash', name='uq_translation_memory'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    source_language = db.Column(db.String(16), nullable=False)
+    target_language = db.Column(db.String(16), nullable=False)
+    text_hash = db.Column(db.String(64), nullable=False)  # SHA-256 of the normalized source text
+    source_text = db.Column(db.Text, nullable=False)
+    translated_text = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+
+
+class AnalyticsRollup(db.Model):
+    """Per-day, per-school counters behind the analytics dashboards."""
+    __tablename__ = 'analytics_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('day', 'school_name', 'metric', name='uq_analytics_rollup'),
+        db.Index('ix_analytics_rollup_metric_day', 'metric', 'day'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    school_name = db.Column(db.String(255), nullable=False, default='')  # '' = no school
+    metric = db.Column(db.String(64), nullable=False)  # students_created, cards_generated, verifications:<status>, ...
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
 # ================== Print Queue Models ==================
 
 class PrintQueue(db.Model):
     __tablename__ = 'print_queue'
+    __table_args__ = (
+        # Serves the agents' claim query: pending jobs of a printer by priority, then FIFO
+        db.Index('ix_print_queue_claim', 'status', 'printer_name', 'priority', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     template_id = db.Column(db.Integer, db.ForeignKey('templates.id'), nullable=False, index=True)
     student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=True, index=True)
@@ -1,11 +1,21 @@
 """
 Notification Service Module
 Handles Email and SMS notifications for ID Card Generator
+
+Emails reuse pooled, logged-in SMTP sessions and SMS reuse one Twilio
+client. Bulk sends (deadline reminders, card ready notices) go through
+``dispatch_notifications``, which sends rate-limited batches in parallel
+and writes NotificationLog rows with bulk inserts.
 """
 
+import atexit
 import os
 import logging
+import queue
 import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -20,11 +30,21 @@ SMTP_SERVER = os.environ.get("SMTP_SERVER", "smtp.gmail.com")
 SMTP_PORT = int(os.environ.get("SMTP_PORT", 587))
 EMAIL_FROM = os.environ.get("EMAIL_FROM")
 EMAIL_PASSWORD = os.environ.get("EMAIL_PASSWORD")
+SMTP_USE_TLS = os.environ.get("SMTP_USE_TLS", "true").lower() not in ("0", "false", "no")
+SMTP_POOL_SIZE = int(os.environ.get("SMTP_POOL_SIZE", "4"))
+SMTP_IDLE_TIMEOUT = float(os.environ.get("SMTP_IDLE_TIMEOUT", "60"))  # seconds
+SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.environ.get("SMTP_MAX_MESSAGES_PER_CONNECTION", "100"))
 
 # ================== SMS Configuration (Twilio) ==================
 TWILIO_ACCOUNT_SID = os.environ.get("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.environ.get("TWILIO_AUTH_TOKEN")
 TWILIO_PHONE_NUMBER = os.environ.get("TWILIO_PHONE_NUMBER")
+NOTIFY_SMS_WORKERS = int(os.environ.get("NOTIFY_SMS_WORKERS", "4"))
+
+# ================== Dispatch Configuration ==================
+NOTIFY_EMAILS_PER_SECOND = float(os.environ.get("NOTIFY_EMAILS_PER_SECOND", "50"))  # 0 = unlimited
+NOTIFY_SMS_PER_SECOND = float(os.environ.get("NOTIFY_SMS_PER_SECOND", "10"))
+NOTIFY_BATCH_SIZE = max(1, int(os.environ.get("NOTIFY_BATCH_SIZE", "200")))
 
 # ================== Email Notification Templates ==================
 DEADLINE_APPROACHING_EMAIL = """
@@ -132,10 +152,152 @@ ERROR_NOTIFICATION_EMAIL = """
 """
 
 
+# ================== Dispatch Helpers ==================
+_MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+def _email_configured():
+    return bool(EMAIL_FROM) and (bool(EMAIL_PASSWORD) or not SMTP_USE_TLS)
+
+
+def _sms_configured():
+    return bool(TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN and TWILIO_PHONE_NUMBER)
+
+
+def _close_quietly(server):
+    try:
+        server.quit()
+    except Exception:
+        try:
+            server.close()
+        except Exception:
+            pass
+
+
+class _SMTPPool:
+    """Persistent, logged-in SMTP sessions reused across messages."""
+
+    def __init__(self, size):
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max(1, size))
+
+    def _connect(self):
+        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=10)
+        if SMTP_USE_TLS:
+            server.starttls()
+        if EMAIL_PASSWORD:
+            server.login(EMAIL_FROM, EMAIL_PASSWORD)
+        return server
+
+    def _checkout(self):
+        while True:
+            try:
+                server, last_used, sent = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect(), 0
+            if time.monotonic() - last_used < SMTP_IDLE_TIMEOUT:
+                return server, sent
+            # Servers drop idle sessions; don't bother probing old ones.
+            _close_quietly(server)
+
+    def _checkin(self, server, sent):
+        if sent >= SMTP_MAX_MESSAGES_PER_CONNECTION:
+            _close_quietly(server)
+        else:
+            self._idle.put((server, time.monotonic(), sent))
+
+    def send(self, recipient, payload):
+        with self._slots:
+            server, sent = self._checkout()
+            for attempt in (0, 1):
+                try:
+                    server.sendmail(EMAIL_FROM, [recipient], payload)
+                    break
+                except _MESSAGE_ERRORS:
+                    # Rejected message; the session itself is still usable.
+                    self._checkin(server, sent)
+                    raise
+                except OSError:
+                    _close_quietly(server)
+                    if attempt:
+                        raise
+                    # Pooled session went stale: reconnect once and resend.
+                    server, sent = self._connect(), 0
+            self._checkin(server, sent + 1)
+
+    def close(self):
+        while True:
+            try:
+                server, _, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            _close_quietly(server)
+
+
+class _RateLimiter:
+    """Spaces calls evenly at ``rate`` per second across threads (0 = unlimited)."""
+
+    def __init__(self, rate):
+        self._interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self._interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+_smtp_pool = _SMTPPool(SMTP_POOL_SIZE)
+_limiters = {
+    "email": _RateLimiter(NOTIFY_EMAILS_PER_SECOND),
+    "sms": _RateLimiter(NOTIFY_SMS_PER_SECOND),
+}
+
+_twilio = None
+_twilio_lock = threading.Lock()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def close_smtp_sessions():
+    """Quit the pooled SMTP sessions (they reconnect on the next send)."""
+    _smtp_pool.close()
+
+
+atexit.register(close_smtp_sessions)
+
+
+def _twilio_client():
+    global _twilio
+    with _twilio_lock:
+        if _twilio is None:
+            from twilio.rest import Client
+            _twilio = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+        return _twilio
+
+
+def _dispatch_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, SMTP_POOL_SIZE) + max(1, NOTIFY_SMS_WORKERS),
+                thread_name_prefix="notify",
+            )
+        return _executor
+
+
 # ================== Email Functions ==================
 def send_email(recipient_email, subject, html_content):
     """
-    Send an email notification.
+    Send an email notification over a pooled SMTP session.
     
     Args:
         recipient_email (str): Recipient email address
@@ -145,7 +307,7 @@ def send_email(recipient_email, subject, html_content):
     Returns:
         tuple: (success: bool, message: str)
     """
-    if not EMAIL_FROM or not EMAIL_PASSWORD:
+    if not _email_configured():
         logger.warning("Email credentials not configured. Skipping email notification.")
         return False, "Email not configured"
     
@@ -160,12 +322,8 @@ def send_email(recipient_email, subject, html_content):
         part = MIMEText(html_content, "html")
         message.attach(part)
         
-        # Send via SMTP
-        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=10)
-        server.starttls()
-        server.login(EMAIL_FROM, EMAIL_PASSWORD)
-        server.sendmail(EMAIL_FROM, recipient_email, message.as_string())
-        server.quit()
+        # Send via a pooled SMTP session
+        _smtp_pool.send(recipient_email, message.as_string())
         
         logger.info(f"Email sent successfully to {recipient_email}")
         return True, "Email sent successfully"
@@ -196,15 +354,12 @@ def send_sms(phone_number, message_text):
     Returns:
         tuple: (success: bool, message: str)
     """
-    if not TWILIO_ACCOUNT_SID or not TWILIO_AUTH_TOKEN or not TWILIO_PHONE_NUMBER:
+    if not _sms_configured():
         logger.warning("Twilio credentials not configured. Skipping SMS notification.")
         return False, "SMS not configured"
     
     try:
-        from twilio.rest import Client
-        
-        client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-        message = client.messages.create(
+        message = _twilio_client().messages.create(
             body=message_text,
             from_=TWILIO_PHONE_NUMBER,
             to=phone_number
@@ -236,28 +391,214 @@ def log_notification(recipient_email, recipient_phone, notification_type, channe
         student_id (int): Associated student ID
         template_id (int): Associated template ID
     """
+    _log_notifications([{
+        "recipient_email": recipient_email,
+        "recipient_phone": recipient_phone,
+        "notification_type": notification_type,
+        "channel": channel,
+        "subject": subject,
+        "message": message,
+        "status": status,
+        "error_message": error_message,
+        "student_id": student_id,
+        "template_id": template_id,
+        "sent_at": datetime.now(timezone.utc) if status == 'sent' else None,
+    }])
+
+
+def _log_notifications(rows):
+    """Insert NotificationLog rows in one statement and commit."""
+    if not rows:
+        return
     try:
-        notif_log = NotificationLog(
-            recipient_email=recipient_email,
-            recipient_phone=recipient_phone,
-            notification_type=notification_type,
-            channel=channel,
-            subject=subject,
-            message=message,
-            status=status,
-            error_message=error_message,
-            student_id=student_id,
-            template_id=template_id,
-            sent_at=datetime.now(timezone.utc) if status == 'sent' else None
-        )
-        db.session.add(notif_log)
+        db.session.execute(NotificationLog.__table__.insert(), rows)
         db.session.commit()
-        logger.info(f"Notification logged: {notification_type} ({channel}) to {recipient_email or recipient_phone}")
+        logger.info(f"Logged {len(rows)} notification(s)")
     except Exception as e:
-        logger.error(f"Error logging notification: {e}")
+        logger.error(f"Error logging notifications: {e}")
         db.session.rollback()
 
 
+# ================== Batched Dispatch ==================
+def _notification(channel, recipient, notification_type, subject, message, student_id=None, template_id=None):
+    return {
+        "channel": channel,
+        "recipient": recipient,
+        "notification_type": notification_type,
+        "subject": subject,
+        "message": message,
+        "student_id": student_id,
+        "template_id": template_id,
+    }
+
+
+def _send_one(notification):
+    _limiters[notification["channel"]].wait()
+    if notification["channel"] == "sms":
+        return send_sms(notification["recipient"], notification["message"])
+    return send_email(notification["recipient"], notification["subject"], notification["message"])
+
+
+def dispatch_notifications(notifications):
+    """
+    Send a batch of notifications and log them with bulk inserts.
+    
+    Emails go out over pooled SMTP sessions and SMS over one reused Twilio
+    client, each throttled to NOTIFY_EMAILS_PER_SECOND / NOTIFY_SMS_PER_SECOND.
+    NotificationLog rows are written NOTIFY_BATCH_SIZE at a time.
+    
+    Args:
+        notifications (list): dicts with channel, recipient, notification_type,
+            subject, message, student_id and template_id
+    
+    Returns:
+        dict: {"sent": int, "failed": int}
+    """
+    notifications = list(notifications)
+    configured = {"email": _email_configured(), "sms": _sms_configured()}
+    for channel, ok in configured.items():
+        if not ok and any(n["channel"] == channel for n in notifications):
+            logger.warning(f"{channel.upper()} not configured. Skipping {channel} notifications.")
+
+    results = [(False, f"{n['channel'].capitalize()} not configured") for n in notifications]
+    pending = [i for i, n in enumerate(notifications) if configured.get(n["channel"])]
+    if len(pending) == 1:
+        results[pending[0]] = _send_one(notifications[pending[0]])
+    elif pending:
+        executor = _dispatch_executor()
+        futures = {executor.submit(_send_one, notifications[i]): i for i in pending}
+        for future, i in futures.items():
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                results[i] = (False, str(e))
+
+    sent = 0
+    rows = []
+    now = datetime.now(timezone.utc)
+    for notification, (success, msg) in zip(notifications, results):
+        sent += bool(success)
+        is_sms = notification["channel"] == "sms"
+        rows.append({
+            "recipient_email": None if is_sms else notification["recipient"],
+            "recipient_phone": notification["recipient"] if is_sms else None,
+            "notification_type": notification["notification_type"],
+            "channel": notification["channel"],
+            "subject": notification["subject"],
+            "message": notification["message"],
+            "status": 'sent' if success else 'failed',
+            "error_message": None if success else msg,
+            "student_id": notification["student_id"],
+            "template_id": notification["template_id"],
+            "sent_at": now if success else None,
+        })
+    for start in range(0, len(rows), NOTIFY_BATCH_SIZE):
+        _log_notifications(rows[start:start + NOTIFY_BATCH_SIZE])
+    return {"sent": sent, "failed": len(rows) - sent}
+
+
+def _school_name(student, template):
+    return student.school_name or template.school_name or "Our School"
+
+
+def _deadline_str(template):
+    return template.deadline.strftime("%d %B %Y, %I:%M %p") if template.deadline else "N/A"
+
+
+def _deadline_notifications(student, template, days_remaining):
+    """Email (and SMS if enabled) deadline reminders for one student."""
+    pref = student.notification_preference
+    if pref and not pref.notify_deadline_approaching:
+        logger.info(f"Student {student.id} has disabled deadline notifications")
+        return []
+    if not student.email:
+        logger.warning(f"Student {student.id} has no email address")
+        return []
+
+    deadline_str = _deadline_str(template)
+    html_content = DEADLINE_APPROACHING_EMAIL.replace("{{ student_name }}", student.name or "Student")
+    html_content = html_content.replace("{{ deadline_date }}", deadline_str)
+    html_content = html_content.replace("{{ school_name }}", _school_name(student, template))
+    html_content = html_content.replace("{{ app_url }}", os.environ.get("APP_URL", "https://app.example.com"))
+
+    subject = "ID Card Deadline Reminder"
+    notifications = [_notification('email', student.email, 'deadline', subject, html_content, student.id, template.id)]
+    if pref and pref.sms_enabled and pref.phone_number:
+        sms_text = f"Hi {student.name}, your ID card deadline is in {days_remaining} days. Please complete it before {deadline_str}. Contact your school for help."
+        notifications.append(_notification('sms', pref.phone_number, 'deadline', subject, sms_text, student.id, template.id))
+    return notifications
+
+
+def _card_ready_notifications(student, template, download_url):
+    """Email (and SMS if enabled) card ready notices for one student."""
+    pref = student.notification_preference
+    if pref and not pref.notify_card_ready:
+        logger.info(f"Student {student.id} has disabled card ready notifications")
+        return []
+    if not student.email:
+        logger.warning(f"Student {student.id} has no email address")
+        return []
+
+    html_content = CARD_READY_EMAIL.replace("{{ student_name }}", student.name or "Student")
+    html_content = html_content.replace("{{ school_name }}", _school_name(student, template))
+    html_content = html_content.replace("{{ generated_time }}", datetime.now(timezone.utc).strftime("%d %B %Y, %I:%M %p"))
+    html_content = html_content.replace("{{ download_url }}", download_url)
+
+    subject = "Your ID Card is Ready!"
+    notifications = [_notification('email', student.email, 'card_ready', subject, html_content, student.id, template.id)]
+    if pref and pref.sms_enabled and pref.phone_number:
+        sms_text = f"Hi {student.name}, your ID card is ready! Download it now: {download_url}"
+        notifications.append(_notification('sms', pref.phone_number, 'card_ready', subject, sms_text, student.id, template.id))
+    return notifications
+
+
+def _students_with_preferences(student_ids=None, template_id=None):
+    from sqlalchemy.orm import selectinload
+
+    query = Student.query.options(selectinload(Student.notification_preference))
+    if student_ids is not None:
+        query = query.filter(Student.id.in_(student_ids))
+    if template_id is not None:
+        query = query.filter(Student.template_id == template_id)
+    return query.order_by(Student.id)
+
+
+def _iter_students(query):
+    """
+    Yield students page by page, keyset-paged on id in separate queries.
+
+    Each page is fully read before its notifications are dispatched and
+    logged, so ``_log_notifications`` never commits under an open cursor.
+    """
+    last_id = None
+    while True:
+        page_query = query if last_id is None else query.filter(Student.id > last_id)
+        page = page_query.limit(NOTIFY_BATCH_SIZE).all()
+        if not page:
+            return
+        last_id = page[-1].id
+        yield from page
+
+
+def _dispatch_in_batches(students, build):
+    """Build and dispatch notifications NOTIFY_BATCH_SIZE students at a time."""
+    totals = {"sent": 0, "failed": 0}
+    batch = []
+
+    def flush():
+        if batch:
+            for key, value in dispatch_notifications(batch).items():
+                totals[key] += value
+            batch.clear()
+
+    for count, student in enumerate(students, 1):
+        batch.extend(build(student))
+        if count % NOTIFY_BATCH_SIZE == 0:
+            flush()
+    flush()
+    return totals
+
+
 # ================== High-Level Notification Functions ==================
 def notify_deadline_approaching(student_id, template_id, days_remaining=3):
     """
@@ -276,132 +617,53 @@ def notify_deadline_approaching(student_id, template_id, days_remaining=3):
             logger.warning(f"Student {student_id} or Template {template_id} not found")
             return
         
-        # Check notification preference
-        pref = student.notification_preference
-        if pref and not pref.notify_deadline_approaching:
-            logger.info(f"Student {student_id} has disabled deadline notifications")
-            return
-        
-        if not student.email:
-            logger.warning(f"Student {student_id} has no email address")
-            return
-        
-        # Prepare email
-        deadline_str = template.deadline.strftime("%d %B %Y, %I:%M %p") if template.deadline else "N/A"
-        html_content = DEADLINE_APPROACHING_EMAIL.replace("{{ student_name }}", student.name or "Student")
-        html_content = html_content.replace("{{ deadline_date }}", deadline_str)
-        html_content = html_content.replace("{{ school_name }}", student.school_name or template.school_name or "Our School")
-        html_content = html_content.replace("{{ app_url }}", os.environ.get("APP_URL", "https://app.example.com"))
-        
-        # Send email
-        success, msg = send_email(student.email, "ID Card Deadline Reminder", html_content)
-        
-        # Log notification
-        log_notification(
-            recipient_email=student.email,
-            recipient_phone=None,
-            notification_type='deadline',
-            channel='email',
-            subject="ID Card Deadline Reminder",
-            message=html_content,
-            status='sent' if success else 'failed',
-            error_message=msg if not success else None,
-            student_id=student_id,
-            template_id=template_id
-        )
-        
-        # Send SMS if enabled
-        if pref and pref.sms_enabled and pref.phone_number:
-            sms_text = f"Hi {student.name}, your ID card deadline is in {days_remaining} days. Please complete it before {deadline_str}. Contact your school for help."
-            sms_success, sms_msg = send_sms(pref.phone_number, sms_text)
-            
-            log_notification(
-                recipient_email=None,
-                recipient_phone=pref.phone_number,
-                notification_type='deadline',
-                channel='sms',
-                subject="ID Card Deadline Reminder",
-                message=sms_text,
-                status='sent' if sms_success else 'failed',
-                error_message=sms_msg if not sms_success else None,
-                student_id=student_id,
-                template_id=template_id
-            )
+        dispatch_notifications(_deadline_notifications(student, template, days_remaining))
         
     except Exception as e:
         logger.error(f"Error notifying deadline approaching for student {student_id}: {e}")
 
 
-def notify_card_ready(student_id, template_id, download_url):
+def notify_card_ready(student_id, template_id, download_url=None, reprint=False):
     """
     Send card ready notification to a student.
     
     Args:
         student_id (int): Student ID
         template_id (int): Template ID
-        download_url (str): URL to download generated card
+        download_url (str): URL to download generated card (defaults to APP_URL)
+        reprint (bool): The card is a reprint (same notice is sent)
+    """
+    notify_cards_ready([student_id], template_id, download_url)
+
+
+def notify_cards_ready(student_ids, template_id, download_url=None):
+    """
+    Send card ready notifications to many students of one template.
+    
+    Args:
+        student_ids (list): Student IDs
+        template_id (int): Template ID
+        download_url (str): URL to download generated cards (defaults to APP_URL)
+    
+    Returns:
+        dict: {"sent": int, "failed": int}
     """
     try:
-        student = db.session.get(Student, student_id)
         template = db.session.get(Template, template_id)
-        
-        if not student or not template:
-            logger.warning(f"Student {student_id} or Template {template_id} not found")
-            return
-        
-        # Check notification preference
-        pref = student.notification_preference
-        if pref and not pref.notify_card_ready:
-            logger.info(f"Student {student_id} has disabled card ready notifications")
-            return
-        
-        if not student.email:
-            logger.warning(f"Student {student_id} has no email address")
-            return
-        
-        # Prepare email
-        html_content = CARD_READY_EMAIL.replace("{{ student_name }}", student.name or "Student")
-        html_content = html_content.replace("{{ school_name }}", student.school_name or template.school_name or "Our School")
-        html_content = html_content.replace("{{ generated_time }}", datetime.now(timezone.utc).strftime("%d %B %Y, %I:%M %p"))
-        html_content = html_content.replace("{{ download_url }}", download_url)
-        
-        # Send email
-        success, msg = send_email(student.email, "Your ID Card is Ready!", html_content)
-        
-        # Log notification
-        log_notification(
-            recipient_email=student.email,
-            recipient_phone=None,
-            notification_type='card_ready',
-            channel='email',
-            subject="Your ID Card is Ready!",
-            message=html_content,
-            status='sent' if success else 'failed',
-            error_message=msg if not success else None,
-            student_id=student_id,
-            template_id=template_id
+        if not template:
+            logger.warning(f"Template {template_id} not found")
+            return {"sent": 0, "failed": 0}
+        
+        download_url = download_url or os.environ.get("APP_URL", "https://app.example.com")
+        students = _students_with_preferences(student_ids=list(student_ids))
+        return _dispatch_in_batches(
+            _iter_students(students),
+            lambda student: _card_ready_notifications(student, template, download_url),
         )
         
-        # Send SMS if enabled
-        if pref and pref.sms_enabled and pref.phone_number:
-            sms_text = f"Hi {student.name}, your ID card is ready! Download it now: {download_url}"
-            sms_success, sms_msg = send_sms(pref.phone_number, sms_text)
-            
-            log_notification(
-                recipient_email=None,
-                recipient_phone=pref.phone_number,
-                notification_type='card_ready',
-                channel='sms',
-                subject="Your ID Card is Ready!",
-                message=sms_text,
-                status='sent' if sms_success else 'failed',
-                error_message=sms_msg if not sms_success else None,
-                student_id=student_id,
-                template_id=template_id
-            )
-        
     except Exception as e:
-        logger.error(f"Error notifying card ready for student {student_id}: {e}")
+        logger.error(f"Error notifying card ready for template {template_id}: {e}")
+        return {"sent": 0, "failed": 0}
 
 
 def notify_generation_error(student_id, template_id, error_message):
@@ -434,24 +696,11 @@ def notify_generation_error(student_id, template_id, error_message):
         # Prepare email
         html_content = ERROR_NOTIFICATION_EMAIL.replace("{{ student_name }}", student.name or "Student")
         html_content = html_content.replace("{{ error_message }}", error_message or "Unknown error occurred")
-        html_content = html_content.replace("{{ school_name }}", student.school_name or template.school_name or "Our School")
+        html_content = html_content.replace("{{ school_name }}", _school_name(student, template))
         
-        # Send email
-        success, msg = send_email(student.email, "ID Card Generation Error", html_content)
-        
-        # Log notification
-        log_notification(
-            recipient_email=student.email,
-            recipient_phone=None,
-            notification_type='error',
-            channel='email',
-            subject="ID Card Generation Error",
-            message=html_content,
-            status='sent' if success else 'failed',
-            error_message=msg if not success else None,
-            student_id=student_id,
-            template_id=template_id
-        )
+        dispatch_notifications([
+            _notification('email', student.email, 'error', "ID Card Generation Error", html_content, student_id, template_id)
+        ])
         
     except Exception as e:
         logger.error(f"Error notifying generation error for student {student_id}: {e}")
@@ -462,37 +711,63 @@ def check_and_notify_approaching_deadlines():
     """
     Check for templates with approaching deadlines and notify students.
     This should be run as a scheduled task (e.g., daily via APScheduler).
+    
+    Students are loaded with their preferences in batches, already-notified
+    students are excluded with one query per template, and reminders go out
+    through ``dispatch_notifications``.
     """
+    from flask import has_app_context
+
+    if not has_app_context():
+        from app.legacy_app import app
+        with app.app_context():
+            return check_and_notify_approaching_deadlines()
+
     try:
         # Find templates with deadlines in the next 3 days
-        three_days_future = datetime.now(timezone.utc) + timedelta(days=3)
-        three_days_past = datetime.now(timezone.utc)
+        now = datetime.now(timezone.utc)
+        three_days_future = now + timedelta(days=3)
         
         templates_with_deadlines = Template.query.filter(
             Template.deadline.isnot(None),
-            Template.deadline >= three_days_past,
+            Template.deadline >= now,
             Template.deadline <= three_days_future
         ).all()
         
+        totals = {"sent": 0, "failed": 0}
         for template in templates_with_deadlines:
-            # Get all students for this template
-            students = Student.query.filter_by(template_id=template.id).all()
+            # Students we already notified for this template
+            notified = {
+                row[0] for row in db.session.query(NotificationLog.student_id).filter(
+                    NotificationLog.template_id == template.id,
+                    NotificationLog.notification_type == 'deadline',
+                    NotificationLog.status == 'sent',
+                    NotificationLog.student_id.isnot(None),
+                ).distinct()
+            }
             
-            for student in students:
-                # Check if we already notified this student
-                existing_notif = NotificationLog.query.filter_by(
-                    student_id=student.id,
-                    template_id=template.id,
-                    notification_type='deadline',
-                    status='sent'
-                ).first()
-                
-                if not existing_notif:
-                    # Calculate days remaining
-                    days_remaining = (template.deadline - datetime.now(timezone.utc)).days
-                    notify_deadline_approaching(student.id, template.id, days_remaining)
+            deadline = template.deadline
+            if deadline.tzinfo is None:
+                deadline = deadline.replace(tzinfo=timezone.utc)
+            days_remaining = (deadline - now).days
+            
+            students = (
+                student
+                for student in _iter_students(_students_with_preferences(template_id=template.id))
+                if student.id not in notified
+            )
+            result = _dispatch_in_batches(
+                students,
+                lambda student: _deadline_notifications(student, template, days_remaining),
+            )
+            for key, value in result.items():
+                totals[key] += value
         
-        logger.info(f"Deadline check completed. Found {len(templates_with_deadlines)} templates with approaching deadlines.")
+        logger.info(
+            f"Deadline check completed. Found {len(templates_with_deadlines)} templates with approaching deadlines "
+            f"({totals['sent']} sent, {totals['failed']} failed)."
+        )
+        return totals
         
     except Exception as e:
         logger.error(f"Error checking approaching deadlines: {e}")
@@ -0,0 +1,157 @@
+"""
+Notification dispatch tests against a local SMTP stand-in (aiosmtpd).
+"""
+import socket
+import threading
+import time
+
+import pytest
+
+import notifications
+from models import NotificationLog
+
+aiosmtpd_controller = pytest.importorskip("aiosmtpd.controller")
+
+
+class _RecordingHandler:
+    """Counts SMTP sessions and records accepted recipients."""
+
+    def __init__(self):
+        self.sessions = 0
+        self.recipients = []
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("reject"):
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.recipients.extend(envelope.rcpt_tos)
+        return "250 Message accepted"
+
+
+class _SMTPStandIn:
+    def __init__(self):
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            self.port = probe.getsockname()[1]
+        self.handler = _RecordingHandler()
+        self._controller = None
+
+    def start(self):
+        self._controller = aiosmtpd_controller.Controller(self.handler, hostname="127.0.0.1", port=self.port)
+        self._controller.start()
+
+    def stop(self):
+        self._controller.stop()
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    server = _SMTPStandIn()
+    server.start()
+    monkeypatch.setattr(notifications, "SMTP_SERVER", "127.0.0.1")
+    monkeypatch.setattr(notifications, "SMTP_PORT", server.port)
+    monkeypatch.setattr(notifications, "SMTP_USE_TLS", False)
+    monkeypatch.setattr(notifications, "EMAIL_FROM", "cards@example.com")
+    monkeypatch.setattr(notifications, "EMAIL_PASSWORD", None)
+    monkeypatch.setattr(notifications, "_smtp_pool", notifications._SMTPPool(2))
+    monkeypatch.setitem(notifications._limiters, "email", notifications._RateLimiter(0))
+    yield server
+    notifications._smtp_pool.close()
+    server.stop()
+
+
+def _email(recipient, student_id=None):
+    return notifications._notification(
+        "email", recipient, "card_ready", "Your card is ready", "<p>Ready</p>", student_id=student_id
+    )
+
+
+def test_pooled_session_is_reused(smtp_server):
+    for i in range(5):
+        assert notifications.send_email(f"student{i}@example.com", "Hi", "<p>Hi</p>")[0]
+
+    assert smtp_server.handler.sessions == 1
+    assert len(smtp_server.handler.recipients) == 5
+
+
+def test_reconnects_after_server_drops_session(smtp_server):
+    assert notifications.send_email("first@example.com", "Hi", "<p>Hi</p>")[0]
+    smtp_server.stop()
+    smtp_server.start()
+
+    assert notifications.send_email("second@example.com", "Hi", "<p>Hi</p>")[0]
+    assert smtp_server.handler.sessions == 2
+    assert smtp_server.handler.recipients == ["first@example.com", "second@example.com"]
+
+
+def test_idle_session_is_replaced(smtp_server, monkeypatch):
+    assert notifications.send_email("first@example.com", "Hi", "<p>Hi</p>")[0]
+    monkeypatch.setattr(notifications, "SMTP_IDLE_TIMEOUT", 0)
+
+    assert notifications.send_email("second@example.com", "Hi", "<p>Hi</p>")[0]
+    assert smtp_server.handler.sessions == 2
+
+
+def test_rate_limiter_spaces_calls_across_threads():
+    limiter = notifications._RateLimiter(20)
+    started = time.monotonic()
+    threads = [threading.Thread(target=limiter.wait) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # The first call goes straight through, the next five wait 1/20 s each.
+    assert time.monotonic() - started >= 5 / 20.0 - 0.01
+
+
+def test_dispatch_is_throttled(db, smtp_server, monkeypatch):
+    monkeypatch.setitem(notifications._limiters, "email", notifications._RateLimiter(20))
+    started = time.monotonic()
+
+    result = notifications.dispatch_notifications([_email(f"s{i}@example.com") for i in range(6)])
+
+    assert result == {"sent": 6, "failed": 0}
+    assert time.monotonic() - started >= 5 / 20.0 - 0.01
+
+
+def test_logs_are_written_in_bulk_with_statuses(db, smtp_server, monkeypatch):
+    monkeypatch.setattr(notifications, "NOTIFY_BATCH_SIZE", 2)
+    monkeypatch.setattr(notifications, "TWILIO_ACCOUNT_SID", None)
+    batches = []
+    log_notifications = notifications._log_notifications
+    monkeypatch.setattr(
+        notifications, "_log_notifications", lambda rows: (batches.append(len(rows)), log_notifications(rows))
+    )
+
+    result = notifications.dispatch_notifications([
+        _email("ok1@example.com"),
+        _email("reject@example.com"),
+        _email("ok2@example.com"),
+        notifications._notification("sms", "+15550100", "card_ready", None, "Ready"),
+    ])
+
+    assert result == {"sent": 2, "failed": 2}
+    assert batches == [2, 2]
+    logs = {
+        (log.recipient_email or log.recipient_phone): log
+        for log in NotificationLog.query.all()
+    }
+    assert {key: log.status for key, log in logs.items()} == {
+        "ok1@example.com": "sent",
+        "reject@example.com": "failed",
+        "ok2@example.com": "sent",
+        "+15550100": "failed",
+    }
+    assert logs["ok1@example.com"].sent_at is not None
+    assert logs["reject@example.com"].sent_at is None
+    assert "SMTP error" in logs["reject@example.com"].error_message
+    assert logs["+15550100"].error_message == "Sms not configured"
@@ -0,0 +1,60 @@
+"""
+Batched translation tests against the offline LocalTranslator.
+"""
+import pytest
+
+from app.services import translation_service
+from app.services.translation_service import LocalTranslator, translate_texts
+from models import TranslationMemory
+
+
+@pytest.fixture
+def translator(monkeypatch):
+    local = LocalTranslator()
+    monkeypatch.setattr(translation_service, "_translator", local)
+    translation_service.clear_translation_cache()
+    yield local
+    translation_service.clear_translation_cache()
+
+
+def test_batch_is_split_into_provider_calls(db, translator, monkeypatch):
+    monkeypatch.setattr(translation_service, "TRANSLATION_BATCH_SIZE", 3)
+    texts = [f"Student {name}" for name in "ABCDEFG"]
+
+    translate_texts(texts, "english", "urdu")
+
+    assert translator.calls == 3
+    assert translator.texts == 7
+
+
+def test_duplicates_are_sent_once(db, translator):
+    result = translate_texts(["Ali Khan", "Ali  Khan", "Ali Khan"], "english", "urdu")
+
+    assert translator.texts == 1
+    assert result == {"Ali Khan": "[ur] Ali Khan", "Ali  Khan": "[ur] Ali Khan"}
+
+
+def test_repeated_text_is_served_from_translation_memory(db, translator, monkeypatch):
+    translate_texts(["Ali Khan", "Sara Ahmed"], "english", "urdu")
+    assert TranslationMemory.query.count() == 2
+
+    # A fresh worker: empty LRU and a translator that has made no calls.
+    translation_service.clear_translation_cache()
+    fresh = LocalTranslator()
+    monkeypatch.setattr(translation_service, "_translator", fresh)
+
+    result = translate_texts(["Sara Ahmed", "Ali Khan"], "english", "urdu")
+
+    assert fresh.calls == 0
+    assert result == {"Sara Ahmed": "[ur] Sara Ahmed", "Ali Khan": "[ur] Ali Khan"}
+
+
+def test_output_order_matches_input(db, translator, monkeypatch):
+    monkeypatch.setattr(translation_service, "TRANSLATION_BATCH_SIZE", 2)
+    translate_texts(["Class Ten"], "english", "urdu")
+    texts = ["Zain", "Class Ten", "Ayesha", "Bilal", "", "Hamza"]
+
+    result = translate_texts(texts, "english", "urdu")
+
+    assert list(result) == texts
+    assert result == {text: (f"[ur] {text}" if text else "") for text in texts}